@@ -9,8 +9,19 @@ import logging
 import uuid
 import traceback
 from datetime import datetime
+from app.services import cache
+from app.services.jobs import JOB_TYPE_RENDER
+from app.services.video_processing.detections import (
+    frame_object_intervals,
+    log_boxes,
+    log_frame_objects,
+    log_intervals,
+    log_names,
+    rethreshold,
+    with_intervals,
+)
 from app.services.video_processing import video_processing
-from app.services.minio import MinioStorage
+from app.services.minio import get_storage
 from app.services.database import DatabaseManager
 
 logger = logging.getLogger(__name__)
@@ -30,10 +41,11 @@ with open(os.path.join(CONFIG_DIR, "secret.json")) as f:
     config = json.load(f)
     SECRET_KEY = config["SECRET_KEY"]
 
-storage = MinioStorage()
+# Соединения с MinIO и БД устанавливаются при первом запросе,
+# поэтому импорт приложения не зависит от доступности сервисов
+storage = get_storage()
 
 db_manager = DatabaseManager()
-db_manager.init_database()
 
 def token_required(f):
     @wraps(f)
@@ -103,6 +115,162 @@ def login():
     return jsonify({"message": "Invalid credentials"}), 401
 
 
+@bp.route("/health", methods=["GET"])
+def health():
+    """Проверка, что процесс приложения запущен (liveness)"""
+    return jsonify({"status": "ok"}), 200
+
+
+@bp.route("/ready", methods=["GET"])
+def ready():
+    """
+    Готовность принимать запросы (readiness): доступны PostgreSQL и MinIO.
+
+    API не выполняет инференс, поэтому готовность модели проверяет
+    обработчик очереди. Если зависимость недоступна, возвращается 503,
+    и балансировщик не направляет запросы на этот экземпляр.
+    """
+    checks = {
+        "database": db_manager.check_connection(),
+        "storage": storage.ensure_connection()
+    }
+    if all(checks.values()):
+        return jsonify({"status": "ready", **checks}), 200
+    return jsonify({"status": "unavailable", **checks}), 503
+
+
+def load_detection_log(video_filename, detection_results=None):
+    """
+    Лог детекций видео.
+
+    Для видео, обработанных до перехода на колоночный формат, вместо
+    лога читаются frame_objects из прежнего JSON-лога.
+
+    :param detection_results: запись DatabaseManager.get_video_detections, если есть
+    :return: (лог детекций, frame_objects) - заполнено не более одного значения
+    """
+    if detection_results:
+        bucket_name, log_name = detection_results['bucket_name'], detection_results['s3_key']
+        if log_name.endswith(video_processing.DETECTION_LOG_SUFFIX):
+            detection_log = storage.get_detection_log(log_name, bucket_name)
+            if detection_log is not None:
+                return detection_log, None
+        else:
+            frame_objects = storage.get_log_from_bucket(bucket_name, log_name)
+            if frame_objects is not None:
+                return None, frame_objects
+
+    detection_log = storage.get_detection_log(video_processing.detection_log_name(video_filename))
+    if detection_log is not None:
+        return detection_log, None
+    return None, storage.get_log(video_processing.legacy_log_names(video_filename)[0])
+
+
+def load_frame_objects(video_filename, detection_results=None):
+    """
+    frame_objects видео в прежнем формате JSON-лога для клиентов.
+
+    Колоночный лог хранит только кадры с детекциями; для ответа он
+    разворачивается в список (номер кадра, оружие, нож).
+
+    :return: список frame_objects или None, если лог не найден
+    """
+    detection_log, frame_objects = load_detection_log(video_filename, detection_results)
+    if detection_log is not None:
+        return log_frame_objects(detection_log)
+    return frame_objects
+
+
+def detection_response(video_filename, detection_results=None, include_frame_objects=True):
+    """
+    Результат детекции для ответа клиенту: интервалы детекций и,
+    для прежних клиентов, покадровые frame_objects.
+    """
+    detection_log, frame_objects = load_detection_log(video_filename, detection_results)
+    if detection_log is not None:
+        response = {"intervals": log_intervals(detection_log)}
+        if include_frame_objects:
+            response["frame_objects"] = log_frame_objects(detection_log)
+        return response
+
+    response = {"intervals": frame_object_intervals(frame_objects or [])}
+    if include_frame_objects:
+        response["frame_objects"] = frame_objects or []
+    return response
+
+
+def reuse_cached_result(content_hash, user_id, video_filename, metadata, upload_path=None):
+    """
+    Создание видео пользователя из результата в кэше без повторной обработки.
+
+    Размеченное видео и лог копируются на стороне сервера MinIO под новыми
+    именами, поэтому удаление или переименование копии не затрагивает
+    исходный результат. Если исходные объекты уже удалены, запись кэша
+    считается устаревшей и удаляется.
+
+    :param content_hash: SHA-256 загруженного видео
+    :param metadata: метаданные видео с запрошенными параметрами обработки
+    :param upload_path: загруженный файл, сохраняемый как исходное видео результата
+    :return: ответ для клиента или None, если результат нужно получить обработкой
+    """
+    try:
+        cache_keys = cache.lookup_keys(
+            content_hash, metadata['confidence_threshold'], metadata['frame_stride'], metadata['render']
+        )
+    except OSError as e:
+        # Без файла весов версию модели не определить, результат получается обработкой
+        logger.warning(f"Кэш результатов недоступен: {e}")
+        return None
+    entry = db_manager.get_cached_result(cache_keys)
+    if not entry:
+        return None
+
+    cached_metadata = entry.get('metadata') or {}
+    # Результат без размеченного видео состоит только из лога
+    annotated = video_processing.has_annotated_video(cached_metadata)
+    # Имя копии лога сохраняет формат исходного лога (колоночный или JSON)
+    log_filename = video_filename + entry['log_s3_key'][len(entry['video_s3_key']):]
+    copied = (
+        (not annotated or storage.copy_object(
+            entry['video_bucket'], entry['video_s3_key'], storage.video_bucket, video_filename
+        ))
+        and storage.copy_object(entry['log_bucket'], entry['log_s3_key'], storage.log_bucket, log_filename)
+    )
+    if not copied:
+        logger.warning(f"Результат в кэше недоступен в хранилище: {entry['video_s3_key']}")
+        storage.delete_objects(video_filename, log_filename)
+        db_manager.delete_cached_result(entry['cache_key'])
+        return None
+
+    metadata = {**cached_metadata, **metadata, "cached_from": entry['video_s3_key']}
+    metadata.pop('original_key', None)
+    if upload_path and video_processing.KEEP_ORIGINALS:
+        original_key = video_processing.original_upload_name(content_hash, upload_path)
+        # То же видео уже могло быть сохранено другим результатом
+        if storage.object_exists(storage.upload_bucket, original_key) or storage.save_upload(upload_path, original_key):
+            metadata['original_key'] = original_key
+    video_id, error = db_manager.create_cached_video(
+        user_id, video_filename, storage.video_bucket, metadata,
+        log_filename, storage.log_bucket, entry['weapon_detected'], entry['cache_key']
+    )
+    if error:
+        storage.delete_objects(video_filename, log_filename)
+        return None
+
+    db_manager.add_log(user_id, 'upload', video_id, {"cached": True})
+    logger.info(f"Результат обработки взят из кэша: {entry['video_s3_key']} -> {video_filename}")
+    response = {
+        "status": "completed",
+        "cached": True,
+        "video_url": video_filename,
+        "fps": int(cached_metadata['fps']) if cached_metadata.get('fps') else None
+    }
+    response.update(detection_response(
+        video_filename, {"bucket_name": storage.log_bucket, "s3_key": log_filename}
+    ))
+    return response
+
+
 @bp.route("/predict", methods=["POST"])
 @token_required
 def processing():
@@ -128,6 +296,25 @@ def processing():
     user_id = user_data.get("user_id")  # Может отсутствовать в старых токенах
     logger.info(f"Обработка видео для пользователя: {username}")
 
+    if not user_id:
+        # Задача обработки хранится в БД и привязывается к пользователю
+        logger.warning(f"Токен пользователя {username} не содержит user_id")
+        return jsonify({"error": "Токен устарел. Пожалуйста, войдите в систему снова"}), 401
+
+    frame_stride = request.form.get('frame_stride', video_processing.FRAME_STRIDE)
+    try:
+        frame_stride = int(frame_stride)
+    except (TypeError, ValueError):
+        frame_stride = 0
+    if not 1 <= frame_stride <= video_processing.MAX_FRAME_STRIDE:
+        return jsonify({"error": f"Шаг выборки кадров должен быть целым числом от 1 до {video_processing.MAX_FRAME_STRIDE}"}), 400
+
+    # render=false: только детекция, без размеченного видео
+    render = request.form.get('render', 'true').lower()
+    if render not in ('true', 'false'):
+        return jsonify({"error": "Параметр render должен быть true или false"}), 400
+    render = render == 'true'
+
     file_extension = os.path.splitext(file.filename)[1]
     logger.debug(f"Расширение загруженного файла: {file_extension}")
 
@@ -135,10 +322,12 @@ def processing():
     try:
         temp_dir = tempfile.gettempdir()
         
-        temp_filename = f"temp_video_{datetime.now().strftime('%Y%m%d%H%M%S')}_{username}{file_extension}"
+        # Суффикс uuid исключает совпадение имен при одновременных загрузках
+        temp_filename = f"temp_video_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}_{username}{file_extension}"
         temp_path = os.path.join(temp_dir, temp_filename)
         
-        file.save(temp_path)
+        # Хэш содержимого считается при сохранении и служит ключом кэша результатов
+        content_hash = cache.save_with_hash(file.stream, temp_path)
         file.close()  # Убедимся, что файл закрыт
         logger.info(f"Временный файл создан: {temp_path}")
         
@@ -154,61 +343,72 @@ def processing():
             return jsonify({"error": f"Файл слишком большой. Максимальный размер: {max_size/(1024*1024)} МБ"}), 400
     
         confidence_threshold = 0.6
-        logger.info(f"Начало обработки видео: {file.filename}, порог уверенности: {confidence_threshold}")
-        video_filename, frame_objects, fps, has_weapon_or_knife, log_filename = video_processing.process_video(
-            temp_path, confidence_threshold, username
-        )
-        
-        if not video_filename or not isinstance(frame_objects, list) or not fps:
-            logger.error("Некорректные результаты обработки видео")
-            raise ValueError("Не удалось корректно обработать видео. Проверьте формат файла.")
-        
-        logger.info(f"Обработка видео завершена: {video_filename}, кадров: {len(frame_objects)}, fps: {fps}")
-        
-        detection_count = sum(1 for obj in frame_objects if len(obj) > 0)
+        video_filename = video_processing.build_output_name(username, temp_path)
+
+        if cache.RESULT_CACHE_ENABLED:
+            cached_response = reuse_cached_result(
+                content_hash, user_id, video_filename, {
+                    "username": username,
+                    "original_filename": file.filename,
+                    "confidence_threshold": confidence_threshold,
+                    "frame_stride": frame_stride,
+                    "render": render
+                },
+                upload_path=temp_path
+            )
+            if cached_response:
+                os.remove(temp_path)
+                return jsonify(cached_response), 200
+
+        # Исходное видео сохраняется в хранилище, чтобы его мог забрать
+        # обработчик очереди, запущенный в отдельном процессе или на другом узле
+        if not storage.save_upload(temp_path, temp_filename):
+            raise RuntimeError("Не удалось сохранить исходное видео в хранилище")
+
         metadata = {
             "username": username,
             "original_filename": file.filename,
-            "fps": str(fps),
-            "detection_count": str(detection_count),
-            "processed_date": datetime.now().isoformat()
+            "upload_key": temp_filename,
+            "confidence_threshold": confidence_threshold,
+            "frame_stride": frame_stride,
+            "render": render
         }
-        logger.debug(f"Метаданные видео: {metadata}")
+        # Параметры, необходимые обработчику очереди для выполнения задачи
+        payload = {
+            "upload_key": temp_filename,
+            "username": username,
+            "confidence_threshold": confidence_threshold,
+            "frame_stride": frame_stride,
+            "render": render,
+            # По хэшу именуется сохраняемое исходное видео и строится ключ кэша
+            "content_hash": content_hash
+        }
+        if cache.RESULT_CACHE_ENABLED:
+            # Обработчик очереди сохранит результат под ключом из версии модели
+            # и параметров обработки, с которыми видео действительно обработано
+            payload["cache"] = True
+        job, error = db_manager.create_video_job(
+            user_id,
+            video_filename,
+            storage.video_bucket,
+            metadata,
+            payload
+        )
+        if error:
+            storage.delete_upload(temp_filename)
+            raise RuntimeError(error)
 
-        if user_id:
-            video_id, error = db_manager.save_video_metadata(
-                user_id, 
-                video_filename, 
-                storage.video_bucket, 
-                metadata, 
-                status='completed'
-            )
-            success, error1 = db_manager.save_detection_results(video_id,log_filename, frame_objects, has_weapon_or_knife)
-            
-            if error:
-                logger.error(f"Ошибка при сохранении метаданных видео в БД: {error}")
-            if error1:
-                logger.error(f"Ошибка при сохранении результатов обнаружения в БД: {error1}")
-            else:
-                db_manager.add_log(user_id, 'upload', video_id)
-                
         if os.path.exists(temp_path):
             os.remove(temp_path)
             logger.debug(f"Временный файл удален: {temp_path}")
 
-        logger.info(f"Запрос /predict успешно обработан для файла: {file.filename}")
+        logger.info(f"Видео {file.filename} поставлено в очередь обработки, задача {job['job_id']}")
         return jsonify({
-            "video_url": video_filename, 
-            "frame_objects": frame_objects, 
-            "fps": fps
-        }), 200
+            "job_id": str(job['job_id']),
+            "status": "pending",
+            "video_url": video_filename
+        }), 202
     
-    except ValueError as ve:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        logger.warning(f"Ошибка валидации в /predict: {str(ve)}")
-        return jsonify({"error": str(ve)}), 400
-        
     except Exception as e:
         if temp_path and os.path.exists(temp_path):
             os.remove(temp_path)
@@ -218,6 +418,51 @@ def processing():
         return jsonify({"error": "Произошла ошибка при обработке видео. Пожалуйста, попробуйте снова или используйте другой файл."}), 500
 
 
+@bp.route("/jobs/<job_id>", methods=["GET"])
+@token_required
+def get_job(job_id):
+    """Получить статус задачи обработки видео и ее результат"""
+    token = request.headers.get("Authorization").split(" ")[1]
+    user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    user_id = user_data.get("user_id")
+
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        return jsonify({"error": "Job not found"}), 404
+
+    try:
+        job = db_manager.get_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        if str(job['user_id']) != user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        metadata = job.get('metadata') or {}
+        response = {
+            "job_id": str(job['job_id']),
+            "status": job['status'],
+            "progress": job.get('progress') or 0,
+            "attempts": job.get('attempts', 0),
+            "video_url": job['s3_key']
+        }
+
+        if job['status'] == 'failed':
+            response["error"] = job.get('error')
+
+        if job['status'] == 'completed':
+            detection_results = db_manager.get_video_detections(job['video_id'])
+            # Клиенты, которым достаточно интервалов, не загружают покадровый лог
+            include_frame_objects = request.args.get("frame_objects", "true").lower() != "false"
+            response.update(detection_response(job['s3_key'], detection_results, include_frame_objects))
+            response["fps"] = int(metadata['fps']) if metadata.get('fps') else None
+
+        return jsonify(response), 200
+    except Exception as e:
+        logger.error(f"Ошибка при получении статуса задачи: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.route("/video/<path:filename>")
 @token_required
 def serve_video(filename):
@@ -230,17 +475,27 @@ def serve_video(filename):
         return jsonify({"message": "Unauthorized"}), 401
 
     try:
+        video = None
         if user_id:
             video = db_manager.get_video_by_s3_key(filename)
             if video and str(video['user_id']) != user_id:
                 return jsonify({"message": "Unauthorized"}), 401
         
         logger.info(f"Запрошено видео: {filename}")
-        video_url = storage.get_presigned_url(filename)
+        metadata = (video or {}).get('metadata') or {}
+        annotated = video_processing.has_annotated_video(metadata)
+        if annotated:
+            video_url = storage.get_presigned_url(filename)
+        elif metadata.get('original_key'):
+            # Размеченное видео не создавалось: отдается исходное видео,
+            # рамки клиент рисует по GET /videos/<filename>/detections
+            video_url = storage.get_presigned_url(metadata['original_key'], bucket_name=storage.upload_bucket)
+        else:
+            video_url = None
         if video_url:
             logger.info(f"Получена временная ссылка из MinIO для {filename}")
            
-            return redirect(video_url) if request.args.get('direct') else jsonify({"url": video_url}), 200
+            return redirect(video_url) if request.args.get('direct') else jsonify({"url": video_url, "annotated": annotated}), 200
         else:
             logger.error(f"Не удалось получить временную ссылку из MinIO для {filename}")
             return jsonify({"error": "Video not found"}), 404
@@ -327,6 +582,7 @@ def get_video_logs(filename):
         return jsonify({"error": "Unauthorized"}), 401
 
     try:
+        detection_results = None
         if user_id:
             video_data = db_manager.get_video_by_s3_key(filename)
             if video_data:
@@ -334,14 +590,8 @@ def get_video_logs(filename):
                     return jsonify({"error": "Unauthorized"}), 401
                 
                 detection_results = db_manager.get_video_detections(video_data['video_id'])
-                if detection_results:
-                    if storage.object_exists(detection_results['bucket_name'], detection_results['s3_key']):
-                        logs = storage.get_log_from_bucket(detection_results['bucket_name'], detection_results['s3_key'])
-                        if logs:
-                            print(logs)
-                            return jsonify(logs)
         
-        logs = storage.get_log(f"{filename}.json")
+        logs = load_frame_objects(filename, detection_results)
         
         if logs is None:
             return jsonify({"error": "Logs not found"}), 404
@@ -352,6 +602,202 @@ def get_video_logs(filename):
         return jsonify({"error": str(e)}), 500
 
 
+@bp.route("/videos/<filename>/intervals", methods=["GET"])
+@token_required
+def get_video_intervals(filename):
+    """
+    Интервалы детекций видео: подряд идущие кадры с одинаковым набором классов.
+
+    Интервалы вычисляются при обработке видео и хранятся в логе детекций,
+    поэтому клиент получает несколько десятков записей вместо покадрового лога.
+    """
+    token = request.headers.get("Authorization").split(" ")[1]
+    user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    username = user_data["user"]
+    user_id = user_data.get("user_id")
+
+    if not filename.startswith(f"{username}_"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        detection_results = None
+        metadata = {}
+        if user_id:
+            video_data = db_manager.get_video_by_s3_key(filename)
+            if video_data:
+                if str(video_data['user_id']) != user_id:
+                    return jsonify({"error": "Unauthorized"}), 401
+                metadata = video_data.get('metadata') or {}
+                detection_results = db_manager.get_video_detections(video_data['video_id'])
+
+        detection_log, frame_objects = load_detection_log(filename, detection_results)
+        if detection_log is not None:
+            intervals = log_intervals(detection_log)
+        elif frame_objects is not None:
+            intervals = frame_object_intervals(frame_objects)
+        else:
+            return jsonify({"error": "Logs not found"}), 404
+
+        return jsonify({
+            "video_url": filename,
+            "fps": int(metadata['fps']) if metadata.get('fps') else None,
+            "intervals": intervals
+        })
+    except Exception as e:
+        logger.error(f"Ошибка при получении интервалов детекций: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/videos/<filename>/detections", methods=["GET"])
+@token_required
+def get_video_detections(filename):
+    """
+    Рамки детекций видео для разметки исходного видео на клиенте.
+
+    Для видео, обработанных без размеченного видео (render=false), клиент
+    рисует рамки поверх исходного видео. Необязательный параметр
+    confidence_threshold задает порог (по умолчанию порог обработки).
+    """
+    token = request.headers.get("Authorization").split(" ")[1]
+    user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    username = user_data["user"]
+    user_id = user_data.get("user_id")
+
+    if not filename.startswith(f"{username}_"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        metadata = {}
+        if user_id:
+            video_data = db_manager.get_video_by_s3_key(filename)
+            if video_data:
+                if str(video_data['user_id']) != user_id:
+                    return jsonify({"error": "Unauthorized"}), 401
+                metadata = video_data.get('metadata') or {}
+
+        detection_log = storage.get_detection_log(video_processing.detection_log_name(filename))
+        if detection_log is None:
+            return jsonify({"error": "Детекции видео не сохранены"}), 404
+
+        confidence_threshold = detection_log["confidence_threshold"]
+        if request.args.get("confidence_threshold") is not None:
+            try:
+                confidence_threshold = float(request.args["confidence_threshold"])
+            except ValueError:
+                return jsonify({"error": "Порог уверенности должен быть числом"}), 400
+            if not detection_log["floor"] <= confidence_threshold <= 1:
+                return jsonify({
+                    "error": f"Порог уверенности должен быть от {detection_log['floor']} до 1"
+                }), 400
+
+        return jsonify({
+            "video_url": filename,
+            "fps": int(metadata['fps']) if metadata.get('fps') else None,
+            "confidence_threshold": confidence_threshold,
+            "names": {str(class_id): name for class_id, name in log_names(detection_log).items()},
+            "detections": log_boxes(detection_log, confidence_threshold)
+        })
+    except Exception as e:
+        logger.error(f"Ошибка при получении рамок детекций: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/videos/<filename>/threshold", methods=["POST"])
+@token_required
+def rethreshold_video(filename):
+    """
+    Пересчет результата детекции для другого порога уверенности.
+
+    Результат вычисляется по сохраненным детекциям модели, без повторной
+    обработки видео. При render=true ставится задача отрисовки нового
+    видео с этим порогом (модель также не запускается).
+    """
+    token = request.headers.get("Authorization").split(" ")[1]
+    user_data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    username = user_data["user"]
+    user_id = user_data.get("user_id")
+
+    if not filename.startswith(f"{username}_"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.get_json() or {}
+    try:
+        confidence_threshold = float(data.get("confidence_threshold"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Порог уверенности должен быть числом"}), 400
+
+    try:
+        video_data = db_manager.get_video_by_s3_key(filename)
+        if not video_data:
+            return jsonify({"error": "Video not found"}), 404
+        if str(video_data['user_id']) != user_id:
+            return jsonify({"error": "Unauthorized"}), 401
+
+        detection_log = storage.get_detection_log(video_processing.detection_log_name(filename))
+        if detection_log is None:
+            return jsonify({"error": "Детекции видео не сохранены, пересчет недоступен"}), 404
+
+        if not detection_log["floor"] <= confidence_threshold <= 1:
+            return jsonify({
+                "error": f"Порог уверенности должен быть от {detection_log['floor']} до 1"
+            }), 400
+
+        summary = rethreshold(detection_log, confidence_threshold)
+        response = {
+            "confidence_threshold": confidence_threshold,
+            "frame_objects": summary.frame_objects,
+            "intervals": log_intervals(with_intervals(detection_log, confidence_threshold)),
+            "weapon_detected": summary.has_weapon_or_knife,
+            "detection_count": sum(1 for _, has_weapon, has_knife in summary.frame_objects if has_weapon or has_knife)
+        }
+        if not data.get("render"):
+            return jsonify(response), 200
+
+        metadata = video_data.get('metadata') or {}
+        original_key = metadata.get('original_key')
+        if not original_key or not storage.object_exists(storage.upload_bucket, original_key):
+            return jsonify({"error": "Исходное видео не сохранено, повторная отрисовка недоступна"}), 409
+
+        original_filename = metadata.get('original_filename') or filename
+        video_filename = video_processing.build_output_name(
+            username, f"{os.path.splitext(original_filename)[0]}_conf{round(confidence_threshold * 100)}"
+        )
+        payload = {
+            "type": JOB_TYPE_RENDER,
+            "username": username,
+            "source_video": filename,
+            "original_key": original_key,
+            "confidence_threshold": confidence_threshold
+        }
+        job, error = db_manager.create_video_job(
+            user_id,
+            video_filename,
+            storage.video_bucket,
+            {
+                "username": username,
+                "original_filename": original_filename,
+                "confidence_threshold": confidence_threshold,
+                "source_video": filename,
+                # Исходное видео не удаляется вместе с source_video, пока задача ждет обработки
+                "original_key": original_key
+            },
+            payload
+        )
+        if error:
+            raise RuntimeError(error)
+
+        logger.info(f"Поставлена задача отрисовки {filename} с порогом {confidence_threshold}: {job['job_id']}")
+        response.update({
+            "job_id": str(job['job_id']),
+            "status": "pending",
+            "video_url": video_filename
+        })
+        return jsonify(response), 202
+    except Exception as e:
+        logger.error(f"Ошибка при пересчете порога уверенности: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.route("/videos/<filename>", methods=["DELETE"])
 @token_required
 def delete_video_route(filename):
@@ -373,8 +819,22 @@ def delete_video_route(filename):
                 if success:
                     deleted_from_db = True
                     logger.info(f"Видео {filename} удалено из базы данных")
+                    
+                    # Видео еще в очереди: исходный файл больше не будет обработан
+                    metadata = video_data.get('metadata') or {}
+                    upload_key = metadata.get('upload_key')
+                    if video_data.get('status') in ('pending', 'processing') and upload_key:
+                        storage.delete_upload(upload_key)
+                    # Исходное видео, сохраненное для повторной отрисовки, общее
+                    # для всех результатов с тем же содержимым и удаляется
+                    # вместе с последним из них
+                    original_key = metadata.get('original_key')
+                    if original_key and db_manager.count_videos_with_original(original_key) == 0:
+                        storage.delete_upload(original_key)
         
-        success = storage.delete_objects(filename, f"{filename}.json")
+        success = storage.delete_objects(filename, video_processing.detection_log_name(filename))
+        for log_name in video_processing.legacy_log_names(filename):
+            storage.delete_log(log_name)
             
         if not success and not deleted_from_db:
             return jsonify({"error": "Failed to delete video"}), 500
@@ -428,7 +888,15 @@ def update_video(filename):
 
         result = storage.rename_object(storage.video_bucket, filename, new_filename)
         
-        storage.rename_object(storage.log_bucket, f"{filename}.json", f"{new_filename}.json")
+        storage.rename_object(
+            storage.log_bucket,
+            video_processing.detection_log_name(filename),
+            video_processing.detection_log_name(new_filename)
+        )
+        for log_name, new_log_name in zip(
+            video_processing.legacy_log_names(filename), video_processing.legacy_log_names(new_filename)
+        ):
+            storage.rename_object(storage.log_bucket, log_name, new_log_name)
             
         return jsonify({"message": "Video renamed successfully", "new_filename": new_filename})
     except Exception as e:
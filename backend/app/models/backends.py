@@ -0,0 +1,153 @@
+import os
+import time
+import logging
+import importlib.util
+
+import numpy as np
+from ultralytics import YOLO
+
+
+logger = logging.getLogger(__name__)
+
+
+BACKEND_PYTORCH = "pytorch"
+BACKEND_ONNX = "onnx"
+BACKEND_OPENVINO = "openvino"
+# INT8-модель создается квантизацией (app/models/quantization.py)
+BACKEND_ONNX_INT8 = "onnx_int8"
+BACKEND_AUTO = "auto"
+BACKENDS = (BACKEND_PYTORCH, BACKEND_ONNX, BACKEND_OPENVINO, BACKEND_ONNX_INT8)
+# INT8 меняет точность модели, поэтому автоматически не выбирается:
+# решение принимается по отчету сравнения с FP32
+AUTO_BACKENDS = (BACKEND_PYTORCH, BACKEND_ONNX, BACKEND_OPENVINO)
+
+# Число замеров при выборе бэкенда (после одного прогревочного запуска)
+BENCHMARK_RUNS = int(os.environ.get("MODEL_BENCHMARK_RUNS", "5"))
+BENCHMARK_FRAME_SIZE = (640, 640)
+
+# Пакеты, без которых бэкенд недоступен: экспорт и исполнение модели
+_BACKEND_REQUIREMENTS = {
+    BACKEND_PYTORCH: (),
+    BACKEND_ONNX: ("onnx", "onnxruntime"),
+    BACKEND_OPENVINO: ("openvino",),
+    BACKEND_ONNX_INT8: ("onnxruntime",),
+}
+
+
+def is_available(backend):
+    """Установлены ли пакеты, необходимые бэкенду"""
+    return all(
+        importlib.util.find_spec(package) is not None
+        for package in _BACKEND_REQUIREMENTS[backend]
+    )
+
+
+def exported_path(checkpoint_path, backend):
+    """
+    Путь к экспортированной модели рядом с чекпоинтом.
+
+    Совпадает с путем, который использует экспорт Ultralytics.
+    """
+    stem = os.path.splitext(checkpoint_path)[0]
+    if backend == BACKEND_ONNX:
+        return f"{stem}.onnx"
+    if backend == BACKEND_OPENVINO:
+        return f"{stem}_openvino_model"
+    if backend == BACKEND_ONNX_INT8:
+        return f"{stem}_int8.onnx"
+    return checkpoint_path
+
+
+def export_model(checkpoint_path, backend):
+    """
+    Экспорт чекпоинта в формат бэкенда с кэшированием результата.
+
+    Экспорт выполняется один раз: повторно он нужен, только если
+    чекпоинт новее экспортированной модели.
+
+    :return: путь к модели в формате бэкенда
+    """
+    path = exported_path(checkpoint_path, backend)
+    if backend == BACKEND_PYTORCH:
+        return path
+
+    if backend == BACKEND_ONNX_INT8:
+        # Для квантизации нужны кадры калибровки, поэтому она не выполняется
+        # автоматически при загрузке
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"INT8-модель не найдена: {path}. Создайте ее командой "
+                f"python -m app.models.quantization quantize"
+            )
+        return path
+
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(checkpoint_path):
+        logger.info(f"Используется экспортированная модель: {path}")
+        return path
+
+    logger.info(f"Экспорт модели {checkpoint_path} в формат {backend}")
+    # Динамический размер пакета нужен для пакетной детекции кадров
+    exported = YOLO(checkpoint_path).export(format=backend, dynamic=True)
+    logger.info(f"Модель экспортирована: {exported}")
+    return path
+
+
+def load_backend(checkpoint_path, backend):
+    """Загрузка модели для заданного бэкенда"""
+    path = export_model(checkpoint_path, backend)
+    return YOLO(path, task="detect")
+
+
+def benchmark(model, runs=BENCHMARK_RUNS):
+    """
+    Медианное время детекции на одном кадре в секундах.
+
+    Первый запуск не учитывается: он включает инициализацию бэкенда.
+    """
+    frame = np.zeros((*BENCHMARK_FRAME_SIZE, 3), dtype=np.uint8)
+    model.predict(frame, verbose=False)
+
+    timings = []
+    for _ in range(max(runs, 1)):
+        started = time.perf_counter()
+        model.predict(frame, verbose=False)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+def select_backend(checkpoint_path, backend=BACKEND_AUTO):
+    """
+    Загрузка модели выбранным или самым быстрым бэкендом.
+
+    В режиме auto модель загружается всеми доступными бэкендами,
+    и выбирается бэкенд с наименьшим временем детекции. Если бэкенд
+    не удалось экспортировать или загрузить, он пропускается.
+
+    :return: (модель YOLO, имя бэкенда)
+    """
+    if backend != BACKEND_AUTO:
+        if backend not in BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд модели: {backend}")
+        return load_backend(checkpoint_path, backend), backend
+
+    best = None
+    for candidate in AUTO_BACKENDS:
+        if not is_available(candidate):
+            logger.info(f"Бэкенд {candidate} недоступен: не установлены необходимые пакеты")
+            continue
+        try:
+            candidate_model = load_backend(checkpoint_path, candidate)
+            latency = benchmark(candidate_model)
+        except Exception as e:
+            logger.warning(f"Бэкенд {candidate} пропущен: {e}")
+            continue
+
+        logger.info(f"Бэкенд {candidate}: {latency * 1000:.1f} мс на кадр")
+        if best is None or latency < best[2]:
+            best = (candidate_model, candidate, latency)
+
+    if best is None:
+        raise RuntimeError("Не удалось загрузить модель ни одним бэкендом")
+
+    logger.info(f"Выбран бэкенд модели: {best[1]}")
+    return best[0], best[1]
@@ -0,0 +1,199 @@
+"""
+Сервер инференса с динамическими пакетами.
+
+Несколько задач одного процесса передают кадры в общую очередь, а модель
+выполняется в одном потоке сервера: запросы разных задач объединяются
+в пакет, ограниченный размером и временем ожидания.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import Future
+
+from app.models import inference_process, model
+from app.services.video_processing.detections import extract_detections, filter_detections
+
+
+logger = logging.getLogger(__name__)
+
+
+# Передавать кадры модели через общий сервер с динамическими пакетами
+INFERENCE_SERVER_ENABLED = os.environ.get("INFERENCE_SERVER", "false").lower() == "true"
+# Наибольшее число кадров в пакете сервера
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "16"))
+# Наибольшее время ожидания запросов других задач после первого запроса пакета
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "10"))
+
+# Сигнал остановки потока сервера
+_STOP = object()
+
+_server = None
+_server_lock = threading.Lock()
+
+
+class _Request:
+    """Кадры одного вызова infer и результат для вызывающего потока"""
+
+    def __init__(self, frames, confidence_threshold):
+        self.frames = frames
+        self.confidence_threshold = confidence_threshold
+        self.future = Future()
+
+
+def _predict(frames, confidence_threshold):
+    client = inference_process.get_client()
+    if client is not None:
+        return client.infer(frames, confidence_threshold)
+    with model.predict_lock:
+        results = model.get_model().predict(
+            frames, imgsz=model.INFERENCE_IMGSZ, conf=confidence_threshold, verbose=False
+        )
+    return [extract_detections(frame_results) for frame_results in results]
+
+
+class InferenceServer:
+    """
+    Общая модель для задач процесса с динамическими пакетами.
+
+    Поток сервера берет первый запрос из очереди и добирает к нему запросы
+    других задач, пока пакет не достигнет max_batch_size кадров или не
+    истечет max_wait секунд. Запрос целиком попадает в один пакет: если он
+    не помещается, пакет закрывается, а запрос открывает следующий.
+
+    Пакет закрывается сразу, если в нем есть запросы всех активных задач
+    (session): одиночная задача не ждет max_wait на каждом пакете.
+
+    Модель запускается с наименьшим порогом запросов пакета, детекции
+    каждого запроса затем фильтруются по его порогу.
+    """
+
+    def __init__(self, predict=None, max_batch_size=None, max_wait=None):
+        self.predict = predict or _predict
+        self.max_batch_size = max(int(max_batch_size or BATCH_MAX_SIZE), 1)
+        self.max_wait = BATCH_MAX_WAIT_MS / 1000 if max_wait is None else max_wait
+        self.batches = 0
+        self.frames = 0
+        self._requests = queue.Queue()
+        self._carry = None
+        self._active_jobs = 0
+        self._jobs_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="inference-server", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Остановка после обработки уже переданных запросов"""
+        self._requests.put(_STOP)
+        self._thread.join()
+
+    @contextmanager
+    def session(self):
+        """Задача, которая передает кадры серверу (для раннего закрытия пакетов)"""
+        with self._jobs_lock:
+            self._active_jobs += 1
+        try:
+            yield self
+        finally:
+            with self._jobs_lock:
+                self._active_jobs -= 1
+
+    def infer(self, frames, confidence_threshold):
+        """
+        Детекция на кадрах в составе общего пакета (блокирует до результата)
+
+        :return: список массивов детекций в порядке кадров
+        """
+        if not frames:
+            return []
+        request = _Request(list(frames), confidence_threshold)
+        self._requests.put(request)
+        return request.future.result()
+
+    def _collect(self):
+        """Формирование пакета запросов; None - сервер остановлен"""
+        first = self._carry if self._carry is not None else self._requests.get()
+        self._carry = None
+        if first is _STOP:
+            return None
+
+        batch = [first]
+        size = len(first.frames)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size and len(batch) < max(self._active_jobs, 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is _STOP or size + len(request.frames) > self.max_batch_size:
+                self._carry = request
+                break
+            batch.append(request)
+            size += len(request.frames)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        frames = [frame for request in batch for frame in request.frames]
+        confidence_threshold = min(request.confidence_threshold for request in batch)
+        try:
+            detections = self.predict(frames, confidence_threshold)
+            if len(detections) != len(frames):
+                raise RuntimeError(
+                    f"Модель вернула {len(detections)} результатов для пакета из {len(frames)} кадров"
+                )
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.frames += len(frames)
+        start = 0
+        for request in batch:
+            request_detections = detections[start:start + len(request.frames)]
+            start += len(request.frames)
+            if request.confidence_threshold > confidence_threshold:
+                request_detections = [
+                    filter_detections(frame_detections, request.confidence_threshold)
+                    for frame_detections in request_detections
+                ]
+            request.future.set_result(request_detections)
+
+
+def get_server():
+    """
+    Сервер инференса процесса (запускается при первом вызове).
+
+    :return: InferenceServer или None, если сервер отключен
+    """
+    global _server
+    if not INFERENCE_SERVER_ENABLED:
+        return None
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                _server = InferenceServer().start()
+                logger.info(
+                    f"Сервер инференса запущен: пакет до {BATCH_MAX_SIZE} кадров, ожидание до {BATCH_MAX_WAIT_MS} мс"
+                )
+    return _server
+
+
+def job_session():
+    """Регистрация задачи на сервере инференса (без сервера ничего не делает)"""
+    server = get_server()
+    return server.session() if server is not None else nullcontext()
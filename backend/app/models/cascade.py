@@ -0,0 +1,180 @@
+"""
+Каскадная детекция: дешевая предварительная проверка каждого кадра
+и полный детектор только на кадрах-кандидатах.
+
+Сравнение с полным детектором: app/models/cascade_benchmark.py.
+"""
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+from ultralytics import YOLO
+
+from app.models import batching, inference_process, model
+from app.services.video_processing.detections import EMPTY_DETECTIONS, extract_detections
+
+
+logger = logging.getLogger(__name__)
+
+
+# Размер входа модели предварительной проверки; 0 - каскад отключен
+CASCADE_SCREEN_IMGSZ = int(os.environ.get("CASCADE_SCREEN_IMGSZ", "0"))
+# Уверенность предварительной проверки, начиная с которой кадр
+# передается полному детектору
+CASCADE_SCREEN_THRESHOLD = float(os.environ.get("CASCADE_SCREEN_THRESHOLD", "0.05"))
+# Чекпоинт модели предварительной проверки (YOLO-детектор); по умолчанию
+# основная модель, запускаемая с уменьшенным входом
+CASCADE_SCREEN_MODEL = os.environ.get("CASCADE_SCREEN_MODEL", "")
+
+_cascade = None
+_cascade_lock = threading.Lock()
+
+
+class CascadeCounters:
+    """Счетчики стадий каскада: число кадров и время каждой стадии"""
+
+    def __init__(self):
+        self.screened_frames = 0
+        self.escalated_frames = 0
+        self.screen_seconds = 0.0
+        self.detect_seconds = 0.0
+
+    @property
+    def escalation_rate(self):
+        """Доля проверенных кадров, переданных полному детектору"""
+        return self.escalated_frames / self.screened_frames if self.screened_frames else 0.0
+
+    def as_dict(self):
+        return {
+            "screened_frames": self.screened_frames,
+            "escalated_frames": self.escalated_frames,
+            "escalation_rate": round(self.escalation_rate, 4),
+            "screen_seconds": round(self.screen_seconds, 3),
+            "detect_seconds": round(self.detect_seconds, 3),
+        }
+
+
+class CascadeDetector:
+    """
+    Двухстадийная детекция пакета кадров.
+
+    Модель предварительной проверки обрабатывает каждый кадр с уменьшенным
+    входом и низким порогом; кадры, на которых она нашла хотя бы одну рамку
+    с уверенностью не ниже screen_threshold, передаются полному детектору
+    с обычным размером входа (INFERENCE_IMGSZ). Остальные кадры получают
+    пустые детекции.
+    """
+
+    def __init__(self, detector, screen_model=None, screen_imgsz=None, screen_threshold=None):
+        self.detector = detector
+        self.screen_model = screen_model or detector
+        self.screen_imgsz = screen_imgsz or CASCADE_SCREEN_IMGSZ
+        self.screen_threshold = CASCADE_SCREEN_THRESHOLD if screen_threshold is None else screen_threshold
+        self.counters = CascadeCounters()
+        self._counters_lock = threading.Lock()
+
+    @property
+    def names(self):
+        return self.detector.names
+
+    def screen(self, frames):
+        """
+        Предварительная проверка пакета кадров
+
+        :return: маска кадров-кандидатов
+        """
+        results = self.screen_model.predict(
+            frames, imgsz=self.screen_imgsz, conf=self.screen_threshold, verbose=False
+        )
+        return np.array([len(extract_detections(frame_results)) > 0 for frame_results in results], dtype=bool)
+
+    def detect(self, frames, confidence_threshold):
+        """
+        Каскадная детекция пакета кадров
+
+        :return: (список массивов детекций в порядке кадров, число кадров,
+                 переданных полному детектору)
+        """
+        detections = [EMPTY_DETECTIONS] * len(frames)
+        # Полный детектор - общая модель процесса, а предикторы Ultralytics
+        # хранят состояние вызова: задачи соседних потоков ждут друг друга
+        with model.predict_lock:
+            started = time.perf_counter()
+            candidates = self.screen(frames)
+            screened = time.perf_counter()
+
+            escalated = np.flatnonzero(candidates)
+            if len(escalated):
+                results = self.detector.predict(
+                    [frames[i] for i in escalated], imgsz=model.INFERENCE_IMGSZ,
+                    conf=confidence_threshold, verbose=False
+                )
+                for i, frame_results in zip(escalated, results):
+                    detections[i] = extract_detections(frame_results)
+            finished = time.perf_counter()
+
+        with self._counters_lock:
+            self.counters.screened_frames += len(frames)
+            self.counters.escalated_frames += len(escalated)
+            self.counters.screen_seconds += screened - started
+            self.counters.detect_seconds += finished - screened
+        return detections, len(escalated)
+
+
+def is_enabled():
+    """Включен ли каскад настройками окружения"""
+    return CASCADE_SCREEN_IMGSZ > 0
+
+
+def check_configuration():
+    """
+    Проверка совместимости каскада с остальными режимами инференса.
+
+    Каскад выполняет обе свои модели в текущем процессе и возвращает
+    счетчики стадий каждой задаче, поэтому не работает через сервер
+    инференса (INFERENCE_SERVER) и процесс инференса (MODEL_PROCESS):
+    кадры прошли бы мимо них, а в процесс загрузились бы лишние модели.
+
+    :raises ValueError: если включены несовместимые режимы
+    """
+    if not is_enabled():
+        return
+    if batching.INFERENCE_SERVER_ENABLED:
+        raise ValueError("Каскад (CASCADE_SCREEN_IMGSZ) нельзя включать вместе с INFERENCE_SERVER")
+    if inference_process.MODEL_PROCESS_ENABLED:
+        raise ValueError("Каскад (CASCADE_SCREEN_IMGSZ) нельзя включать вместе с MODEL_PROCESS")
+
+
+def load_screen_model():
+    """
+    Модель предварительной проверки.
+
+    Даже если это основной чекпоинт, загружается отдельный экземпляр:
+    предиктор Ultralytics хранит размер входа между вызовами.
+    """
+    path = os.path.abspath(CASCADE_SCREEN_MODEL) if CASCADE_SCREEN_MODEL else model.absolute_model_path
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Модель предварительной проверки не найдена по пути: {path}")
+    return YOLO(path, task="detect")
+
+
+def get_cascade():
+    """
+    Каскадный детектор процесса (создается при первом вызове).
+
+    :return: CascadeDetector или None, если каскад отключен
+    """
+    global _cascade
+    if not is_enabled():
+        return None
+    if _cascade is None:
+        with _cascade_lock:
+            if _cascade is None:
+                check_configuration()
+                _cascade = CascadeDetector(model.get_model(), load_screen_model())
+                logger.info(
+                    f"Каскад включен: вход проверки {CASCADE_SCREEN_IMGSZ}, порог {CASCADE_SCREEN_THRESHOLD}"
+                )
+    return _cascade
@@ -0,0 +1,131 @@
+"""
+Сравнение каскадной детекции с полным детектором на фиксированном клипе.
+
+Запуск из директории backend:
+
+    python -m app.models.cascade_benchmark --video clip.mp4
+"""
+import json
+import time
+import logging
+import argparse
+
+import cv2
+
+from app.models import model
+from app.models.cascade import (
+    CASCADE_SCREEN_IMGSZ,
+    CASCADE_SCREEN_THRESHOLD,
+    CascadeCounters,
+    CascadeDetector,
+    load_screen_model,
+)
+from app.services.video_processing.detections import count_classes, extract_detections
+
+
+logger = logging.getLogger(__name__)
+
+
+def read_clip(video_path, max_frames):
+    """Кадры начала видео для замера"""
+    frames = []
+    cap = cv2.VideoCapture(video_path)
+    while len(frames) < max_frames:
+        success, frame = cap.read()
+        if not success:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise ValueError(f"Не удалось прочитать кадры из {video_path}")
+    return frames
+
+
+def benchmark_cascade(cascade, frames, confidence_threshold=0.25, batch_size=8):
+    """
+    Сравнение каскада с полным детектором на одних и тех же кадрах.
+
+    Эталоном служит полный детектор на каждом кадре. Для каскада
+    считаются счетчики стадий, ускорение и полнота: доля эталонных
+    кадров с оружием или ножом, которые каскад не пропустил.
+
+    :return: отчет (словарь)
+    """
+    batches = [frames[i:i + batch_size] for i in range(0, len(frames), batch_size)]
+    names = cascade.names
+    # Прогревочные запуски обеих моделей не учитываются во времени
+    cascade.detector.predict(frames[0], imgsz=model.INFERENCE_IMGSZ, conf=confidence_threshold, verbose=False)
+    cascade.screen(frames[:1])
+
+    started = time.perf_counter()
+    reference = []
+    for batch in batches:
+        results = cascade.detector.predict(
+            batch, imgsz=model.INFERENCE_IMGSZ, conf=confidence_threshold, verbose=False
+        )
+        reference.extend(extract_detections(frame_results) for frame_results in results)
+    full_elapsed = time.perf_counter() - started
+
+    cascade.counters = CascadeCounters()
+    started = time.perf_counter()
+    detected = []
+    for batch in batches:
+        detected.extend(cascade.detect(batch, confidence_threshold)[0])
+    cascade_elapsed = time.perf_counter() - started
+
+    reference_positive = [any(count_classes(frame_detections, names)) for frame_detections in reference]
+    cascade_positive = [any(count_classes(frame_detections, names)) for frame_detections in detected]
+    kept = sum(ref and cand for ref, cand in zip(reference_positive, cascade_positive))
+
+    report = {
+        "frames": len(frames),
+        "confidence_threshold": confidence_threshold,
+        "screen_imgsz": cascade.screen_imgsz,
+        "screen_threshold": cascade.screen_threshold,
+        "full": {
+            "fps": round(len(frames) / full_elapsed, 2),
+            "ms_per_frame": round(full_elapsed * 1000 / len(frames), 2),
+            "positive_frames": sum(reference_positive),
+        },
+        "cascade": {
+            "fps": round(len(frames) / cascade_elapsed, 2),
+            "ms_per_frame": round(cascade_elapsed * 1000 / len(frames), 2),
+            "positive_frames": sum(cascade_positive),
+            **cascade.counters.as_dict(),
+        },
+        "speedup": round(full_elapsed / cascade_elapsed, 2),
+        "frame_recall": round(kept / sum(reference_positive), 4) if any(reference_positive) else 1.0,
+    }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение каскадной детекции с полным детектором")
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--screen-imgsz", type=int, default=CASCADE_SCREEN_IMGSZ or 320)
+    parser.add_argument("--screen-threshold", type=float, default=CASCADE_SCREEN_THRESHOLD)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-frames", type=int, default=300)
+    parser.add_argument("--output", help="файл для сохранения отчета в JSON")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    cascade = CascadeDetector(
+        model.get_model(), load_screen_model(),
+        screen_imgsz=args.screen_imgsz, screen_threshold=args.screen_threshold,
+    )
+    report = benchmark_cascade(
+        cascade, read_clip(args.video, args.max_frames),
+        confidence_threshold=args.conf, batch_size=args.batch_size,
+    )
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as report_file:
+            report_file.write(output)
+
+
+if __name__ == "__main__":
+    main()
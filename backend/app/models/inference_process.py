@@ -0,0 +1,262 @@
+"""
+Модель в отдельном процессе инференса.
+
+Кадры передаются через кольцевой буфер в разделяемой памяти
+(multiprocessing.shared_memory): процесс инференса читает их как
+массивы NumPy поверх буфера, без копирования. Через канал передаются
+только описания кадров (номер ячейки и форма) и детекции.
+"""
+import os
+import atexit
+import queue
+import logging
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from app.models import model
+from app.services.video_processing.detections import extract_detections
+
+
+logger = logging.getLogger(__name__)
+
+
+# Выполнять модель в отдельном процессе инференса
+MODEL_PROCESS_ENABLED = os.environ.get("MODEL_PROCESS", "false").lower() == "true"
+# Число ячеек кольцевого буфера (кадров, одновременно находящихся в буфере)
+RING_SLOTS = int(os.environ.get("MODEL_PROCESS_RING_SLOTS", "16"))
+# Размер ячейки в байтах; по умолчанию помещается кадр 1920x1080 BGR.
+# Кадры большего размера передаются через канал с копированием
+RING_SLOT_BYTES = int(os.environ.get("MODEL_PROCESS_SLOT_BYTES", str(1920 * 1080 * 3)))
+# Время ожидания запуска процесса и загрузки модели, секунды
+START_TIMEOUT = float(os.environ.get("MODEL_PROCESS_START_TIMEOUT", "300"))
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class FrameRing:
+    """
+    Кольцевой буфер кадров в разделяемой памяти.
+
+    Буфер разделен на slots ячеек по slot_bytes байт. Создающий процесс
+    выделяет ячейки (acquire), записывает в них кадры и освобождает
+    после получения детекций (release); процесс инференса открывает
+    тот же буфер по имени и читает ячейки как массивы без копирования.
+    """
+
+    def __init__(self, slots=None, slot_bytes=None, name=None):
+        self.slots = max(int(slots or RING_SLOTS), 1)
+        self.slot_bytes = max(int(slot_bytes or RING_SLOT_BYTES), 1)
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._free = queue.Queue()
+        for slot in range(self.slots):
+            self._free.put(slot)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def view(self, slot, shape, dtype=np.uint8):
+        """Массив поверх ячейки буфера (без копирования)"""
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def fits(self, frame):
+        return frame.nbytes <= self.slot_bytes
+
+    def acquire(self):
+        """Свободная ячейка (ожидает освобождения, если все заняты)"""
+        return self._free.get()
+
+    def release(self, slot):
+        self._free.put(slot)
+
+    def write(self, slot, frame):
+        """Копирование кадра в ячейку; возвращает описание кадра для процесса инференса"""
+        frame = np.ascontiguousarray(frame)
+        self.view(slot, frame.shape, frame.dtype)[...] = frame
+        return ("shm", slot, frame.shape, frame.dtype.str)
+
+    def read(self, descriptor):
+        """Кадр по описанию: массив поверх ячейки или кадр, переданный через канал"""
+        if descriptor[0] == "shm":
+            _, slot, shape, dtype = descriptor
+            return self.view(slot, shape, np.dtype(dtype))
+        return descriptor[1]
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _model_predict(frames, confidence_threshold):
+    """Детекция моделью процесса инференса"""
+    results = model.get_model().predict(
+        frames, imgsz=model.INFERENCE_IMGSZ, conf=confidence_threshold, verbose=False
+    )
+    return [extract_detections(frame_results) for frame_results in results]
+
+
+def _serve(connection, ring_name, slots, slot_bytes, predict, processes):
+    """
+    Цикл процесса инференса: описания кадров -> детекции.
+
+    Сообщения: ("predict", описания кадров, порог) -> ("ok", детекции)
+    или ("error", текст ошибки); None завершает процесс.
+    """
+    global MODEL_PROCESS_ENABLED
+    # Модель выполняется в этом процессе: прогрев не должен запускать
+    # новый процесс инференса
+    MODEL_PROCESS_ENABLED = False
+    ring = FrameRing(slots, slot_bytes, name=ring_name)
+    try:
+        model.configure_threads(processes)
+        if predict is _model_predict:
+            ready = model.warm_up()
+            connection.send(("ready", model.backend if ready else None, model.warm_up_error))
+        else:
+            connection.send(("ready", "custom", None))
+
+        while True:
+            message = connection.recv()
+            if message is None:
+                return
+            _, descriptors, confidence_threshold = message
+            try:
+                frames = [ring.read(descriptor) for descriptor in descriptors]
+                connection.send(("ok", predict(frames, confidence_threshold)))
+            except Exception as e:
+                connection.send(("error", str(e)))
+    except (EOFError, KeyboardInterrupt):
+        return
+    finally:
+        ring.close()
+
+
+class InferenceProcessClient:
+    """
+    Запуск процесса инференса и передача ему кадров.
+
+    Кадры копируются в ячейки кольцевого буфера один раз; процесс
+    инференса читает их без копирования, а в канал попадают только
+    описания ячеек и массивы детекций (несколько рамок на кадр).
+    Пакет больше числа ячеек передается частями.
+    """
+
+    def __init__(self, predict=None, slots=None, slot_bytes=None, processes=1):
+        self.ring = FrameRing(slots, slot_bytes)
+        self.backend = None
+        self._lock = threading.Lock()
+        self._acquire_lock = threading.Lock()
+        self._warned_oversized = False
+        self._closed = False
+        # spawn: процесс не наследует потоки и состояние torch родителя
+        context = multiprocessing.get_context("spawn")
+        self._connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_serve,
+            args=(child_connection, self.ring.name, self.ring.slots, self.ring.slot_bytes,
+                  predict or _model_predict, processes),
+            name="inference-process",
+            daemon=True,
+        )
+        self.process.start()
+        child_connection.close()
+
+        try:
+            if not self._connection.poll(START_TIMEOUT):
+                raise EOFError
+            _, self.backend, error = self._connection.recv()
+        except EOFError:
+            self.close()
+            raise RuntimeError("Процесс инференса не запустился")
+        if self.backend is None:
+            self.close()
+            raise RuntimeError(f"Ошибка загрузки модели в процессе инференса: {error}")
+        logger.info(f"Процесс инференса {self.process.pid} запущен, бэкенд: {self.backend}")
+
+    def infer(self, frames, confidence_threshold):
+        """
+        Детекция на кадрах в процессе инференса
+
+        :return: список массивов детекций в порядке кадров
+        """
+        detections = []
+        for start in range(0, len(frames), self.ring.slots):
+            detections.extend(self._infer_chunk(frames[start:start + self.ring.slots], confidence_threshold))
+        return detections
+
+    def _infer_chunk(self, frames, confidence_threshold):
+        slots = []
+        descriptors = []
+        try:
+            # Ячейки пакета выделяются разом: потоки, выделяющие ячейки
+            # по одной, могли бы разобрать буфер и ждать друг друга
+            with self._acquire_lock:
+                slots = [self.ring.acquire() for frame in frames if self.ring.fits(frame)]
+            free_slots = iter(slots)
+            for frame in frames:
+                if self.ring.fits(frame):
+                    descriptors.append(self.ring.write(next(free_slots), frame))
+                else:
+                    if not self._warned_oversized:
+                        logger.warning(
+                            f"Кадр {frame.shape} больше ячейки буфера ({self.ring.slot_bytes} байт), "
+                            f"передается через канал"
+                        )
+                        self._warned_oversized = True
+                    descriptors.append(("inline", frame))
+
+            with self._lock:
+                try:
+                    self._connection.send(("predict", descriptors, confidence_threshold))
+                    status, result = self._connection.recv()
+                except (EOFError, OSError, BrokenPipeError) as e:
+                    raise RuntimeError("Процесс инференса завершился") from e
+        finally:
+            for slot in slots:
+                self.ring.release(slot)
+
+        if status != "ok":
+            raise RuntimeError(f"Ошибка в процессе инференса: {result}")
+        return result
+
+    def close(self):
+        """Остановка процесса инференса и освобождение разделяемой памяти"""
+        if self._closed:
+            return
+        self._closed = True
+        if self.process.is_alive():
+            try:
+                self._connection.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+            self.process.join(timeout=10)
+            if self.process.is_alive():
+                self.process.terminate()
+        self._connection.close()
+        self.ring.close()
+
+
+def get_client(processes=1):
+    """
+    Клиент процесса инференса (процесс запускается при первом вызове).
+
+    :return: InferenceProcessClient или None, если режим отключен
+    """
+    global _client
+    if not MODEL_PROCESS_ENABLED:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = InferenceProcessClient(processes=processes)
+                atexit.register(_client.close)
+    return _client
@@ -1,22 +1,198 @@
 import os
+import hashlib
+import threading
 from ultralytics import YOLO
 import logging
 
+import numpy as np
+import torch
+
+from app.models.backends import AUTO_BACKENDS, BACKEND_AUTO, BACKEND_PYTORCH, select_backend
+
 logger = logging.getLogger(__name__)
 
 
 model_path = os.environ.get("MODEL_PATH", "app/utils/yolov8nv2_e200_bs16.pt")
+# Бэкенд инференса: pytorch, onnx, openvino или auto (выбор самого быстрого)
+model_backend = os.environ.get("MODEL_BACKEND", BACKEND_PYTORCH)
+# Размер входа модели (большая сторона кадра после масштабирования);
+# меньшее значение ускоряет детекцию ценой пропуска мелких объектов
+INFERENCE_IMGSZ = int(os.environ.get("INFERENCE_IMGSZ", "640"))
+# Размер кадра для прогревочного запуска модели
+WARM_UP_FRAME_SIZE = (640, 640)
+# Число потоков torch внутри процесса (intra-op); 0 - ядра делятся
+# поровну между процессами обработчика очереди
+TORCH_THREADS = int(os.environ.get("TORCH_THREADS", "0"))
 
 
 absolute_model_path = os.path.join(os.getcwd(), model_path)
 
+# Модель загружается при первом обращении к model.model (или get_model()),
+# а не при импорте модуля
+_model = None
+_backend = None
+_load_lock = threading.Lock()
+
+_weights_hash = None
+
+# Предиктор Ultralytics хранит состояние вызова (размер входа, пакет,
+# источник кадров), поэтому прямые вызовы модели из нескольких потоков
+# (JOB_CONCURRENCY) выполняются по одному
+predict_lock = threading.Lock()
+
+# Число процессов, между которыми делятся ядра (см. configure_threads)
+_processes = 1
+
+_ready = threading.Event()
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+warm_up_error = None
+
+
+def get_model():
+    """
+    Загруженная модель YOLO (загружается один раз при первом вызове).
+
+    :return: модель YOLO
+    """
+    global _model, _backend
+    if _model is None:
+        with _load_lock:
+            if _model is None:
+                if not os.path.exists(absolute_model_path):
+                    raise FileNotFoundError(f"Модель не найдена по пути: {absolute_model_path}")
+
+                if model_backend == BACKEND_PYTORCH:
+                    loaded, backend = YOLO(absolute_model_path), BACKEND_PYTORCH
+                else:
+                    loaded, backend = select_backend(absolute_model_path, model_backend)
+                _backend = backend
+                _model = loaded
+                logger.info(f"Модель загружена: {absolute_model_path}, бэкенд: {backend}")
+    return _model
+
+
+def __getattr__(name):
+    # Обращение к model.model и model.backend загружает модель
+    if name == "model":
+        return get_model()
+    if name == "backend":
+        if _backend is None:
+            get_model()
+        return _backend
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def weights_hash():
+    """SHA-256 файла весов (первые 16 символов), считается один раз на процесс"""
+    global _weights_hash
+    if _weights_hash is None:
+        digest = hashlib.sha256()
+        with open(absolute_model_path, "rb") as weights:
+            for chunk in iter(lambda: weights.read(1024 * 1024), b""):
+                digest.update(chunk)
+        _weights_hash = digest.hexdigest()[:16]
+    return _weights_hash
+
+
+def model_version(backend=None):
+    """
+    Версия модели для ключа кэша результатов: бэкенд, которым выполняется
+    детекция, и SHA-256 файла весов.
+
+    :param backend: бэкенд; по умолчанию - бэкенд загруженной модели
+                    (в режиме auto он известен только после загрузки,
+                    при необходимости модель загружается)
+    """
+    if backend is None:
+        if _backend is None:
+            get_model()
+        backend = _backend
+    return f"{backend}:{weights_hash()}"
+
+
+def expected_model_versions():
+    """
+    Версии модели, которыми обработчик очереди с этими настройками
+    может получить результат, без загрузки модели (для поиска в кэше в API).
+
+    В режиме auto бэкенд выбирается при загрузке модели, поэтому подходит
+    любой из AUTO_BACKENDS с теми же весами.
+    """
+    backends = AUTO_BACKENDS if model_backend == BACKEND_AUTO else (model_backend,)
+    return [model_version(backend) for backend in backends]
+
+
+def configure_threads(processes=1):
+    """
+    Настройка числа потоков torch в процессе.
+
+    Каждый процесс по умолчанию занимает все ядра, поэтому несколько
+    процессов с моделью конкурируют за них; потоки делятся между процессами.
+
+    :param processes: число процессов, одновременно выполняющих модель
+    :return: установленное число потоков
+    """
+    global _processes
+    _processes = max(processes, 1)
+    threads = TORCH_THREADS or max((os.cpu_count() or 1) // _processes, 1)
+    torch.set_num_threads(threads)
+    logger.info(f"Потоков torch в процессе {os.getpid()}: {threads}")
+    return threads
+
+
+def warm_up():
+    """
+    Загрузка модели и один прогревочный запуск на пустом кадре.
+
+    Первый запуск включает выбор ядер torch и инициализацию бэкенда,
+    поэтому выполняется до поступления запросов. В режиме MODEL_PROCESS
+    модель загружается и прогревается в процессе инференса.
+
+    :return: True, если модель готова к работе
+    """
+    global warm_up_error, _backend
+    try:
+        # Импорт здесь: модуль процесса инференса сам импортирует этот модуль
+        from app.models import inference_process
+
+        client = inference_process.get_client(_processes)
+        if client is not None:
+            # Модель загружена и прогрета в процессе инференса
+            _backend = client.backend
+        else:
+            frame = np.zeros((*WARM_UP_FRAME_SIZE, 3), dtype=np.uint8)
+            with predict_lock:
+                get_model().predict(frame, imgsz=INFERENCE_IMGSZ, verbose=False)
+    except Exception as e:
+        warm_up_error = str(e)
+        logger.error(f"Ошибка прогрева модели: {e}")
+        return False
 
-if not os.path.exists(absolute_model_path):
-    raise FileNotFoundError(f"Модель не найдена по пути: {absolute_model_path}")
+    warm_up_error = None
+    _ready.set()
+    logger.info("Модель прогрета и готова к работе")
+    return True
 
 
-model = YOLO(absolute_model_path)
-logger.info(f"Модель загружена: {absolute_model_path}")
+def start_warm_up():
+    """
+    Прогрев модели в фоновом потоке.
 
+    Пока прогрев выполняется или после успешного прогрева повторный вызов
+    не запускает новый поток. Если прогрев завершился ошибкой (она сохранена
+    в warm_up_error), следующий вызов запускает его заново.
+    """
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is not None and not _warm_up_thread.is_alive() and not _ready.is_set():
+            _warm_up_thread = None
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=warm_up, name="model-warm-up", daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
 
 
+def is_ready():
+    """Загружена и прогрета ли модель"""
+    return _ready.is_set()
@@ -0,0 +1,322 @@
+"""
+Квантизация детектора в INT8 и сравнение вариантов модели.
+
+Запуск из директории backend:
+
+    python -m app.models.quantization extract --video clip.mp4
+    python -m app.models.quantization quantize
+    python -m app.models.quantization compare --video clip.mp4
+"""
+import os
+import json
+import time
+import logging
+import argparse
+
+import cv2
+import numpy as np
+
+from app.models.backends import (
+    BACKEND_ONNX,
+    BACKEND_ONNX_INT8,
+    BACKEND_PYTORCH,
+    exported_path,
+    export_model,
+    load_backend,
+)
+from app.services.video_processing.detections import count_classes, extract_detections
+
+
+logger = logging.getLogger(__name__)
+
+
+MODEL_PATH = os.environ.get("MODEL_PATH", "app/utils/yolov8nv2_e200_bs16.pt")
+# Кадры для калибровки диапазонов активаций хранятся локально
+CALIBRATION_DIR = os.environ.get("CALIBRATION_DIR", "app/utils/calibration")
+CALIBRATION_FRAME_LIMIT = 200
+IMAGE_SIZE = 640
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+# Совпадение рамок при сравнении с эталонной моделью
+MATCH_IOU = 0.5
+
+
+def letterbox(frame, size=IMAGE_SIZE):
+    """
+    Приведение кадра к входу модели так же, как при детекции в Ultralytics:
+    масштабирование с сохранением пропорций и дополнение серым до size x size.
+
+    :return: тензор float32 формы (1, 3, size, size) в диапазоне [0, 1]
+    """
+    height, width = frame.shape[:2]
+    scale = min(size / height, size / width)
+    resized_width, resized_height = round(width * scale), round(height * scale)
+    resized = cv2.resize(frame, (resized_width, resized_height), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top = (size - resized_height) // 2
+    left = (size - resized_width) // 2
+    canvas[top:top + resized_height, left:left + resized_width] = resized
+
+    tensor = canvas[:, :, ::-1].transpose(2, 0, 1)  # BGR -> RGB, HWC -> CHW
+    return np.ascontiguousarray(tensor[np.newaxis], dtype=np.float32) / 255.0
+
+
+def extract_calibration_frames(video_path, output_dir=CALIBRATION_DIR, every=30, limit=CALIBRATION_FRAME_LIMIT):
+    """
+    Сохранение каждого every-го кадра видео для калибровки
+
+    :return: число сохраненных кадров
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.splitext(os.path.basename(video_path))[0]
+    cap = cv2.VideoCapture(video_path)
+    saved = 0
+    index = 0
+    try:
+        while saved < limit:
+            success, frame = cap.read()
+            if not success:
+                break
+            if index % every == 0:
+                cv2.imwrite(os.path.join(output_dir, f"{base}_{index:06d}.jpg"), frame)
+                saved += 1
+            index += 1
+    finally:
+        cap.release()
+
+    logger.info(f"Сохранено кадров для калибровки: {saved} -> {output_dir}")
+    return saved
+
+
+def load_calibration_frames(calibration_dir=CALIBRATION_DIR, limit=CALIBRATION_FRAME_LIMIT):
+    """Список путей к кадрам калибровки"""
+    if not os.path.isdir(calibration_dir):
+        raise FileNotFoundError(f"Директория с кадрами для калибровки не найдена: {calibration_dir}")
+
+    paths = sorted(
+        os.path.join(calibration_dir, name)
+        for name in os.listdir(calibration_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[:limit]
+    if not paths:
+        raise FileNotFoundError(f"В директории {calibration_dir} нет кадров для калибровки")
+    return paths
+
+
+def _calibration_reader(input_name, frame_paths):
+    """Источник калибровочных данных для onnxruntime"""
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class FrameCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self.frames = iter(frame_paths)
+
+        def get_next(self):
+            for path in self.frames:
+                frame = cv2.imread(path)
+                if frame is not None:
+                    return {input_name: letterbox(frame)}
+            return None
+
+    return FrameCalibrationReader()
+
+
+def _head_postprocess_nodes(onnx_model):
+    """
+    Узлы постобработки головы Detect, исключаемые из квантизации.
+
+    Голова объединяет координаты рамок (сотни пикселей) и вероятности
+    классов (0-1) в один тензор; общий масштаб INT8 для них уничтожает
+    точность вероятностей, поэтому квантуются только свертки головы.
+    """
+    prefixes = {
+        node.name.split("/")[1]
+        for node in onnx_model.graph.node
+        if node.name.startswith("/model.")
+    }
+    head = max(prefixes, key=lambda prefix: int(prefix.split(".")[1]))
+    return [
+        node.name
+        for node in onnx_model.graph.node
+        if node.name.startswith(f"/{head}/") and node.op_type != "Conv"
+    ]
+
+
+def quantize_model(checkpoint_path, calibration_dir=CALIBRATION_DIR):
+    """
+    Статическая квантизация модели в INT8 (onnxruntime, формат QDQ).
+
+    Чекпоинт экспортируется в ONNX (FP32), диапазоны активаций
+    калибруются на локальных кадрах, веса квантуются поканально.
+
+    :return: путь к INT8-модели
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    frame_paths = load_calibration_frames(calibration_dir)
+    fp32_path = export_model(checkpoint_path, BACKEND_ONNX)
+    int8_path = exported_path(checkpoint_path, BACKEND_ONNX_INT8)
+    fp32_model = onnx.load(fp32_path)
+
+    logger.info(f"Квантизация {fp32_path} на {len(frame_paths)} кадрах")
+    quantize_static(
+        fp32_path,
+        int8_path,
+        _calibration_reader(fp32_model.graph.input[0].name, frame_paths),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        weight_type=QuantType.QInt8,
+        activation_type=QuantType.QUInt8,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=_head_postprocess_nodes(fp32_model),
+    )
+
+    # Метаданные (имена классов, шаг, размер входа) нужны Ultralytics при загрузке
+    int8_model = onnx.load(int8_path)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, int8_path)
+
+    logger.info(f"INT8-модель сохранена: {int8_path}")
+    return int8_path
+
+
+def _box_iou(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum(area + areas - intersection, 1e-9)
+
+
+def match_detections(reference, candidate, iou_threshold=MATCH_IOU):
+    """
+    Сопоставление детекций кадра с эталонными (жадно, по убыванию уверенности)
+
+    :return: число совпавших рамок того же класса
+    """
+    matched = 0
+    used = np.zeros(len(reference), dtype=bool)
+    for row in candidate[np.argsort(-candidate[:, 4])]:
+        same_class = (reference[:, 5] == row[5]) & ~used
+        if not same_class.any():
+            continue
+        ious = np.where(same_class, _box_iou(row[:4], reference[:, :4]), 0)
+        best = int(np.argmax(ious))
+        if ious[best] >= iou_threshold:
+            used[best] = True
+            matched += 1
+    return matched
+
+
+def run_variant(model, frames, confidence_threshold):
+    """Детекция на кадрах клипа с замером времени"""
+    detections = []
+    started = time.perf_counter()
+    for frame in frames:
+        results = model.predict(frame, conf=confidence_threshold, verbose=False)
+        detections.append(extract_detections(results[0]))
+    return detections, time.perf_counter() - started
+
+
+def compare_models(checkpoint_path, video_path, variants=(BACKEND_PYTORCH, BACKEND_ONNX, BACKEND_ONNX_INT8),
+                   confidence_threshold=0.25, max_frames=300):
+    """
+    Сравнение точности и скорости вариантов модели на фиксированном клипе.
+
+    Эталоном служит первый вариант (FP32). Для остальных считаются
+    точность и полнота рамок относительно эталона и доля кадров,
+    в которых совпадает вывод о наличии оружия и ножей.
+
+    :return: отчет (словарь)
+    """
+    frames = []
+    cap = cv2.VideoCapture(video_path)
+    while len(frames) < max_frames:
+        success, frame = cap.read()
+        if not success:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise ValueError(f"Не удалось прочитать кадры из {video_path}")
+
+    report = {"video": video_path, "frames": len(frames), "confidence_threshold": confidence_threshold, "variants": []}
+    reference = None
+    for variant in variants:
+        model = load_backend(checkpoint_path, variant)
+        # Прогревочный запуск не учитывается во времени
+        model.predict(frames[0], conf=confidence_threshold, verbose=False)
+        detections, elapsed = run_variant(model, frames, confidence_threshold)
+
+        entry = {
+            "variant": variant,
+            "fps": round(len(frames) / elapsed, 2),
+            "ms_per_frame": round(elapsed * 1000 / len(frames), 2),
+            "detections": int(sum(len(frame_detections) for frame_detections in detections)),
+        }
+        if reference is None:
+            reference = {"detections": detections, "names": model.names, "elapsed": elapsed}
+        else:
+            matched = sum(
+                match_detections(ref, cand) for ref, cand in zip(reference["detections"], detections)
+            )
+            reference_total = sum(len(ref) for ref in reference["detections"])
+            agreement = sum(
+                (np.array(count_classes(ref, reference["names"])) > 0).tolist()
+                == (np.array(count_classes(cand, model.names)) > 0).tolist()
+                for ref, cand in zip(reference["detections"], detections)
+            )
+            entry.update({
+                "speedup": round(reference["elapsed"] / elapsed, 2),
+                "precision": round(matched / entry["detections"], 4) if entry["detections"] else 1.0,
+                "recall": round(matched / reference_total, 4) if reference_total else 1.0,
+                "frame_agreement": round(agreement / len(frames), 4),
+            })
+        report["variants"].append(entry)
+        logger.info(f"Вариант {variant}: {entry}")
+
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Квантизация модели в INT8 и сравнение с FP32")
+    parser.add_argument("--model", default=MODEL_PATH, help="путь к чекпоинту .pt")
+    parser.add_argument("--calibration-dir", default=CALIBRATION_DIR, help="директория с кадрами для калибровки")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    extract = commands.add_parser("extract", help="сохранить кадры видео для калибровки")
+    extract.add_argument("--video", required=True)
+    extract.add_argument("--every", type=int, default=30, help="шаг между сохраняемыми кадрами")
+
+    commands.add_parser("quantize", help="создать INT8-модель")
+
+    compare = commands.add_parser("compare", help="сравнить FP32 и INT8 на клипе")
+    compare.add_argument("--video", required=True)
+    compare.add_argument("--conf", type=float, default=0.25)
+    compare.add_argument("--max-frames", type=int, default=300)
+    compare.add_argument("--output", help="файл для сохранения отчета в JSON")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    checkpoint_path = os.path.abspath(args.model)
+
+    if args.command == "extract":
+        extract_calibration_frames(args.video, args.calibration_dir, every=args.every)
+    elif args.command == "quantize":
+        quantize_model(checkpoint_path, args.calibration_dir)
+    elif args.command == "compare":
+        report = compare_models(checkpoint_path, args.video, confidence_threshold=args.conf, max_frames=args.max_frames)
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        print(output)
+        if args.output:
+            with open(args.output, "w") as report_file:
+                report_file.write(output)
+
+
+if __name__ == "__main__":
+    main()
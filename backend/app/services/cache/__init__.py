@@ -0,0 +1,15 @@
+from .result_cache import (
+    RESULT_CACHE_ENABLED,
+    build_cache_key,
+    lookup_keys,
+    pipeline_options,
+    save_with_hash
+)
+
+__all__ = [
+    'RESULT_CACHE_ENABLED',
+    'build_cache_key',
+    'lookup_keys',
+    'pipeline_options',
+    'save_with_hash'
+]
\ No newline at end of file
@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+import logging
+
+from app.models import cascade, model
+from app.services.video_processing import video_processing
+from app.services.video_processing import decoder
+from app.services.video_processing import motion
+from app.services.video_processing import tracking
+from app.services.video_processing import tiling
+
+
+logger = logging.getLogger(__name__)
+
+
+# Повторно загруженное видео с теми же параметрами обработки не обрабатывается
+# заново: результат копируется из кэша
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE", "true").lower() == "true"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def save_with_hash(stream, file_path, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Сохранение загружаемого файла с одновременным вычислением SHA-256.
+
+    Файл читается один раз: каждый блок записывается на диск и сразу
+    добавляется в хэш, поэтому повторное чтение файла не требуется.
+
+    :param stream: поток загружаемого файла
+    :param file_path: путь для сохранения
+    :return: SHA-256 содержимого (hex)
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "wb") as output:
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            digest.update(chunk)
+            output.write(chunk)
+    return digest.hexdigest()
+
+
+def pipeline_options(frame_stride, render=True):
+    """
+    Параметры обработки, от которых зависят детекции и размеченное видео.
+
+    Размер пакета, очереди и число процессов на результат не влияют
+    и в ключ кэша не входят. Результат без размеченного видео (render=False)
+    хранится под отдельным ключом; ключи прежних результатов не меняются.
+    """
+    options = {
+        "pipeline": video_processing.PIPELINE_MODE,
+        "frame_stride": frame_stride,
+        "motion_threshold": motion.MOTION_THRESHOLD,
+        # От нижнего порога модели зависит лог всех детекций
+        "raw_detection_floor": video_processing.RAW_DETECTION_FLOOR,
+    }
+    if not render:
+        options["render"] = False
+        if decoder.DOWNSCALE_DECODE and not tiling.TILED_INFERENCE_ENABLED:
+            # Кадры уменьшаются при декодировании, а не перед моделью
+            options["downscale_decode"] = True
+    if model.INFERENCE_IMGSZ != 640:
+        options["inference_imgsz"] = model.INFERENCE_IMGSZ
+    if tracking.TRACKER_KEYFRAME_INTERVAL > 1:
+        options["tracker_keyframe_interval"] = tracking.TRACKER_KEYFRAME_INTERVAL
+        options["tracker_match_iou"] = tracking.TRACKER_MATCH_IOU
+        options["tracker_decay"] = tracking.TRACKER_DECAY
+        options["tracker_redetect_health"] = tracking.TRACKER_REDETECT_HEALTH
+        options["tracker_max_age"] = tracking.TRACKER_MAX_AGE
+    if cascade.is_enabled():
+        # Кадры, отсеянные предварительной проверкой, не получают детекций
+        options["cascade_screen_imgsz"] = cascade.CASCADE_SCREEN_IMGSZ
+        options["cascade_screen_threshold"] = cascade.CASCADE_SCREEN_THRESHOLD
+        options["cascade_screen_model"] = os.path.basename(cascade.CASCADE_SCREEN_MODEL)
+    if tiling.TILED_INFERENCE_ENABLED:
+        # Участки добавляют детекции мелких объектов
+        options["tile_size"] = tiling.TILE_SIZE
+        options["tile_overlap"] = tiling.TILE_OVERLAP
+        options["tile_max_per_frame"] = tiling.TILE_MAX_PER_FRAME
+        options["tile_low_confidence"] = tiling.TILE_LOW_CONFIDENCE
+        options["tile_motion_threshold"] = tiling.TILE_MOTION_THRESHOLD
+        options["tile_merge_threshold"] = tiling.TILE_MERGE_THRESHOLD
+    if motion.MOTION_THRESHOLD > 0:
+        options["motion_pixel_threshold"] = motion.MOTION_PIXEL_THRESHOLD
+        options["motion_max_gated"] = motion.MOTION_MAX_GATED
+    return options
+
+
+def build_cache_key(content_hash, model_version, confidence_threshold, options):
+    """
+    Ключ кэша результатов обработки.
+
+    :param content_hash: SHA-256 исходного видео
+    :param model_version: версия модели (см. model.model_version)
+    :param confidence_threshold: порог уверенности
+    :param options: параметры обработки (см. pipeline_options)
+    :return: SHA-256 канонического JSON из всех параметров (hex)
+    """
+    key = json.dumps(
+        {
+            "content_hash": content_hash,
+            "model_version": model_version,
+            "confidence_threshold": float(confidence_threshold),
+            "options": options,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def lookup_keys(content_hash, confidence_threshold, frame_stride, render=True):
+    """
+    Ключи, под которыми обработчик очереди с настройками этого развертывания
+    сохранил бы результат обработки видео.
+
+    Ключ строится так же, как в обработчике очереди, поэтому результат
+    другой версии весов, бэкенда или других параметров обработки
+    попаданием не считается.
+
+    :return: список ключей (несколько в режиме MODEL_BACKEND=auto)
+    """
+    options = pipeline_options(frame_stride, render)
+    return [
+        build_cache_key(content_hash, version, confidence_threshold, options)
+        for version in model.expected_model_versions()
+    ]
@@ -83,6 +83,13 @@ class DatabaseManager:
         conn.close()
         return True
     
+    def check_connection(self):
+        """Проверка доступности базы данных (для проверки готовности API)"""
+        result, error = self.execute_query("SELECT 1 AS ok", fetch='one')
+        if error:
+            logger.warning(f"База данных недоступна: {error}")
+        return result is not None
+
     def execute_query(self, query, params=None, fetch=None, cursor_factory=None):
         """
         Выполнение запроса к базе данных
@@ -196,6 +203,43 @@ class DatabaseManager:
         logger.info(f"Обновлен статус видео {video_id} на {status}")
         return True, None
     
+    def update_video_metadata(self, video_id, updates):
+        """
+        Дополнение метаданных видео (слияние JSONB)
+        
+        :param video_id: ID видео в базе данных
+        :param updates: словарь с обновляемыми полями метаданных
+        :return: (успех, сообщение об ошибке)
+        """
+        _, error = self.execute_query(
+            """
+            UPDATE videos 
+            SET metadata = COALESCE(metadata, '{}'::jsonb) || %s::jsonb
+            WHERE video_id = %s
+            """,
+            (json.dumps(updates), video_id),
+            fetch=None
+        )
+        
+        if error:
+            return False, error
+        
+        return True, None
+    
+    def get_video_by_id(self, video_id):
+        """Получение видео по ID"""
+        result, _ = self.execute_query(
+            """
+            SELECT * FROM videos 
+            WHERE video_id = %s
+            """,
+            (video_id,),
+            fetch='one',
+            cursor_factory=RealDictCursor
+        )
+        
+        return result
+    
     def rename_video(self, video_id, user_id, new_s3_key):
         """
         Переименование видео (обновление ключа S3)
@@ -282,6 +326,28 @@ class DatabaseManager:
         
         return result
     
+    def count_videos_with_original(self, original_key):
+        """
+        Число видео, ссылающихся на сохраненное исходное видео
+        
+        :return: число видео или None при ошибке
+        """
+        result, error = self.execute_query(
+            """
+            SELECT COUNT(*) AS count FROM videos
+            WHERE metadata->>'original_key' = %s
+            """,
+            (original_key,),
+            fetch='one',
+            cursor_factory=RealDictCursor
+        )
+        
+        if error:
+            logger.error(f"Ошибка при подсчете ссылок на исходное видео: {error}")
+            return None
+        
+        return result['count']
+    
     def delete_video(self, video_id, user_id):
         """Удаление видео из базы данных"""
         try:
@@ -360,6 +426,12 @@ class DatabaseManager:
                 INSERT INTO detection_results 
                 (video_id, user_id, s3_key, bucket_name, status, weapon_detected)
                 VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (video_id) DO UPDATE
+                SET s3_key = EXCLUDED.s3_key,
+                    bucket_name = EXCLUDED.bucket_name,
+                    status = EXCLUDED.status,
+                    weapon_detected = EXCLUDED.weapon_detected,
+                    processed_time = CURRENT_TIMESTAMP
                 RETURNING result_id
                 """, (video_id, user_id, log_filename, detection_bucket_name, 'completed', weapon_detected))
                 
@@ -442,6 +514,414 @@ class DatabaseManager:
         logger.info(f"Добавлена запись в журнал: {action}")
         return True
     
+    def create_video_job(self, user_id, s3_key, bucket_name, metadata, payload, max_attempts=3):
+        """
+        Создание видео в статусе 'pending' и задачи его обработки в одной транзакции
+        
+        :param user_id: ID пользователя
+        :param s3_key: ключ будущего обработанного видео
+        :param bucket_name: бакет обработанного видео
+        :param metadata: метаданные видео
+        :param payload: параметры задачи для обработчика
+        :param max_attempts: максимальное число попыток обработки
+        :return: ({'job_id', 'video_id'}, сообщение об ошибке)
+        """
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO videos (user_id, s3_key, bucket_name, status, metadata)
+                    VALUES (%s, %s, %s, 'pending', %s)
+                    RETURNING video_id
+                    """,
+                    (user_id, s3_key, bucket_name, json.dumps(metadata))
+                )
+                video_id = cursor.fetchone()['video_id']
+                
+                cursor.execute(
+                    """
+                    INSERT INTO jobs (video_id, status, payload, max_attempts)
+                    VALUES (%s, 'pending', %s, %s)
+                    RETURNING job_id
+                    """,
+                    (video_id, json.dumps(payload), max_attempts)
+                )
+                job_id = cursor.fetchone()['job_id']
+                
+            logger.info(f"Создана задача обработки {job_id} для видео {s3_key}")
+            return {'job_id': job_id, 'video_id': video_id}, None
+            
+        except Exception as e:
+            logger.error(f"Ошибка при создании задачи обработки: {e}")
+            return None, f"Ошибка при создании задачи обработки: {e}"
+    
+    def claim_job(self, worker_id, lease_seconds):
+        """
+        Захват следующей задачи из очереди
+        
+        Берется самая старая задача в статусе 'pending' либо задача,
+        аренда которой истекла (обработчик упал или потерял связь с БД).
+        FOR UPDATE SKIP LOCKED пропускает строки, которые в этот момент
+        захватывают другие обработчики, поэтому задачу получит только один.
+        
+        :param worker_id: идентификатор обработчика
+        :param lease_seconds: срок аренды задачи в секундах
+        :return: запись задачи с полями видео (user_id, s3_key) или None
+        """
+        result, error = self.execute_query(
+            """
+            WITH next_job AS (
+                SELECT job_id FROM jobs
+                WHERE attempts < max_attempts
+                  AND (status = 'pending'
+                       OR (status = 'processing' AND lease_expires_at < NOW()))
+                ORDER BY created_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            ), claimed AS (
+                UPDATE jobs j
+                SET status = 'processing',
+                    worker_id = %s,
+                    attempts = j.attempts + 1,
+                    started_at = NOW(),
+                    heartbeat_at = NOW(),
+                    lease_expires_at = NOW() + %s * INTERVAL '1 second'
+                FROM next_job
+                WHERE j.job_id = next_job.job_id
+                RETURNING j.*
+            ), video AS (
+                UPDATE videos v
+                SET status = 'processing'
+                FROM claimed
+                WHERE v.video_id = claimed.video_id
+                RETURNING v.video_id, v.user_id, v.s3_key
+            )
+            SELECT claimed.*, video.user_id, video.s3_key
+            FROM claimed JOIN video ON video.video_id = claimed.video_id
+            """,
+            (worker_id, lease_seconds),
+            fetch='one',
+            cursor_factory=RealDictCursor
+        )
+        
+        if error:
+            logger.error(f"Ошибка при захвате задачи из очереди: {error}")
+            return None
+        
+        if result:
+            logger.info(f"Задача {result['job_id']} взята обработчиком {worker_id} (попытка {result['attempts']})")
+        return result
+    
+    def heartbeat_job(self, job_id, worker_id, lease_seconds, progress=None):
+        """
+        Продление аренды задачи и сохранение прогресса
+        
+        :return: (True, None) - аренда продлена; (False, None) - задача больше
+                 не принадлежит обработчику; (False, ошибка) - ошибка БД
+        """
+        result, error = self.execute_query(
+            """
+            UPDATE jobs
+            SET heartbeat_at = NOW(),
+                lease_expires_at = NOW() + %s * INTERVAL '1 second',
+                progress = COALESCE(%s, progress)
+            WHERE job_id = %s AND worker_id = %s AND status = 'processing'
+            RETURNING job_id
+            """,
+            (lease_seconds, progress, job_id, worker_id),
+            fetch='one',
+            cursor_factory=RealDictCursor
+        )
+        
+        if error:
+            return False, error
+        
+        return result is not None, None
+    
+    def complete_job(self, job_id, worker_id, video_id, log_filename, weapon_detected, metadata=None):
+        """
+        Сохранение результатов и отметка задачи как выполненной в одной транзакции
+        
+        Задача завершается, только если она по-прежнему в обработке у этого
+        обработчика и аренда не истекла; иначе транзакция ничего не меняет
+        (задачу мог забрать другой обработчик). Результат детекции
+        записывается через upsert по video_id, поэтому повтор не создает
+        второй записи.
+        
+        :param metadata: дополнение метаданных видео (слияние JSONB)
+        :return: (True, None) - задача выполнена; (False, None) - задача больше
+                 не принадлежит обработчику; (False, ошибка) - ошибка БД
+        """
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE jobs
+                    SET status = 'completed', progress = 100, error = NULL,
+                        finished_at = NOW(), lease_expires_at = NULL
+                    WHERE job_id = %s AND worker_id = %s
+                      AND status = 'processing' AND lease_expires_at > NOW()
+                    RETURNING job_id
+                    """,
+                    (job_id, worker_id)
+                )
+                if not cursor.fetchone():
+                    return False, None
+                
+                cursor.execute(
+                    """
+                    UPDATE videos
+                    SET status = 'completed',
+                        metadata = COALESCE(metadata, '{}'::jsonb) || %s::jsonb
+                    WHERE video_id = %s
+                    RETURNING user_id
+                    """,
+                    (json.dumps(metadata or {}), video_id)
+                )
+                video = cursor.fetchone()
+                if not video:
+                    raise Exception(f"Видео с ID {video_id} не найдено")
+                
+                cursor.execute(
+                    """
+                    INSERT INTO detection_results
+                    (video_id, user_id, s3_key, bucket_name, status, weapon_detected)
+                    VALUES (%s, %s, %s, 'logs', 'completed', %s)
+                    ON CONFLICT (video_id) DO UPDATE
+                    SET s3_key = EXCLUDED.s3_key,
+                        bucket_name = EXCLUDED.bucket_name,
+                        status = EXCLUDED.status,
+                        weapon_detected = EXCLUDED.weapon_detected,
+                        processed_time = CURRENT_TIMESTAMP
+                    """,
+                    (video_id, video['user_id'], log_filename, weapon_detected)
+                )
+            
+            logger.info(f"Задача {job_id} выполнена")
+            return True, None
+            
+        except Exception as e:
+            logger.error(f"Ошибка при завершении задачи: {e}")
+            return False, f"Ошибка при завершении задачи: {e}"
+    
+    def fail_job(self, job_id, worker_id, error_message):
+        """
+        Обработка неудачной попытки выполнения задачи
+        
+        Если попытки не исчерпаны, задача возвращается в очередь,
+        иначе задача и видео переводятся в статус 'failed'.
+        
+        :return: (задача окончательно провалена, сообщение об ошибке)
+        """
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE jobs
+                    SET status = CASE WHEN attempts < max_attempts THEN 'pending' ELSE 'failed' END,
+                        error = %s,
+                        worker_id = NULL,
+                        lease_expires_at = NULL,
+                        finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE NOW() END
+                    WHERE job_id = %s AND worker_id = %s AND status = 'processing'
+                    RETURNING video_id, status
+                    """,
+                    (error_message, job_id, worker_id)
+                )
+                job = cursor.fetchone()
+                if not job:
+                    return False, "Задача не найдена или принадлежит другому обработчику"
+                
+                cursor.execute(
+                    """
+                    UPDATE videos
+                    SET status = %s
+                    WHERE video_id = %s
+                    """,
+                    (job['status'], job['video_id'])
+                )
+                
+            final = job['status'] == 'failed'
+            logger.info(f"Задача {job_id} {'провалена' if final else 'возвращена в очередь'}: {error_message}")
+            return final, None
+            
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении статуса задачи: {e}")
+            return False, f"Ошибка при обновлении статуса задачи: {e}"
+    
+    def fail_expired_jobs(self):
+        """
+        Перевод в статус 'failed' задач, у которых истекла аренда
+        и исчерпаны попытки обработки
+        
+        :return: список video_id проваленных задач и их payload
+        """
+        result, error = self.execute_query(
+            """
+            WITH expired AS (
+                UPDATE jobs
+                SET status = 'failed',
+                    error = COALESCE(error, 'Истек срок аренды задачи'),
+                    finished_at = NOW(),
+                    lease_expires_at = NULL
+                WHERE status = 'processing'
+                  AND lease_expires_at < NOW()
+                  AND attempts >= max_attempts
+                RETURNING video_id, payload
+            ), video AS (
+                UPDATE videos v
+                SET status = 'failed'
+                FROM expired
+                WHERE v.video_id = expired.video_id
+            )
+            SELECT * FROM expired
+            """,
+            fetch='all',
+            cursor_factory=RealDictCursor
+        )
+        
+        if error:
+            logger.error(f"Ошибка при обработке задач с истекшей арендой: {error}")
+            return []
+        
+        return result or []
+    
+    def get_job(self, job_id):
+        """Получение задачи обработки вместе с данными видео"""
+        result, _ = self.execute_query(
+            """
+            SELECT j.*, v.user_id, v.s3_key, v.metadata
+            FROM jobs j
+            JOIN videos v ON j.video_id = v.video_id
+            WHERE j.job_id = %s
+            """,
+            (job_id,),
+            fetch='one',
+            cursor_factory=RealDictCursor
+        )
+        
+        return result
+    
+    def get_cached_result(self, cache_keys):
+        """
+        Получение записи кэша результатов обработки по ключу
+        
+        :param cache_keys: возможные ключи (см. cache.lookup_keys); если
+                           подходит несколько записей, возвращается самая новая
+        :return: запись кэша или None
+        """
+        result, _ = self.execute_query(
+            """
+            SELECT * FROM result_cache
+            WHERE cache_key = ANY(%s)
+            ORDER BY created_at DESC
+            LIMIT 1
+            """,
+            (list(cache_keys),),
+            fetch='one',
+            cursor_factory=RealDictCursor
+        )
+        
+        return result
+    
+    def save_cached_result(self, cache_key, content_hash, model_version, confidence_threshold, options,
+                           video_s3_key, video_bucket, log_s3_key, log_bucket, weapon_detected, metadata=None):
+        """
+        Сохранение результата обработки в кэш
+        
+        Если запись с таким ключом уже есть (одно видео обрабатывалось
+        параллельно), она начинает ссылаться на новый результат.
+        
+        :return: (True, None) при успехе, (False, сообщение об ошибке) при ошибке
+        """
+        _, error = self.execute_query(
+            """
+            INSERT INTO result_cache
+            (cache_key, content_hash, model_version, confidence_threshold, options,
+             video_s3_key, video_bucket, log_s3_key, log_bucket, weapon_detected, metadata)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (cache_key) DO UPDATE
+            SET video_s3_key = EXCLUDED.video_s3_key,
+                video_bucket = EXCLUDED.video_bucket,
+                log_s3_key = EXCLUDED.log_s3_key,
+                log_bucket = EXCLUDED.log_bucket,
+                weapon_detected = EXCLUDED.weapon_detected,
+                metadata = EXCLUDED.metadata
+            """,
+            (
+                cache_key, content_hash, model_version, confidence_threshold, json.dumps(options),
+                video_s3_key, video_bucket, log_s3_key, log_bucket, weapon_detected,
+                json.dumps(metadata or {})
+            )
+        )
+        
+        if error:
+            logger.error(f"Ошибка при сохранении результата в кэш: {error}")
+            return False, error
+        
+        logger.info(f"Результат обработки {video_s3_key} сохранен в кэш")
+        return True, None
+    
+    def delete_cached_result(self, cache_key):
+        """Удаление устаревшей записи кэша (исходные объекты удалены из хранилища)"""
+        _, error = self.execute_query(
+            "DELETE FROM result_cache WHERE cache_key = %s",
+            (cache_key,)
+        )
+        
+        if error:
+            logger.error(f"Ошибка при удалении записи кэша: {error}")
+            return False
+        
+        return True
+    
+    def create_cached_video(self, user_id, s3_key, bucket_name, metadata, log_s3_key, log_bucket,
+                            weapon_detected, cache_key):
+        """
+        Создание обработанного видео из результата в кэше
+        
+        Видео и результаты детекции создаются сразу в статусе 'completed'
+        в одной транзакции, счетчик попаданий в кэш увеличивается.
+        
+        :return: (video_id, сообщение об ошибке)
+        """
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO videos (user_id, s3_key, bucket_name, status, metadata)
+                    VALUES (%s, %s, %s, 'completed', %s)
+                    RETURNING video_id
+                    """,
+                    (user_id, s3_key, bucket_name, json.dumps(metadata))
+                )
+                video_id = cursor.fetchone()['video_id']
+                
+                cursor.execute(
+                    """
+                    INSERT INTO detection_results
+                    (video_id, user_id, s3_key, bucket_name, status, weapon_detected)
+                    VALUES (%s, %s, %s, %s, 'completed', %s)
+                    """,
+                    (video_id, user_id, log_s3_key, log_bucket, weapon_detected)
+                )
+                
+                cursor.execute(
+                    """
+                    UPDATE result_cache
+                    SET hits = hits + 1, last_hit_at = CURRENT_TIMESTAMP
+                    WHERE cache_key = %s
+                    """,
+                    (cache_key,)
+                )
+                
+            logger.info(f"Видео {s3_key} создано из кэша результатов")
+            return video_id, None
+            
+        except Exception as e:
+            logger.error(f"Ошибка при создании видео из кэша: {e}")
+            return None, f"Ошибка при создании видео из кэша: {e}"
+    
     def get_user_logs(self, user_id, limit=100):
         """Получение журнала действий пользователя"""
         result, _ = self.execute_query(
@@ -0,0 +1,11 @@
+from .worker import (
+    JOB_TYPE_RENDER,
+    VideoJobWorker,
+    run_worker
+)
+
+__all__ = [
+    'JOB_TYPE_RENDER',
+    'VideoJobWorker',
+    'run_worker'
+]
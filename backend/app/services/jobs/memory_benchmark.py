@@ -0,0 +1,123 @@
+"""
+Замер памяти процессов-обработчиков очереди (JOB_WORKERS > 1).
+
+Процессы запускаются так же, как в worker.run_worker (fork, configure_threads,
+warm_up), но вместо чтения очереди каждый процесс после прогрева сообщает
+свою память из /proc/self/smaps_rollup (только Linux). Замер выполняется
+дважды: с загрузкой модели и gc.freeze() до запуска процессов и без них.
+
+Запуск из директории backend:
+
+    python -m app.services.jobs.memory_benchmark --workers 4
+"""
+import gc
+import os
+import json
+import logging
+import argparse
+import multiprocessing
+
+from app.models import inference_process, model
+
+
+logger = logging.getLogger(__name__)
+
+# Поля smaps_rollup, попадающие в отчет (в КиБ)
+MEMORY_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def read_memory(pid="self"):
+    """
+    Память процесса по /proc/<pid>/smaps_rollup.
+
+    :return: словарь {поле: МиБ} для MEMORY_FIELDS
+    """
+    memory = {}
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            name, _, value = line.partition(":")
+            if name in MEMORY_FIELDS:
+                memory[name] = round(int(value.split()[0]) / 1024, 1)
+    return memory
+
+
+def _measure_worker(processes, results, done):
+    # Та же подготовка, что в worker._worker_main до чтения очереди
+    model.configure_threads(processes)
+    model.warm_up()
+    # Память снимается, когда прогреты все процессы: Pss зависит от того,
+    # сколько живых процессов разделяют страницы
+    results.put(os.getpid())
+    done.wait()
+
+
+def measure(processes, preload):
+    """
+    Память процессов-обработчиков после прогрева модели.
+
+    Каждый замер запускается в отдельном процессе, чтобы модель,
+    загруженная в предыдущем замере, не попала в следующий.
+
+    :param processes: число процессов-обработчиков
+    :param preload: загружать ли модель и выполнять gc.freeze() до запуска процессов
+    :return: отчет (словарь)
+    """
+    context = multiprocessing.get_context("fork")
+    report = context.Queue()
+    runner = context.Process(target=_measure, args=(processes, preload, report))
+    runner.start()
+    result = report.get()
+    runner.join()
+    return result
+
+
+def _measure(processes, preload, report):
+    if preload:
+        if not inference_process.MODEL_PROCESS_ENABLED:
+            model.get_model()
+        gc.freeze()
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    done = context.Event()
+    workers = [
+        context.Process(target=_measure_worker, args=(processes, results, done), name=f"video-worker-{i}")
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    pids = [results.get() for _ in workers]
+    memory = [read_memory(pid) for pid in pids]
+    parent = read_memory()
+    done.set()
+    for worker in workers:
+        worker.join()
+
+    report.put({
+        "workers": processes,
+        "preload": preload,
+        "parent": parent,
+        "per_worker": {
+            field: round(sum(item[field] for item in memory) / len(memory), 1) for field in MEMORY_FIELDS
+        },
+        "total_pss": round(parent["Pss"] + sum(item["Pss"] for item in memory), 1),
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер памяти процессов-обработчиков очереди")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", help="файл для сохранения отчета в JSON")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    report = [measure(args.workers, preload=False), measure(args.workers, preload=True)]
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as report_file:
+            report_file.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+import gc
+import os
+import time
+import socket
+import shutil
+import logging
+import tempfile
+import threading
+import traceback
+import multiprocessing
+from datetime import datetime
+
+from app.services.database import DatabaseManager
+from app.models import cascade, inference_process, model
+from app.services import cache
+from app.services.minio import get_storage
+from app.services.video_processing import video_processing
+
+
+logger = logging.getLogger(__name__)
+handler = logging.StreamHandler()
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+
+POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "2"))
+WORKER_PROCESSES = int(os.environ.get("JOB_WORKERS", "1"))
+# Число задач, одновременно обрабатываемых в одном процессе (в потоках);
+# вместе с сервером инференса (INFERENCE_SERVER) кадры задач объединяются
+# в общие пакеты модели
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "1"))
+# Аренда задачи истекает, если обработчик не продлевал ее дольше LEASE_SECONDS;
+# после этого задачу может забрать другой обработчик
+LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "60"))
+HEARTBEAT_INTERVAL = float(os.environ.get("JOB_HEARTBEAT_INTERVAL", "15"))
+DEFAULT_CONFIDENCE_THRESHOLD = 0.6
+# Задача повторной отрисовки видео с другим порогом по сохраненным детекциям
+JOB_TYPE_RENDER = "render"
+
+
+class JobLeaseLost(Exception):
+    """Задача больше не принадлежит обработчику (аренда истекла или видео удалено)"""
+
+
+class JobHeartbeat:
+    """
+    Фоновое продление аренды задачи.
+
+    Раз в interval секунд продлевает аренду и сохраняет текущий прогресс.
+    Если задача перешла к другому обработчику, выставляет lease_lost.
+    """
+
+    def __init__(self, db_manager, job_id, worker_id, lease_seconds=LEASE_SECONDS, interval=HEARTBEAT_INTERVAL):
+        self.db_manager = db_manager
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.interval = interval
+        self.progress = 0
+        self.lease_lost = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def beat(self):
+        """Однократное продление аренды"""
+        alive, error = self.db_manager.heartbeat_job(
+            self.job_id, self.worker_id, self.lease_seconds, self.progress
+        )
+        if error:
+            # Кратковременная недоступность БД не должна прерывать обработку:
+            # аренда продлится при следующем heartbeat
+            logger.warning(f"Не удалось продлить аренду задачи {self.job_id}: {error}")
+        elif not alive:
+            logger.warning(f"Задача {self.job_id} больше не принадлежит обработчику {self.worker_id}")
+            self.lease_lost.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.beat()
+            if self.lease_lost.is_set():
+                return
+
+    def report_progress(self, frames_done, total_frames):
+        """Обновление прогресса; сохраняется в БД при следующем heartbeat"""
+        if self.lease_lost.is_set():
+            raise JobLeaseLost(f"Аренда задачи {self.job_id} потеряна")
+        if total_frames:
+            # 100% выставляется только после сохранения результатов
+            self.progress = min(int(frames_done * 100 / total_frames), 99)
+
+    def __enter__(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"heartbeat-{self.job_id}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._stopped.set()
+        self._thread.join()
+        return False
+
+
+class VideoJobWorker:
+    """Обработчик очереди видео: забирает задачи из БД и запускает process_video"""
+
+    def __init__(self, db_manager=None, storage=None, poll_interval=POLL_INTERVAL,
+                 lease_seconds=LEASE_SECONDS, heartbeat_interval=HEARTBEAT_INTERVAL, worker_id=None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.storage = storage or get_storage()
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+
+    def run_once(self):
+        """
+        Обработка одной задачи из очереди
+
+        :return: True, если задача была взята в обработку, иначе False
+        """
+        for expired in self.db_manager.fail_expired_jobs():
+            logger.warning(f"Задача видео {expired['video_id']} провалена: истекла аренда, попытки исчерпаны")
+            upload_key = (expired.get('payload') or {}).get('upload_key')
+            if upload_key:
+                self.storage.delete_upload(upload_key)
+
+        job = self.db_manager.claim_job(self.worker_id, self.lease_seconds)
+        if not job:
+            return False
+
+        self.process_job(job)
+        return True
+
+    def run(self):
+        """Бесконечный цикл опроса очереди"""
+        logger.info(f"Обработчик очереди видео {self.worker_id} запущен")
+        while True:
+            try:
+                if not self.run_once():
+                    time.sleep(self.poll_interval)
+            except Exception as e:
+                logger.error(f"Ошибка в цикле обработчика очереди: {e}")
+                logger.error(traceback.format_exc())
+                time.sleep(self.poll_interval)
+
+    def render_job(self, job, payload, local_path, heartbeat):
+        """Отрисовка сохраненных детекций исходного видео с новым порогом"""
+        detection_log = self.storage.get_detection_log(
+            video_processing.detection_log_name(payload['source_video'])
+        )
+        if detection_log is None:
+            raise FileNotFoundError(f"Детекции видео {payload['source_video']} не найдены в хранилище")
+
+        return video_processing.rerender_video(
+            local_path,
+            detection_log,
+            payload['confidence_threshold'],
+            payload.get('username'),
+            output_name=job['s3_key'],
+            progress_callback=heartbeat.report_progress,
+        )
+
+    def original_key(self, payload, source_key, video_filename):
+        """
+        Имя, под которым сохраняется исходное видео для повторной отрисовки
+
+        :return: имя исходного видео в бакете загрузок или None, если оно не сохраняется
+        """
+        if not video_processing.KEEP_ORIGINALS:
+            return None
+        if payload.get('type') == JOB_TYPE_RENDER:
+            # Результат отрисовки ссылается на исходное видео, по которому построен
+            return source_key
+        content_hash = payload.get('content_hash')
+        if not content_hash:
+            # Задача поставлена до хранения исходных видео по хэшу содержимого
+            content_hash = os.path.splitext(video_filename)[0]
+        return video_processing.original_upload_name(content_hash, source_key)
+
+    def keep_original(self, source_key, original_key):
+        """
+        Сохранение исходного видео под именем original_key
+
+        Если объект с этим именем уже есть (то же видео загружалось раньше),
+        он используется повторно, а загрузка удаляется.
+
+        :return: True, если исходное видео сохранено
+        """
+        if source_key == original_key:
+            return True
+        if self.storage.object_exists(self.storage.upload_bucket, original_key):
+            self.storage.delete_upload(source_key)
+            return True
+        return self.storage.rename_object(self.storage.upload_bucket, source_key, original_key)
+
+    def cache_result(self, payload, video_filename, log_filename, weapon_detected, metadata):
+        """
+        Сохранение результата в кэш, чтобы повторная загрузка видео не обрабатывалась.
+
+        Ключ строится из версии модели (с бэкендом, выбранным в этом процессе)
+        и параметров обработки этого обработчика: API их не знает.
+        """
+        content_hash = payload.get('content_hash')
+        if not payload.get('cache') or not content_hash:
+            return
+        confidence_threshold = payload.get('confidence_threshold', DEFAULT_CONFIDENCE_THRESHOLD)
+        options = cache.pipeline_options(
+            payload.get('frame_stride') or video_processing.FRAME_STRIDE, payload.get('render', True)
+        )
+        # Ошибка кэша не влияет на результат задачи
+        try:
+            model_version = model.model_version()
+        except Exception as e:
+            logger.warning(f"Результат не сохранен в кэш: не удалось определить версию модели: {e}")
+            return
+        self.db_manager.save_cached_result(
+            cache.build_cache_key(content_hash, model_version, confidence_threshold, options),
+            content_hash,
+            model_version,
+            confidence_threshold,
+            options,
+            video_filename,
+            self.storage.video_bucket,
+            log_filename,
+            self.storage.log_bucket,
+            weapon_detected,
+            {key: value for key, value in metadata.items() if key != 'processed_date'}
+        )
+
+    def process_job(self, job):
+        """Обработка задачи, взятой из очереди"""
+        job_id = job['job_id']
+        video_id = job['video_id']
+        payload = job.get('payload') or {}
+        upload_key = payload.get('upload_key')
+        render = payload.get('type') == JOB_TYPE_RENDER
+        # Задача отрисовки читает сохраненное исходное видео другого результата
+        source_key = payload.get('original_key') if render else upload_key
+        logger.info(f"Начало обработки задачи {job_id} (видео {video_id}): {source_key}")
+
+        work_dir = tempfile.mkdtemp(prefix="video_upload_")
+        heartbeat = JobHeartbeat(
+            self.db_manager, job_id, self.worker_id,
+            self.lease_seconds, self.heartbeat_interval
+        )
+        try:
+            with heartbeat:
+                if not source_key:
+                    raise ValueError("В задаче не указан исходный файл")
+
+                local_path = os.path.join(work_dir, os.path.basename(source_key))
+                if not self.storage.get_upload(source_key, local_path):
+                    raise FileNotFoundError(f"Исходное видео не найдено в хранилище: {source_key}")
+
+                stats = {}
+                if render:
+                    video_filename, frame_objects, fps, has_weapon_or_knife, log_filename = self.render_job(
+                        job, payload, local_path, heartbeat
+                    )
+                else:
+                    video_filename, frame_objects, fps, has_weapon_or_knife, log_filename = video_processing.process_video(
+                        local_path,
+                        payload.get('confidence_threshold', DEFAULT_CONFIDENCE_THRESHOLD),
+                        payload.get('username'),
+                        output_name=job['s3_key'],
+                        progress_callback=heartbeat.report_progress,
+                        frame_stride=payload.get('frame_stride'),
+                        stats=stats,
+                        render=payload.get('render', True),
+                    )
+
+                if heartbeat.lease_lost.is_set():
+                    raise JobLeaseLost(f"Аренда задачи {job_id} потеряна")
+
+            detection_count = sum(1 for _, has_weapon, has_knife in frame_objects if has_weapon or has_knife)
+            metadata = {
+                "fps": str(fps),
+                "detection_count": str(detection_count),
+                "processed_date": datetime.now().isoformat()
+            }
+            # Статистика конвейера (в т.ч. число кадров, пропущенных фильтром
+            # движения) сохраняется для подбора настроек обработки
+            metadata.update({key: str(value) for key, value in stats.items()})
+            if not payload.get('render', True):
+                # Размеченное видео не создавалось, клиент показывает исходное
+                metadata["render"] = "false"
+            original_key = self.original_key(payload, source_key, video_filename)
+            if original_key:
+                metadata["original_key"] = original_key
+
+            # Результаты и завершение задачи фиксируются одной транзакцией
+            # при действующей аренде; исходное видео до этого не трогается,
+            # чтобы задачу мог повторить другой обработчик
+            completed, error = self.db_manager.complete_job(
+                job_id, self.worker_id, video_id, log_filename, has_weapon_or_knife, metadata
+            )
+            if error:
+                raise RuntimeError(error)
+            if not completed:
+                raise JobLeaseLost(f"Аренда задачи {job_id} потеряна до сохранения результатов")
+
+            self.db_manager.add_log(job['user_id'], 'upload', video_id)
+            self.cache_result(payload, video_filename, log_filename, has_weapon_or_knife, metadata)
+            if original_key and not self.keep_original(source_key, original_key):
+                logger.warning(f"Не удалось сохранить исходное видео {source_key} как {original_key}")
+                self.db_manager.update_video_metadata(video_id, {"original_key": None})
+                original_key = None
+            if upload_key and not original_key:
+                self.storage.delete_upload(upload_key)
+            logger.info(f"Задача {job_id} успешно выполнена: {video_filename}")
+
+        except JobLeaseLost as e:
+            # Задачей уже владеет другой обработчик (или видео удалено):
+            # состояние задачи не меняем, только освобождаем локальные ресурсы
+            logger.warning(str(e))
+
+        except Exception as e:
+            logger.error(f"Ошибка при обработке задачи {job_id}: {e}")
+            logger.error(traceback.format_exc())
+            final, error = self.db_manager.fail_job(job_id, self.worker_id, str(e))
+            if final and upload_key:
+                self.storage.delete_upload(upload_key)
+
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _worker_main(processes=1, concurrency=None):
+    model.configure_threads(processes)
+    # Модель прогревается до первой задачи, чтобы загрузка не расходовала аренду
+    model.warm_up()
+    concurrency = max(int(concurrency or JOB_CONCURRENCY), 1)
+    if concurrency == 1:
+        VideoJobWorker().run()
+        return
+
+    # Каждый поток забирает задачи под собственным идентификатором,
+    # чтобы аренды задач одного процесса не смешивались
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    threads = [
+        threading.Thread(
+            target=VideoJobWorker(worker_id=f"{base_id}:{i}").run, name=f"video-job-{i}", daemon=True
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    logger.info(f"Задач, одновременно обрабатываемых в процессе {os.getpid()}: {concurrency}")
+    for thread in threads:
+        thread.join()
+
+
+def run_worker(processes=None):
+    """
+    Запуск обработчиков очереди видео
+
+    :param processes: число процессов-обработчиков (по умолчанию JOB_WORKERS)
+    """
+    # Несовместимые режимы инференса отклоняются до запуска обработчиков
+    cascade.check_configuration()
+    processes = processes or WORKER_PROCESSES
+    if processes == 1:
+        _worker_main()
+        return
+
+    # Веса загружаются до запуска процессов и остаются общими для них
+    # (copy-on-write); инференс в родительском процессе не выполняется.
+    # В режиме MODEL_PROCESS модель загружает процесс инференса каждого обработчика
+    if not inference_process.MODEL_PROCESS_ENABLED:
+        model.get_model()
+    gc.freeze()
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=_worker_main, args=(processes,), name=f"video-worker-{i}")
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    logger.info(f"Запущено процессов-обработчиков: {processes}")
+
+    for worker in workers:
+        worker.join()
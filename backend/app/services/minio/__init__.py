@@ -1,7 +1,9 @@
 from .minio_storage import (
-    MinioStorage
+    MinioStorage,
+    get_storage
 )
 
 __all__ = [
-    'MinioStorage'
+    'MinioStorage',
+    'get_storage'
 ] 
\ No newline at end of file
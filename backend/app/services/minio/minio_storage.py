@@ -5,10 +5,13 @@ import os
 import json
 import logging
 import time
+import threading
 from datetime import datetime, timedelta
 from functools import wraps
 import io
 
+import numpy as np
+
 # Настройка логирования
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -56,6 +59,7 @@ class MinioStorage:
         secure=os.environ.get('MINIO_SECURE', 'false').lower() == 'true',
         video_bucket='videos',
         log_bucket='logs',
+        upload_bucket='uploads',
         region=None
     ):
         self.endpoint = endpoint
@@ -64,14 +68,18 @@ class MinioStorage:
         self.secure = secure
         self.video_bucket = video_bucket
         self.log_bucket = log_bucket
+        self.upload_bucket = upload_bucket
         self.region = region
         self.client = None
+        # Бакеты проверяются при первом обращении к хранилищу, а не при
+        # создании объекта: импорт приложения не обращается к сети
+        self.buckets_checked = False
         logger.info(f"Инициализация MinioStorage с параметрами: endpoint={endpoint}, secure={secure}, region={region}")
         self.connect()
         
     def connect(self):
-        """Установка соединения с MinIO"""
-        logger.info(f"Попытка установки соединения с MinIO по адресу {self.endpoint}")
+        """Создание клиента MinIO (без обращения к серверу)"""
+        logger.info(f"Создание клиента MinIO для адреса {self.endpoint}")
         try:
             self.client = Minio(
                 endpoint=self.endpoint,
@@ -80,10 +88,6 @@ class MinioStorage:
                 secure=self.secure,
                 region=self.region
             )
-            
-            self._ensure_buckets_exist()
-            
-            logger.info("Соединение с MinIO установлено успешно")
             return True
         except S3Error as e:
             logger.error(f"Ошибка инициализации Minio: {e}")
@@ -96,19 +100,13 @@ class MinioStorage:
         """Проверка и создание необходимых бакетов"""
         logger.debug("Проверка существования необходимых бакетов")
         try:
-            if not self.client.bucket_exists(self.video_bucket):
-                logger.info(f"Бакет {self.video_bucket} не существует, создаем")
-                self.client.make_bucket(self.video_bucket)
-                logger.info(f"Создан бакет {self.video_bucket}")
-            else:
-                logger.debug(f"Бакет {self.video_bucket} уже существует")
-            
-            if not self.client.bucket_exists(self.log_bucket):
-                logger.info(f"Бакет {self.log_bucket} не существует, создаем")
-                self.client.make_bucket(self.log_bucket)
-                logger.info(f"Создан бакет {self.log_bucket}")
-            else:
-                logger.debug(f"Бакет {self.log_bucket} уже существует")
+            for bucket in (self.video_bucket, self.log_bucket, self.upload_bucket):
+                if not self.client.bucket_exists(bucket):
+                    logger.info(f"Бакет {bucket} не существует, создаем")
+                    self.client.make_bucket(bucket)
+                    logger.info(f"Создан бакет {bucket}")
+                else:
+                    logger.debug(f"Бакет {bucket} уже существует")
                 
         except Exception as e:
             logger.error(f"Ошибка при проверке/создании бакетов: {e}")
@@ -130,9 +128,19 @@ class MinioStorage:
         logger.debug("Проверка необходимости переподключения к MinIO")
         if self.client is None:
             logger.info("Клиент MinIO не инициализирован, выполняется подключение")
-            return self.connect()
+            if not self.connect():
+                return False
+        if not self.buckets_checked:
+            try:
+                self._ensure_buckets_exist()
+            except Exception:
+                return False
+            self.buckets_checked = True
+            logger.info("Соединение с MinIO установлено успешно")
+            return True
         if not self.check_connection():
             logger.info("Соединение с MinIO потеряно, выполняется переподключение")
+            self.buckets_checked = False
             return self.connect()
         return True
             
@@ -162,6 +170,89 @@ class MinioStorage:
             logger.error(f"Ошибка при сохранении видео: {e}")
             return False
     
+    @retry_s3_operation()
+    def save_upload(self, file_path, object_name, metadata=None):
+        """Сохранение исходного видео, ожидающего обработки, в бакет загрузок"""
+        logger.info(f"Загрузка исходного видео {file_path} в MinIO с именем {object_name}")
+        try:
+            self.ensure_connection()
+            
+            self.client.fput_object(
+                bucket_name=self.upload_bucket,
+                object_name=object_name,
+                file_path=file_path,
+                metadata=metadata
+            )
+            
+            logger.info(f"Исходное видео {object_name} успешно загружено в Minio")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении исходного видео: {e}")
+            return False
+    
+    @retry_s3_operation()
+    def get_upload(self, object_name, file_path):
+        """Скачивание исходного видео из бакета загрузок
+        
+        Args:
+            object_name (str): Имя объекта в Minio
+            file_path (str): Путь для сохранения файла
+            
+        Returns:
+            bool: True - успешно, False - ошибка
+        """
+        logger.info(f"Скачивание исходного видео {object_name} из MinIO в {file_path}")
+        try:
+            self.ensure_connection()
+            
+            self.client.fget_object(
+                bucket_name=self.upload_bucket,
+                object_name=object_name,
+                file_path=file_path
+            )
+            
+            logger.info(f"Исходное видео {object_name} успешно скачано в {file_path}")
+            return True
+        except S3Error as e:
+            logger.error(f"Ошибка получения исходного видео из Minio: {e}")
+            return False
+    
+    @retry_s3_operation()
+    def delete_upload(self, object_name):
+        """Удаление обработанного исходного видео из бакета загрузок"""
+        logger.info(f"Удаление исходного видео {object_name} из MinIO")
+        try:
+            self.ensure_connection()
+            
+            self.client.remove_object(
+                bucket_name=self.upload_bucket,
+                object_name=object_name
+            )
+            
+            logger.info(f"Исходное видео {object_name} успешно удалено")
+            return True
+        except S3Error as e:
+            logger.error(f"Ошибка удаления исходного видео из Minio: {e}")
+            return False
+    
+    @retry_s3_operation()
+    def delete_log(self, object_name):
+        """Удаление лога из бакета логов"""
+        logger.info(f"Удаление лога {object_name} из MinIO")
+        try:
+            self.ensure_connection()
+            
+            self.client.remove_object(
+                bucket_name=self.log_bucket,
+                object_name=object_name
+            )
+            
+            logger.info(f"Лог {object_name} успешно удален")
+            return True
+        except S3Error as e:
+            logger.error(f"Ошибка удаления лога из Minio: {e}")
+            return False
+    
     @retry_s3_operation()
     def save_log(self, log_data, object_name, metadata=None):
         """Сохранение JSON лога в Minio"""
@@ -185,6 +276,95 @@ class MinioStorage:
         logger.info(f"Лог {object_name} успешно загружен в Minio")
         return True
     
+    @retry_s3_operation()
+    def save_detection_log(self, columns, object_name, metadata=None):
+        """Сохранение лога детекций в компактном колоночном формате (сжатый NumPy .npz)
+        
+        Args:
+            columns (dict): Имя столбца -> массив NumPy, число или строка
+            object_name (str): Имя объекта в Minio
+        """
+        logger.info(f"Сохранение лога детекций в MinIO с именем {object_name}")
+        self.ensure_connection()
+        
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **columns)
+        data = buffer.getvalue()
+        logger.debug(f"Размер лога детекций: {len(data)} байт")
+        
+        self.client.put_object(
+            bucket_name=self.log_bucket,
+            object_name=object_name,
+            data=io.BytesIO(data),
+            length=len(data),
+            content_type='application/octet-stream',
+            metadata=metadata
+        )
+        
+        logger.info(f"Лог детекций {object_name} успешно загружен в Minio")
+        return True
+    
+    @retry_s3_operation()
+    def get_detection_log(self, object_name, bucket_name=None):
+        """Получение лога детекций в колоночном формате
+        
+        Args:
+            object_name (str): Имя объекта в Minio
+            bucket_name (str, optional): Бакет (по умолчанию бакет логов)
+            
+        Returns:
+            dict or None: Столбцы лога (массивы NumPy, числа и строки) или None,
+            если лога нет или он не читается
+        """
+        logger.info(f"Получение лога детекций {object_name} из MinIO")
+        try:
+            self.ensure_connection()
+            
+            response = self.client.get_object(
+                bucket_name=bucket_name or self.log_bucket,
+                object_name=object_name
+            )
+            try:
+                data = response.read()
+            finally:
+                response.close()
+                response.release_conn()
+            
+            with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+                columns = {
+                    name: archive[name].item() if archive[name].ndim == 0 else archive[name]
+                    for name in archive.files
+                }
+            
+            logger.info(f"Лог детекций {object_name} успешно получен из Minio")
+            return columns
+        except Exception as e:
+            logger.error(f"Ошибка при получении лога детекций: {e}")
+            return None
+    
+    @retry_s3_operation()
+    def copy_object(self, source_bucket, source_object, target_bucket, target_object):
+        """Копирование объекта на стороне сервера MinIO (без скачивания)
+        
+        Returns:
+            bool: True - успешно, False - ошибка (в т.ч. если исходного объекта нет)
+        """
+        logger.info(f"Копирование объекта {source_bucket}/{source_object} в {target_bucket}/{target_object}")
+        try:
+            self.ensure_connection()
+            
+            self.client.copy_object(
+                bucket_name=target_bucket,
+                object_name=target_object,
+                source=CopySource(source_bucket, source_object)
+            )
+            
+            logger.info(f"Объект {source_object} скопирован в {target_object}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при копировании объекта: {e}")
+            return False
+    
     @retry_s3_operation()
     def rename_object(self, source_bucket, source_object, target_object):
         """Переименование объекта через операцию копирования"""
@@ -353,12 +533,13 @@ class MinioStorage:
             return False
             
     @retry_s3_operation()
-    def get_presigned_url(self, object_name, expires=7):
+    def get_presigned_url(self, object_name, expires=7, bucket_name=None):
         """Создание временной ссылки на видео в Minio
         
         Args:
             object_name (str): Имя объекта в Minio
             expires (int, optional): Время жизни ссылки в днях
+            bucket_name (str, optional): Бакет (по умолчанию бакет видео)
             
         Returns:
             str or None: URL или None в случае ошибки
@@ -366,18 +547,19 @@ class MinioStorage:
         logger.info(f"Создание временной ссылки для {object_name} со сроком действия {expires} дней")
         try:
             self.ensure_connection()
+            bucket_name = bucket_name or self.video_bucket
 
             try:
                 self.client.stat_object(
-                    bucket_name=self.video_bucket,
+                    bucket_name=bucket_name,
                     object_name=object_name
                 )
             except Exception as e:
-                logger.warning(f"Объект {object_name} не найден в бакете {self.video_bucket}: {e}")
+                logger.warning(f"Объект {object_name} не найден в бакете {bucket_name}: {e}")
                 return None
             
             url = self.client.presigned_get_object(
-                bucket_name=self.video_bucket,
+                bucket_name=bucket_name,
                 object_name=object_name,
                 expires=timedelta(days=expires)
             )
@@ -418,10 +600,16 @@ class MinioStorage:
                 log_count = 0
                 
                 try:
-                    log_data = self.get_log(f"{filename}.json")
-                    if log_data:
+                    detection_log = self.get_detection_log(f"{filename}.detections.npz")
+                    if detection_log:
                         log_exists = True
-                        log_count = len(log_data)
+                        log_count = detection_log["total_frames"]
+                    else:
+                        # Видео, обработанные до перехода на колоночный формат
+                        log_data = self.get_log(f"{filename}.json")
+                        if log_data:
+                            log_exists = True
+                            log_count = len(log_data)
                 except Exception as e:
                     logger.warning(f"Ошибка при проверке лога для {filename}: {e}")
                 
@@ -449,3 +637,17 @@ class MinioStorage:
         except S3Error as e:
             logger.error(f"Ошибка получения списка видео: {e}")
             return []
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Общий для приложения экземпляр MinioStorage (создается при первом вызове)"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = MinioStorage()
+    return _storage
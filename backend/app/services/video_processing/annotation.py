@@ -0,0 +1,57 @@
+import cv2
+
+from app.services.video_processing.detections import WEAPON_CLASS, KNIFE_CLASS
+
+
+# Цвета рамок в формате BGR
+CLASS_COLORS = {
+    WEAPON_CLASS: (0, 0, 255),
+    KNIFE_CLASS: (0, 165, 255),
+}
+DEFAULT_COLOR = (0, 255, 0)
+
+
+def draw_detections(frame, detections, names):
+    """
+    Отрисовка рамок и подписей детекций прямо на декодированном кадре.
+
+    :param frame: кадр BGR (изменяется на месте)
+    :param detections: массив детекций [x1, y1, x2, y2, conf, cls]
+    :param names: словарь {class_id: имя класса} модели
+    :return: тот же кадр с нанесенной разметкой
+    """
+    # Толщина линий и размер шрифта подбираются под разрешение, как в Ultralytics
+    line_width = max(round(sum(frame.shape[:2]) / 2 * 0.003), 2)
+    font_thickness = max(line_width - 1, 1)
+    font_scale = line_width / 3
+
+    for x1, y1, x2, y2, confidence, class_id in detections:
+        class_name = names.get(int(class_id), str(int(class_id)))
+        color = CLASS_COLORS.get(class_name, DEFAULT_COLOR)
+        top_left = (int(x1), int(y1))
+        cv2.rectangle(frame, top_left, (int(x2), int(y2)), color, line_width)
+
+        label = f"{class_name} {confidence:.2f}"
+        (text_width, text_height), baseline = cv2.getTextSize(
+            label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, font_thickness
+        )
+        label_top = max(int(y1) - text_height - baseline, 0)
+        cv2.rectangle(
+            frame,
+            (int(x1), label_top),
+            (int(x1) + text_width, label_top + text_height + baseline),
+            color,
+            -1,
+        )
+        cv2.putText(
+            frame,
+            label,
+            (int(x1), label_top + text_height),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            font_scale,
+            (255, 255, 255),
+            font_thickness,
+            cv2.LINE_AA,
+        )
+
+    return frame
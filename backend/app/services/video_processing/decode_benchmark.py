@@ -0,0 +1,103 @@
+"""
+Сравнение декодирования ffmpeg в размере входа модели (DOWNSCALE_DECODE)
+с полным декодированием OpenCV и последующим уменьшением кадра.
+
+Запуск из директории backend:
+
+    python -m app.services.video_processing.decode_benchmark --video clip.mp4
+"""
+import json
+import time
+import logging
+import argparse
+
+import cv2
+
+from app.models.model import INFERENCE_IMGSZ
+from app.services.video_processing.decoder import (
+    fit_inference_size,
+    inference_size,
+    read_scaled_frames,
+    video_size,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def _time_frames(frames, max_frames):
+    started = time.perf_counter()
+    count = 0
+    for _ in frames:
+        count += 1
+        if count == max_frames:
+            break
+    return count, time.perf_counter() - started
+
+
+def _read_opencv(video_path, imgsz):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        while True:
+            success, frame = cap.read()
+            if not success:
+                break
+            yield fit_inference_size(frame, imgsz)[0]
+    finally:
+        cap.release()
+
+
+def benchmark_decode(video_path, imgsz=INFERENCE_IMGSZ, max_frames=300):
+    """
+    Время декодирования кадров видео в размере входа модели двумя способами.
+
+    Время включает запуск ffmpeg и открытие видео OpenCV.
+
+    :return: отчет (словарь)
+    """
+    width, height = video_size(video_path)
+    size = inference_size(width, height, imgsz)
+    if size is None:
+        raise ValueError(f"Кадр {width}x{height} не больше imgsz={imgsz}, уменьшение не выполняется")
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25
+    cap.release()
+
+    scaled_frames, scaled_elapsed = _time_frames(read_scaled_frames(video_path, size, fps), max_frames)
+    opencv_frames, opencv_elapsed = _time_frames(_read_opencv(video_path, imgsz), max_frames)
+
+    return {
+        "source_size": f"{width}x{height}",
+        "inference_size": f"{size[0]}x{size[1]}",
+        "scaled": {
+            "frames": scaled_frames,
+            "ms_per_frame": round(scaled_elapsed * 1000 / scaled_frames, 2),
+        },
+        "opencv": {
+            "frames": opencv_frames,
+            "ms_per_frame": round(opencv_elapsed * 1000 / opencv_frames, 2),
+        },
+        "speedup": round((opencv_elapsed / opencv_frames) / (scaled_elapsed / scaled_frames), 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение декодирования с уменьшением и полного декодирования")
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--imgsz", type=int, default=INFERENCE_IMGSZ)
+    parser.add_argument("--max-frames", type=int, default=300)
+    parser.add_argument("--output", help="файл для сохранения отчета в JSON")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    report = benchmark_decode(args.video, imgsz=args.imgsz, max_frames=args.max_frames)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as report_file:
+            report_file.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import os
+import logging
+import subprocess
+
+import cv2
+import numpy as np
+
+from app.services.video_processing.encoder import get_ffmpeg_binary
+
+
+logger = logging.getLogger(__name__)
+
+
+# Декодировать видео сразу в размере входа модели, если размеченное
+# видео не нужно (render=false)
+DOWNSCALE_DECODE = os.environ.get("DOWNSCALE_DECODE", "true").lower() == "true"
+
+
+def video_size(filename):
+    """Ширина и высота кадра видео"""
+    cap = cv2.VideoCapture(filename)
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+
+
+def inference_size(width, height, imgsz):
+    """
+    Размер кадра для модели: большая сторона равна imgsz, пропорции сохраняются.
+
+    :return: (ширина, высота) или None, если кадр не больше imgsz
+    """
+    if not imgsz or max(width, height) <= imgsz:
+        return None
+    scale = imgsz / max(width, height)
+    return max(round(width * scale), 1), max(round(height * scale), 1)
+
+
+def fit_inference_size(frame, imgsz):
+    """
+    Уменьшение кадра до размера входа модели.
+
+    Ultralytics все равно уменьшает кадр до imgsz; интерполяция по площади
+    здесь дешевле и не дает ступенчатости на кадрах 4K.
+
+    :return: (кадр для модели, множители (sx, sy) координат до исходного кадра
+             или None, если кадр не уменьшался)
+    """
+    height, width = frame.shape[:2]
+    size = inference_size(width, height, imgsz)
+    if size is None:
+        return frame, None
+    resized = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return resized, (width / size[0], height / size[1])
+
+
+def read_scaled_frames(filename, size, fps, start_frame=0, end_frame=None):
+    """
+    Генератор кадров, декодированных ffmpeg сразу в уменьшенном размере.
+
+    Масштабирование и перевод в BGR выполняются в ffmpeg на уменьшенном
+    кадре, поэтому кадр исходного разрешения в BGR не создается.
+
+    :param size: (ширина, высота) кадров
+    :param fps: частота кадров (для перехода к start_frame)
+    :param start_frame: номер первого кадра
+    :param end_frame: номер кадра, на котором чтение останавливается (не включается)
+    """
+    width, height = size
+    command = [get_ffmpeg_binary(), "-loglevel", "error"]
+    if start_frame:
+        command += ["-ss", f"{start_frame / fps:.6f}"]
+    # passthrough: каждый кадр выводится один раз с исходным временем;
+    # иначе rawvideo выводится с постоянной частотой, и при переменной
+    # частоте кадров ffmpeg повторяет или отбрасывает кадры
+    command += ["-i", filename, "-map", "0:v:0", "-an", "-fps_mode", "passthrough"]
+    if end_frame is not None:
+        command += ["-frames:v", str(max(end_frame - start_frame, 0))]
+    command += [
+        "-vf", f"scale={width}:{height}:flags=area",
+        "-f", "rawvideo",
+        "-pix_fmt", "bgr24",
+        "-",
+    ]
+
+    frame_bytes = width * height * 3
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    frames_read = 0
+    try:
+        while True:
+            frame = np.empty((height, width, 3), dtype=np.uint8)
+            view = memoryview(frame).cast("B")
+            filled = 0
+            while filled < frame_bytes:
+                chunk = process.stdout.readinto(view[filled:])
+                if not chunk:
+                    break
+                filled += chunk
+            if filled < frame_bytes:
+                break
+            frames_read += 1
+            yield frame
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        stderr = process.stderr.read().decode(errors="replace").strip()
+        process.stderr.close()
+
+    if frames_read == 0 and process.returncode:
+        raise RuntimeError(f"ffmpeg не смог декодировать видео: {stderr}")
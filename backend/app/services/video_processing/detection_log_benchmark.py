@@ -0,0 +1,137 @@
+"""
+Сравнение колоночного лога детекций (.detections.npz) с прежним
+JSON-списком frame_objects: размер и время чтения с развертыванием
+в frame_objects.
+
+Лог строится из синтетических детекций (фиксированное зерно), поэтому
+модель и видео не нужны.
+
+Запуск из директории backend:
+
+    python -m app.services.video_processing.detection_log_benchmark --frames 108000 --detection-rate 0.05
+"""
+import io
+import json
+import time
+import logging
+import argparse
+
+import numpy as np
+
+from app.services.video_processing.detections import (
+    EMPTY_DETECTIONS,
+    DetectionSummary,
+    build_detection_log,
+    log_frame_objects,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Классы модели (как в весах YOLO приложения)
+BENCHMARK_NAMES = {0: "weapon", 1: "knife"}
+
+
+def synthetic_summary(total_frames, detection_rate, confidence_threshold=0.25, floor=0.05, seed=0):
+    """
+    DetectionSummary видео с детекциями в доле detection_rate кадров.
+
+    Кадры с детекциями идут сериями (объект виден несколько секунд),
+    на кадре одна-две рамки кадра 1920x1080 с уверенностью от floor до 1.
+    """
+    rng = np.random.default_rng(seed)
+    summary = DetectionSummary(BENCHMARK_NAMES, confidence_threshold)
+    target = int(total_frames * detection_rate)
+    detected = np.zeros(total_frames, dtype=bool)
+    while detected.sum() < target:
+        start = int(rng.integers(0, total_frames))
+        detected[start:start + int(rng.integers(25, 250))] = True
+
+    for frame_index in range(total_frames):
+        if not detected[frame_index]:
+            summary.add(frame_index, EMPTY_DETECTIONS)
+            continue
+        count = int(rng.integers(1, 3))
+        corners = rng.uniform(0, [1800, 960], size=(count, 2))
+        detections = np.column_stack([
+            corners, corners + rng.uniform(20, 120, size=(count, 2)),
+            rng.uniform(floor, 1.0, size=count), rng.integers(0, 2, size=count),
+        ]).astype(np.float32)
+        summary.add(frame_index, detections)
+    return summary
+
+
+def _best_time(function, repeats):
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _read_npz(data):
+    # Чтение так же, как в MinioStorage.get_detection_log
+    with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+        columns = {
+            name: archive[name].item() if archive[name].ndim == 0 else archive[name]
+            for name in archive.files
+        }
+    return log_frame_objects(columns)
+
+
+def benchmark_detection_log(total_frames=108000, detection_rate=0.05, repeats=5, floor=0.05):
+    """
+    Размер и время чтения лога в колоночном формате и в прежнем JSON.
+
+    Время - лучшее из repeats: чтение колоночного лога и развертывание
+    в frame_objects против json.loads прежнего лога.
+
+    :return: отчет (словарь)
+    """
+    summary = synthetic_summary(total_frames, detection_rate, floor=floor)
+    buffer = io.BytesIO()
+    # Сжатие так же, как в MinioStorage.save_detection_log
+    np.savez_compressed(buffer, **build_detection_log(summary, floor))
+    npz_data = buffer.getvalue()
+    json_data = json.dumps(summary.frame_objects).encode("utf-8")
+
+    if _read_npz(npz_data) != summary.frame_objects:
+        raise RuntimeError("frame_objects колоночного лога не совпадают с JSON-логом")
+
+    return {
+        "frames": total_frames,
+        "detected_frames": len(summary.raw_detections),
+        "boxes": sum(len(detections) for _, detections in summary.raw_detections),
+        "npz": {
+            "bytes": len(npz_data),
+            "read_ms": round(_best_time(lambda: _read_npz(npz_data), repeats) * 1000, 2),
+        },
+        "json": {
+            "bytes": len(json_data),
+            "read_ms": round(_best_time(lambda: json.loads(json_data), repeats) * 1000, 2),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение колоночного лога детекций с JSON-логом")
+    parser.add_argument("--frames", type=int, default=108000)
+    parser.add_argument("--detection-rate", type=float, default=0.05)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="файл для сохранения отчета в JSON")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    report = benchmark_detection_log(args.frames, args.detection_rate, args.repeats)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as report_file:
+            report_file.write(output)
+
+
+if __name__ == "__main__":
+    main()
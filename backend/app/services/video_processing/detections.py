@@ -0,0 +1,444 @@
+import json
+
+import numpy as np
+
+
+WEAPON_CLASS = "weapon"
+KNIFE_CLASS = "knife"
+
+# Детекции кадра хранятся в формате Ultralytics boxes.data:
+# [x1, y1, x2, y2, confidence, class_id]
+DETECTION_COLUMNS = 6
+EMPTY_DETECTIONS = np.empty((0, DETECTION_COLUMNS), dtype=np.float32)
+# Версия колоночного формата лога детекций (см. build_detection_log)
+DETECTION_LOG_VERSION = 1
+# Классы интервала детекций хранятся битовой маской
+INTERVAL_WEAPON = 1
+INTERVAL_KNIFE = 2
+
+
+def _to_numpy(values):
+    """Преобразование тензора torch или последовательности в массив NumPy"""
+    if hasattr(values, "cpu"):
+        values = values.cpu().numpy()
+    return np.asarray(values, dtype=np.float32)
+
+
+def extract_detections(frame_results):
+    """
+    Извлечение детекций кадра из результата модели в компактный массив.
+
+    :param frame_results: результат Ultralytics для одного кадра
+    :return: массив формы (N, 6) со столбцами [x1, y1, x2, y2, conf, cls]
+    """
+    boxes = frame_results.boxes
+    xyxy = _to_numpy(boxes.xyxy).reshape(-1, 4)
+    if len(xyxy) == 0:
+        return EMPTY_DETECTIONS
+
+    confidence = _to_numpy(boxes.conf).reshape(-1, 1)
+    class_ids = _to_numpy(boxes.cls).reshape(-1, 1)
+    return np.hstack([xyxy, confidence, class_ids]).astype(np.float32)
+
+
+def filter_detections(detections, confidence_threshold):
+    """Детекции кадра с уверенностью не ниже порога"""
+    if not confidence_threshold or len(detections) == 0:
+        return detections
+    return detections[detections[:, 4] >= confidence_threshold]
+
+
+def scale_boxes(detections, scale):
+    """
+    Перевод рамок из координат уменьшенного кадра в координаты исходного.
+
+    :param scale: множители (sx, sy) или None (рамки не меняются)
+    :return: новый массив детекций (исходный не изменяется)
+    """
+    if scale is None or len(detections) == 0:
+        return detections
+    scaled = detections.copy()
+    scaled[:, [0, 2]] *= scale[0]
+    scaled[:, [1, 3]] *= scale[1]
+    return scaled
+
+
+def count_classes(detections, names):
+    """
+    Подсчет оружия и ножей среди детекций кадра.
+
+    :param detections: массив детекций кадра
+    :param names: словарь {class_id: имя класса} модели
+    :return: (количество оружия, количество ножей)
+    """
+    weapons = 0
+    knives = 0
+    for class_id in detections[:, 5].astype(int):
+        class_name = names.get(class_id)
+        if class_name == WEAPON_CLASS:
+            weapons += 1
+        elif class_name == KNIFE_CLASS:
+            knives += 1
+    return weapons, knives
+
+
+class DetectionSummary:
+    """
+    Накопление покадровых результатов детекции без хранения самих кадров.
+
+    Модель запускается с низким порогом уверенности; все ее детекции
+    сохраняются в raw_detections, а frame_objects и счетчики учитывают
+    только детекции не ниже confidence_threshold. Это позволяет позже
+    пересчитать результат для другого порога без повторного запуска модели.
+
+    Если детекции получены с трекером, каждой рамке соответствует номер
+    трека (track_ids), и кроме рамок по кадрам (total_weapons) считаются
+    различные объекты (distinct_weapons, distinct_knives).
+    """
+
+    def __init__(self, names, confidence_threshold=0.0):
+        self.names = names
+        self.confidence_threshold = confidence_threshold
+        self.frame_objects = []
+        # (номер кадра, детекции) для кадров, где есть хотя бы одна детекция
+        self.raw_detections = []
+        # Номера треков детекций raw_detections (-1 - без трекера)
+        self.track_ids = []
+        self.tracking = False
+        self.next_track_id = 0
+        self.weapon_tracks = set()
+        self.knife_tracks = set()
+        self.total_weapons = 0
+        self.total_knives = 0
+        # Кадры, переданные модели, пропущенные фильтром движения
+        # и полученные трекером без запуска модели
+        self.inferred_frames = 0
+        self.gated_frames = 0
+        self.tracked_frames = 0
+        # Кадры, проверенные первой стадией каскада и переданные полному детектору
+        self.screened_frames = 0
+        self.escalated_frames = 0
+        # Кадры, на которых модель проверила участки исходного разрешения, и число участков
+        self.tiled_frames = 0
+        self.tiles = 0
+
+    def add(self, frame_index, detections, track_ids=None):
+        """
+        Добавление детекций очередного кадра
+
+        :param track_ids: номера треков детекций (если используется трекер)
+        :return: детекции кадра не ниже порога уверенности (для отрисовки)
+        """
+        if track_ids is None:
+            track_ids = np.full(len(detections), -1, dtype=np.int32)
+        else:
+            self.tracking = True
+        if len(detections):
+            self.raw_detections.append((frame_index, detections))
+            self.track_ids.append(np.asarray(track_ids, dtype=np.int32))
+            self.next_track_id = max(self.next_track_id, int(np.max(track_ids)) + 1)
+        visible_mask = detections[:, 4] >= self.confidence_threshold
+        visible = detections[visible_mask]
+        weapons, knives = count_classes(visible, self.names)
+        self.total_weapons += weapons
+        self.total_knives += knives
+        self.frame_objects.append((frame_index, weapons > 0, knives > 0))
+
+        for class_id, track_id in zip(visible[:, 5].astype(int), np.asarray(track_ids)[visible_mask]):
+            if track_id < 0:
+                continue
+            class_name = self.names.get(class_id)
+            if class_name == WEAPON_CLASS:
+                self.weapon_tracks.add(int(track_id))
+            elif class_name == KNIFE_CLASS:
+                self.knife_tracks.add(int(track_id))
+        return visible
+
+    def merge(self, other):
+        """Добавление результатов следующего по порядку участка видео"""
+        self.frame_objects.extend(other.frame_objects)
+        self.raw_detections.extend(other.raw_detections)
+        # Участки нумеруют треки с нуля: номера сдвигаются, чтобы не совпадать.
+        # Объект на границе участков считается дважды
+        offset = self.next_track_id
+        self.track_ids.extend(np.where(ids >= 0, ids + offset, ids) for ids in other.track_ids)
+        self.weapon_tracks.update(track_id + offset for track_id in other.weapon_tracks)
+        self.knife_tracks.update(track_id + offset for track_id in other.knife_tracks)
+        self.next_track_id += other.next_track_id
+        self.tracking = self.tracking or other.tracking
+        self.total_weapons += other.total_weapons
+        self.total_knives += other.total_knives
+        self.inferred_frames += other.inferred_frames
+        self.gated_frames += other.gated_frames
+        self.tracked_frames += other.tracked_frames
+        self.screened_frames += other.screened_frames
+        self.escalated_frames += other.escalated_frames
+        self.tiled_frames += other.tiled_frames
+        self.tiles += other.tiles
+
+    @property
+    def has_weapon_or_knife(self):
+        return self.total_weapons > 0 or self.total_knives > 0
+
+    @property
+    def distinct_weapons(self):
+        """Число различных треков оружия (None без трекера)"""
+        return len(self.weapon_tracks) if self.tracking else None
+
+    @property
+    def distinct_knives(self):
+        """Число различных треков ножей (None без трекера)"""
+        return len(self.knife_tracks) if self.tracking else None
+
+
+def build_detection_log(summary, floor, confidence_threshold=None):
+    """
+    Колоночный лог всех детекций модели для хранения и пересчета с другим порогом.
+
+    Хранятся только кадры с детекциями: по одной строке на рамку в столбцах
+    frame, class_id, confidence и boxes (координаты в пикселях); если
+    использовался трекер, добавляется столбец track_id.
+
+    :param summary: DetectionSummary обработанного видео
+    :param floor: порог уверенности, с которым запускалась модель
+    :param confidence_threshold: порог размеченного видео (по умолчанию порог summary)
+    :return: словарь столбцов для MinioStorage.save_detection_log
+    """
+    if confidence_threshold is None:
+        confidence_threshold = summary.confidence_threshold
+    if summary.raw_detections:
+        rows = np.concatenate([detections for _, detections in summary.raw_detections])
+        frames = np.concatenate([
+            np.full(len(detections), frame_index, dtype=np.int32)
+            for frame_index, detections in summary.raw_detections
+        ])
+    else:
+        rows = EMPTY_DETECTIONS
+        frames = np.empty(0, dtype=np.int32)
+
+    columns = {}
+    if summary.tracking:
+        columns["track_id"] = (
+            np.concatenate(summary.track_ids) if summary.track_ids else np.empty(0, dtype=np.int32)
+        )
+
+    return with_intervals({
+        **columns,
+        "version": DETECTION_LOG_VERSION,
+        "total_frames": len(summary.frame_objects),
+        "floor": float(floor),
+        "confidence_threshold": float(confidence_threshold),
+        "names": json.dumps({str(class_id): name for class_id, name in summary.names.items()}),
+        "frame": frames,
+        "class_id": rows[:, 5].astype(np.int16),
+        "confidence": rows[:, 4].astype(np.float32),
+        # Рамки ограничены кадром, целых пикселей достаточно для отрисовки
+        "boxes": np.clip(np.rint(rows[:, :4]), 0, np.iinfo(np.uint16).max).astype(np.uint16),
+    })
+
+
+def log_names(detection_log):
+    """Словарь {class_id: имя класса} из лога детекций"""
+    return {int(class_id): name for class_id, name in json.loads(detection_log["names"]).items()}
+
+
+def iter_log_detections(detection_log):
+    """
+    Детекции каждого кадра из лога детекций.
+
+    :return: генератор пар (номер кадра, массив детекций в формате
+             extract_detections); кадры без детекций получают пустой массив
+    """
+    frames = np.asarray(detection_log["frame"])
+    rows = np.column_stack([
+        np.asarray(detection_log["boxes"], dtype=np.float32).reshape(-1, 4),
+        np.asarray(detection_log["confidence"], dtype=np.float32),
+        np.asarray(detection_log["class_id"], dtype=np.float32),
+    ])
+    # Строки лога упорядочены по кадрам: границы кадров находятся бинарным поиском
+    bounds = np.searchsorted(frames, np.arange(detection_log["total_frames"] + 1))
+    for frame_index in range(detection_log["total_frames"]):
+        yield frame_index, rows[bounds[frame_index]:bounds[frame_index + 1]]
+
+
+def _class_frames(detection_log, confidence_threshold):
+    """
+    Кадры с оружием и с ножами для порога.
+
+    :return: (маска кадров с оружием, маска кадров с ножами,
+              маска детекций оружия, маска детекций ножей)
+    """
+    names = log_names(detection_log)
+    weapon_ids = [class_id for class_id, name in names.items() if name == WEAPON_CLASS]
+    knife_ids = [class_id for class_id, name in names.items() if name == KNIFE_CLASS]
+
+    frames = np.asarray(detection_log["frame"])
+    class_ids = np.asarray(detection_log["class_id"])
+    visible = np.asarray(detection_log["confidence"]) >= confidence_threshold
+    is_weapon = visible & np.isin(class_ids, weapon_ids)
+    is_knife = visible & np.isin(class_ids, knife_ids)
+
+    weapons = np.zeros(detection_log["total_frames"], dtype=bool)
+    knives = np.zeros(detection_log["total_frames"], dtype=bool)
+    weapons[frames[is_weapon]] = True
+    knives[frames[is_knife]] = True
+    return weapons, knives, is_weapon, is_knife
+
+
+def _runs(weapons, knives):
+    """
+    Интервалы подряд идущих кадров с одинаковым набором классов (RLE).
+
+    :return: (первые кадры, последние кадры, классы интервалов) - только
+             для интервалов, где есть оружие или нож
+    """
+    codes = weapons.astype(np.uint8) * INTERVAL_WEAPON + knives.astype(np.uint8) * INTERVAL_KNIFE
+    changes = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.concatenate([[0], changes]) if len(codes) else changes
+    ends = np.concatenate([changes, [len(codes)]]) - 1
+    detected = codes[starts] > 0
+    return starts[detected].astype(np.int32), ends[detected].astype(np.int32), codes[starts[detected]]
+
+
+def with_intervals(detection_log, confidence_threshold=None):
+    """
+    Лог детекций с интервалами детекций для порога.
+
+    Интервалы вычисляются один раз при сохранении лога и хранятся в нем
+    (столбцы interval_*), поэтому для страницы результата не нужно
+    разворачивать лог в покадровые записи.
+
+    :param confidence_threshold: порог размеченного видео (по умолчанию порог лога)
+    :return: новый словарь столбцов лога
+    """
+    if confidence_threshold is None:
+        confidence_threshold = detection_log["confidence_threshold"]
+    weapons, knives, is_weapon, is_knife = _class_frames(detection_log, confidence_threshold)
+    starts, ends, classes = _runs(weapons, knives)
+
+    # Максимальная уверенность детекций оружия и ножей в каждом кадре;
+    # кадры между интервалами таких детекций не содержат
+    relevant = is_weapon | is_knife
+    frame_confidence = np.zeros(detection_log["total_frames"], dtype=np.float32)
+    np.maximum.at(
+        frame_confidence,
+        np.asarray(detection_log["frame"])[relevant],
+        np.asarray(detection_log["confidence"])[relevant],
+    )
+    confidence = (
+        np.maximum.reduceat(frame_confidence, starts) if len(starts) else np.empty(0, dtype=np.float32)
+    )
+
+    return {
+        **detection_log,
+        "confidence_threshold": float(confidence_threshold),
+        "interval_start": starts,
+        "interval_end": ends,
+        "interval_classes": classes,
+        "interval_confidence": confidence,
+    }
+
+
+def _interval_records(starts, ends, classes, confidence=None):
+    return [
+        {
+            "start_frame": int(start),
+            "end_frame": int(end),
+            "classes": [
+                name for flag, name in ((INTERVAL_WEAPON, WEAPON_CLASS), (INTERVAL_KNIFE, KNIFE_CLASS))
+                if int(interval_classes) & flag
+            ],
+            "max_confidence": round(float(confidence[i]), 4) if confidence is not None else None,
+        }
+        for i, (start, end, interval_classes) in enumerate(zip(starts, ends, classes))
+    ]
+
+
+def log_intervals(detection_log):
+    """
+    Интервалы детекций из лога: подряд идущие кадры с одинаковым набором классов.
+
+    :return: список {start_frame, end_frame (включительно), classes, max_confidence}
+    """
+    if "interval_start" not in detection_log:
+        detection_log = with_intervals(detection_log)
+    return _interval_records(
+        detection_log["interval_start"],
+        detection_log["interval_end"],
+        detection_log["interval_classes"],
+        detection_log["interval_confidence"],
+    )
+
+
+def frame_object_intervals(frame_objects):
+    """
+    Интервалы детекций из frame_objects прежнего JSON-лога.
+
+    Уверенность в таком логе не хранится, поэтому max_confidence равна None.
+    """
+    weapons = np.array([bool(has_weapon) for _, has_weapon, _ in frame_objects], dtype=bool)
+    knives = np.array([bool(has_knife) for _, _, has_knife in frame_objects], dtype=bool)
+    starts, ends, classes = _runs(weapons, knives)
+    frame_indices = [frame_object[0] for frame_object in frame_objects]
+    return _interval_records(
+        [frame_indices[start] for start in starts],
+        [frame_indices[end] for end in ends],
+        classes,
+    )
+
+
+def log_boxes(detection_log, confidence_threshold=None):
+    """
+    Рамки детекций не ниже порога для разметки исходного видео на клиенте.
+
+    :param confidence_threshold: порог (по умолчанию порог размеченного видео)
+    :return: список [номер кадра, class_id, уверенность, x1, y1, x2, y2]
+             в порядке кадров
+    """
+    if confidence_threshold is None:
+        confidence_threshold = detection_log["confidence_threshold"]
+    visible = np.asarray(detection_log["confidence"]) >= confidence_threshold
+    frames = np.asarray(detection_log["frame"])[visible].tolist()
+    class_ids = np.asarray(detection_log["class_id"])[visible].tolist()
+    confidence = np.round(np.asarray(detection_log["confidence"], dtype=np.float64)[visible], 4).tolist()
+    boxes = np.asarray(detection_log["boxes"]).reshape(-1, 4)[visible].tolist()
+    return [
+        [frame, class_id, frame_confidence, *box]
+        for frame, class_id, frame_confidence, box in zip(frames, class_ids, confidence, boxes)
+    ]
+
+
+def log_frame_objects(detection_log, confidence_threshold=None):
+    """
+    frame_objects в прежнем формате JSON-лога: (номер кадра, оружие, нож) для каждого кадра.
+
+    :param confidence_threshold: порог (по умолчанию порог размеченного видео)
+    """
+    if confidence_threshold is None:
+        confidence_threshold = detection_log["confidence_threshold"]
+    weapons, knives, _, _ = _class_frames(detection_log, confidence_threshold)
+    return list(zip(range(len(weapons)), weapons.tolist(), knives.tolist()))
+
+
+def rethreshold(detection_log, confidence_threshold):
+    """
+    Пересчет результата детекции для другого порога без запуска модели.
+
+    Вычисляется по столбцам лога без перебора кадров; raw_detections
+    результата не заполняются (детекции остаются в логе).
+
+    :param detection_log: лог детекций (см. build_detection_log)
+    :param confidence_threshold: новый порог, не ниже порога лога
+    :return: DetectionSummary с frame_objects для нового порога
+    """
+    if confidence_threshold < detection_log["floor"]:
+        raise ValueError(
+            f"Порог {confidence_threshold} ниже порога сохраненных детекций {detection_log['floor']}"
+        )
+
+    summary = DetectionSummary(log_names(detection_log), confidence_threshold)
+    weapons, knives, is_weapon, is_knife = _class_frames(detection_log, confidence_threshold)
+    summary.frame_objects = list(zip(range(len(weapons)), weapons.tolist(), knives.tolist()))
+    summary.total_weapons = int(is_weapon.sum())
+    summary.total_knives = int(is_knife.sum())
+    return summary
@@ -0,0 +1,183 @@
+import os
+import shutil
+import logging
+import subprocess
+
+
+logger = logging.getLogger(__name__)
+
+
+H264_PRESET = os.environ.get("H264_PRESET", "veryfast")
+H264_CRF = os.environ.get("H264_CRF", "23")
+
+
+def get_ffmpeg_binary():
+    """
+    Поиск исполняемого файла ffmpeg.
+
+    Порядок: переменная окружения FFMPEG_BINARY, бинарник из imageio-ffmpeg
+    (устанавливается вместе с moviepy), ffmpeg из PATH.
+    """
+    binary = os.environ.get("FFMPEG_BINARY")
+    if binary:
+        return binary
+
+    try:
+        import imageio_ffmpeg
+
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        pass
+
+    binary = shutil.which("ffmpeg")
+    if binary is None:
+        raise FileNotFoundError("Не найден исполняемый файл ffmpeg")
+    return binary
+
+
+class VideoEncoder:
+    """
+    Кодирование кадров в H.264 MP4 за один проход.
+
+    Кадры BGR передаются в stdin подпроцесса ffmpeg без промежуточных
+    файлов; звуковая дорожка (если есть) копируется из исходного видео.
+    """
+
+    def __init__(self, output_path, fps, width=None, height=None, audio_source=None):
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.audio_source = audio_source
+        self.frames_written = 0
+        self.process = None
+
+    def _build_command(self):
+        command = [
+            get_ffmpeg_binary(),
+            "-y",
+            "-loglevel", "error",
+            "-f", "rawvideo",
+            "-pix_fmt", "bgr24",
+            "-s", f"{self.width}x{self.height}",
+            "-r", str(self.fps),
+            "-i", "-",
+        ]
+        if self.audio_source:
+            command += ["-i", self.audio_source, "-map", "0:v:0", "-map", "1:a:0?",
+                        "-c:a", "aac", "-shortest"]
+        command += [
+            "-c:v", "libx264",
+            "-preset", H264_PRESET,
+            "-crf", str(H264_CRF),
+            # yuv420p требует четных размеров кадра
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            self.output_path,
+        ]
+        return command
+
+    def open(self):
+        """Запуск подпроцесса ffmpeg"""
+        command = self._build_command()
+        logger.info(f"Запуск кодировщика H.264: {self.output_path}")
+        logger.debug(f"Команда ffmpeg: {' '.join(command)}")
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        return self
+
+    def write(self, frame):
+        """Передача одного кадра BGR кодировщику"""
+        if self.process is None:
+            # Размер кадра берется из первого кадра, если не задан явно
+            if self.width is None or self.height is None:
+                self.height, self.width = frame.shape[:2]
+            self.open()
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except BrokenPipeError:
+            error = self.process.stderr.read().decode("utf-8", errors="replace")
+            raise RuntimeError(f"ffmpeg завершился с ошибкой: {error}")
+        self.frames_written += 1
+
+    def close(self):
+        """Завершение кодирования и ожидание записи файла"""
+        if self.process is None:
+            return
+        self.process.stdin.close()
+        error = self.process.stderr.read().decode("utf-8", errors="replace")
+        return_code = self.process.wait()
+        self.process = None
+        if return_code != 0:
+            raise RuntimeError(f"ffmpeg завершился с кодом {return_code}: {error}")
+        logger.info(f"Кодирование завершено: {self.frames_written} кадров -> {self.output_path}")
+
+    def abort(self):
+        """Аварийная остановка кодировщика без ожидания результата"""
+        if self.process is None:
+            return
+        self.process.kill()
+        self.process.wait()
+        self.process = None
+
+    def __enter__(self):
+        # Подпроцесс запускается при записи первого кадра
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def concat_segments(segment_paths, output_path, audio_source=None):
+    """
+    Склейка MP4-сегментов без перекодирования видео.
+
+    Сегменты закодированы VideoEncoder с одинаковыми параметрами и каждый
+    начинается с ключевого кадра, поэтому видеопоток копируется как есть.
+    Звуковая дорожка берется целиком из исходного видео.
+
+    :param segment_paths: пути к сегментам в порядке воспроизведения
+    :param output_path: путь к итоговому MP4
+    :param audio_source: исходное видео для копирования звука
+    """
+    list_path = f"{os.path.splitext(output_path)[0]}-segments.txt"
+    with open(list_path, "w") as segment_list:
+        for path in segment_paths:
+            # Экранирование кавычек по правилам concat-демультиплексора ffmpeg
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            segment_list.write(f"file '{escaped}'\n")
+
+    command = [
+        get_ffmpeg_binary(),
+        "-y",
+        "-loglevel", "error",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", list_path,
+    ]
+    if audio_source:
+        command += ["-i", audio_source, "-map", "0:v:0", "-map", "1:a:0?",
+                    "-c:a", "aac", "-shortest"]
+    command += [
+        "-c:v", "copy",
+        "-movflags", "+faststart",
+        output_path,
+    ]
+
+    logger.info(f"Склейка {len(segment_paths)} сегментов: {output_path}")
+    try:
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        error = result.stderr.decode("utf-8", errors="replace")
+        raise RuntimeError(f"ffmpeg завершился с кодом {result.returncode}: {error}")
@@ -0,0 +1,75 @@
+import os
+import cv2
+
+
+# Доля изменившихся пикселей, начиная с которой кадр передается модели;
+# 0 отключает фильтр
+MOTION_THRESHOLD = float(os.environ.get("MOTION_THRESHOLD", "0"))
+# Изменение яркости пикселя, которое считается движением (0-255)
+MOTION_PIXEL_THRESHOLD = int(os.environ.get("MOTION_PIXEL_THRESHOLD", "25"))
+# Максимальное число подряд пропущенных кадров, после которого модель
+# запускается принудительно (защита от медленных изменений сцены)
+MOTION_MAX_GATED = int(os.environ.get("MOTION_MAX_GATED", "250"))
+# Ширина уменьшенного кадра для сравнения
+MOTION_FRAME_WIDTH = 160
+
+
+class MotionGate:
+    """
+    Фильтр кадров без изменений сцены.
+
+    Кадр сравнивается с последним кадром, переданным модели: уменьшенные
+    размытые полутоновые кадры вычитаются, и если доля изменившихся
+    пикселей меньше threshold, детекция для кадра не запускается.
+    """
+
+    def __init__(self, threshold=None, pixel_threshold=None, max_gated=None, frame_width=MOTION_FRAME_WIDTH):
+        self.threshold = MOTION_THRESHOLD if threshold is None else threshold
+        self.pixel_threshold = MOTION_PIXEL_THRESHOLD if pixel_threshold is None else pixel_threshold
+        self.max_gated = MOTION_MAX_GATED if max_gated is None else max_gated
+        self.frame_width = frame_width
+        self.reference = None
+        self.gated_in_row = 0
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        scale = self.frame_width / width
+        small = cv2.resize(
+            frame, (self.frame_width, max(int(height * scale), 1)), interpolation=cv2.INTER_AREA
+        )
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        # Размытие подавляет шум матрицы и артефакты сжатия
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def changed_ratio(self, prepared):
+        """Доля пикселей, изменившихся относительно опорного кадра"""
+        diff = cv2.absdiff(prepared, self.reference)
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) / mask.size
+
+    def should_infer(self, frame):
+        """
+        Нужно ли запускать модель для кадра.
+
+        :param frame: кадр BGR
+        :return: True, если сцена изменилась или фильтр отключен
+        """
+        if not self.enabled:
+            return True
+
+        prepared = self._prepare(frame)
+        if (
+            self.reference is None
+            or self.gated_in_row >= self.max_gated
+            or self.changed_ratio(prepared) >= self.threshold
+        ):
+            self.reference = prepared
+            self.gated_in_row = 0
+            return True
+
+        self.gated_in_row += 1
+        return False
@@ -0,0 +1,299 @@
+import os
+import logging
+import threading
+import subprocess
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app.models import inference_process, model
+from app.services.video_processing.detections import DetectionSummary
+from app.services.video_processing.encoder import concat_segments, get_ffmpeg_binary
+
+
+logger = logging.getLogger(__name__)
+
+
+# Число процессов, параллельно обрабатывающих участки одного видео
+SEGMENT_WORKERS = int(os.environ.get("SEGMENT_WORKERS", str(max((os.cpu_count() or 1) // 2, 1))))
+# Минимальная длина участка в кадрах: более короткие видео не делятся
+SEGMENT_MIN_FRAMES = int(os.environ.get("SEGMENT_MIN_FRAMES", "250"))
+# Способ запуска процессов: spawn не наследует потоки и блокировки
+# родительского процесса (heartbeat обработчика очереди, пул потоков torch)
+SEGMENT_START_METHOD = os.environ.get("SEGMENT_START_METHOD", "spawn")
+
+_pool = None
+# (число процессов, бэкенд модели) текущего пула
+_pool_key = None
+# Число задач, обрабатывающих участки в текущем пуле; пул заменяется
+# только когда он не используется
+_pool_users = 0
+_pool_lock = threading.Condition()
+
+
+def keyframe_index(filename):
+    """
+    Число кадров видео и ключевые кадры в порядке показа.
+
+    Пакеты видеопотока читаются ffmpeg без декодирования (-c copy, формат
+    framecrc: у пакета ключевого кадра нет поля F= или в нем выставлен
+    бит 0x1). Номер кадра - позиция пакета после сортировки по pts,
+    поэтому B-кадры и переменная частота кадров учитываются.
+
+    :return: (число кадров, список (номер кадра, время от начала видео в секундах))
+             или None, если пакеты прочитать не удалось
+    """
+    command = [
+        get_ffmpeg_binary(), "-loglevel", "error",
+        "-i", filename,
+        "-map", "0:v:0", "-c", "copy",
+        "-f", "framecrc", "-",
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        logger.warning(f"Не удалось запустить ffmpeg для поиска ключевых кадров: {e}")
+        return None
+    if result.returncode != 0:
+        error = result.stderr.decode("utf-8", errors="replace")
+        logger.warning(f"Не удалось прочитать пакеты видео {filename}: {error}")
+        return None
+
+    time_base = None
+    packets = []
+    try:
+        for line in result.stdout.decode("utf-8", errors="replace").splitlines():
+            if line.startswith("#tb 0:"):
+                numerator, denominator = line.split(":", 1)[1].strip().split("/")
+                time_base = int(numerator) / int(denominator)
+            elif line and not line.startswith("#"):
+                # поток, dts, pts, длительность, размер, crc[, F=флаги]
+                fields = [field.strip() for field in line.split(",")]
+                flags = int(fields[6].split("=", 1)[1], 16) if len(fields) > 6 else 0x1
+                packets.append((int(fields[2]), bool(flags & 0x1)))
+    except (ValueError, IndexError) as e:
+        logger.warning(f"Неожиданный формат пакетов видео {filename}: {e}")
+        return None
+    if time_base is None or not packets:
+        return None
+
+    packets.sort()
+    start = packets[0][0]
+    keyframes = [
+        (frame, (pts - start) * time_base)
+        for frame, (pts, keyframe) in enumerate(packets)
+        if keyframe
+    ]
+    return len(packets), keyframes
+
+
+def seekable_keyframes(keyframes, fps):
+    """
+    Ключевые кадры, с которых участок читается точно.
+
+    Декодеры переходят к кадру по времени номер / fps (CAP_PROP_POS_FRAMES,
+    ffmpeg -ss). Переход точен, если по этому времени находится ключевой
+    кадр: декодирование начинается с него, и кадры на границе участков
+    не теряются и не повторяются. При переменной частоте кадров время
+    кадра может не совпадать с номер / fps, такие кадры пропускаются.
+
+    :param keyframes: список (номер кадра, время в секундах) из keyframe_index
+    :return: номера ключевых кадров
+    """
+    return [frame for frame, time in keyframes if abs(time * fps - frame) < 0.5]
+
+
+def plan_segments(total_frames, workers, min_frames=SEGMENT_MIN_FRAMES, keyframes=None):
+    """
+    Разбиение видео на непрерывные участки кадров.
+
+    :param total_frames: число кадров видео
+    :param workers: число процессов-обработчиков
+    :param min_frames: минимальная длина участка
+    :param keyframes: номера кадров, с которых может начинаться участок;
+                      границы переносятся на ближайший из них (None - без ограничений)
+    :return: список диапазонов (первый кадр, кадр после последнего)
+    """
+    if total_frames <= 0:
+        return [(0, None)]
+
+    count = max(min(workers, total_frames // max(min_frames, 1)), 1)
+    bounds = [total_frames * i // count for i in range(count + 1)]
+    if keyframes is not None:
+        candidates = [frame for frame in keyframes if 0 < frame < total_frames]
+        inner = {min(candidates, key=lambda frame: abs(frame - bound)) for bound in bounds[1:-1]} if candidates else set()
+        bounds = [0] + sorted(inner) + [total_frames]
+    segments = list(zip(bounds[:-1], bounds[1:]))
+    # Счетчик кадров контейнера бывает неточным: последний участок
+    # читается до конца файла
+    segments[-1] = (segments[-1][0], None)
+    return segments
+
+
+def _init_worker(threads, backend):
+    """
+    Инициализация процесса пула: модель загружается и прогревается один раз.
+
+    :param backend: бэкенд модели, выбранный в родительском процессе; в режиме
+                    auto процессы иначе выбирали бы бэкенд каждый сам
+                    (одновременный экспорт весов, разные бэкенды у участков)
+    """
+    import torch
+
+    # Процессы делят ядра между собой, иначе потоки torch конкурируют
+    torch.set_num_threads(threads)
+    # Процесс пула сам выполняет модель и не запускает процесс инференса
+    inference_process.MODEL_PROCESS_ENABLED = False
+    model.model_backend = backend
+    model.warm_up()
+
+
+def _process_segment(filename, output_path, confidence_threshold, fps, start_frame, end_frame, options,
+                     audio=False):
+    from app.services.video_processing import video_processing
+
+    return video_processing.run_single_pass(
+        filename,
+        output_path,
+        confidence_threshold,
+        fps,
+        start_frame=start_frame,
+        end_frame=end_frame,
+        audio=audio,
+        **options,
+    )
+
+
+def _create_pool(workers, backend):
+    threads = max((os.cpu_count() or 1) // workers, 1)
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(SEGMENT_START_METHOD),
+        initializer=_init_worker,
+        initargs=(threads, backend),
+    )
+    logger.info(
+        f"Создан пул обработки участков видео: {workers} процессов по {threads} потоков torch, бэкенд {backend}"
+    )
+    return pool
+
+
+@contextmanager
+def use_pool(workers, backend):
+    """
+    Пул процессов для обработки участков на время обработки одного видео.
+
+    Пул создается один раз и переиспользуется между видео, поэтому
+    модель загружается один раз на процесс, а не на каждую задачу.
+    Задачи в соседних потоках (JOB_CONCURRENCY) используют один пул;
+    если задаче нужен пул другого размера, она ждет, пока текущий пул
+    освободится, и только затем заменяет его.
+
+    :param workers: число процессов
+    :param backend: бэкенд модели процессов пула
+    """
+    global _pool, _pool_key, _pool_users
+    key = (workers, backend)
+    with _pool_lock:
+        while _pool is not None and _pool_key != key and _pool_users:
+            _pool_lock.wait()
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = _create_pool(workers, backend)
+            _pool_key = key
+        _pool_users += 1
+        pool = _pool
+    try:
+        yield pool
+    finally:
+        with _pool_lock:
+            _pool_users -= 1
+            _pool_lock.notify_all()
+
+
+def run_segmented(filename, output_path, confidence_threshold, fps, total_frames, work_dir,
+                  workers=None, progress_callback=None, **options):
+    """
+    Параллельная обработка участков видео в пуле процессов.
+
+    Каждый участок проходит однопроходный конвейер в отдельном процессе
+    и кодируется в свой MP4; затем сегменты склеиваются без перекодирования,
+    а звук копируется из исходного видео. Если output_path равен None,
+    участки только детектируются, видео не создается. Номера кадров в frame_objects
+    глобальные, так как каждый участок нумерует кадры со своего начала.
+
+    Участки начинаются с ключевых кадров (seekable_keyframes). Если число
+    кадров участков не совпало с ожидаемым (кадры на границе потеряны
+    или повторены), видео обрабатывается заново одним участком.
+
+    :param work_dir: директория задачи для временных сегментов
+    :param workers: число процессов (по умолчанию SEGMENT_WORKERS)
+    :param progress_callback: функция, вызываемая с числом обработанных кадров
+    :param options: параметры run_single_pass (batch_size, stride, ...)
+    :return: DetectionSummary
+    """
+    workers = max(int(workers or SEGMENT_WORKERS), 1)
+    index = keyframe_index(filename)
+    if index is None:
+        # Без ключевых кадров граница участка может попасть между ними
+        logger.warning(f"Ключевые кадры видео {filename} не определены, видео обрабатывается одним участком")
+        keyframes = []
+    else:
+        # Число пакетов точнее счетчика кадров контейнера
+        total_frames, keyframes = index[0], seekable_keyframes(index[1], fps)
+    segments = plan_segments(total_frames, workers, SEGMENT_MIN_FRAMES, keyframes)
+    logger.info(f"Видео разбито на {len(segments)} участков: {segments}")
+
+    # Бэкенд модели выбирается один раз в этом процессе (в обработчике
+    # очереди модель уже прогрета) и передается процессам пула
+    with use_pool(workers, model.backend) as pool:
+        segment_paths = [
+            os.path.join(work_dir, f"segment_{i:03d}.mp4") if output_path is not None else None
+            for i in range(len(segments))
+        ]
+        futures = {
+            pool.submit(
+                _process_segment, filename, path, confidence_threshold, fps, start, end, options
+            ): i
+            for i, (path, (start, end)) in enumerate(zip(segment_paths, segments))
+        }
+
+        results = [None] * len(segments)
+        frames_done = 0
+        try:
+            for future in as_completed(futures):
+                segment_summary = future.result()
+                results[futures[future]] = segment_summary
+                frames_done += len(segment_summary.frame_objects)
+                if progress_callback:
+                    progress_callback(frames_done)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+        counts = [len(segment_summary.frame_objects) for segment_summary in results]
+        expected = [end - start for start, end in segments[:-1]]
+        if len(segments) > 1 and (counts[:-1] != expected or sum(counts) != total_frames):
+            logger.warning(
+                f"Число кадров участков {counts} не совпадает с ожидаемым (участки {segments}, "
+                f"всего кадров {total_frames}), видео обрабатывается одним участком"
+            )
+            return pool.submit(
+                _process_segment, filename, output_path, confidence_threshold, fps, 0, None, options, True
+            ).result()
+
+    summary = DetectionSummary(results[0].names)
+    for segment_summary in results:
+        summary.merge(segment_summary)
+
+    if output_path is None:
+        return summary
+
+    concat_segments(
+        [path for path, result in zip(segment_paths, results) if result.frame_objects],
+        output_path,
+        audio_source=filename,
+    )
+    return summary
@@ -0,0 +1,151 @@
+import queue
+import threading
+
+
+# Сигнал окончания потока данных между стадиями
+_END = object()
+# Период проверки флага остановки при ожидании места в очереди
+_POLL_TIMEOUT = 0.1
+
+
+class StageError(RuntimeError):
+    """Ошибка в фоновой стадии конвейера"""
+
+
+class _Stage:
+    """Фоновый поток с ограниченной очередью и передачей исключений"""
+
+    def __init__(self, maxsize, name):
+        self.queue = queue.Queue(maxsize=max(int(maxsize), 1))
+        self.error = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run_safe, name=name, daemon=True)
+
+    def _run(self):
+        raise NotImplementedError
+
+    def _run_safe(self):
+        try:
+            self._run()
+        except BaseException as e:
+            self.error = e
+            self._stopped.set()
+
+    def _put(self, item):
+        """Помещение в очередь с ожиданием места; False, если стадия остановлена"""
+        while not self._stopped.is_set():
+            try:
+                self.queue.put(item, timeout=_POLL_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise StageError(f"Ошибка в стадии {self._thread.name}: {self.error}") from self.error
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Остановка стадии без ожидания обработки оставшихся элементов"""
+        self._stopped.set()
+        self._thread.join()
+
+
+class Prefetcher(_Stage):
+    """
+    Чтение элементов итератора в фоновом потоке.
+
+    Поток опережает потребителя не более чем на maxsize элементов:
+    при заполненной очереди он ждет, пока потребитель не заберет данные.
+    """
+
+    def __init__(self, iterable, maxsize, name="prefetch"):
+        super().__init__(maxsize, name)
+        self.iterable = iterable
+
+    def _run(self):
+        try:
+            for item in self.iterable:
+                if not self._put(item):
+                    return
+        except Exception as e:
+            # Ошибка сохраняется до отправки сигнала окончания,
+            # чтобы потребитель гарантированно ее получил
+            self.error = e
+        finally:
+            close = getattr(self.iterable, "close", None)
+            if close:
+                close()
+            self._put(_END)
+
+    def __iter__(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=_POLL_TIMEOUT)
+            except queue.Empty:
+                if not self._thread.is_alive() and self.queue.empty():
+                    self._raise_error()
+                    return
+                continue
+            if item is _END:
+                self._raise_error()
+                return
+            yield item
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+        return False
+
+
+class BackgroundWorker(_Stage):
+    """
+    Обработка элементов функцией handler в фоновом потоке.
+
+    put блокируется, если в очереди уже maxsize необработанных элементов,
+    поэтому медленная стадия сдерживает предыдущие (backpressure).
+    """
+
+    def __init__(self, handler, maxsize, name="worker"):
+        super().__init__(maxsize, name)
+        self.handler = handler
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=_POLL_TIMEOUT)
+            except queue.Empty:
+                if self._stopped.is_set():
+                    return
+                continue
+            if item is _END:
+                return
+            self.handler(item)
+
+    def put(self, item):
+        """Передача элемента на обработку; ошибка стадии пробрасывается вызывающему"""
+        if not self._put(item):
+            self._raise_error()
+            raise StageError(f"Стадия {self._thread.name} остановлена")
+
+    def finish(self):
+        """Ожидание обработки всех переданных элементов"""
+        self._put(_END)
+        self._thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.stop()
+        return False
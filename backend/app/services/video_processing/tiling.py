@@ -0,0 +1,236 @@
+import os
+
+import cv2
+import numpy as np
+
+from app.models import model
+from app.services.video_processing.detections import EMPTY_DETECTIONS
+from app.services.video_processing.motion import MOTION_PIXEL_THRESHOLD
+
+
+# Дополнительная детекция на участках кадра исходного разрешения
+TILED_INFERENCE_ENABLED = os.environ.get("TILED_INFERENCE", "false").lower() == "true"
+# Сторона участка в пикселях исходного кадра; по умолчанию INFERENCE_IMGSZ,
+# чтобы участок передавался модели без уменьшения
+TILE_SIZE = int(os.environ.get("TILE_SIZE", "0"))
+# Доля перекрытия соседних участков: объект на границе целиком
+# попадает хотя бы в один участок
+TILE_OVERLAP = float(os.environ.get("TILE_OVERLAP", "0.2"))
+# Наибольшее число участков на кадр (ограничивает рост стоимости детекции)
+TILE_MAX_PER_FRAME = int(os.environ.get("TILE_MAX_PER_FRAME", "4"))
+# Детекции полного кадра с уверенностью ниже этой проверяются на участке
+TILE_LOW_CONFIDENCE = float(os.environ.get("TILE_LOW_CONFIDENCE", "0.5"))
+# Доля изменившихся пикселей участка, начиная с которой он проверяется
+TILE_MOTION_THRESHOLD = float(os.environ.get("TILE_MOTION_THRESHOLD", "0.02"))
+# Доля площади меньшей рамки в пересечении, начиная с которой рамки
+# одного класса считаются одним объектом при объединении
+TILE_MERGE_THRESHOLD = float(os.environ.get("TILE_MERGE_THRESHOLD", "0.5"))
+# Ширина уменьшенного кадра для поиска движения
+TILE_MOTION_WIDTH = 320
+
+
+def tile_grid(width, height, tile_size, overlap):
+    """
+    Участки кадра с перекрытием, покрывающие его целиком.
+
+    :return: массив (N, 4) целочисленных координат x1, y1, x2, y2
+    """
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        step = max(int(tile_size * (1 - overlap)), 1)
+        positions = list(range(0, length - tile_size, step))
+        # Последний участок прижимается к краю кадра
+        return positions + [length - tile_size]
+
+    return np.array(
+        [
+            [x, y, min(x + tile_size, width), min(y + tile_size, height)]
+            for y in starts(height)
+            for x in starts(width)
+        ],
+        dtype=np.int32,
+    )
+
+
+def box_overlap(boxes, other_boxes):
+    """
+    Попарная доля площади меньшей рамки, попавшая в пересечение.
+
+    В отличие от IoU, обрезанная границей участка рамка сливается
+    с полной рамкой того же объекта.
+
+    :return: матрица (N, M)
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 1, 4)
+    other_boxes = np.asarray(other_boxes, dtype=np.float32).reshape(1, -1, 4)
+    x1 = np.maximum(boxes[..., 0], other_boxes[..., 0])
+    y1 = np.maximum(boxes[..., 1], other_boxes[..., 1])
+    x2 = np.minimum(boxes[..., 2], other_boxes[..., 2])
+    y2 = np.minimum(boxes[..., 3], other_boxes[..., 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    areas = (boxes[..., 2] - boxes[..., 0]) * (boxes[..., 3] - boxes[..., 1])
+    other_areas = (other_boxes[..., 2] - other_boxes[..., 0]) * (other_boxes[..., 3] - other_boxes[..., 1])
+    return intersection / np.maximum(np.minimum(areas, other_areas), 1e-9)
+
+
+def merge_detections(detections, threshold=None):
+    """
+    Объединение детекций полного кадра и участков (NMS по классам).
+
+    Рамки перебираются по убыванию уверенности; рамка отбрасывается,
+    если она пересекается с уже оставленной рамкой того же класса
+    не меньше чем на threshold (см. box_overlap).
+
+    :param detections: массив (N, 6) детекций в координатах кадра
+    :return: оставленные детекции по убыванию уверенности
+    """
+    threshold = TILE_MERGE_THRESHOLD if threshold is None else threshold
+    if len(detections) < 2:
+        return detections
+    detections = detections[np.argsort(-detections[:, 4], kind="stable")]
+    overlap = box_overlap(detections[:, :4], detections[:, :4])
+    same_class = detections[:, 5][:, None] == detections[:, 5][None, :]
+    suppressed = np.zeros(len(detections), dtype=bool)
+    for i in range(len(detections)):
+        if suppressed[i]:
+            continue
+        duplicates = same_class[i] & (overlap[i] >= threshold)
+        duplicates[:i + 1] = False
+        suppressed |= duplicates
+    return detections[~suppressed]
+
+
+class TiledInference:
+    """
+    Адаптивная детекция на участках кадра исходного разрешения.
+
+    Полный кадр уменьшается до входа модели, и мелкие объекты (нож вдали
+    на кадре 4K) становятся неразличимы. Проверять участки каждого кадра
+    дорого, поэтому модель получает только участки, где что-то есть:
+
+    - участки с детекциями полного кадра ниже low_confidence (модель
+      сомневается, на исходном разрешении объект виден лучше);
+    - участки, где с предыдущего кадра изменилось не меньше
+      motion_threshold пикселей.
+
+    На кадр проверяется не больше max_tiles участков (сначала участки
+    с детекциями, затем с наибольшим движением), поэтому стоимость
+    ограничена max_tiles дополнительными проходами модели на кадр.
+    Детекции участков переводятся в координаты кадра и объединяются
+    с детекциями полного кадра (merge_detections).
+
+    Объект хранит кадр для сравнения движения, поэтому создается
+    на каждый обрабатываемый участок видео.
+    """
+
+    def __init__(self, enabled=None, tile_size=None, overlap=None, max_tiles=None,
+                 low_confidence=None, motion_threshold=None, merge_threshold=None):
+        self.enabled = TILED_INFERENCE_ENABLED if enabled is None else enabled
+        self.tile_size = tile_size or TILE_SIZE or model.INFERENCE_IMGSZ
+        self.overlap = TILE_OVERLAP if overlap is None else overlap
+        self.max_tiles = TILE_MAX_PER_FRAME if max_tiles is None else max_tiles
+        self.low_confidence = TILE_LOW_CONFIDENCE if low_confidence is None else low_confidence
+        self.motion_threshold = TILE_MOTION_THRESHOLD if motion_threshold is None else motion_threshold
+        self.merge_threshold = TILE_MERGE_THRESHOLD if merge_threshold is None else merge_threshold
+        self.reference = None
+        self._grid = None
+        self._grid_shape = None
+
+    def grid(self, frame):
+        """Участки кадра (сетка вычисляется один раз для размера кадра)"""
+        height, width = frame.shape[:2]
+        if self._grid_shape != (width, height):
+            self._grid = tile_grid(width, height, self.tile_size, self.overlap)
+            self._grid_shape = (width, height)
+        return self._grid
+
+    def _motion_mask(self, frame):
+        """Маска изменившихся пикселей уменьшенного кадра (None для первого кадра)"""
+        height, width = frame.shape[:2]
+        small = cv2.resize(
+            frame, (TILE_MOTION_WIDTH, max(int(height * TILE_MOTION_WIDTH / width), 1)),
+            interpolation=cv2.INTER_AREA,
+        )
+        prepared = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        reference, self.reference = self.reference, prepared
+        if reference is None or reference.shape != prepared.shape:
+            return None
+        return cv2.absdiff(prepared, reference) > MOTION_PIXEL_THRESHOLD
+
+    def select(self, frame, detections):
+        """
+        Участки кадра для дополнительной детекции
+
+        :param detections: детекции полного кадра в координатах кадра
+        :return: массив (K, 4) участков, K <= max_tiles
+        """
+        grid = self.grid(frame)
+        # Кадр целиком помещается в один участок: уменьшения не было
+        if len(grid) < 2 or self.max_tiles <= 0:
+            return grid[:0]
+
+        scores = np.zeros(len(grid), dtype=np.float32)
+        uncertain = detections[detections[:, 4] < self.low_confidence]
+        if len(uncertain):
+            centers_x = (uncertain[:, 0] + uncertain[:, 2]) / 2
+            centers_y = (uncertain[:, 1] + uncertain[:, 3]) / 2
+            inside = (
+                (centers_x[None, :] >= grid[:, 0:1]) & (centers_x[None, :] < grid[:, 2:3])
+                & (centers_y[None, :] >= grid[:, 1:2]) & (centers_y[None, :] < grid[:, 3:4])
+            )
+            # Участки с детекциями проверяются раньше участков с движением
+            scores[inside.any(axis=1)] = 2.0
+
+        mask = self._motion_mask(frame)
+        if mask is not None and self.motion_threshold > 0:
+            scale = mask.shape[1] / frame.shape[1]
+            for i, (x1, y1, x2, y2) in enumerate((grid * scale).astype(np.int32)):
+                region = mask[y1:max(y2, y1 + 1), x1:max(x2, x1 + 1)]
+                ratio = float(region.mean()) if region.size else 0.0
+                if ratio >= self.motion_threshold:
+                    scores[i] = max(scores[i], ratio)
+
+        candidates = np.flatnonzero(scores > 0)
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return grid[order[:self.max_tiles]]
+
+    def refine(self, frames, detections, predict, batch_size=None):
+        """
+        Дополнение детекций пакета кадров детекциями участков.
+
+        Участки всех кадров пакета передаются модели пакетами
+        по batch_size (по умолчанию - по числу кадров пакета).
+
+        :param detections: детекции полных кадров в координатах кадров
+        :param predict: функция (список участков) -> детекции в координатах участков
+        :return: (детекции кадров, число кадров с участками, число участков)
+        """
+        crops = []
+        owners = []
+        for index, (frame, frame_detections) in enumerate(zip(frames, detections)):
+            for x1, y1, x2, y2 in self.select(frame, frame_detections):
+                crops.append(frame[y1:y2, x1:x2])
+                owners.append((index, x1, y1))
+        if not crops:
+            return detections, 0, 0
+
+        batch_size = max(int(batch_size or len(frames)), 1)
+        tile_detections = []
+        for start in range(0, len(crops), batch_size):
+            tile_detections.extend(predict(crops[start:start + batch_size]))
+        extra = [[] for _ in frames]
+        for (index, x1, y1), crop_detections in zip(owners, tile_detections):
+            if len(crop_detections):
+                shifted = crop_detections.copy()
+                shifted[:, [0, 2]] += x1
+                shifted[:, [1, 3]] += y1
+                extra[index].append(shifted)
+
+        merged = []
+        for frame_detections, frame_extra in zip(detections, extra):
+            if frame_extra:
+                combined = np.concatenate([frame_detections] + frame_extra).astype(np.float32)
+                frame_detections = merge_detections(combined, self.merge_threshold)
+            merged.append(frame_detections if len(frame_detections) else EMPTY_DETECTIONS)
+        return merged, len({index for index, _, _ in owners}), len(crops)
@@ -0,0 +1,88 @@
+"""
+Стоимость детекции на участках кадра (TILED_INFERENCE): без участков,
+с адаптивным выбором участков и с проверкой всех участков кадра.
+
+Запуск из директории backend:
+
+    python -m app.services.video_processing.tiling_benchmark --video clip.mp4
+"""
+import json
+import time
+import logging
+import argparse
+
+from app.models import model
+from app.models.cascade_benchmark import read_clip
+from app.services.video_processing.detections import DetectionSummary
+from app.services.video_processing.tiling import TiledInference
+from app.services.video_processing.video_processing import INFERENCE_BATCH_SIZE, predict_batch
+
+
+logger = logging.getLogger(__name__)
+
+
+class AllTiles(TiledInference):
+    """Проверка всех участков каждого кадра (верхняя граница стоимости)"""
+
+    def select(self, frame, detections):
+        grid = self.grid(frame)
+        return grid if len(grid) > 1 else grid[:0]
+
+
+def _run(frames, tiler, confidence_threshold, batch_size):
+    summary = DetectionSummary(model.model.names)
+    started = time.perf_counter()
+    for start in range(0, len(frames), batch_size):
+        predict_batch(frames[start:start + batch_size], confidence_threshold, summary, tiler)
+    elapsed = time.perf_counter() - started
+    return {
+        "ms_per_frame": round(elapsed * 1000 / len(frames), 2),
+        "tiled_frames": summary.tiled_frames,
+        "tiles_per_frame": round(summary.tiles / len(frames), 2),
+    }
+
+
+def benchmark_tiling(frames, confidence_threshold=0.25, batch_size=INFERENCE_BATCH_SIZE, **tiler_options):
+    """
+    Время детекции кадров без участков, с адаптивным выбором и со всеми участками.
+
+    :param tiler_options: параметры TiledInference адаптивного режима
+    :return: отчет (словарь)
+    """
+    # Прогревочный запуск модели не учитывается во времени
+    predict_batch(frames[:1], confidence_threshold)
+
+    adaptive = TiledInference(enabled=True, **tiler_options)
+    return {
+        "frames": len(frames),
+        "frame_size": f"{frames[0].shape[1]}x{frames[0].shape[0]}",
+        "grid_tiles": len(adaptive.grid(frames[0])),
+        "full_frame": _run(frames, None, confidence_threshold, batch_size),
+        "adaptive": _run(frames, adaptive, confidence_threshold, batch_size),
+        "all_tiles": _run(frames, AllTiles(enabled=True, **tiler_options), confidence_threshold, batch_size),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Стоимость детекции на участках кадра")
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--batch-size", type=int, default=INFERENCE_BATCH_SIZE)
+    parser.add_argument("--max-frames", type=int, default=32)
+    parser.add_argument("--output", help="файл для сохранения отчета в JSON")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    report = benchmark_tiling(
+        read_clip(args.video, args.max_frames), confidence_threshold=args.conf, batch_size=args.batch_size
+    )
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as report_file:
+            report_file.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import os
+
+import cv2
+import numpy as np
+
+from app.services.video_processing.detections import EMPTY_DETECTIONS
+
+
+# Модель запускается на каждом TRACKER_KEYFRAME_INTERVAL-м кадре, рамки
+# промежуточных кадров переносятся трекером; 0 или 1 отключает трекер
+TRACKER_KEYFRAME_INTERVAL = int(os.environ.get("TRACKER_KEYFRAME_INTERVAL", "0"))
+# Минимальное пересечение (IoU) рамки трека и новой детекции того же класса
+TRACKER_MATCH_IOU = float(os.environ.get("TRACKER_MATCH_IOU", "0.3"))
+# Множитель надежности трека за каждый кадр без детекции
+TRACKER_DECAY = float(os.environ.get("TRACKER_DECAY", "0.95"))
+# Надежность трека, ниже которой модель запускается раньше ключевого кадра
+TRACKER_REDETECT_HEALTH = float(os.environ.get("TRACKER_REDETECT_HEALTH", "0.5"))
+# Число ключевых кадров подряд без детекции, после которого трек удаляется
+TRACKER_MAX_AGE = int(os.environ.get("TRACKER_MAX_AGE", "2"))
+# Сетка точек внутри рамки, по которым оценивается ее смещение
+TRACKER_GRID = 4
+
+_LK_PARAMS = {
+    "winSize": (21, 21),
+    "maxLevel": 3,
+    "criteria": (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+}
+
+
+def box_iou(boxes, other_boxes):
+    """
+    Попарное пересечение рамок (IoU).
+
+    :param boxes: массив (N, 4) в формате x1, y1, x2, y2
+    :param other_boxes: массив (M, 4)
+    :return: матрица (N, M)
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 1, 4)
+    other_boxes = np.asarray(other_boxes, dtype=np.float32).reshape(1, -1, 4)
+    x1 = np.maximum(boxes[..., 0], other_boxes[..., 0])
+    y1 = np.maximum(boxes[..., 1], other_boxes[..., 1])
+    x2 = np.minimum(boxes[..., 2], other_boxes[..., 2])
+    y2 = np.minimum(boxes[..., 3], other_boxes[..., 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    areas = (boxes[..., 2] - boxes[..., 0]) * (boxes[..., 3] - boxes[..., 1])
+    other_areas = (other_boxes[..., 2] - other_boxes[..., 0]) * (other_boxes[..., 3] - other_boxes[..., 1])
+    return intersection / np.maximum(areas + other_areas - intersection, 1e-9)
+
+
+class ObjectTracker:
+    """
+    Перенос рамок между ключевыми кадрами и присвоение номеров объектам.
+
+    На ключевом кадре детекции модели сопоставляются с треками по IoU
+    (жадно, только рамки одного класса): совпавшие продолжают трек,
+    остальные открывают новые. На промежуточных кадрах рамки треков
+    смещаются по оптическому потоку (Lucas-Kanade по сетке точек внутри
+    рамки). Надежность трека падает с каждым промежуточным кадром и
+    с долей потерянных точек; если надежность видимого трека опускается
+    ниже redetect_health, needs_detection просит запустить модель раньше.
+    """
+
+    def __init__(self, confidence_threshold=0.0, match_iou=None, decay=None,
+                 redetect_health=None, max_age=None):
+        self.confidence_threshold = confidence_threshold
+        self.match_iou = TRACKER_MATCH_IOU if match_iou is None else match_iou
+        self.decay = TRACKER_DECAY if decay is None else decay
+        self.redetect_health = TRACKER_REDETECT_HEALTH if redetect_health is None else redetect_health
+        self.max_age = TRACKER_MAX_AGE if max_age is None else max_age
+        # Детекции треков в формате extract_detections и параллельные массивы
+        self.detections = EMPTY_DETECTIONS
+        self.track_ids = np.empty(0, dtype=np.int32)
+        self.health = np.empty(0, dtype=np.float32)
+        self.misses = np.empty(0, dtype=np.int32)
+        self.next_track_id = 0
+        self._gray = None
+
+    @property
+    def needs_detection(self):
+        """Опустилась ли надежность видимого трека ниже порога"""
+        active = (self.misses == 0) & (self.detections[:, 4] >= self.confidence_threshold)
+        return bool((self.health[active] < self.redetect_health).any())
+
+    def update(self, frame, detections):
+        """
+        Сопоставление детекций ключевого кадра с треками
+
+        :return: номера треков детекций (в порядке строк detections)
+        """
+        self._gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        track_ids = np.full(len(detections), -1, dtype=np.int32)
+        matched_tracks = np.zeros(len(self.track_ids), dtype=bool)
+
+        if len(detections) and len(self.track_ids):
+            ious = box_iou(self.detections[:, :4], detections[:, :4])
+            ious[self.detections[:, 5][:, None] != detections[:, 5][None, :]] = 0
+            for track, detection in zip(*np.unravel_index(np.argsort(-ious, axis=None), ious.shape)):
+                if ious[track, detection] < self.match_iou:
+                    break
+                if matched_tracks[track] or track_ids[detection] >= 0:
+                    continue
+                matched_tracks[track] = True
+                track_ids[detection] = self.track_ids[track]
+
+        new = track_ids < 0
+        track_ids[new] = np.arange(self.next_track_id, self.next_track_id + new.sum())
+        self.next_track_id += int(new.sum())
+
+        # Треки без детекции сохраняются max_age ключевых кадров, чтобы объект,
+        # пропущенный моделью на одном кадре, не получил новый номер
+        kept = ~matched_tracks & (self.misses + 1 <= self.max_age)
+        self.detections = np.concatenate([detections, self.detections[kept]]).astype(np.float32)
+        self.track_ids = np.concatenate([track_ids, self.track_ids[kept]])
+        self.health = np.concatenate([np.ones(len(detections), dtype=np.float32), self.health[kept]])
+        self.misses = np.concatenate([np.zeros(len(detections), dtype=np.int32), self.misses[kept] + 1])
+        return track_ids
+
+    def propagate(self, frame):
+        """
+        Перенос рамок треков на следующий кадр по оптическому потоку
+
+        :return: (детекции кадра, номера их треков); детекции сохраняют
+                 уверенность ключевого кадра
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        active = np.flatnonzero(self.misses == 0)
+        if self._gray is None or not len(active):
+            self._gray = gray
+            return EMPTY_DETECTIONS, np.empty(0, dtype=np.int32)
+
+        boxes = self.detections[active, :4]
+        # Точки во внутренней половине рамки: края чаще захватывают фон
+        steps = (np.arange(TRACKER_GRID) + 0.5) / TRACKER_GRID * 0.5 + 0.25
+        grid_x, grid_y = np.meshgrid(steps, steps)
+        widths = (boxes[:, 2] - boxes[:, 0])[:, None]
+        heights = (boxes[:, 3] - boxes[:, 1])[:, None]
+        points = np.stack([
+            boxes[:, :1] + grid_x.ravel()[None, :] * widths,
+            boxes[:, 1:2] + grid_y.ravel()[None, :] * heights,
+        ], axis=-1).reshape(-1, 1, 2).astype(np.float32)
+
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, points, None, **_LK_PARAMS)
+        self._gray = gray
+        status = status.reshape(len(active), -1).astype(bool)
+        shifts = (moved - points).reshape(len(active), -1, 2)
+
+        height, width = gray.shape[:2]
+        for row, track in enumerate(active):
+            tracked = status[row]
+            if tracked.any():
+                dx, dy = np.median(shifts[row][tracked], axis=0)
+                box = self.detections[track, :4] + np.array([dx, dy, dx, dy], dtype=np.float32)
+                self.detections[track, :4] = np.clip(box, 0, [width, height, width, height])
+            self.health[track] *= self.decay * tracked.mean()
+
+        return self.detections[active].copy(), self.track_ids[active].copy()
+
@@ -4,9 +4,35 @@ import cv2
 import os
 import shutil
 import logging
-from app.models import model
-from app.services.minio import MinioStorage
+from app.models import batching, cascade, inference_process, model
+from app.services.minio import get_storage
+from app.services.video_processing.detections import (
+    EMPTY_DETECTIONS,
+    DetectionSummary,
+    build_detection_log,
+    extract_detections,
+    filter_detections,
+    iter_log_detections,
+    rethreshold,
+    scale_boxes,
+    with_intervals,
+)
+from app.services.video_processing.annotation import draw_detections
+from app.services.video_processing.decoder import (
+    DOWNSCALE_DECODE,
+    fit_inference_size,
+    inference_size,
+    read_scaled_frames,
+    video_size,
+)
+from app.services.video_processing.encoder import VideoEncoder
+from app.services.video_processing.motion import MotionGate
+from app.services.video_processing.segments import run_segmented
+from app.services.video_processing.stages import BackgroundWorker, Prefetcher
+from app.services.video_processing.tiling import TiledInference
+from app.services.video_processing.tracking import TRACKER_KEYFRAME_INTERVAL, ObjectTracker
 import tempfile
+from contextlib import nullcontext
 
 
 # Настройка логирования
@@ -18,11 +44,45 @@ logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
 
-video_directory = "runs/detect/predict/"
-storage = MinioStorage()
+# Режимы конвейера обработки:
+# single_pass - декодирование, детекция, отрисовка и кодирование H.264 за один проход
+# segments - однопроходный конвейер на участках видео в пуле процессов
+# ultralytics - сохранение видео предиктором Ultralytics с последующей конвертацией
+PIPELINE_SINGLE_PASS = "single_pass"
+PIPELINE_SEGMENTS = "segments"
+PIPELINE_ULTRALYTICS = "ultralytics"
+PIPELINE_MODE = os.environ.get("VIDEO_PIPELINE", PIPELINE_SINGLE_PASS)
 
+# Число кадров, передаваемых модели за один прямой проход
+INFERENCE_BATCH_SIZE = int(os.environ.get("INFERENCE_BATCH_SIZE", "8"))
+# Емкость очередей между стадиями декодирования, детекции и кодирования
+# (в пакетах кадров); ограничивает память и задает обратное давление
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "4"))
+# Детекция запускается на каждом FRAME_STRIDE-м кадре, результаты
+# промежуточных кадров берутся от ближайшего обработанного кадра
+FRAME_STRIDE = int(os.environ.get("FRAME_STRIDE", "1"))
+MAX_FRAME_STRIDE = 30
+# Модель запускается с этим порогом уверенности (но не выше запрошенного),
+# и все ее детекции сохраняются: результат для более высокого порога
+# пересчитывается без повторной обработки видео
+RAW_DETECTION_FLOOR = float(os.environ.get("RAW_DETECTION_FLOOR", "0.1"))
+# Исходные видео сохраняются после обработки, чтобы их можно было
+# отрисовать заново с другим порогом уверенности
+KEEP_ORIGINALS = os.environ.get("KEEP_ORIGINALS", "true").lower() == "true"
+# Лог детекций хранится в колоночном формате NumPy (.npz со сжатием)
+DETECTION_LOG_SUFFIX = ".detections.npz"
 
-def convert_avi_to_mp4(input_file, output_file):
+DEFAULT_FPS = 25
+PREDICT_DIR_NAME = "predict"
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+storage = get_storage()
+
+
+def convert_avi_to_mp4(input_file, output_file, temp_audiofile=None):
+    if temp_audiofile is None:
+        # Временный аудиофайл кладем рядом с результатом, а не в текущую
+        # директорию, чтобы параллельные конвертации не пересекались
+        temp_audiofile = f"{os.path.splitext(output_file)[0]}-audio.m4a"
     try:
         logger.info(f"Конвертация AVI в MP4: {input_file} -> {output_file}")
         video = VideoFileClip(input_file)
@@ -30,7 +90,7 @@ def convert_avi_to_mp4(input_file, output_file):
             output_file,
             codec="libx264",
             audio_codec="aac",
-            temp_audiofile="temp-audio.m4a",
+            temp_audiofile=temp_audiofile,
             remove_temp=True,
         )
         video.close()
@@ -41,8 +101,645 @@ def convert_avi_to_mp4(input_file, output_file):
         return False
 
 
-def process_video(filename, confidence_threshold=0.25, username=None):
+def find_processed_video(output_dir):
+    """
+    Поиск видео, сохраненного моделью в директории задачи.
+
+    Директория принадлежит одной задаче, поэтому имя файла угадывать
+    не нужно: берется любое видео, MP4 в приоритете.
+
+    :param output_dir: директория, в которую предиктор сохранил результат
+    :return: путь к видеофайлу или None, если видео не найдено
+    """
+    if not os.path.isdir(output_dir):
+        return None
+
+    videos = sorted(
+        file for file in os.listdir(output_dir)
+        if file.lower().endswith(VIDEO_EXTENSIONS)
+    )
+    if not videos:
+        return None
+
+    mp4_videos = [file for file in videos if file.lower().endswith(".mp4")]
+    return os.path.join(output_dir, (mp4_videos or videos)[0])
+
+
+def summarize_detections(results):
+    """
+    Сводит поток результатов модели к компактным покадровым записям.
+
+    Результаты потребляются по одному, поэтому в памяти одновременно
+    находится только текущий кадр.
+
+    :param results: итерируемый объект с результатами Ultralytics по кадрам
+    :return: DetectionSummary
+    """
+    summary = DetectionSummary({})
+    for i, frame_results in enumerate(results):
+        summary.names = frame_results.names
+        summary.add(i, extract_detections(frame_results))
+        summary.inferred_frames += 1
+    return summary
+
+
+def read_frames(filename, start_frame=0, end_frame=None):
+    """
+    Генератор декодированных кадров видео
+
+    :param start_frame: номер первого кадра
+    :param end_frame: номер кадра, на котором чтение останавливается (не включается)
+    """
+    cap = cv2.VideoCapture(filename)
+    try:
+        if start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        position = start_frame
+        while end_frame is None or position < end_frame:
+            success, frame = cap.read()
+            if not success:
+                break
+            position += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+def decode_frames(filename, fps, start_frame=0, end_frame=None, render=True):
+    """
+    Кадры для конвейера: исходного разрешения или уменьшенные до входа модели.
+
+    Если размеченное видео не нужно (render=False), кадры исходного
+    разрешения не используются, и ffmpeg декодирует их сразу в размере
+    INFERENCE_IMGSZ (DOWNSCALE_DECODE); рамки детекций затем переводятся
+    в координаты исходного кадра множителями scale.
+
+    :param render: нужны ли кадры исходного разрешения (для разметки
+                   или детекции на участках кадра)
+    :return: (генератор кадров, множители (sx, sy) координат или None)
+    """
+    if not render and DOWNSCALE_DECODE:
+        width, height = video_size(filename)
+        size = inference_size(width, height, model.INFERENCE_IMGSZ)
+        if size is not None:
+            scale = (width / size[0], height / size[1])
+            return read_scaled_frames(filename, size, fps, start_frame, end_frame), scale
+    return read_frames(filename, start_frame, end_frame), None
+
+
+def iter_batches(frames, batch_size):
+    """
+    Группировка потока кадров в пакеты фиксированного размера.
+
+    Последний пакет может быть неполным.
+    """
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def gate_groups(groups, motion_gate):
+    """
+    Отметка групп кадров, первый кадр которых нужно передать модели.
+
+    :return: генератор пар (группа кадров, нужна ли детекция)
+    """
+    for group in groups:
+        yield group, motion_gate.should_infer(group[0])
+
+
+def nearest_sample(offset, stride, detections, next_detections):
+    """
+    Выбор детекций для кадра между двумя обработанными кадрами.
+
+    :param offset: смещение кадра от начала группы
+    :param stride: шаг выборки кадров
+    :param detections: детекции первого кадра группы
+    :param next_detections: детекции первого кадра следующей группы
+                            (None для последней группы)
+    :return: детекции ближайшего обработанного кадра
+    """
+    if next_detections is None or 2 * offset <= stride:
+        return detections
+    return next_detections
+
+
+def predict_batch(frames, confidence_threshold, summary=None, tiler=None):
+    """
+    Детекция на пакете кадров за один вызов модели.
+
+    Если включен каскад (CASCADE_SCREEN_IMGSZ), полный детектор получает
+    только кадры, отобранные предварительной проверкой; число проверенных
+    и отобранных кадров добавляется в summary.
+
+    Если включен сервер инференса (INFERENCE_SERVER), кадры передаются
+    ему и обрабатываются в общем пакете с кадрами других задач процесса.
+    В режиме MODEL_PROCESS модель выполняется в процессе инференса.
+
+    Кадры больше INFERENCE_IMGSZ уменьшаются до передачи модели,
+    рамки возвращаются в координатах переданных кадров.
+
+    Если передан включенный tiler (TiledInference), после полных кадров
+    модель проверяет выбранные им участки исходного разрешения, и детекции
+    участков объединяются с детекциями кадров.
+
+    :param frames: список кадров BGR
+    :param summary: DetectionSummary для счетчиков каскада и участков
+    :param tiler: TiledInference участка видео или None
+    :return: список массивов детекций в порядке кадров
+    """
+    fitted = [fit_inference_size(frame, model.INFERENCE_IMGSZ) for frame in frames]
+    detections = _predict_frames([frame for frame, _ in fitted], confidence_threshold, summary)
+    detections = [scale_boxes(frame_detections, scale) for frame_detections, (_, scale) in zip(detections, fitted)]
+    if tiler is None or not tiler.enabled:
+        return detections
+
+    # Участки не учитываются в счетчиках каскада: счетчики считают кадры
+    detections, tiled_frames, tiles = tiler.refine(
+        frames, detections, lambda crops: predict_batch(crops, confidence_threshold)
+    )
+    if summary is not None:
+        summary.tiled_frames += tiled_frames
+        summary.tiles += tiles
+    return detections
+
+
+def _predict_frames(frames, confidence_threshold, summary):
+    detector = cascade.get_cascade()
+    if detector is not None:
+        detections, escalated = detector.detect(frames, confidence_threshold)
+        if summary is not None:
+            summary.screened_frames += len(frames)
+            summary.escalated_frames += escalated
+        return detections
+
+    server = batching.get_server()
+    if server is not None:
+        return server.infer(frames, confidence_threshold)
+    client = inference_process.get_client()
+    if client is not None:
+        return client.infer(frames, confidence_threshold)
+
+    # Без сервера инференса задачи процесса вызывают модель напрямую
+    # и по очереди (см. model.predict_lock)
+    with model.predict_lock:
+        results = model.model.predict(frames, imgsz=model.INFERENCE_IMGSZ, conf=confidence_threshold, verbose=False)
+    if len(results) != len(frames):
+        raise RuntimeError(
+            f"Модель вернула {len(results)} результатов для пакета из {len(frames)} кадров"
+        )
+    return [extract_detections(frame_results) for frame_results in results]
+
+
+def build_output_name(username, filename):
+    """Формирование имени обработанного видео в хранилище"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base_filename = os.path.basename(os.path.splitext(filename)[0])
+    return f"{username}_{timestamp}_{base_filename}.mp4"
+
+
+def detection_log_name(video_filename):
+    """Имя лога детекций обработанного видео"""
+    return f"{video_filename}{DETECTION_LOG_SUFFIX}"
+
+
+def legacy_log_names(video_filename):
+    """Логи видео в прежнем формате JSON: frame_objects и все детекции модели"""
+    return [f"{video_filename}.json", f"{video_filename}.detections.json"]
+
+
+def original_upload_name(content_hash, source_filename):
+    """
+    Имя исходного видео, сохраняемого в бакете загрузок для повторной отрисовки.
+
+    Имя строится из SHA-256 содержимого, поэтому повторные загрузки
+    того же видео и результаты отрисовки ссылаются на один объект.
+    """
+    extension = os.path.splitext(source_filename)[1]
+    return f"originals/{content_hash}{extension}"
+
+
+def has_annotated_video(metadata):
+    """Сохранялось ли размеченное видео (False для обработки с render=false)"""
+    return str((metadata or {}).get("render", True)).lower() != "false"
+
+
+def detection_floor(confidence_threshold):
+    """Порог уверенности, с которым запускается модель"""
+    return min(RAW_DETECTION_FLOOR, confidence_threshold)
+
+
+def run_single_pass(filename, output_path, confidence_threshold, fps, progress_callback=None,
+                    batch_size=None, queue_size=None, stride=None, motion_gate=None,
+                    start_frame=0, end_frame=None, audio=True, floor=None, keyframe_interval=None,
+                    tiler=None):
+    """
+    Однопроходный конвейер: декодирование -> детекция -> отрисовка -> H.264.
+
+    Если output_path равен None, выполняется только детекция: кадры
+    не размечаются и не кодируются.
+
+    Кадры размечаются сразу после детекции и передаются в кодировщик,
+    поэтому видео кодируется один раз, без промежуточного AVI. Детекция
+    выполняется пакетами по batch_size кадров: на CPU один прямой проход
+    по пакету заметно быстрее, чем по кадру за раз.
+
+    Стадии работают параллельно в отдельных потоках: декодер заполняет
+    очередь пакетов, детекция выполняется в текущем потоке, а отрисовка
+    и передача кадров в ffmpeg - в потоке кодировщика. cv2 и torch
+    освобождают GIL, поэтому стадии загружают разные ядра CPU.
+
+    При stride > 1 модель обрабатывает только каждый stride-й кадр,
+    а промежуточные кадры получают детекции ближайшего обработанного
+    кадра: frame_objects по-прежнему содержит запись для каждого кадра.
+
+    Фильтр движения (motion_gate) пропускает детекцию на кадрах, где сцена
+    не изменилась с последнего обработанного кадра; такие кадры получают
+    предыдущие детекции. Число обработанных и пропущенных кадров
+    сохраняется в summary.inferred_frames и summary.gated_frames.
+
+    :param output_path: путь к размеченному видео или None (без видео)
+    :param progress_callback: функция, вызываемая с числом обработанных кадров
+    :param batch_size: размер пакета кадров (по умолчанию INFERENCE_BATCH_SIZE)
+    :param queue_size: емкость очередей между стадиями (по умолчанию PIPELINE_QUEUE_SIZE)
+    :param stride: шаг выборки кадров для детекции (по умолчанию FRAME_STRIDE)
+    :param motion_gate: фильтр кадров без движения (по умолчанию MotionGate с настройками окружения)
+    :param start_frame: первый обрабатываемый кадр (номера кадров в summary глобальные)
+    :param end_frame: кадр, на котором обработка останавливается (не включается)
+    :param audio: копировать ли звуковую дорожку исходного видео
+    :param floor: порог уверенности модели (по умолчанию detection_floor(confidence_threshold));
+                  на видео и в frame_objects попадают детекции не ниже confidence_threshold
+    :param keyframe_interval: интервал ключевых кадров трекера (по умолчанию
+                              TRACKER_KEYFRAME_INTERVAL); больше 1 - см. run_tracked_pass
+    :param tiler: детекция на участках кадра (по умолчанию TiledInference с настройками окружения)
+    :return: DetectionSummary
+    """
+    keyframe_interval = int(keyframe_interval or TRACKER_KEYFRAME_INTERVAL)
+    if keyframe_interval > 1:
+        if stride and int(stride) > 1:
+            logger.warning("Шаг выборки кадров не используется вместе с трекером")
+        return run_tracked_pass(
+            filename, output_path, confidence_threshold, fps, progress_callback,
+            keyframe_interval=keyframe_interval, queue_size=queue_size,
+            start_frame=start_frame, end_frame=end_frame, audio=audio, floor=floor, tiler=tiler,
+        )
+
+    batch_size = max(int(batch_size or INFERENCE_BATCH_SIZE), 1)
+    queue_size = max(int(queue_size or PIPELINE_QUEUE_SIZE), 1)
+    stride = max(int(stride or FRAME_STRIDE), 1)
+    motion_gate = motion_gate or MotionGate()
+    tiler = tiler or TiledInference()
+    floor = detection_floor(confidence_threshold) if floor is None else floor
+    names = model.model.names
+    summary = DetectionSummary(names, confidence_threshold)
+    index = start_frame
+    detections = EMPTY_DETECTIONS
+    # Группа кадров, ожидающая детекций следующей группы
+    pending = None
+
+    render = output_path is not None
+    audio_source = filename if audio else None
+    with (VideoEncoder(output_path, fps, audio_source=audio_source) if render else nullcontext()) as encoder:
+
+        def encode(item):
+            frame, detections = item
+            encoder.write(draw_detections(frame, detections, names))
+
+        def emit(group, detections, next_detections):
+            nonlocal index
+            for offset, frame in enumerate(group):
+                frame_detections = nearest_sample(offset, stride, detections, next_detections)
+                visible = summary.add(index, frame_detections)
+                if render:
+                    encode_stage.put((frame, visible))
+                index += 1
+
+        # Пакет содержит batch_size * stride кадров, поэтому очередь
+        # декодера уменьшается, чтобы не увеличивать потребление памяти
+        decode_queue_size = max(queue_size // stride, 1)
+        # Группы по stride кадров: первый кадр группы передается модели,
+        # если фильтр движения не отметил его как неизменившийся.
+        # Фильтр работает в потоке декодера, не занимая поток детекции.
+        # Без разметки и участков кадры декодируются сразу в размере входа модели
+        frames, decode_scale = decode_frames(filename, fps, start_frame, end_frame, render or tiler.enabled)
+        groups = gate_groups(iter_batches(frames, stride), motion_gate)
+
+        with Prefetcher(iter_batches(groups, batch_size), decode_queue_size, name="decode") as batches, \
+             (BackgroundWorker(encode, queue_size * batch_size, name="encode") if render else nullcontext()) as encode_stage:
+            for batch in batches:
+                samples = [group[0] for group, infer in batch if infer]
+                sample_detections = iter(
+                    scale_boxes(sample, decode_scale)
+                    for sample in (predict_batch(samples, floor, summary, tiler) if samples else ())
+                )
+                for group, infer in batch:
+                    if infer:
+                        detections = next(sample_detections)
+                        summary.inferred_frames += 1
+                    else:
+                        # Сцена не изменилась: используются детекции предыдущего кадра
+                        summary.gated_frames += 1
+                    if pending is not None:
+                        emit(*pending, detections)
+                        pending = None
+                    if len(group) == 1:
+                        # Промежуточных кадров нет, детекции следующей группы не нужны
+                        emit(group, detections, None)
+                    else:
+                        pending = (group, detections)
+                if progress_callback:
+                    progress_callback(index - start_frame)
+
+            if pending is not None:
+                emit(*pending, None)
+                if progress_callback:
+                    progress_callback(index - start_frame)
+
+    return summary
+
+
+def run_tracked_pass(filename, output_path, confidence_threshold, fps, progress_callback=None,
+                     keyframe_interval=None, queue_size=None, tracker=None,
+                     start_frame=0, end_frame=None, audio=True, floor=None, tiler=None):
+    """
+    Однопроходный конвейер с трекером: модель запускается только на ключевых кадрах.
+
+    Ключевым считается каждый keyframe_interval-й кадр, а также кадр,
+    на котором надежность трека упала ниже порога (трекер просит
+    детекцию раньше). На остальных кадрах рамки переносятся трекером
+    по оптическому потоку. Детекции получают номера треков, поэтому
+    summary содержит число различных объектов, а не только число рамок.
+
+    Ключевые кадры заранее неизвестны, поэтому модель получает кадры
+    по одному, без пакетов; фильтр движения и шаг выборки не применяются.
+
+    :param tracker: трекер (по умолчанию ObjectTracker с настройками окружения)
+    :param tiler: детекция на участках ключевых кадров (по умолчанию TiledInference)
+    :return: DetectionSummary (число кадров трекера - в summary.tracked_frames)
+    """
+    keyframe_interval = max(int(keyframe_interval or TRACKER_KEYFRAME_INTERVAL), 1)
+    queue_size = max(int(queue_size or PIPELINE_QUEUE_SIZE), 1)
+    floor = detection_floor(confidence_threshold) if floor is None else floor
+    tracker = tracker or ObjectTracker(confidence_threshold)
+    tiler = tiler or TiledInference()
+    names = model.model.names
+    summary = DetectionSummary(names, confidence_threshold)
+    since_keyframe = keyframe_interval
+    frames_done = 0
+
+    render = output_path is not None
+    audio_source = filename if audio else None
+    with (VideoEncoder(output_path, fps, audio_source=audio_source) if render else nullcontext()) as encoder:
+
+        def encode(item):
+            frame, detections = item
+            encoder.write(draw_detections(frame, detections, names))
+
+        # Трекер работает в координатах декодированных кадров, в summary
+        # рамки попадают в координатах исходного кадра
+        decoded, decode_scale = decode_frames(filename, fps, start_frame, end_frame, render or tiler.enabled)
+        with Prefetcher(decoded, queue_size * INFERENCE_BATCH_SIZE, name="decode") as frames, \
+             (BackgroundWorker(encode, queue_size * INFERENCE_BATCH_SIZE, name="encode") if render else nullcontext()) as encode_stage:
+            for frame in frames:
+                if since_keyframe >= keyframe_interval or tracker.needs_detection:
+                    detections = predict_batch([frame], floor, summary, tiler)[0]
+                    track_ids = tracker.update(frame, detections)
+                    summary.inferred_frames += 1
+                    since_keyframe = 0
+                else:
+                    detections, track_ids = tracker.propagate(frame)
+                    summary.tracked_frames += 1
+                since_keyframe += 1
+
+                visible = summary.add(start_frame + frames_done, scale_boxes(detections, decode_scale), track_ids)
+                if render:
+                    encode_stage.put((frame, visible))
+                frames_done += 1
+                if progress_callback and frames_done % INFERENCE_BATCH_SIZE == 0:
+                    progress_callback(frames_done)
+
+    if progress_callback:
+        progress_callback(frames_done)
+    return summary
+
+
+def run_ultralytics_pipeline(filename, output_path, confidence_threshold, work_dir):
+    """
+    Конвейер на основе сохранения видео предиктором Ultralytics.
+
+    Видео сохраняется предиктором (часто в AVI) и затем перекодируется в MP4.
+    Если output_path равен None, предиктор видео не сохраняет.
+
+    :return: DetectionSummary
+    """
+    output_dir = os.path.join(work_dir, PREDICT_DIR_NAME)
+    render = output_path is not None
+
+    # stream=True возвращает генератор: результаты кадров не накапливаются
+    # в памяти, каждый кадр сводится к компактной записи и освобождается.
+    # Предиктор занят всем видео, поэтому блокировка держится до конца потока
+    with model.predict_lock:
+        results = model.model(
+            source=filename,
+            save=render,
+            imgsz=model.INFERENCE_IMGSZ,
+            conf=confidence_threshold,
+            stream=True,
+            project=work_dir,
+            name=PREDICT_DIR_NAME,
+            exist_ok=True,
+        )
+        summary = summarize_detections(results)
+    if not render:
+        return summary
+
+    processed_video = find_processed_video(output_dir)
+    if processed_video is None:
+        available_files = (
+            os.listdir(output_dir) if os.path.exists(output_dir) else []
+        )
+        logger.error(
+            f"Не найдены подходящие файлы в {output_dir}. Доступные файлы: {available_files}"
+        )
+        raise FileNotFoundError(
+            f"Обработанное видео не найдено в директории {output_dir}"
+        )
+
+    if processed_video.endswith(".mp4"):
+        # Если модель создала MP4, просто копируем его
+        logger.info(f"Найден MP4 файл, копирование: {processed_video}")
+        shutil.copy2(processed_video, output_path)
+    else:
+        # Если модель создала AVI (или другой контейнер), конвертируем в MP4
+        logger.info(f"Найден файл {processed_video}, конвертация в MP4")
+        conversion_success = convert_avi_to_mp4(
+            processed_video,
+            output_path,
+            temp_audiofile=os.path.join(work_dir, "temp-audio.m4a"),
+        )
+        if not conversion_success:
+            logger.warning("Конвертация не удалась, пробуем прямое копирование...")
+            shutil.copy2(processed_video, output_path)
+
+    return summary
+
+
+def save_results(video_path, video_filename, metadata, detection_log):
+    """
+    Сохранение размеченного видео и лога детекций в MinIO
+
+    :param video_path: путь к размеченному видео или None, если видео
+                       не создавалось (метаданные сохраняются с логом)
+    :param detection_log: лог детекций (см. build_detection_log)
+    :return: имя лога детекций
+    """
+    if video_path is not None:
+        logger.info(f"Загрузка видео в MinIO: {video_filename}")
+        storage.save_video(video_path, video_filename, metadata)
+
+    # Лог хранит только кадры с детекциями, frame_objects для клиентов
+    # восстанавливаются из него (см. log_frame_objects)
+    log_filename = detection_log_name(video_filename)
+    logger.info(f"Сохранение лога детекций в MinIO: {log_filename}")
+    storage.save_detection_log(
+        detection_log, log_filename, metadata if video_path is None else None
+    )
+    return log_filename
+
+
+def render_detections(filename, output_path, detection_log, confidence_threshold, fps, progress_callback=None):
+    """
+    Отрисовка сохраненных детекций на исходном видео без запуска модели.
+
+    :param detection_log: лог детекций видео (см. build_detection_log)
+    :param confidence_threshold: порог уверенности отображаемых детекций
+    :param progress_callback: функция, вызываемая с числом обработанных кадров
+    :return: DetectionSummary для нового порога
+    """
+    summary = rethreshold(detection_log, confidence_threshold)
+    names = summary.names
+    log_detections = iter_log_detections(detection_log)
+    frames_done = 0
+
+    with VideoEncoder(output_path, fps, audio_source=filename) as encoder:
+
+        def encode(item):
+            frame, frame_detections = item
+            encoder.write(draw_detections(frame, frame_detections, names))
+
+        with BackgroundWorker(encode, PIPELINE_QUEUE_SIZE * INFERENCE_BATCH_SIZE, name="encode") as encode_stage:
+            for frame in read_frames(filename):
+                # Кадры лога и видео идут в одном порядке
+                _, frame_detections = next(log_detections, (frames_done, EMPTY_DETECTIONS))
+                encode_stage.put((frame, filter_detections(frame_detections, confidence_threshold)))
+                frames_done += 1
+                if progress_callback and frames_done % INFERENCE_BATCH_SIZE == 0:
+                    progress_callback(frames_done)
+
+    if progress_callback:
+        progress_callback(frames_done)
+    return summary
+
+
+def rerender_video(filename, detection_log, confidence_threshold, username=None, output_name=None, progress_callback=None):
+    """
+    Повторная отрисовка видео для другого порога уверенности по сохраненным детекциям.
+
+    :param filename: путь к исходному видео
+    :param detection_log: лог детекций видео
+    :param confidence_threshold: новый порог уверенности
+    :param output_name: имя результата в хранилище
+    :param progress_callback: функция (обработано_кадров, всего_кадров) для отчета о прогрессе
+    :return: (имя видео, frame_objects, fps, найдено ли оружие/нож, имя лога)
+    """
+    logger.info(f"Повторная отрисовка видео {filename} с порогом {confidence_threshold}")
+    work_dir = tempfile.mkdtemp(prefix="video_render_")
+    try:
+        cap = cv2.VideoCapture(filename)
+        if not cap.isOpened():
+            raise ValueError("Не удалось открыть видеофайл. Проверьте формат файла.")
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.release()
+
+        total_frames = detection_log["total_frames"]
+        new_filename = output_name or build_output_name(username, filename)
+        final_video_path = os.path.join(work_dir, new_filename)
+
+        on_frame = None
+        if progress_callback:
+            on_frame = lambda done: progress_callback(done, total_frames)
+        summary = render_detections(
+            filename, final_video_path, detection_log, confidence_threshold, source_fps, on_frame
+        )
+
+        metadata = {
+            "username": username,
+            "fps": str(int(source_fps)),
+            "total_frames": str(total_frames),
+            "width": str(width),
+            "height": str(height),
+            "processed_date": datetime.now().isoformat(),
+        }
+        # Детекции те же, меняется только порог размеченного видео
+        log_filename = save_results(
+            final_video_path, new_filename, metadata,
+            with_intervals(detection_log, confidence_threshold)
+        )
+
+        logger.info(f"Повторная отрисовка завершена: {new_filename}")
+        return new_filename, summary.frame_objects, int(source_fps), summary.has_weapon_or_knife, log_filename
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def process_video(
+    filename,
+    confidence_threshold=0.25,
+    username=None,
+    pipeline=None,
+    output_name=None,
+    progress_callback=None,
+    batch_size=None,
+    frame_stride=None,
+    stats=None,
+    render=True,
+    keyframe_interval=None,
+):
+    """
+    Обработка видео: детекция оружия и ножей, сохранение размеченного видео и лога.
+
+    При render=False выполняется только детекция: отрисовка, кодирование
+    и загрузка видео пропускаются, сохраняется лог детекций (с координатами
+    рамок, по которым клиент может разметить исходное видео).
+
+    :param filename: путь к исходному видео
+    :param confidence_threshold: порог уверенности модели
+    :param username: имя пользователя (префикс имени результата)
+    :param pipeline: режим конвейера (single_pass, segments или ultralytics)
+    :param output_name: имя результата в хранилище (по умолчанию формируется автоматически)
+    :param progress_callback: функция (обработано_кадров, всего_кадров) для отчета о прогрессе
+    :param batch_size: размер пакета кадров для детекции в режимах single_pass и segments
+    :param frame_stride: шаг выборки кадров для детекции в режимах single_pass и segments
+    :param stats: словарь, в который записывается статистика обработки
+                  (число кадров, переданных модели и пропущенных фильтром движения)
+    :param render: создавать ли размеченное видео
+    :param keyframe_interval: интервал ключевых кадров трекера в режимах single_pass
+                              и segments (по умолчанию TRACKER_KEYFRAME_INTERVAL)
+    :return: (имя видео, frame_objects, fps, найдено ли оружие/нож, имя лога)
+    """
     logger.info(f"Начало обработки видео: {filename}, пользователь: {username}")
+    pipeline = pipeline or PIPELINE_MODE
+
+    # Каждая задача получает собственную рабочую директорию, поэтому
+    # несколько видео можно обрабатывать параллельно на одном хосте
+    work_dir = tempfile.mkdtemp(prefix="video_job_")
 
     try:
         # Проверяем, что файл существует и доступен для чтения
@@ -56,7 +753,8 @@ def process_video(filename, confidence_threshold=0.25, username=None):
             raise ValueError("Не удалось открыть видеофайл. Проверьте формат файла.")
 
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+        fps = int(source_fps)
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         cap.release()
@@ -65,100 +763,98 @@ def process_video(filename, confidence_threshold=0.25, username=None):
             f"Параметры видео: {total_frames} кадров, {fps} FPS, разрешение {width}x{height}"
         )
 
-        logger.info(
-            f"Запуск модели обнаружения с порогом уверенности {confidence_threshold}"
-        )
-        results = model.model(source=filename, save=True, conf=confidence_threshold)
-
-        frame_objects = []
-        total_weapons = 0
-        total_knives = 0
-        has_weapon_or_knife = False
-
-        for i, frame_results in enumerate(results):
-            boxes = frame_results.boxes
-            has_weapon = False
-            has_knife = False
-            for box in boxes:
-                cls = int(box.cls[0])
-                if frame_results.names[cls] == "weapon":
-                    has_weapon = True
-                    total_weapons += 1
-                    has_weapon_or_knife = True
-                elif frame_results.names[cls] == "knife":
-                    has_knife = True
-                    total_knives += 1
-                    has_weapon_or_knife = True
-            frame_objects.append((i, has_weapon, has_knife))
+        new_filename = output_name or build_output_name(username, filename)
+        logger.debug(f"Новое имя файла: {new_filename}")
+
+        final_video_path = os.path.join(work_dir, new_filename) if render else None
+        logger.debug(f"Путь к временному файлу: {final_video_path}")
 
         logger.info(
-            f"Обнаружено объектов: {total_weapons} оружия, {total_knives} ножей"
+            f"Запуск модели обнаружения с порогом уверенности {confidence_threshold}, режим {pipeline}"
+            + ("" if render else ", без размеченного видео")
         )
+        # Предиктор Ultralytics рисует все найденные рамки, поэтому
+        # в этом режиме модель запускается с запрошенным порогом
+        floor = confidence_threshold if pipeline == PIPELINE_ULTRALYTICS else detection_floor(confidence_threshold)
+        # Задача учитывается сервером инференса, пока передает ему кадры
+        with batching.job_session():
+            if pipeline == PIPELINE_ULTRALYTICS:
+                if frame_stride and int(frame_stride) > 1:
+                    logger.warning("Шаг выборки кадров не поддерживается режимом ultralytics и будет проигнорирован")
+                summary = run_ultralytics_pipeline(
+                    filename, final_video_path, confidence_threshold, work_dir
+                )
+            elif pipeline == PIPELINE_SINGLE_PASS:
+                on_frame = None
+                if progress_callback:
+                    on_frame = lambda done: progress_callback(done, total_frames)
+                summary = run_single_pass(
+                    filename, final_video_path, confidence_threshold, source_fps, on_frame,
+                    batch_size=batch_size,
+                    stride=frame_stride,
+                    keyframe_interval=keyframe_interval,
+                )
+            elif pipeline == PIPELINE_SEGMENTS:
+                on_frame = None
+                if progress_callback:
+                    on_frame = lambda done: progress_callback(done, total_frames)
+                summary = run_segmented(
+                    filename, final_video_path, confidence_threshold, source_fps,
+                    total_frames, work_dir, progress_callback=on_frame,
+                    batch_size=batch_size, stride=frame_stride,
+                    keyframe_interval=keyframe_interval,
+                )
+            else:
+                raise ValueError(f"Неизвестный режим конвейера: {pipeline}")
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        base_filename = os.path.basename(os.path.splitext(filename)[0])
-        new_filename = f"{username}_{timestamp}_{base_filename}.mp4"
-        logger.debug(f"Новое имя файла: {new_filename}")
+        frame_objects = summary.frame_objects
+        has_weapon_or_knife = summary.has_weapon_or_knife
 
-        # Используем временную директорию для файла
-        temp_dir = tempfile.gettempdir()
-        final_video_path = os.path.join(temp_dir, new_filename)
-        logger.debug(f"Путь к временному файлу: {final_video_path}")
-
-        # Проверяем, создала ли модель MP4 файл
-        processed_mp4 = os.path.join(
-            "runs", "detect", "predict", os.path.basename(filename)[:-3] + "mp4"
+        logger.info(
+            f"Обнаружено объектов: {summary.total_weapons} оружия, {summary.total_knives} ножей"
         )
-        processed_avi = os.path.join(
-            "runs", "detect", "predict", os.path.basename(filename)[:-3] + "avi"
+        logger.info(
+            f"Кадров передано модели: {summary.inferred_frames}, пропущено фильтром движения: {summary.gated_frames}"
         )
-
-        if os.path.exists(processed_mp4):
-            # Если модель создала MP4, просто копируем его
-            logger.info(f"Найден MP4 файл, копирование: {processed_mp4}")
-            shutil.copy2(processed_mp4, final_video_path)
-        elif os.path.exists(processed_avi):
-            # Если модель создала AVI, конвертируем в MP4
-            logger.info(f"Найден AVI файл, конвертация: {processed_avi}")
-            conversion_success = convert_avi_to_mp4(processed_avi, final_video_path)
-            if not conversion_success:
-                logger.warning("Конвертация не удалась, пробуем прямое копирование...")
-                shutil.copy2(processed_avi, final_video_path)
-        else:
-            # Ищем любые созданные файлы в директории predict
-            available_files = []
-            if os.path.exists(video_directory):
-                available_files = os.listdir(video_directory)
-
-                # Ищем файл с похожим именем
-                for file in available_files:
-                    if os.path.basename(filename).split(".")[0] in file:
-                        source_path = os.path.join(video_directory, file)
-                        logger.info(f"Найден альтернативный файл: {source_path}")
-
-                        if file.endswith(".mp4"):
-                            shutil.copy2(source_path, final_video_path)
-                            break
-                        elif file.endswith((".avi", ".mov", ".mkv")):
-                            conversion_success = convert_avi_to_mp4(
-                                source_path, final_video_path
-                            )
-                            if not conversion_success:
-                                shutil.copy2(source_path, final_video_path)
-                            break
-                else:
-                    logger.error(
-                        f"Не найдены подходящие файлы в {video_directory}. Доступные файлы: {available_files}"
-                    )
-                    raise FileNotFoundError(
-                        f"Обработанное видео не найдено в директории {video_directory}"
-                    )
-            else:
-                logger.error(f"Директория {video_directory} не существует")
-                raise FileNotFoundError(f"Директория {video_directory} не найдена")
+        if summary.screened_frames:
+            logger.info(
+                f"Каскад: проверено кадров {summary.screened_frames}, "
+                f"передано полному детектору {summary.escalated_frames}"
+            )
+        if summary.tiles:
+            logger.info(
+                f"Участки исходного разрешения: кадров {summary.tiled_frames}, участков {summary.tiles}"
+            )
+        if summary.tracking:
+            logger.info(
+                f"Кадров получено трекером: {summary.tracked_frames}, различных объектов: "
+                f"{summary.distinct_weapons} оружия, {summary.distinct_knives} ножей"
+            )
+        if stats is not None:
+            stats.update({
+                "total_frames": len(frame_objects),
+                "inferred_frames": summary.inferred_frames,
+                "gated_frames": summary.gated_frames,
+            })
+            if summary.screened_frames:
+                stats.update({
+                    "screened_frames": summary.screened_frames,
+                    "escalated_frames": summary.escalated_frames,
+                })
+            if summary.tiles:
+                stats.update({
+                    "tiled_frames": summary.tiled_frames,
+                    "tiles": summary.tiles,
+                })
+            if summary.tracking:
+                stats.update({
+                    "tracked_frames": summary.tracked_frames,
+                    "distinct_weapons": summary.distinct_weapons,
+                    "distinct_knives": summary.distinct_knives,
+                })
 
         # Проверяем, что файл действительно был создан и имеет ненулевой размер
-        if (
+        if render and (
             not os.path.exists(final_video_path)
             or os.path.getsize(final_video_path) == 0
         ):
@@ -177,32 +873,13 @@ def process_video(filename, confidence_threshold=0.25, username=None):
             "height": str(height),
             "processed_date": datetime.now().isoformat(),
         }
+        if not render:
+            metadata["render"] = "false"
 
-        # Загружаем видео в MinIO
-        logger.info(f"Загрузка видео в MinIO: {new_filename}")
-        storage.save_video(final_video_path, new_filename, metadata)
-
-        # Сохраняем результаты детекции в MinIO
-        # frame_objects содержит кортежи (номер_кадра, наличие_оружия, наличие_ножа)
-        # где наличие_оружия и наличие_ножа - булевы значения
-        log_filename = f"{new_filename}.json"
-        logger.info(f"Сохранение лога детекции в MinIO: {log_filename}")
-        storage.save_log(frame_objects, log_filename)
-
-        # Очистка временных файлов модели
-        logger.debug("Очистка временных файлов")
-        if os.path.exists(processed_mp4):
-            os.remove(processed_mp4)
-        if os.path.exists(processed_avi):
-            os.remove(processed_avi)
-        if os.path.exists("runs"):
-            shutil.rmtree("runs")
-            logger.debug("Директория 'runs' удалена")
-
-        # Удаление временного файла
-        if os.path.exists(final_video_path):
-            os.remove(final_video_path)
-            logger.debug(f"Временный файл удален: {final_video_path}")
+        log_filename = save_results(
+            final_video_path, new_filename, metadata,
+            build_detection_log(summary, floor, confidence_threshold)
+        )
 
         logger.info(f"Обработка видео успешно завершена: {new_filename}")
         return new_filename, frame_objects, fps, has_weapon_or_knife, log_filename
@@ -213,3 +890,9 @@ def process_video(filename, confidence_threshold=0.25, username=None):
 
         logger.error(traceback.format_exc())
         raise
+
+    finally:
+        # Удаляем только рабочую директорию этой задачи: выходные файлы
+        # параллельных задач находятся в своих директориях и не затрагиваются
+        shutil.rmtree(work_dir, ignore_errors=True)
+        logger.debug(f"Рабочая директория удалена: {work_dir}")
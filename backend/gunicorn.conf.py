@@ -0,0 +1,30 @@
+"""
+Конфигурация gunicorn для production-запуска API:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+API не выполняет инференс (видео обрабатывает worker.py), поэтому модель
+в процессах сервера не загружается. Приложение импортируется в главном
+процессе до создания процессов-обработчиков (preload_app), и импортированные
+модули остаются в общих страницах памяти (copy-on-write).
+"""
+import os
+import gc
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5174')}"
+# Число процессов-обработчиков HTTP-запросов
+workers = int(os.environ.get("WEB_WORKERS", "2"))
+# Потоки в процессе: запросы в основном ждут MinIO и БД
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", "4"))
+# Загрузка больших видео занимает время
+timeout = int(os.environ.get("WEB_TIMEOUT", "120"))
+preload_app = True
+accesslog = "-"
+
+
+def when_ready(server):
+    """Главный процесс: объекты импортированных модулей исключаются из сборки мусора"""
+    # Иначе сборщик изменяет их заголовки и копирует общие страницы в каждый процесс
+    gc.freeze()
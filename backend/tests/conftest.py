@@ -15,14 +15,11 @@ def app():
     """Создает и настраивает экземпляр Flask для тестирования."""
     with patch('app.api.routes.SECRET_KEY', TEST_SECRET_KEY), \
          patch('app.api.routes.DatabaseManager') as mock_db_manager, \
-         patch('app.api.routes.MinioStorage') as mock_minio:
+         patch('app.api.routes.storage') as mock_storage_instance:
         
         mock_db_instance = MagicMock()
         mock_db_manager.return_value = mock_db_instance
         
-        mock_storage_instance = MagicMock()
-        mock_minio.return_value = mock_storage_instance
-        
         app = create_app({
             'TESTING': True,
             'SECRET_KEY': TEST_SECRET_KEY
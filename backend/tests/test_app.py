@@ -89,13 +89,14 @@ def test_video_upload_to_minio(authenticated_client):
                     content_type='multipart/form-data'
                 )
                 
-            assert response.status_code == 200
+            assert response.status_code == 202
             data = json.loads(response.data)
+            assert 'job_id' in data
             assert 'video_url' in data
-            assert 'frame_objects' in data
-            assert 'fps' in data
+            assert data['status'] == 'pending'
             
-            mock_process.assert_called_once()
+            mock_storage.save_upload.assert_called_once()
+            mock_process.assert_not_called()
 
 @patch('app.api.routes.storage')
 def test_get_video_from_minio(mock_storage, authenticated_client):
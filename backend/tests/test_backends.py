@@ -0,0 +1,70 @@
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+from app.models import backends
+
+
+def test_exported_path():
+    """Тестирует пути экспортированных моделей рядом с чекпоинтом."""
+    assert backends.exported_path("/models/yolo.pt", "onnx") == "/models/yolo.onnx"
+    assert backends.exported_path("/models/yolo.pt", "openvino") == "/models/yolo_openvino_model"
+    assert backends.exported_path("/models/yolo.pt", "pytorch") == "/models/yolo.pt"
+
+def test_export_model_uses_cache(tmp_path):
+    """Тестирует, что экспорт не повторяется, если модель уже экспортирована."""
+    checkpoint = tmp_path / "yolo.pt"
+    checkpoint.write_bytes(b"weights")
+    exported = tmp_path / "yolo.onnx"
+    exported.write_bytes(b"onnx")
+    os.utime(checkpoint, (1, 1))
+
+    with patch('app.models.backends.YOLO') as mock_yolo:
+        path = backends.export_model(str(checkpoint), "onnx")
+
+    assert path == str(exported)
+    mock_yolo.assert_not_called()
+
+def test_export_model_outdated(tmp_path):
+    """Тестирует повторный экспорт после обновления чекпоинта."""
+    checkpoint = tmp_path / "yolo.pt"
+    checkpoint.write_bytes(b"weights")
+    exported = tmp_path / "yolo.onnx"
+    exported.write_bytes(b"onnx")
+    os.utime(exported, (1, 1))
+
+    with patch('app.models.backends.YOLO') as mock_yolo:
+        backends.export_model(str(checkpoint), "onnx")
+
+    mock_yolo.return_value.export.assert_called_once_with(format="onnx", dynamic=True)
+
+def test_select_backend_auto_picks_fastest():
+    """Тестирует выбор самого быстрого доступного бэкенда."""
+    models = {name: MagicMock(name=name) for name in backends.BACKENDS}
+    latency = {"pytorch": 0.05, "onnx": 0.02}
+
+    with patch('app.models.backends.is_available', side_effect=lambda name: name != "openvino"), \
+         patch('app.models.backends.load_backend', side_effect=lambda path, name: models[name]), \
+         patch('app.models.backends.benchmark', side_effect=lambda model: latency[model._mock_name]):
+        model, backend = backends.select_backend("yolo.pt", "auto")
+
+    assert backend == "onnx"
+    assert model is models["onnx"]
+
+def test_select_backend_skips_failed_export():
+    """Тестирует, что бэкенд с ошибкой экспорта пропускается."""
+    def load(path, name):
+        if name == "onnx":
+            raise RuntimeError("export failed")
+        return MagicMock()
+
+    with patch('app.models.backends.is_available', return_value=True), \
+         patch('app.models.backends.load_backend', side_effect=load), \
+         patch('app.models.backends.benchmark', return_value=0.01):
+        _, backend = backends.select_backend("yolo.pt", "auto")
+
+    assert backend == "pytorch"
+
+def test_select_backend_unknown():
+    """Тестирует ошибку для неизвестного бэкенда."""
+    with pytest.raises(ValueError):
+        backends.select_backend("yolo.pt", "tensorrt")
@@ -0,0 +1,125 @@
+import time
+import threading
+import numpy as np
+import pytest
+from unittest.mock import patch
+from app.models.batching import InferenceServer
+from app.services.video_processing import video_processing
+
+
+def _frames(count, value=0):
+    return [np.full((4, 4, 3), value, dtype=np.uint8) for _ in range(count)]
+
+class _RecordingModel:
+    """Мок модели: запоминает размеры пакетов, на каждом кадре одна рамка с уверенностью 0.3 и 0.8."""
+
+    def __init__(self):
+        self.batches = []
+        self.thresholds = []
+
+    def __call__(self, frames, confidence_threshold):
+        self.batches.append(len(frames))
+        self.thresholds.append(confidence_threshold)
+        results = []
+        for frame in frames:
+            rows = np.array([[0, 0, 1, 1, 0.3, 0], [0, 0, 2, 2, 0.8, frame[0, 0, 0]]], dtype=np.float32)
+            results.append(rows[rows[:, 4] >= confidence_threshold])
+        return results
+
+@pytest.fixture
+def recording_model():
+    return _RecordingModel()
+
+def _run_jobs(server, requests):
+    """Запускает задачи в потоках; каждая передает серверу свои кадры с порогом."""
+    results = [None] * len(requests)
+    ready = threading.Barrier(len(requests))
+
+    def job(index, frames, threshold):
+        with server.session():
+            ready.wait()
+            results[index] = server.infer(frames, threshold)
+            ready.wait()
+
+    threads = [threading.Thread(target=job, args=(i, *request)) for i, request in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_server_batches_concurrent_jobs(recording_model):
+    """Тестирует объединение запросов одновременных задач в один пакет модели."""
+    server = InferenceServer(recording_model, max_batch_size=16, max_wait=5).start()
+    try:
+        results = _run_jobs(server, [(_frames(2, value), 0.5) for value in (0, 1, 2)])
+    finally:
+        server.stop()
+
+    assert recording_model.batches == [6]
+    # Каждая задача получает детекции своих кадров
+    assert [[int(rows[0, 5]) for rows in result] for result in results] == [[0, 0], [1, 1], [2, 2]]
+    assert server.batches == 1
+    assert server.frames == 6
+
+def test_server_single_job_does_not_wait(recording_model):
+    """Тестирует, что единственная задача не ждет запросов других задач."""
+    server = InferenceServer(recording_model, max_batch_size=16, max_wait=5).start()
+    try:
+        with server.session():
+            started = time.perf_counter()
+            server.infer(_frames(2), 0.5)
+            server.infer(_frames(3), 0.5)
+            elapsed = time.perf_counter() - started
+    finally:
+        server.stop()
+
+    assert elapsed < 1
+    assert recording_model.batches == [2, 3]
+
+def test_server_respects_max_batch_size(recording_model):
+    """Тестирует, что запрос, не помещающийся в пакет, открывает следующий."""
+    server = InferenceServer(recording_model, max_batch_size=4, max_wait=0.2).start()
+    try:
+        _run_jobs(server, [(_frames(3), 0.5), (_frames(3), 0.5)])
+    finally:
+        server.stop()
+
+    assert recording_model.batches == [3, 3]
+
+def test_server_filters_by_request_threshold(recording_model):
+    """Тестирует запуск модели с наименьшим порогом пакета и фильтрацию по порогу запроса."""
+    server = InferenceServer(recording_model, max_batch_size=16, max_wait=5).start()
+    try:
+        low, high = _run_jobs(server, [(_frames(1), 0.2), (_frames(1), 0.6)])
+    finally:
+        server.stop()
+
+    assert recording_model.thresholds == [0.2]
+    assert len(low[0]) == 2
+    assert len(high[0]) == 1
+
+def test_server_propagates_errors():
+    """Тестирует передачу ошибки модели вызывающей задаче."""
+    def failing_model(frames, confidence_threshold):
+        raise RuntimeError("ошибка модели")
+
+    server = InferenceServer(failing_model, max_wait=0).start()
+    try:
+        with pytest.raises(RuntimeError, match="ошибка модели"):
+            server.infer(_frames(1), 0.5)
+        assert server.infer([], 0.5) == []
+    finally:
+        server.stop()
+
+def test_predict_batch_uses_server(recording_model):
+    """Тестирует передачу кадров серверу инференса, если он включен."""
+    server = InferenceServer(recording_model, max_wait=0).start()
+    try:
+        with patch('app.services.video_processing.video_processing.batching.get_server', return_value=server):
+            detections = video_processing.predict_batch(_frames(2), 0.5)
+    finally:
+        server.stop()
+
+    assert recording_model.batches == [2]
+    assert [len(rows) for rows in detections] == [1, 1]
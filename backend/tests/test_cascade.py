@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from app.models import cascade
+from app.models.cascade import CascadeDetector
+from app.models.cascade_benchmark import benchmark_cascade
+from app.services.video_processing import video_processing
+from app.services.video_processing.detections import DetectionSummary
+
+
+def _frame_result(class_ids):
+    """Создает мок результата модели для одного кадра."""
+    frame_result = MagicMock()
+    frame_result.boxes.cls = np.array(class_ids, dtype=np.float32)
+    frame_result.boxes.conf = np.full(len(class_ids), 0.9, dtype=np.float32)
+    frame_result.boxes.xyxy = np.array([[10, 10, 50, 50]] * len(class_ids), dtype=np.float32).reshape(-1, 4)
+    return frame_result
+
+def _frames(*values):
+    """Кадры, значение пикселей которых отмечает наличие объекта (1 - есть)."""
+    return [np.full((48, 64, 3), value, dtype=np.uint8) for value in values]
+
+def _model(names=None):
+    """Мок модели: рамка оружия на кадрах со значением пикселей 1."""
+    mock_model = MagicMock()
+    mock_model.names = names or {0: "weapon", 1: "knife"}
+    mock_model.predict.side_effect = lambda frames, **kwargs: [
+        _frame_result([0] if frame[0, 0, 0] else []) for frame in (frames if isinstance(frames, list) else [frames])
+    ]
+    return mock_model
+
+def test_cascade_runs_detector_on_candidates_only():
+    """Тестирует запуск полного детектора только на кадрах, отобранных проверкой."""
+    detector, screen_model = _model(), _model()
+    cascade = CascadeDetector(detector, screen_model, screen_imgsz=256, screen_threshold=0.05)
+
+    detections, escalated = cascade.detect(_frames(0, 1, 0, 1), 0.1)
+
+    assert escalated == 2
+    assert [len(frame_detections) for frame_detections in detections] == [0, 1, 0, 1]
+    assert screen_model.predict.call_args[1]["imgsz"] == 256
+    assert screen_model.predict.call_args[1]["conf"] == 0.05
+    assert len(detector.predict.call_args[0][0]) == 2
+    assert cascade.counters.screened_frames == 4
+    assert cascade.counters.escalated_frames == 2
+    assert cascade.counters.escalation_rate == 0.5
+
+    # Кадры без кандидатов не передаются полному детектору
+    detector.predict.reset_mock()
+    detections, escalated = cascade.detect(_frames(0, 0), 0.1)
+    assert escalated == 0
+    assert [len(frame_detections) for frame_detections in detections] == [0, 0]
+    detector.predict.assert_not_called()
+
+def test_predict_batch_counts_cascade_stages():
+    """Тестирует счетчики стадий каскада в сводке обработки."""
+    cascade = CascadeDetector(_model(), _model(), screen_imgsz=256)
+    summary = DetectionSummary({0: "weapon", 1: "knife"})
+
+    with patch('app.services.video_processing.video_processing.cascade.get_cascade', return_value=cascade):
+        detections = video_processing.predict_batch(_frames(1, 0, 0), 0.1, summary)
+
+    assert [len(frame_detections) for frame_detections in detections] == [1, 0, 0]
+    assert summary.screened_frames == 3
+    assert summary.escalated_frames == 1
+
+def test_benchmark_cascade_report():
+    """Тестирует отчет сравнения каскада с полным детектором."""
+    cascade = CascadeDetector(_model(), _model(), screen_imgsz=256)
+
+    report = benchmark_cascade(cascade, _frames(0, 1, 0, 0, 1, 0), batch_size=4)
+
+    assert report["frames"] == 6
+    assert report["full"]["positive_frames"] == 2
+    assert report["cascade"]["screened_frames"] == 6
+    assert report["cascade"]["escalated_frames"] == 2
+    assert report["frame_recall"] == 1.0
+    assert report["speedup"] > 0
+
+def test_check_configuration_rejects_shared_backends():
+    """Тестирует отказ от запуска каскада вместе с сервером инференса или процессом инференса."""
+    with patch.object(cascade, 'CASCADE_SCREEN_IMGSZ', 0), \
+         patch.object(cascade.batching, 'INFERENCE_SERVER_ENABLED', True):
+        cascade.check_configuration()
+
+    with patch.object(cascade, 'CASCADE_SCREEN_IMGSZ', 320):
+        with patch.object(cascade.batching, 'INFERENCE_SERVER_ENABLED', True), \
+             pytest.raises(ValueError, match="INFERENCE_SERVER"):
+            cascade.check_configuration()
+        with patch.object(cascade.inference_process, 'MODEL_PROCESS_ENABLED', True), \
+             pytest.raises(ValueError, match="MODEL_PROCESS"):
+            cascade.check_configuration()
+        cascade.check_configuration()
@@ -297,4 +297,131 @@ def test_delete_video_error(db_manager):
     assert "Ошибка при удалении видео" in error
     
     # Проверяем, что метод transaction был вызван
-    db_manager.transaction.assert_called_once() 
\ No newline at end of file
+    db_manager.transaction.assert_called_once() 
+def test_create_video_job(db_manager):
+    """Тестирует создание видео и задачи обработки в одной транзакции."""
+    video_id = uuid.uuid4()
+    job_id = uuid.uuid4()
+    db_manager._mock_cursor.fetchone.side_effect = [{"video_id": video_id}, {"job_id": job_id}]
+
+    result, error = db_manager.create_video_job(
+        uuid.uuid4(), "testuser_video.mp4", "videos", {"username": "testuser"}, {"upload_key": "temp.mp4"}
+    )
+
+    assert error is None
+    assert result == {"job_id": job_id, "video_id": video_id}
+    assert db_manager._mock_cursor.execute.call_count == 2
+    db_manager._mock_conn.commit.assert_called_once()
+
+def test_claim_job(db_manager):
+    """Тестирует захват задачи без блокировки других обработчиков."""
+    job = {"job_id": uuid.uuid4(), "attempts": 1}
+    db_manager.execute_query = MagicMock(return_value=(job, None))
+
+    result = db_manager.claim_job("worker-1", 60)
+
+    assert result == job
+    query, params = db_manager.execute_query.call_args[0]
+    assert "FOR UPDATE SKIP LOCKED" in query
+    assert params == ("worker-1", 60)
+
+def test_heartbeat_job(db_manager):
+    """Тестирует продление аренды задачи."""
+    db_manager.execute_query = MagicMock(return_value=({"job_id": "job-1"}, None))
+    assert db_manager.heartbeat_job("job-1", "worker-1", 60, 40) == (True, None)
+
+    # Задача перешла к другому обработчику
+    db_manager.execute_query = MagicMock(return_value=(None, None))
+    assert db_manager.heartbeat_job("job-1", "worker-1", 60, 40) == (False, None)
+
+def test_fail_job(db_manager):
+    """Тестирует возврат задачи в очередь и окончательный провал."""
+    video_id = uuid.uuid4()
+    db_manager._mock_cursor.fetchone.return_value = {"video_id": video_id, "status": "pending"}
+    assert db_manager.fail_job("job-1", "worker-1", "ошибка") == (False, None)
+
+    db_manager._mock_cursor.fetchone.return_value = {"video_id": video_id, "status": "failed"}
+    assert db_manager.fail_job("job-1", "worker-1", "ошибка") == (True, None)
+
+def test_complete_job(db_manager):
+    """Тестирует сохранение результатов и завершение задачи в одной транзакции при действующей аренде."""
+    video_id = uuid.uuid4()
+    db_manager._mock_cursor.fetchone.side_effect = [{"job_id": "job-1"}, {"user_id": uuid.uuid4()}]
+
+    assert db_manager.complete_job(
+        "job-1", "worker-1", video_id, "video.mp4.detections.npz", True, {"fps": "30"}
+    ) == (True, None)
+
+    queries = [call[0][0] for call in db_manager._mock_cursor.execute.call_args_list]
+    assert "status = 'processing' AND lease_expires_at > NOW()" in queries[0]
+    assert "metadata" in queries[1]
+    assert "ON CONFLICT (video_id) DO UPDATE" in queries[2]
+    db_manager._mock_conn.commit.assert_called_once()
+
+def test_complete_job_lease_lost(db_manager):
+    """Тестирует, что задача другого обработчика или с истекшей арендой не завершается."""
+    db_manager._mock_cursor.fetchone.return_value = None
+
+    assert db_manager.complete_job("job-1", "worker-1", uuid.uuid4(), "video.mp4.json", False) == (False, None)
+
+    # Результаты и статус видео не изменяются
+    assert db_manager._mock_cursor.execute.call_count == 1
+
+def test_create_cached_video(db_manager):
+    """Тестирует создание обработанного видео из кэша результатов в одной транзакции."""
+    video_id = uuid.uuid4()
+    db_manager._mock_cursor.fetchone.return_value = {"video_id": video_id}
+
+    result, error = db_manager.create_cached_video(
+        uuid.uuid4(), "testuser_video.mp4", "videos", {"fps": "30"},
+        "testuser_video.mp4.json", "logs", True, "a" * 64
+    )
+
+    assert error is None
+    assert result == video_id
+    queries = [call[0][0] for call in db_manager._mock_cursor.execute.call_args_list]
+    assert "'completed'" in queries[0]
+    assert "detection_results" in queries[1]
+    assert "hits = hits + 1" in queries[2]
+    db_manager._mock_conn.commit.assert_called_once()
+
+def test_check_connection(db_manager):
+    """Тестирует проверку доступности базы данных запросом SELECT 1."""
+    db_manager.execute_query = MagicMock(return_value=((1,), None))
+    assert db_manager.check_connection() is True
+
+    db_manager.execute_query = MagicMock(return_value=(None, "Ошибка подключения к БД"))
+    assert db_manager.check_connection() is False
+
+def test_count_videos_with_original(db_manager):
+    """Тестирует подсчет видео, ссылающихся на сохраненное исходное видео."""
+    db_manager.execute_query = MagicMock(return_value=({"count": 2}, None))
+    assert db_manager.count_videos_with_original("originals/a.mp4") == 2
+    assert "metadata->>'original_key' = %s" in db_manager.execute_query.call_args[0][0]
+
+    db_manager.execute_query = MagicMock(return_value=(None, "Ошибка подключения к БД"))
+    assert db_manager.count_videos_with_original("originals/a.mp4") is None
+
+def test_get_cached_result(db_manager):
+    """Тестирует поиск результата в кэше по возможным ключам."""
+    db_manager.execute_query = MagicMock(return_value=({"cache_key": "a" * 64}, None))
+
+    assert db_manager.get_cached_result(("a" * 64, "b" * 64)) == {"cache_key": "a" * 64}
+
+    query, params = db_manager.execute_query.call_args[0]
+    assert "WHERE cache_key = ANY(%s)" in query
+    assert params == (["a" * 64, "b" * 64],)
+
+def test_save_cached_result(db_manager):
+    """Тестирует сохранение результата обработки в кэш."""
+    db_manager.execute_query = MagicMock(return_value=(None, None))
+
+    assert db_manager.save_cached_result(
+        "a" * 64, "b" * 64, "pytorch:0123", 0.6, {"frame_stride": 1},
+        "testuser_video.mp4", "videos", "testuser_video.mp4.json", "logs", False, {"fps": "30"}
+    ) == (True, None)
+
+    query, params = db_manager.execute_query.call_args[0]
+    assert "ON CONFLICT (cache_key)" in query
+    assert params[0] == "a" * 64
+    assert json.loads(params[4]) == {"frame_stride": 1}
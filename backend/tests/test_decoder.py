@@ -0,0 +1,111 @@
+import os
+import tempfile
+import subprocess
+
+import cv2
+import numpy as np
+import pytest
+
+from app.services.video_processing import decoder, video_processing
+from app.services.video_processing.encoder import get_ffmpeg_binary
+from app.services.video_processing.detections import scale_boxes
+
+
+@pytest.fixture
+def large_video_file():
+    """Создает временное видео 1280x720, кадры которого пронумерованы яркостью."""
+    temp_file = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+    temp_file.close()
+
+    writer = cv2.VideoWriter(temp_file.name, cv2.VideoWriter_fourcc(*'mp4v'), 30, (1280, 720))
+    for i in range(6):
+        writer.write(np.full((720, 1280, 3), i * 40, dtype=np.uint8))
+    writer.release()
+
+    yield temp_file.name
+
+    if os.path.exists(temp_file.name):
+        os.remove(temp_file.name)
+
+def test_inference_size():
+    """Тестирует размер входа модели с сохранением пропорций кадра."""
+    assert decoder.inference_size(3840, 2160, 640) == (640, 360)
+    assert decoder.inference_size(720, 1280, 640) == (360, 640)
+    # Кадры не больше imgsz не уменьшаются
+    assert decoder.inference_size(640, 480, 640) is None
+    assert decoder.inference_size(1920, 1080, 0) is None
+
+def test_fit_inference_size():
+    """Тестирует уменьшение кадра до входа модели и множители координат."""
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+    resized, scale = decoder.fit_inference_size(frame, 640)
+
+    assert resized.shape == (360, 640, 3)
+    assert scale == (3.0, 3.0)
+    small = np.zeros((480, 640, 3), dtype=np.uint8)
+    assert decoder.fit_inference_size(small, 640) == (small, None)
+
+def test_scale_boxes():
+    """Тестирует перевод рамок в координаты исходного кадра без изменения входного массива."""
+    detections = np.array([[10, 20, 30, 40, 0.9, 0]], dtype=np.float32)
+
+    scaled = scale_boxes(detections, (2.0, 3.0))
+
+    np.testing.assert_allclose(scaled[0], [20, 60, 60, 120, 0.9, 0], rtol=1e-6)
+    assert detections[0, 0] == 10
+    assert scale_boxes(detections, None) is detections
+
+def test_read_scaled_frames(large_video_file):
+    """Тестирует декодирование ffmpeg в уменьшенном размере с первого и до последнего кадра."""
+    frames = list(decoder.read_scaled_frames(large_video_file, (640, 360), 30))
+
+    assert len(frames) == 6
+    assert all(frame.shape == (360, 640, 3) for frame in frames)
+
+    segment = list(decoder.read_scaled_frames(large_video_file, (640, 360), 30, start_frame=2, end_frame=4))
+
+    assert len(segment) == 2
+    # Кадры сегмента совпадают с кадрами полного декодирования
+    assert abs(int(segment[0].mean()) - int(frames[2].mean())) <= 2
+    assert abs(int(segment[1].mean()) - int(frames[3].mean())) <= 2
+
+def test_read_scaled_frames_invalid_file(tmp_path):
+    """Тестирует ошибку декодирования файла, который не является видео."""
+    path = tmp_path / "broken.mp4"
+    path.write_bytes(b"not a video")
+
+    with pytest.raises(RuntimeError):
+        list(decoder.read_scaled_frames(str(path), (64, 36), 30))
+
+def test_benchmark_decode_report(large_video_file):
+    """Тестирует отчет сравнения декодирования с уменьшением и полного декодирования."""
+    from app.services.video_processing.decode_benchmark import benchmark_decode
+
+    report = benchmark_decode(large_video_file, imgsz=640, max_frames=4)
+
+    assert report["source_size"] == "1280x720"
+    assert report["inference_size"] == "640x360"
+    assert report["scaled"]["frames"] == report["opencv"]["frames"] == 4
+    assert report["speedup"] > 0
+    with pytest.raises(ValueError):
+        benchmark_decode(large_video_file, imgsz=1280)
+
+def test_read_scaled_frames_variable_frame_rate(tmp_path):
+    """Тестирует, что при переменной частоте кадров ffmpeg не повторяет и не отбрасывает кадры."""
+    path = str(tmp_path / "vfr.mp4")
+    # После 30-го кадра пауза 1 с: при постоянной частоте вывода кадр повторился бы
+    subprocess.run([
+        get_ffmpeg_binary(), "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", "testsrc=size=320x240:rate=25",
+        "-frames:v", "60", "-vf", "setpts=N/25/TB+gte(N\\,30)/TB", "-fps_mode", "passthrough",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", path,
+    ], check=True)
+
+    frames = list(video_processing.read_frames(path))
+    scaled = list(decoder.read_scaled_frames(path, (160, 120), 25))
+
+    assert len(scaled) == len(frames)
+    # Кадры совпадают по порядку: уменьшенный кадр похож на исходный
+    for index in (29, 30, len(frames) - 1):
+        assert abs(float(scaled[index].mean()) - float(frames[index].mean())) < 3
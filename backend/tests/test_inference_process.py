@@ -0,0 +1,74 @@
+import os
+import numpy as np
+import pytest
+from unittest.mock import patch
+from app.models.inference_process import FrameRing, InferenceProcessClient
+from app.services.video_processing import video_processing
+
+
+def _mean_predict(frames, confidence_threshold):
+    """Детекции процесса инференса: рамка размером с кадр, уверенность - средняя яркость."""
+    detections = []
+    for frame in frames:
+        if frame[0, 0, 0] == 255:
+            raise ValueError("поврежденный кадр")
+        height, width = frame.shape[:2]
+        detections.append(np.array([[0, 0, width, height, frame.mean() / 255, 0]], dtype=np.float32))
+    return detections
+
+def _frame(value, size=(8, 8)):
+    return np.full((*size, 3), value, dtype=np.uint8)
+
+@pytest.fixture(scope="module")
+def client():
+    """Процесс инференса с двумя ячейками буфера по размеру кадра 8x8."""
+    client = InferenceProcessClient(_mean_predict, slots=2, slot_bytes=8 * 8 * 3)
+    yield client
+    client.close()
+
+def test_frame_ring_views_shared_memory():
+    """Тестирует чтение кадра из ячейки буфера без копирования."""
+    ring = FrameRing(slots=2, slot_bytes=64)
+    try:
+        slot = ring.acquire()
+        descriptor = ring.write(slot, np.arange(12, dtype=np.uint8).reshape(2, 2, 3))
+        attached = FrameRing(slots=2, slot_bytes=64, name=ring.name)
+        frame = attached.read(descriptor)
+
+        assert frame.tolist() == np.arange(12).reshape(2, 2, 3).tolist()
+        assert np.shares_memory(frame, attached.view(slot, (2, 2, 3)))
+        assert not ring.fits(np.zeros((8, 8, 3), dtype=np.uint8))
+        del frame
+        attached.close()
+    finally:
+        ring.close()
+
+def test_client_runs_frames_in_inference_process(client):
+    """Тестирует передачу кадров через буфер пакетами по числу ячеек."""
+    values = [10, 50, 100, 150, 200]
+
+    detections = client.infer([_frame(value) for value in values], 0.1)
+
+    assert client.process.pid != os.getpid()
+    assert [round(float(rows[0, 4]) * 255) for rows in detections] == values
+
+def test_client_sends_oversized_frames_through_pipe(client):
+    """Тестирует передачу кадра, не помещающегося в ячейку, через канал."""
+    detections = client.infer([_frame(30), _frame(60, size=(16, 16))], 0.1)
+
+    assert detections[1][0, :4].tolist() == [0, 0, 16, 16]
+    assert round(float(detections[1][0, 4]) * 255) == 60
+
+def test_client_propagates_errors(client):
+    """Тестирует передачу ошибки процесса инференса и освобождение ячеек."""
+    with pytest.raises(RuntimeError, match="поврежденный кадр"):
+        client.infer([_frame(255), _frame(1)], 0.1)
+
+    assert len(client.infer([_frame(1), _frame(2)], 0.1)) == 2
+
+def test_predict_batch_uses_inference_process(client):
+    """Тестирует выполнение модели в процессе инференса в режиме MODEL_PROCESS."""
+    with patch('app.services.video_processing.video_processing.inference_process.get_client', return_value=client):
+        detections = video_processing.predict_batch([_frame(20)], 0.1)
+
+    assert round(float(detections[0][0, 4]) * 255) == 20
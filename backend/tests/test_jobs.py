@@ -0,0 +1,316 @@
+import pytest
+import uuid
+from unittest.mock import patch, MagicMock, ANY
+from app.services import cache
+from app.services.jobs import VideoJobWorker
+from app.services.jobs import worker as worker_module
+from app.services.jobs.worker import JobHeartbeat, JobLeaseLost
+
+
+@pytest.fixture
+def worker():
+    """Создает обработчик очереди с мокированными БД и хранилищем."""
+    db_manager = MagicMock()
+    storage = MagicMock()
+    storage.get_upload.return_value = True
+    storage.object_exists.return_value = False
+    db_manager.fail_expired_jobs.return_value = []
+    db_manager.complete_job.return_value = (True, None)
+    db_manager.heartbeat_job.return_value = (True, None)
+    db_manager.fail_job.return_value = (False, None)
+    return VideoJobWorker(
+        db_manager=db_manager, storage=storage, poll_interval=0, heartbeat_interval=60
+    )
+
+@pytest.fixture
+def claimed_job():
+    """Задача, взятая из очереди."""
+    return {
+        "job_id": uuid.uuid4(),
+        "video_id": uuid.uuid4(),
+        "user_id": uuid.uuid4(),
+        "s3_key": "testuser_20230101_120000_video.mp4",
+        "status": "processing",
+        "attempts": 1,
+        "payload": {
+            "username": "testuser",
+            "upload_key": "temp_video_1_testuser.mp4",
+            "confidence_threshold": 0.6,
+            "frame_stride": 2,
+            "content_hash": "c" * 64
+        }
+    }
+
+def test_run_once_empty_queue(worker):
+    """Тестирует опрос пустой очереди."""
+    worker.db_manager.claim_job.return_value = None
+
+    assert worker.run_once() is False
+    worker.db_manager.claim_job.assert_called_once_with(worker.worker_id, worker.lease_seconds)
+
+def test_run_once_cleans_expired_jobs(worker):
+    """Тестирует удаление исходных видео задач с истекшей арендой и исчерпанными попытками."""
+    worker.db_manager.claim_job.return_value = None
+    worker.db_manager.fail_expired_jobs.return_value = [
+        {"video_id": uuid.uuid4(), "payload": {"upload_key": "temp_video_2_testuser.mp4"}}
+    ]
+
+    worker.run_once()
+
+    worker.storage.delete_upload.assert_called_once_with("temp_video_2_testuser.mp4")
+
+def test_process_job_success(worker, claimed_job):
+    """Тестирует успешную обработку задачи из очереди."""
+    worker.db_manager.claim_job.return_value = claimed_job
+    frame_objects = [(0, True, False), (1, False, False)]
+
+    def process_video(*args, stats=None, **kwargs):
+        stats.update({"inferred_frames": 1, "gated_frames": 1})
+        return claimed_job["s3_key"], frame_objects, 30, True, f"{claimed_job['s3_key']}.json"
+
+    with patch('app.services.jobs.worker.video_processing.process_video', side_effect=process_video) as mock_process:
+        assert worker.run_once() is True
+
+    args, kwargs = mock_process.call_args
+    assert args[0].endswith(claimed_job["payload"]["upload_key"])
+    assert args[1:] == (0.6, "testuser")
+    assert kwargs["output_name"] == claimed_job["s3_key"]
+    assert kwargs["frame_stride"] == 2
+
+    worker.db_manager.complete_job.assert_called_once_with(
+        claimed_job["job_id"], worker.worker_id, claimed_job["video_id"],
+        f"{claimed_job['s3_key']}.json", True, ANY
+    )
+    metadata = worker.db_manager.complete_job.call_args[0][5]
+    assert metadata["detection_count"] == "1"
+    assert metadata["gated_frames"] == "1"
+    worker.db_manager.fail_job.assert_not_called()
+    # Исходное видео сохраняется для повторной отрисовки с другим порогом
+    worker.storage.rename_object.assert_called_once_with(
+        worker.storage.upload_bucket, "temp_video_1_testuser.mp4", f"originals/{'c' * 64}.mp4"
+    )
+    assert metadata["original_key"] == f"originals/{'c' * 64}.mp4"
+    worker.storage.delete_upload.assert_not_called()
+
+def test_process_job_reuses_stored_original(worker, claimed_job):
+    """Тестирует повторное использование исходного видео с тем же содержимым вместо новой копии."""
+    worker.storage.object_exists.return_value = True
+
+    with patch('app.services.jobs.worker.video_processing.process_video') as mock_process:
+        mock_process.return_value = (claimed_job["s3_key"], [], 30, False, f"{claimed_job['s3_key']}.json")
+        worker.process_job(claimed_job)
+
+    worker.storage.object_exists.assert_called_once_with(worker.storage.upload_bucket, f"originals/{'c' * 64}.mp4")
+    worker.storage.rename_object.assert_not_called()
+    worker.storage.copy_object.assert_not_called()
+    worker.storage.delete_upload.assert_called_once_with("temp_video_1_testuser.mp4")
+    assert worker.db_manager.complete_job.call_args[0][5]["original_key"] == f"originals/{'c' * 64}.mp4"
+
+def test_process_job_detection_only(worker, claimed_job):
+    """Тестирует обработку без размеченного видео."""
+    claimed_job["payload"]["render"] = False
+
+    with patch('app.services.jobs.worker.video_processing.process_video') as mock_process:
+        mock_process.return_value = (claimed_job["s3_key"], [(0, True, False)], 30, True, f"{claimed_job['s3_key']}.detections.npz")
+        worker.process_job(claimed_job)
+
+    assert mock_process.call_args[1]["render"] is False
+    metadata = worker.db_manager.complete_job.call_args[0][5]
+    assert metadata["render"] == "false"
+
+def test_process_job_without_keeping_original(worker, claimed_job):
+    """Тестирует удаление исходного видео, если исходные видео не сохраняются."""
+    with patch('app.services.jobs.worker.video_processing.KEEP_ORIGINALS', False), \
+         patch('app.services.jobs.worker.video_processing.process_video') as mock_process:
+        mock_process.return_value = (claimed_job["s3_key"], [], 30, False, f"{claimed_job['s3_key']}.json")
+        worker.process_job(claimed_job)
+
+    worker.storage.rename_object.assert_not_called()
+    worker.storage.delete_upload.assert_called_once_with("temp_video_1_testuser.mp4")
+
+def test_process_render_job(worker, claimed_job):
+    """Тестирует отрисовку сохраненных детекций с новым порогом без запуска модели."""
+    detection_log = {"floor": 0.1, "total_frames": 2, "names": '{"0": "weapon"}'}
+    claimed_job["payload"] = {
+        "type": "render",
+        "username": "testuser",
+        "source_video": "testuser_20230101_110000_video.mp4",
+        "original_key": "originals/testuser_20230101_110000_video.mp4",
+        "confidence_threshold": 0.8
+    }
+    worker.storage.get_detection_log.return_value = detection_log
+
+    with patch('app.services.jobs.worker.video_processing.process_video') as mock_process, \
+         patch('app.services.jobs.worker.video_processing.rerender_video') as mock_render:
+        mock_render.return_value = (claimed_job["s3_key"], [(0, False, False)], 30, False, f"{claimed_job['s3_key']}.json")
+        worker.process_job(claimed_job)
+
+    mock_process.assert_not_called()
+    worker.storage.get_upload.assert_called_once_with(
+        "originals/testuser_20230101_110000_video.mp4", ANY
+    )
+    worker.storage.get_detection_log.assert_called_once_with("testuser_20230101_110000_video.mp4.detections.npz")
+    args, kwargs = mock_render.call_args
+    assert args[1:] == (detection_log, 0.8, "testuser")
+    assert kwargs["output_name"] == claimed_job["s3_key"]
+    # Результат ссылается на то же исходное видео, копия не создается
+    assert worker.db_manager.complete_job.call_args[0][5]["original_key"] == "originals/testuser_20230101_110000_video.mp4"
+    worker.storage.copy_object.assert_not_called()
+    worker.storage.rename_object.assert_not_called()
+    worker.storage.delete_upload.assert_not_called()
+    worker.db_manager.complete_job.assert_called_once()
+
+def test_process_job_saves_result_to_cache(worker, claimed_job):
+    """Тестирует сохранение результата в кэш под ключом из версии модели и параметров обработчика."""
+    claimed_job["payload"].update({"cache": True, "content_hash": "b" * 64})
+    worker.storage.video_bucket = "videos"
+    worker.storage.log_bucket = "logs"
+    log_filename = f"{claimed_job['s3_key']}.json"
+
+    # Бэкенд модели выбран в процессе обработчика (MODEL_BACKEND=auto)
+    with patch('app.services.jobs.worker.video_processing.process_video') as mock_process, \
+         patch.object(worker_module.model, 'model_version', return_value="onnx_int8:0123"):
+        mock_process.return_value = (claimed_job["s3_key"], [(0, True, False)], 30, True, log_filename)
+        worker.process_job(claimed_job)
+
+    args = worker.db_manager.save_cached_result.call_args[0]
+    options = cache.pipeline_options(2, True)
+    # Ключ совпадает с ключом, который ищет API развертывания с тем же бэкендом
+    with patch.object(worker_module.model, 'weights_hash', return_value="0123"), \
+         patch.object(worker_module.model, 'model_backend', "onnx_int8"):
+        assert args[0] in cache.lookup_keys("b" * 64, 0.6, 2, True)
+    assert args[:9] == (
+        cache.build_cache_key("b" * 64, "onnx_int8:0123", 0.6, options), "b" * 64, "onnx_int8:0123", 0.6, options,
+        claimed_job["s3_key"], "videos", log_filename, "logs"
+    )
+    assert args[9] is True
+    assert args[10]["fps"] == "30"
+    assert "processed_date" not in args[10]
+
+def test_process_job_failure_is_retried(worker, claimed_job):
+    """Тестирует возврат задачи в очередь, пока попытки не исчерпаны."""
+    with patch('app.services.jobs.worker.video_processing.process_video') as mock_process:
+        mock_process.side_effect = ValueError("Не удалось открыть видеофайл")
+        worker.process_job(claimed_job)
+
+    worker.db_manager.fail_job.assert_called_once_with(
+        claimed_job["job_id"], worker.worker_id, "Не удалось открыть видеофайл"
+    )
+    worker.db_manager.complete_job.assert_not_called()
+    # Исходное видео понадобится следующей попытке
+    worker.storage.delete_upload.assert_not_called()
+
+def test_process_job_final_failure(worker, claimed_job):
+    """Тестирует удаление исходного видео после последней неудачной попытки."""
+    worker.db_manager.fail_job.return_value = (True, None)
+
+    with patch('app.services.jobs.worker.video_processing.process_video') as mock_process:
+        mock_process.side_effect = ValueError("Не удалось открыть видеофайл")
+        worker.process_job(claimed_job)
+
+    worker.storage.delete_upload.assert_called_once_with("temp_video_1_testuser.mp4")
+
+def test_process_job_lease_lost(worker, claimed_job):
+    """Тестирует, что задача с потерянной арендой не изменяется обработчиком."""
+    def process_video(*args, progress_callback=None, **kwargs):
+        worker.db_manager.heartbeat_job.return_value = (False, None)
+        heartbeat = progress_callback.__self__
+        heartbeat.beat()
+        progress_callback(1, 10)
+
+    with patch('app.services.jobs.worker.video_processing.process_video', side_effect=process_video):
+        worker.process_job(claimed_job)
+
+    worker.db_manager.fail_job.assert_not_called()
+    worker.db_manager.complete_job.assert_not_called()
+    worker.storage.delete_upload.assert_not_called()
+
+def test_process_job_lease_lost_before_completion(worker, claimed_job):
+    """Тестирует, что исходное видео не переносится, если аренда истекла до сохранения результатов."""
+    worker.db_manager.complete_job.return_value = (False, None)
+
+    with patch('app.services.jobs.worker.video_processing.process_video') as mock_process:
+        mock_process.return_value = (claimed_job["s3_key"], [(0, True, False)], 30, True, f"{claimed_job['s3_key']}.json")
+        worker.process_job(claimed_job)
+
+    # Задачу повторит другой обработчик: исходное видео остается на месте
+    worker.storage.rename_object.assert_not_called()
+    worker.storage.delete_upload.assert_not_called()
+    worker.db_manager.fail_job.assert_not_called()
+    worker.db_manager.add_log.assert_not_called()
+    worker.db_manager.save_cached_result.assert_not_called()
+
+def test_process_job_original_not_kept(worker, claimed_job):
+    """Тестирует удаление ссылки на исходное видео, если его не удалось перенести после завершения задачи."""
+    worker.storage.rename_object.return_value = False
+
+    with patch('app.services.jobs.worker.video_processing.process_video') as mock_process:
+        mock_process.return_value = (claimed_job["s3_key"], [], 30, False, f"{claimed_job['s3_key']}.json")
+        worker.process_job(claimed_job)
+
+    worker.db_manager.update_video_metadata.assert_called_once_with(claimed_job["video_id"], {"original_key": None})
+    worker.storage.delete_upload.assert_called_once_with("temp_video_1_testuser.mp4")
+    worker.db_manager.fail_job.assert_not_called()
+
+def test_heartbeat_reports_progress(worker):
+    """Тестирует сохранение прогресса при продлении аренды."""
+    heartbeat = JobHeartbeat(worker.db_manager, "job-1", worker.worker_id, lease_seconds=60)
+
+    heartbeat.report_progress(50, 100)
+    heartbeat.beat()
+    heartbeat.report_progress(100, 100)
+    heartbeat.beat()
+
+    progress_values = [call[0][3] for call in worker.db_manager.heartbeat_job.call_args_list]
+    assert progress_values == [50, 99]
+    assert not heartbeat.lease_lost.is_set()
+
+def test_heartbeat_database_error_keeps_lease(worker):
+    """Тестирует, что ошибка БД при продлении аренды не прерывает обработку."""
+    worker.db_manager.heartbeat_job.return_value = (False, "connection refused")
+    heartbeat = JobHeartbeat(worker.db_manager, "job-1", worker.worker_id)
+
+    heartbeat.beat()
+
+    assert not heartbeat.lease_lost.is_set()
+    heartbeat.report_progress(1, 10)
+
+def test_heartbeat_lease_lost(worker):
+    """Тестирует остановку обработки после потери аренды."""
+    worker.db_manager.heartbeat_job.return_value = (False, None)
+    heartbeat = JobHeartbeat(worker.db_manager, "job-1", worker.worker_id)
+
+    heartbeat.beat()
+
+    assert heartbeat.lease_lost.is_set()
+    with pytest.raises(JobLeaseLost):
+        heartbeat.report_progress(1, 10)
+
+def test_worker_main_runs_concurrent_jobs():
+    """Тестирует запуск нескольких обработчиков задач в одном процессе."""
+    from app.services.jobs import worker as worker_module
+
+    with patch.object(worker_module, 'model'), \
+         patch.object(worker_module, 'VideoJobWorker') as mock_worker:
+        worker_module._worker_main(concurrency=3)
+
+    worker_ids = [call.kwargs["worker_id"] for call in mock_worker.call_args_list]
+    assert len(set(worker_ids)) == 3
+    assert mock_worker.return_value.run.call_count == 3
+
+
+def test_memory_benchmark_reports_each_worker():
+    """Тестирует замер памяти процессов-обработчиков с предзагрузкой модели."""
+    from app.services.jobs import memory_benchmark
+
+    with patch.object(memory_benchmark.model, "get_model") as get_model, \
+            patch.object(memory_benchmark.model, "warm_up") as warm_up:
+        report = memory_benchmark.measure(2, preload=True)
+
+    assert report["workers"] == 2 and report["preload"] is True
+    assert set(report["per_worker"]) == set(memory_benchmark.MEMORY_FIELDS)
+    assert report["per_worker"]["Pss"] > 0
+    assert report["total_pss"] > report["parent"]["Pss"]
+    # Моки вызываются в дочерних процессах, в тестовом процессе их вызовов нет
+    get_model.assert_not_called()
+    warm_up.assert_not_called()
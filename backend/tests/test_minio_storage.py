@@ -2,6 +2,7 @@ import pytest
 import os
 import json
 import tempfile
+import numpy as np
 from unittest.mock import patch, MagicMock
 from app.services.minio.minio_storage import MinioStorage
 from datetime import timedelta
@@ -30,6 +31,20 @@ def test_init_storage(storage, mock_minio_client):
         region=os.environ.get('MINIO_REGION', None)
     )
 
+def test_buckets_checked_on_first_use(mock_minio_client):
+    """Тестирует, что бакеты проверяются при первом обращении, а не при создании хранилища."""
+    storage = MinioStorage()
+    client = mock_minio_client.return_value
+
+    client.bucket_exists.assert_not_called()
+
+    assert storage.ensure_connection() is True
+    assert client.bucket_exists.call_count == 3
+    assert storage.buckets_checked is True
+
+    storage.ensure_connection()
+    assert client.bucket_exists.call_count == 3
+
 def test_save_video(storage):
     """Тестирует сохранение видео в MinIO."""
     with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_file:
@@ -175,6 +190,44 @@ def test_error_handling_save_video(storage):
     finally:
         os.unlink(temp_path)
 
+def test_detection_log_round_trip(storage):
+    """Тестирует сохранение и чтение колоночного лога детекций."""
+    columns = {
+        "version": 1,
+        "total_frames": 3,
+        "floor": 0.1,
+        "names": json.dumps({"0": "weapon"}),
+        "frame": np.array([0, 2], dtype=np.int32),
+        "confidence": np.array([0.3, 0.9], dtype=np.float32),
+    }
+
+    assert storage.save_detection_log(columns, "video.mp4.detections.npz") is True
+
+    kwargs = storage.client.put_object.call_args[1]
+    assert kwargs["object_name"] == "video.mp4.detections.npz"
+    assert kwargs["content_type"] == "application/octet-stream"
+    mock_response = MagicMock()
+    mock_response.read.return_value = kwargs["data"].getvalue()
+    storage.client.get_object.return_value = mock_response
+
+    result = storage.get_detection_log("video.mp4.detections.npz")
+
+    assert result["total_frames"] == 3
+    assert result["floor"] == 0.1
+    assert json.loads(result["names"]) == {"0": "weapon"}
+    assert result["frame"].dtype == np.int32
+    np.testing.assert_array_equal(result["confidence"], columns["confidence"])
+    storage.client.get_object.assert_called_once_with(
+        bucket_name=storage.log_bucket,
+        object_name="video.mp4.detections.npz"
+    )
+
+def test_get_detection_log_missing(storage):
+    """Тестирует отсутствие лога детекций."""
+    storage.client.get_object.side_effect = Exception("NoSuchKey")
+
+    assert storage.get_detection_log("video.mp4.detections.npz") is None
+
 def test_error_handling_get_log(storage):
     """Тестирует обработку ошибок при получении логов."""
     storage.client.get_object.side_effect = Exception("Minio error")
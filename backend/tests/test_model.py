@@ -70,3 +70,105 @@ def test_model_prediction(mock_yolo):
         assert hasattr(result.boxes, 'conf')
         assert hasattr(result.boxes, 'xyxy')
 
+
+@pytest.fixture
+def lazy_model(monkeypatch):
+    """Модуль модели в состоянии до загрузки, с мокированным классом YOLO."""
+    import threading
+    from app.models import model as model_module
+
+    mock_yolo_class = MagicMock()
+    monkeypatch.setattr(model_module, 'YOLO', mock_yolo_class)
+    monkeypatch.setattr(model_module, 'model_backend', 'pytorch')
+    monkeypatch.setattr(model_module, '_model', None)
+    monkeypatch.setattr(model_module, '_ready', threading.Event())
+    monkeypatch.setattr(model_module, 'warm_up_error', None)
+    monkeypatch.delitem(model_module.__dict__, 'model', raising=False)
+    with patch('app.models.model.os.path.exists', return_value=True):
+        yield model_module, mock_yolo_class
+
+def test_model_loaded_on_first_access(lazy_model):
+    """Тестирует, что модель загружается при первом обращении и только один раз."""
+    model_module, mock_yolo_class = lazy_model
+
+    mock_yolo_class.assert_not_called()
+
+    loaded = model_module.model
+    assert loaded is mock_yolo_class.return_value
+    assert model_module.get_model() is loaded
+    assert model_module.backend == "pytorch"
+    mock_yolo_class.assert_called_once_with(model_module.absolute_model_path)
+
+def test_warm_up(lazy_model):
+    """Тестирует прогрев модели одним запуском на пустом кадре."""
+    model_module, mock_yolo_class = lazy_model
+
+    assert not model_module.is_ready()
+    assert model_module.warm_up() is True
+
+    assert model_module.is_ready()
+    frame = mock_yolo_class.return_value.predict.call_args[0][0]
+    assert frame.shape == (*model_module.WARM_UP_FRAME_SIZE, 3)
+
+def test_warm_up_error(lazy_model):
+    """Тестирует, что ошибка прогрева сохраняется, а модель не считается готовой."""
+    model_module, mock_yolo_class = lazy_model
+    mock_yolo_class.return_value.predict.side_effect = RuntimeError("CUDA error")
+
+    assert model_module.warm_up() is False
+
+    assert not model_module.is_ready()
+    assert model_module.warm_up_error == "CUDA error"
+
+def test_start_warm_up_retries_after_error(lazy_model, monkeypatch):
+    """Тестирует повторный запуск прогрева после ошибки, а не постоянную неготовность."""
+    model_module, mock_yolo_class = lazy_model
+    monkeypatch.setattr(model_module, '_warm_up_thread', None)
+    mock_yolo_class.return_value.predict.side_effect = [RuntimeError("CUDA error"), None]
+
+    failed = model_module.start_warm_up()
+    failed.join()
+
+    assert not model_module.is_ready()
+    assert model_module.warm_up_error == "CUDA error"
+
+    retried = model_module.start_warm_up()
+    retried.join()
+
+    assert retried is not failed
+    assert model_module.is_ready()
+    assert model_module.warm_up_error is None
+    # После успешного прогрева новый поток не запускается
+    assert model_module.start_warm_up() is retried
+
+def test_model_version_uses_loaded_backend(lazy_model, monkeypatch, tmp_path):
+    """Тестирует, что версия модели содержит бэкенд, выбранный при загрузке, а не MODEL_BACKEND."""
+    model_module, _ = lazy_model
+    weights = tmp_path / "model.pt"
+    weights.write_bytes(b"weights")
+    monkeypatch.setattr(model_module, 'absolute_model_path', str(weights))
+    monkeypatch.setattr(model_module, 'model_backend', 'auto')
+    monkeypatch.setattr(model_module, '_weights_hash', None)
+    monkeypatch.setattr(model_module, '_backend', None)
+
+    with patch.object(model_module, 'select_backend', return_value=(MagicMock(), 'onnx_int8')):
+        version = model_module.model_version()
+
+    assert version.startswith("onnx_int8:")
+    monkeypatch.setattr(model_module, '_backend', 'pytorch')
+    assert model_module.model_version() == f"pytorch:{version.split(':')[1]}"
+
+def test_configure_threads(monkeypatch):
+    """Тестирует деление ядер CPU между процессами с моделью."""
+    from app.models import model as model_module
+
+    monkeypatch.setattr(model_module, 'TORCH_THREADS', 0)
+    with patch('app.models.model.os.cpu_count', return_value=8), \
+         patch('app.models.model.torch.set_num_threads') as mock_set_threads:
+        assert model_module.configure_threads(3) == 2
+        mock_set_threads.assert_called_once_with(2)
+
+        assert model_module.configure_threads(16) == 1
+
+        monkeypatch.setattr(model_module, 'TORCH_THREADS', 4)
+        assert model_module.configure_threads(3) == 4
@@ -0,0 +1,45 @@
+import numpy as np
+from app.services.video_processing.motion import MotionGate
+
+
+def _frame(value=0, box=None):
+    """Создает кадр BGR 480x640, при необходимости с белым прямоугольником."""
+    frame = np.full((480, 640, 3), value, dtype=np.uint8)
+    if box:
+        x1, y1, x2, y2 = box
+        frame[y1:y2, x1:x2] = 255
+    return frame
+
+def test_motion_gate_disabled():
+    """Тестирует, что при нулевом пороге модель запускается на каждом кадре."""
+    gate = MotionGate(threshold=0)
+
+    assert all(gate.should_infer(_frame()) for _ in range(5))
+
+def test_motion_gate_skips_static_scene():
+    """Тестирует пропуск кадров статичной сцены и запуск модели при движении."""
+    gate = MotionGate(threshold=0.01, max_gated=100)
+
+    assert gate.should_infer(_frame()) is True
+    assert gate.should_infer(_frame()) is False
+    assert gate.should_infer(_frame(value=3)) is False  # шум ниже порога яркости
+    assert gate.should_infer(_frame(box=(100, 100, 300, 300))) is True
+    assert gate.should_infer(_frame(box=(100, 100, 300, 300))) is False
+
+def test_motion_gate_compares_with_last_inferred_frame():
+    """Тестирует, что медленные изменения накапливаются относительно последнего обработанного кадра."""
+    gate = MotionGate(threshold=0.1, max_gated=100)
+    gate.should_infer(_frame())
+
+    # Каждый шаг изменяет около 6% кадра, по сравнению с соседним кадром изменений мало
+    results = [gate.should_infer(_frame(box=(0, 0, 40 * step, 480))) for step in range(1, 4)]
+
+    assert results == [False, True, False]
+
+def test_motion_gate_forces_inference():
+    """Тестирует принудительный запуск модели после max_gated пропущенных кадров."""
+    gate = MotionGate(threshold=0.01, max_gated=2)
+
+    results = [gate.should_infer(_frame()) for _ in range(7)]
+
+    assert results == [True, False, False, True, False, False, True]
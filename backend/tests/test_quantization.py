@@ -0,0 +1,51 @@
+import pytest
+import numpy as np
+from app.models import backends
+from app.models.quantization import letterbox, load_calibration_frames, match_detections
+
+
+def test_letterbox_keeps_aspect_ratio():
+    """Тестирует приведение кадра к квадратному входу модели с дополнением."""
+    frame = np.full((480, 640, 3), 255, dtype=np.uint8)
+
+    tensor = letterbox(frame, size=320)
+
+    assert tensor.shape == (1, 3, 320, 320)
+    assert tensor.dtype == np.float32
+    # Кадр 4:3 занимает 240 строк по центру, сверху и снизу серые полосы
+    assert tensor[0, 0, 0, 0] == pytest.approx(114 / 255)
+    assert tensor[0, 0, 160, 160] == pytest.approx(1.0)
+
+def test_match_detections():
+    """Тестирует сопоставление рамок с эталонными по IoU и классу."""
+    reference = np.array([
+        [10, 10, 50, 50, 0.9, 0],
+        [100, 100, 150, 150, 0.8, 1],
+    ], dtype=np.float32)
+    candidate = np.array([
+        [12, 12, 50, 50, 0.7, 0],      # совпадает с первой рамкой
+        [100, 100, 150, 150, 0.6, 0],  # другой класс
+        [300, 300, 350, 350, 0.5, 1],  # лишняя рамка
+    ], dtype=np.float32)
+
+    assert match_detections(reference, candidate) == 1
+    assert match_detections(reference, reference) == 2
+
+def test_load_calibration_frames(tmp_path):
+    """Тестирует поиск кадров калибровки."""
+    with pytest.raises(FileNotFoundError):
+        load_calibration_frames(str(tmp_path))
+
+    (tmp_path / "b.jpg").write_bytes(b"")
+    (tmp_path / "a.png").write_bytes(b"")
+    (tmp_path / "notes.txt").write_bytes(b"")
+
+    assert load_calibration_frames(str(tmp_path)) == [str(tmp_path / "a.png"), str(tmp_path / "b.jpg")]
+
+def test_int8_backend_requires_quantized_model(tmp_path):
+    """Тестирует, что INT8-модель не создается автоматически при загрузке."""
+    checkpoint = tmp_path / "yolo.pt"
+    checkpoint.write_bytes(b"weights")
+
+    with pytest.raises(FileNotFoundError, match="quantization"):
+        backends.export_model(str(checkpoint), backends.BACKEND_ONNX_INT8)
@@ -0,0 +1,85 @@
+import io
+import hashlib
+import pytest
+from unittest.mock import patch
+from app.services.cache import build_cache_key, pipeline_options, result_cache, save_with_hash
+
+
+def test_save_with_hash(tmp_path):
+    """Тестирует сохранение файла с вычислением SHA-256 за один проход."""
+    content = b"video content" * 1000
+    path = tmp_path / "upload.mp4"
+
+    digest = save_with_hash(io.BytesIO(content), str(path), chunk_size=1024)
+
+    assert digest == hashlib.sha256(content).hexdigest()
+    assert path.read_bytes() == content
+
+def test_build_cache_key_is_canonical():
+    """Тестирует, что ключ не зависит от порядка параметров обработки."""
+    first = build_cache_key("a" * 64, "pytorch:0123", 0.6, {"pipeline": "single_pass", "frame_stride": 1})
+    second = build_cache_key("a" * 64, "pytorch:0123", 0.6, {"frame_stride": 1, "pipeline": "single_pass"})
+
+    assert first == second
+    assert len(first) == 64
+
+@pytest.mark.parametrize("changes", [
+    {"content_hash": "b" * 64},
+    {"model_version": "onnx:0123"},
+    {"confidence_threshold": 0.5},
+    {"options": {"pipeline": "single_pass", "frame_stride": 2}},
+])
+def test_build_cache_key_depends_on_parameters(changes):
+    """Тестирует, что любой параметр, влияющий на результат, меняет ключ."""
+    params = {
+        "content_hash": "a" * 64,
+        "model_version": "pytorch:0123",
+        "confidence_threshold": 0.6,
+        "options": {"pipeline": "single_pass", "frame_stride": 1},
+    }
+
+    assert build_cache_key(**params) != build_cache_key(**{**params, **changes})
+
+def test_pipeline_options():
+    """Тестирует, что в параметры кэша входят настройки, влияющие на детекции."""
+    options = pipeline_options(3)
+
+    assert options["frame_stride"] == 3
+    assert "pipeline" in options
+    assert "motion_threshold" in options
+    # Ключи результатов с размеченным видео не зависят от параметра render
+    assert "render" not in options
+    assert pipeline_options(3, render=False)["render"] is False
+
+def test_pipeline_options_cascade():
+    """Тестирует, что настройки каскада входят в ключ только при включенном каскаде."""
+    assert not any(key.startswith("cascade_") for key in pipeline_options(1))
+
+    with patch('app.models.cascade.CASCADE_SCREEN_IMGSZ', 320):
+        options = pipeline_options(1)
+
+    assert options["cascade_screen_imgsz"] == 320
+    assert "cascade_screen_threshold" in options
+
+def test_pipeline_options_inference_size():
+    """Тестирует, что размер входа модели и декодирование в нем входят в ключ кэша."""
+    assert "inference_imgsz" not in pipeline_options(1)
+    assert "downscale_decode" not in pipeline_options(1)
+
+    with patch.object(result_cache.model, 'INFERENCE_IMGSZ', 960), \
+         patch.object(result_cache.decoder, 'DOWNSCALE_DECODE', True):
+        options = pipeline_options(1, render=False)
+
+    assert options["inference_imgsz"] == 960
+    assert options["downscale_decode"] is True
+
+def test_pipeline_options_tiling():
+    """Тестирует, что настройки участков входят в ключ только при включенной детекции на участках."""
+    assert not any(key.startswith("tile_") for key in pipeline_options(1))
+
+    with patch.object(result_cache.tiling, 'TILED_INFERENCE_ENABLED', True):
+        options = pipeline_options(1, render=False)
+
+    assert "tile_max_per_frame" in options
+    # Кадры для участков декодируются в исходном разрешении
+    assert "downscale_decode" not in options
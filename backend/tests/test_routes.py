@@ -3,9 +3,14 @@ import json
 import os
 import jwt
 import uuid
+import io
+import hashlib
 from datetime import datetime
-from unittest.mock import patch, MagicMock, ANY
+from unittest.mock import patch, MagicMock, ANY, call
+import numpy as np
 from app import create_app
+from app.services import cache
+from app.services.cache import result_cache
 
 # Чтение секретного ключа из тестового окружения
 TEST_SECRET_KEY = "test_secret_key"
@@ -21,12 +26,17 @@ def app():
         
         mock_db_manager = MagicMock()
         mock_storage = MagicMock()
+        mock_db_manager.get_cached_result.return_value = None
+        mock_storage.get_detection_log.return_value = None
         
         app.db_manager = mock_db_manager
         app.storage = mock_storage
         
+        # Версия модели не зависит от файла весов в тестовом окружении
         with patch('app.api.routes.db_manager', mock_db_manager), \
-             patch('app.api.routes.storage', mock_storage):
+             patch('app.api.routes.storage', mock_storage), \
+             patch.object(result_cache.model, 'weights_hash', return_value="0123"), \
+             patch.object(result_cache.model, 'model_backend', "pytorch"):
             
             yield app
 
@@ -243,6 +253,26 @@ def test_get_video_logs_success(client, app, auth_headers, test_username, test_u
         
         app.storage.get_log.assert_called_with(test_log_filename)
 
+def test_get_video_logs_from_compact_log(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует выдачу колоночного лога детекций в прежнем формате JSON."""
+    app.db_manager.get_video_by_s3_key.return_value = {
+        "video_id": uuid.uuid4(),
+        "user_id": test_user_id,
+        "s3_key": test_video_filename
+    }
+    app.db_manager.get_video_detections.return_value = {
+        "bucket_name": "logs",
+        "s3_key": f"{test_video_filename}.detections.npz"
+    }
+    app.storage.get_detection_log.return_value = _detection_log()
+
+    response = client.get(f'/videos/{test_video_filename}/logs', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert json.loads(response.data) == [[0, False, False], [1, False, False], [2, True, False]]
+    app.storage.get_detection_log.assert_called_once_with(f"{test_video_filename}.detections.npz", "logs")
+    app.storage.get_log.assert_not_called()
+
 def test_get_video_logs_not_found(client, app, auth_headers, test_username, test_user_id, test_video_filename, test_log_filename):
     """Тестирует получение логов несуществующего видео."""
     video_id = uuid.uuid4()
@@ -296,6 +326,26 @@ def test_delete_video_success(client, app, auth_headers, test_username, test_use
         assert 'Successfully deleted' in data['message']
         
        
+@pytest.mark.parametrize("references,deleted", [(0, True), (1, False)])
+def test_delete_video_shared_original(client, app, auth_headers, test_user_id, test_video_filename, references, deleted):
+    """Тестирует, что общее исходное видео удаляется только вместе с последним ссылающимся на него видео."""
+    original_key = f"originals/{'c' * 64}.mp4"
+    app.db_manager.get_video_by_s3_key.return_value = {
+        "video_id": uuid.uuid4(),
+        "user_id": test_user_id,
+        "status": "completed",
+        "metadata": {"original_key": original_key}
+    }
+    app.db_manager.delete_video.return_value = (True, None)
+    app.db_manager.count_videos_with_original.return_value = references
+    app.storage.delete_objects.return_value = True
+
+    response = client.delete(f'/videos/{test_video_filename}', headers=auth_headers)
+
+    assert response.status_code == 200
+    app.db_manager.count_videos_with_original.assert_called_once_with(original_key)
+    assert (call(original_key) in app.storage.delete_upload.call_args_list) is deleted
+
 def test_update_video_success(client, app, auth_headers, test_username, test_user_id, test_video_filename):
     """Тестирует успешное обновление видео."""
     new_name = "new_video_name.mp4"
@@ -325,4 +375,641 @@ def test_update_video_success(client, app, auth_headers, test_username, test_use
         assert response.status_code == 200
         data = json.loads(response.data)
         assert 'message' in data
-        assert 'renamed successfully' in data['message'] 
\ No newline at end of file
+        assert 'renamed successfully' in data['message'] 
+def test_predict_enqueues_job(client, app, auth_headers, test_username):
+    """Тестирует постановку видео в очередь обработки."""
+    job_id = uuid.uuid4()
+    app.storage.save_upload.return_value = True
+    app.storage.video_bucket = "videos"
+    app.db_manager.create_video_job.return_value = ({"job_id": job_id, "video_id": uuid.uuid4()}, None)
+
+    with patch('app.api.routes.video_processing.process_video') as mock_process:
+        response = client.post(
+            '/predict',
+            data={'file': (io.BytesIO(b"test video content"), 'test_video.mp4')},
+            content_type='multipart/form-data',
+            headers=auth_headers
+        )
+
+    assert response.status_code == 202
+    data = json.loads(response.data)
+    assert data['job_id'] == str(job_id)
+    assert data['status'] == 'pending'
+    assert data['video_url'].startswith(f"{test_username}_")
+
+    mock_process.assert_not_called()
+    upload_path, upload_key = app.storage.save_upload.call_args[0]
+    assert not os.path.exists(upload_path)
+
+    _, s3_key, bucket, metadata, payload = app.db_manager.create_video_job.call_args[0]
+    assert s3_key == data['video_url']
+    assert metadata['original_filename'] == 'test_video.mp4'
+    content_hash = hashlib.sha256(b"test video content").hexdigest()
+    # Ключ кэша строит обработчик очереди; API передает только хэш содержимого
+    app.db_manager.get_cached_result.assert_called_once_with(cache.lookup_keys(content_hash, 0.6, 1, True))
+    assert payload == {
+        "upload_key": upload_key,
+        "username": test_username,
+        "confidence_threshold": 0.6,
+        "frame_stride": 1,
+        "render": True,
+        "content_hash": content_hash,
+        "cache": True
+    }
+
+def test_predict_frame_stride(client, app, auth_headers):
+    """Тестирует передачу шага выборки кадров в задачу обработки."""
+    app.storage.save_upload.return_value = True
+    app.db_manager.create_video_job.return_value = ({"job_id": uuid.uuid4(), "video_id": uuid.uuid4()}, None)
+
+    response = client.post(
+        '/predict',
+        data={'file': (io.BytesIO(b"test video content"), 'test_video.mp4'), 'frame_stride': '5'},
+        content_type='multipart/form-data',
+        headers=auth_headers
+    )
+
+    assert response.status_code == 202
+    payload = app.db_manager.create_video_job.call_args[0][4]
+    assert payload['frame_stride'] == 5
+
+def test_predict_detection_only(client, app, auth_headers):
+    """Тестирует постановку задачи только детекции, без размеченного видео."""
+    app.storage.save_upload.return_value = True
+    app.db_manager.create_video_job.return_value = ({"job_id": uuid.uuid4(), "video_id": uuid.uuid4()}, None)
+
+    response = client.post(
+        '/predict',
+        data={'file': (io.BytesIO(b"test video content"), 'test_video.mp4'), 'render': 'false'},
+        content_type='multipart/form-data',
+        headers=auth_headers
+    )
+
+    assert response.status_code == 202
+    _, _, _, metadata, payload = app.db_manager.create_video_job.call_args[0]
+    assert payload['render'] is False
+    assert metadata['render'] is False
+    # Результат без видео ищется в кэше отдельно от результата с видео
+    content_hash = hashlib.sha256(b"test video content").hexdigest()
+    assert app.db_manager.get_cached_result.call_args[0][0] == cache.lookup_keys(content_hash, 0.6, 1, False)
+    assert app.db_manager.get_cached_result.call_args[0][0] != cache.lookup_keys(content_hash, 0.6, 1, True)
+
+def test_predict_invalid_render(client, app, auth_headers):
+    """Тестирует отклонение некорректного значения render."""
+    response = client.post(
+        '/predict',
+        data={'file': (io.BytesIO(b"test video content"), 'test_video.mp4'), 'render': 'maybe'},
+        content_type='multipart/form-data',
+        headers=auth_headers
+    )
+
+    assert response.status_code == 400
+    app.storage.save_upload.assert_not_called()
+
+@pytest.mark.parametrize("frame_stride", ["0", "abc", "1000"])
+def test_predict_invalid_frame_stride(client, app, auth_headers, frame_stride):
+    """Тестирует отклонение некорректного шага выборки кадров."""
+    response = client.post(
+        '/predict',
+        data={'file': (io.BytesIO(b"test video content"), 'test_video.mp4'), 'frame_stride': frame_stride},
+        content_type='multipart/form-data',
+        headers=auth_headers
+    )
+
+    assert response.status_code == 400
+    app.storage.save_upload.assert_not_called()
+
+def test_predict_job_creation_failure(client, app, auth_headers):
+    """Тестирует удаление исходного видео, если задачу не удалось создать."""
+    app.storage.save_upload.return_value = True
+    app.db_manager.create_video_job.return_value = (None, "Ошибка при создании задачи обработки")
+
+    response = client.post(
+        '/predict',
+        data={'file': (io.BytesIO(b"test video content"), 'test_video.mp4')},
+        content_type='multipart/form-data',
+        headers=auth_headers
+    )
+
+    assert response.status_code == 500
+    upload_key = app.storage.save_upload.call_args[0][1]
+    app.storage.delete_upload.assert_called_once_with(upload_key)
+
+def test_predict_upload_failure(client, app, auth_headers):
+    """Тестирует ошибку сохранения исходного видео в хранилище."""
+    app.storage.save_upload.return_value = False
+
+    response = client.post(
+        '/predict',
+        data={'file': (io.BytesIO(b"test video content"), 'test_video.mp4')},
+        content_type='multipart/form-data',
+        headers=auth_headers
+    )
+
+    assert response.status_code == 500
+    app.db_manager.create_video_job.assert_not_called()
+
+def _cache_record(video_s3_key="otheruser_20230101_120000_clip.mp4"):
+    """Запись кэша в формате DatabaseManager.get_cached_result."""
+    return {
+        "cache_key": "a" * 64,
+        "video_s3_key": video_s3_key,
+        "video_bucket": "videos",
+        "log_s3_key": f"{video_s3_key}.detections.npz",
+        "log_bucket": "logs",
+        "weapon_detected": True,
+        "metadata": {"fps": "30", "detection_count": "2"}
+    }
+
+def test_predict_cache_hit(client, app, auth_headers, test_user_id):
+    """Тестирует возврат результата из кэша без повторной обработки видео."""
+    app.db_manager.get_cached_result.return_value = _cache_record()
+    app.storage.object_exists.return_value = False
+    app.db_manager.create_cached_video.return_value = (uuid.uuid4(), None)
+    app.storage.video_bucket = "videos"
+    app.storage.log_bucket = "logs"
+    app.storage.copy_object.return_value = True
+    app.storage.get_detection_log.return_value = _detection_log()
+
+    response = client.post(
+        '/predict',
+        data={'file': (io.BytesIO(b"test video content"), 'incident.mp4')},
+        content_type='multipart/form-data',
+        headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["status"] == "completed"
+    assert data["cached"] is True
+    assert data["frame_objects"] == [[0, False, False], [1, False, False], [2, True, False]]
+    assert data["fps"] == 30
+
+    app.storage.copy_object.assert_any_call(
+        "videos", "otheruser_20230101_120000_clip.mp4", "videos", data["video_url"]
+    )
+    app.storage.copy_object.assert_any_call(
+        "logs", "otheruser_20230101_120000_clip.mp4.detections.npz", "logs", f"{data['video_url']}.detections.npz"
+    )
+    args = app.db_manager.create_cached_video.call_args[0]
+    assert args[0] == str(test_user_id)
+    assert args[7] == "a" * 64
+    assert args[3]["original_filename"] == "incident.mp4"
+    assert args[3]["cached_from"] == "otheruser_20230101_120000_clip.mp4"
+    # Загруженный файл сохраняется только как исходное видео для повторной отрисовки
+    upload_path, original_key = app.storage.save_upload.call_args[0]
+    assert original_key == f"originals/{hashlib.sha256(b'test video content').hexdigest()}.mp4"
+    assert args[3]["original_key"] == original_key
+    assert not os.path.exists(upload_path)
+    app.db_manager.create_video_job.assert_not_called()
+
+def test_predict_cache_hit_reuses_original(client, app, auth_headers):
+    """Тестирует, что исходное видео с тем же содержимым не сохраняется повторно."""
+    app.db_manager.get_cached_result.return_value = _cache_record()
+    app.db_manager.create_cached_video.return_value = (uuid.uuid4(), None)
+    app.storage.copy_object.return_value = True
+    app.storage.object_exists.return_value = True
+    app.storage.get_detection_log.return_value = _detection_log()
+
+    response = client.post(
+        '/predict',
+        data={'file': (io.BytesIO(b"test video content"), 'incident.mp4')},
+        content_type='multipart/form-data',
+        headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    app.storage.save_upload.assert_not_called()
+    metadata = app.db_manager.create_cached_video.call_args[0][3]
+    assert metadata["original_key"] == f"originals/{hashlib.sha256(b'test video content').hexdigest()}.mp4"
+
+@pytest.mark.parametrize("model_version,options,hit", [
+    ("pytorch:0123", {}, True),
+    # Результат прежних весов или другого бэкенда
+    ("pytorch:4567", {}, False),
+    ("onnx:0123", {}, False),
+    # Результат, полученный с другими параметрами обработки
+    ("pytorch:0123", {"motion_threshold": 0.5}, False),
+])
+def test_predict_cache_key_matches_deployment(client, app, auth_headers, model_version, options, hit):
+    """Тестирует, что результат другой версии модели или других параметров обработки не считается попаданием."""
+    content_hash = hashlib.sha256(b"test video content").hexdigest()
+    stored_key = cache.build_cache_key(
+        content_hash, model_version, 0.6, {**cache.pipeline_options(1, True), **options}
+    )
+    app.db_manager.get_cached_result.side_effect = lambda keys: _cache_record() if stored_key in keys else None
+    app.db_manager.create_cached_video.return_value = (uuid.uuid4(), None)
+    app.db_manager.create_video_job.return_value = ({"job_id": uuid.uuid4(), "video_id": uuid.uuid4()}, None)
+    app.storage.copy_object.return_value = True
+    app.storage.save_upload.return_value = True
+    app.storage.get_detection_log.return_value = _detection_log()
+
+    response = client.post(
+        '/predict',
+        data={'file': (io.BytesIO(b"test video content"), 'incident.mp4')},
+        content_type='multipart/form-data',
+        headers=auth_headers
+    )
+
+    assert response.status_code == (200 if hit else 202)
+    assert app.db_manager.create_video_job.called is not hit
+
+def test_predict_cache_auto_backend(client, app, auth_headers):
+    """Тестирует поиск результатов всех бэкендов режима auto с теми же весами без загрузки модели."""
+    with patch.object(result_cache.model, 'model_backend', "auto"), \
+         patch.object(result_cache.model, 'get_model') as mock_get_model:
+        client.post(
+            '/predict',
+            data={'file': (io.BytesIO(b"test video content"), 'incident.mp4')},
+            content_type='multipart/form-data',
+            headers=auth_headers
+        )
+
+    mock_get_model.assert_not_called()
+    content_hash = hashlib.sha256(b"test video content").hexdigest()
+    options = cache.pipeline_options(1, True)
+    assert app.db_manager.get_cached_result.call_args[0][0] == [
+        cache.build_cache_key(content_hash, f"{backend}:0123", 0.6, options)
+        for backend in ("pytorch", "onnx", "openvino")
+    ]
+
+def test_predict_cache_hit_detection_only(client, app, auth_headers):
+    """Тестирует повторное использование результата без размеченного видео."""
+    record = _cache_record()
+    record["metadata"]["render"] = "false"
+    app.db_manager.get_cached_result.return_value = record
+    app.db_manager.create_cached_video.return_value = (uuid.uuid4(), None)
+    app.storage.log_bucket = "logs"
+    app.storage.copy_object.return_value = True
+    app.storage.get_detection_log.return_value = _detection_log()
+
+    response = client.post(
+        '/predict',
+        data={'file': (io.BytesIO(b"test video content"), 'incident.mp4'), 'render': 'false'},
+        content_type='multipart/form-data',
+        headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    # Копируется только лог детекций
+    app.storage.copy_object.assert_called_once_with(
+        "logs", "otheruser_20230101_120000_clip.mp4.detections.npz",
+        "logs", f"{json.loads(response.data)['video_url']}.detections.npz"
+    )
+
+def test_predict_stale_cache_entry(client, app, auth_headers):
+    """Тестирует обработку видео, если результат в кэше удален из хранилища."""
+    app.db_manager.get_cached_result.return_value = _cache_record()
+    app.storage.copy_object.return_value = False
+    app.storage.save_upload.return_value = True
+    app.db_manager.create_video_job.return_value = ({"job_id": uuid.uuid4(), "video_id": uuid.uuid4()}, None)
+
+    response = client.post(
+        '/predict',
+        data={'file': (io.BytesIO(b"test video content"), 'incident.mp4')},
+        content_type='multipart/form-data',
+        headers=auth_headers
+    )
+
+    assert response.status_code == 202
+    app.db_manager.delete_cached_result.assert_called_once_with("a" * 64)
+    app.db_manager.create_cached_video.assert_not_called()
+
+def _detection_log():
+    """Лог детекций: оружие с уверенностью 0.3 в кадре 0 и 0.9 в кадре 2."""
+    return {
+        "version": 1,
+        "total_frames": 3,
+        "floor": 0.1,
+        "confidence_threshold": 0.6,
+        "names": json.dumps({"0": "weapon", "1": "knife"}),
+        "frame": np.array([0, 2], dtype=np.int32),
+        "class_id": np.array([0, 0], dtype=np.int16),
+        "confidence": np.array([0.3, 0.9], dtype=np.float32),
+        "boxes": np.array([[10, 10, 50, 50]] * 2, dtype=np.uint16)
+    }
+
+def test_get_video_intervals(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует выдачу интервалов детекций вместо покадрового лога."""
+    app.db_manager.get_video_by_s3_key.return_value = {
+        "video_id": uuid.uuid4(),
+        "user_id": test_user_id,
+        "metadata": {"fps": "25"}
+    }
+    app.db_manager.get_video_detections.return_value = None
+    app.storage.get_detection_log.return_value = _detection_log()
+
+    response = client.get(f'/videos/{test_video_filename}/intervals', headers=auth_headers)
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["fps"] == 25
+    assert data["intervals"] == [
+        {"start_frame": 2, "end_frame": 2, "classes": ["weapon"], "max_confidence": 0.9}
+    ]
+
+def test_get_video_intervals_legacy_log(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует интервалы для видео с прежним JSON-логом."""
+    app.db_manager.get_video_by_s3_key.return_value = {"video_id": uuid.uuid4(), "user_id": test_user_id}
+    app.db_manager.get_video_detections.return_value = None
+    app.storage.get_log.return_value = [[0, True, False], [1, True, False], [2, False, False], [3, False, True]]
+
+    response = client.get(f'/videos/{test_video_filename}/intervals', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert json.loads(response.data)["intervals"] == [
+        {"start_frame": 0, "end_frame": 1, "classes": ["weapon"], "max_confidence": None},
+        {"start_frame": 3, "end_frame": 3, "classes": ["knife"], "max_confidence": None}
+    ]
+
+def test_serve_detection_only_video(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует выдачу исходного видео для результата без размеченного видео."""
+    app.db_manager.get_video_by_s3_key.return_value = {
+        "video_id": uuid.uuid4(),
+        "user_id": test_user_id,
+        "metadata": {"render": "false", "original_key": "originals/testuser_20230101_120000_test_video.mp4"}
+    }
+    app.storage.upload_bucket = "uploads"
+    app.storage.get_presigned_url.return_value = "https://minio.example.com/uploads/original.mp4"
+
+    response = client.get(f'/video/{test_video_filename}', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert json.loads(response.data) == {
+        "url": "https://minio.example.com/uploads/original.mp4",
+        "annotated": False
+    }
+    app.storage.get_presigned_url.assert_called_once_with(
+        "originals/testuser_20230101_120000_test_video.mp4", bucket_name="uploads"
+    )
+
+def test_get_video_detections(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует выдачу рамок детекций для разметки видео на клиенте."""
+    app.db_manager.get_video_by_s3_key.return_value = {
+        "video_id": uuid.uuid4(),
+        "user_id": test_user_id,
+        "metadata": {"fps": "25", "render": "false"}
+    }
+    app.storage.get_detection_log.return_value = _detection_log()
+
+    response = client.get(f'/videos/{test_video_filename}/detections', headers=auth_headers)
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["fps"] == 25
+    assert data["names"] == {"0": "weapon", "1": "knife"}
+    assert data["detections"] == [[2, 0, 0.9, 10, 10, 50, 50]]
+
+    response = client.get(
+        f'/videos/{test_video_filename}/detections?confidence_threshold=0.2', headers=auth_headers
+    )
+    assert [row[0] for row in json.loads(response.data)["detections"]] == [0, 2]
+
+def test_get_video_detections_invalid_threshold(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует отклонение порога ниже порога сохраненных детекций."""
+    app.db_manager.get_video_by_s3_key.return_value = {"video_id": uuid.uuid4(), "user_id": test_user_id}
+    app.storage.get_detection_log.return_value = _detection_log()
+
+    response = client.get(
+        f'/videos/{test_video_filename}/detections?confidence_threshold=0.05', headers=auth_headers
+    )
+
+    assert response.status_code == 400
+
+def test_get_video_intervals_not_found(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует интервалы видео без лога детекций."""
+    app.db_manager.get_video_by_s3_key.return_value = {"video_id": uuid.uuid4(), "user_id": test_user_id}
+    app.db_manager.get_video_detections.return_value = None
+    app.storage.get_log.return_value = None
+
+    response = client.get(f'/videos/{test_video_filename}/intervals', headers=auth_headers)
+
+    assert response.status_code == 404
+
+def test_rethreshold_preview(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует пересчет результата для другого порога без обработки видео."""
+    app.db_manager.get_video_by_s3_key.return_value = {"user_id": test_user_id, "metadata": {}}
+    app.storage.get_detection_log.return_value = _detection_log()
+
+    response = client.post(
+        f'/videos/{test_video_filename}/threshold',
+        json={'confidence_threshold': 0.2},
+        headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["frame_objects"] == [[0, True, False], [1, False, False], [2, True, False]]
+    assert data["detection_count"] == 2
+    app.storage.get_detection_log.assert_called_once_with(f"{test_video_filename}.detections.npz")
+    app.db_manager.create_video_job.assert_not_called()
+
+@pytest.mark.parametrize("threshold", [0.05, 1.5, "high"])
+def test_rethreshold_invalid_threshold(client, app, auth_headers, test_user_id, test_video_filename, threshold):
+    """Тестирует отказ для порога вне диапазона сохраненных детекций."""
+    app.db_manager.get_video_by_s3_key.return_value = {"user_id": test_user_id, "metadata": {}}
+    app.storage.get_detection_log.return_value = _detection_log()
+
+    response = client.post(
+        f'/videos/{test_video_filename}/threshold',
+        json={'confidence_threshold': threshold},
+        headers=auth_headers
+    )
+
+    assert response.status_code == 400
+
+def test_rethreshold_without_raw_log(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует видео, обработанное до сохранения всех детекций."""
+    app.db_manager.get_video_by_s3_key.return_value = {"user_id": test_user_id, "metadata": {}}
+    app.storage.get_detection_log.return_value = None
+
+    response = client.post(
+        f'/videos/{test_video_filename}/threshold',
+        json={'confidence_threshold': 0.5},
+        headers=auth_headers
+    )
+
+    assert response.status_code == 404
+
+def test_rethreshold_render(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует постановку задачи отрисовки видео с новым порогом."""
+    job_id = uuid.uuid4()
+    original_key = "originals/testuser_20230101_120000_test_video.mp4"
+    app.db_manager.get_video_by_s3_key.return_value = {
+        "user_id": test_user_id,
+        "metadata": {"original_key": original_key, "original_filename": "test_video.mp4"}
+    }
+    app.storage.get_detection_log.return_value = _detection_log()
+    app.storage.object_exists.return_value = True
+    app.db_manager.create_video_job.return_value = ({"job_id": job_id, "video_id": uuid.uuid4()}, None)
+
+    response = client.post(
+        f'/videos/{test_video_filename}/threshold',
+        json={'confidence_threshold': 0.5, 'render': True},
+        headers=auth_headers
+    )
+
+    assert response.status_code == 202
+    data = json.loads(response.data)
+    assert data["job_id"] == str(job_id)
+    assert data["frame_objects"] == [[0, False, False], [1, False, False], [2, True, False]]
+    assert data["video_url"].endswith("_test_video_conf50.mp4")
+
+    args = app.db_manager.create_video_job.call_args[0]
+    assert args[1] == data["video_url"]
+    assert args[3]["original_key"] == original_key
+    assert args[4] == {
+        "type": "render",
+        "username": "testuser",
+        "source_video": test_video_filename,
+        "original_key": original_key,
+        "confidence_threshold": 0.5
+    }
+
+def test_rethreshold_render_without_original(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует отказ в отрисовке, если исходное видео не сохранено."""
+    app.db_manager.get_video_by_s3_key.return_value = {"user_id": test_user_id, "metadata": {}}
+    app.storage.get_detection_log.return_value = _detection_log()
+
+    response = client.post(
+        f'/videos/{test_video_filename}/threshold',
+        json={'confidence_threshold': 0.5, 'render': True},
+        headers=auth_headers
+    )
+
+    assert response.status_code == 409
+    app.db_manager.create_video_job.assert_not_called()
+
+def _job_record(user_id, s3_key, status, **fields):
+    """Запись задачи в формате DatabaseManager.get_job."""
+    record = {
+        "job_id": uuid.uuid4(),
+        "video_id": uuid.uuid4(),
+        "user_id": user_id,
+        "s3_key": s3_key,
+        "status": status,
+        "progress": 0,
+        "attempts": 1,
+        "error": None,
+        "metadata": {}
+    }
+    record.update(fields)
+    return record
+
+def test_get_job_pending(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует получение статуса задачи в процессе обработки."""
+    job = _job_record(test_user_id, test_video_filename, "processing", progress=40)
+    app.db_manager.get_job.return_value = job
+
+    response = client.get(f'/jobs/{job["job_id"]}', headers=auth_headers)
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['status'] == 'processing'
+    assert data['progress'] == 40
+    assert data['attempts'] == 1
+    assert 'frame_objects' not in data
+
+def test_get_job_failed(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует получение ошибки окончательно проваленной задачи."""
+    job = _job_record(
+        test_user_id, test_video_filename, "failed",
+        attempts=3, error="Не удалось открыть видеофайл"
+    )
+    app.db_manager.get_job.return_value = job
+
+    response = client.get(f'/jobs/{job["job_id"]}', headers=auth_headers)
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['status'] == 'failed'
+    assert data['error'] == "Не удалось открыть видеофайл"
+    assert data['attempts'] == 3
+
+def test_get_job_completed(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует получение результата выполненной задачи."""
+    job = _job_record(
+        test_user_id, test_video_filename, "completed",
+        progress=100, metadata={"fps": "30"}
+    )
+    app.db_manager.get_job.return_value = job
+    app.db_manager.get_video_detections.return_value = {
+        "bucket_name": "logs",
+        "s3_key": f"{test_video_filename}.json"
+    }
+    app.storage.get_log_from_bucket.return_value = [[0, True, False]]
+
+    response = client.get(f'/jobs/{job["job_id"]}', headers=auth_headers)
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['status'] == 'completed'
+    assert data['video_url'] == test_video_filename
+    assert data['frame_objects'] == [[0, True, False]]
+    assert data['fps'] == 30
+    app.db_manager.get_video_detections.assert_called_once_with(job["video_id"])
+
+def test_get_job_completed_intervals_only(client, app, auth_headers, test_user_id, test_video_filename):
+    """Тестирует результат задачи без покадрового лога по запросу клиента."""
+    job = _job_record(test_user_id, test_video_filename, "completed", metadata={"fps": "30"})
+    app.db_manager.get_job.return_value = job
+    app.db_manager.get_video_detections.return_value = {
+        "bucket_name": "logs",
+        "s3_key": f"{test_video_filename}.detections.npz"
+    }
+    app.storage.get_detection_log.return_value = _detection_log()
+
+    response = client.get(f'/jobs/{job["job_id"]}?frame_objects=false', headers=auth_headers)
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert "frame_objects" not in data
+    assert data['intervals'] == [
+        {"start_frame": 2, "end_frame": 2, "classes": ["weapon"], "max_confidence": 0.9}
+    ]
+
+def test_get_job_other_user(client, app, auth_headers, test_video_filename):
+    """Тестирует запрет доступа к задаче другого пользователя."""
+    job = _job_record(uuid.uuid4(), test_video_filename, "pending")
+    app.db_manager.get_job.return_value = job
+
+    response = client.get(f'/jobs/{job["job_id"]}', headers=auth_headers)
+
+    assert response.status_code == 401
+
+def test_get_job_invalid_id(client, app, auth_headers):
+    """Тестирует запрос задачи с некорректным идентификатором."""
+    response = client.get('/jobs/not-a-uuid', headers=auth_headers)
+
+    assert response.status_code == 404
+    app.db_manager.get_job.assert_not_called()
+
+def test_health(client):
+    """Тестирует проверку работы процесса."""
+    response = client.get('/health')
+
+    assert response.status_code == 200
+    assert json.loads(response.data)["status"] == "ok"
+
+def test_ready(client, app):
+    """Тестирует готовность экземпляра при доступных PostgreSQL и MinIO без загрузки модели."""
+    app.db_manager.check_connection.return_value = True
+    app.storage.ensure_connection.return_value = True
+
+    with patch('app.models.model.get_model') as mock_get_model:
+        response = client.get('/ready')
+
+    assert response.status_code == 200
+    assert json.loads(response.data) == {"status": "ready", "database": True, "storage": True}
+    mock_get_model.assert_not_called()
+
+@pytest.mark.parametrize("database,storage", [(False, True), (True, False)])
+def test_ready_dependency_unavailable(client, app, database, storage):
+    """Тестирует, что экземпляр не готов, если недоступна БД или хранилище."""
+    app.db_manager.check_connection.return_value = database
+    app.storage.ensure_connection.return_value = storage
+
+    response = client.get('/ready')
+
+    assert response.status_code == 503
+    assert json.loads(response.data) == {"status": "unavailable", "database": database, "storage": storage}
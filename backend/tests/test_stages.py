@@ -0,0 +1,58 @@
+import pytest
+import time
+from app.services.video_processing.stages import BackgroundWorker, Prefetcher, StageError
+
+
+def test_prefetcher_preserves_order():
+    """Тестирует, что элементы читаются в фоновом потоке без изменения порядка."""
+    with Prefetcher(iter(range(100)), maxsize=3) as items:
+        assert list(items) == list(range(100))
+
+def test_prefetcher_is_bounded():
+    """Тестирует, что поток чтения не опережает потребителя больше чем на maxsize элементов."""
+    produced = []
+
+    def source():
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    with Prefetcher(source(), maxsize=2) as items:
+        iterator = iter(items)
+        assert next(iterator) == 0
+        # Очередь вмещает 2 элемента, еще один ожидает места в потоке чтения
+        time.sleep(0.3)
+        assert len(produced) <= 4
+
+def test_prefetcher_propagates_error():
+    """Тестирует передачу исключения из потока чтения потребителю."""
+    def source():
+        yield 1
+        raise ValueError("ошибка декодирования")
+
+    with Prefetcher(source(), maxsize=2) as items:
+        iterator = iter(items)
+        assert next(iterator) == 1
+        with pytest.raises(StageError, match="ошибка декодирования"):
+            next(iterator)
+
+def test_background_worker_processes_all_items():
+    """Тестирует обработку всех элементов до выхода из контекста."""
+    handled = []
+
+    with BackgroundWorker(handled.append, maxsize=2) as worker:
+        for i in range(50):
+            worker.put(i)
+
+    assert handled == list(range(50))
+
+def test_background_worker_propagates_error():
+    """Тестирует, что ошибка обработчика прерывает передачу элементов."""
+    def handler(item):
+        if item == 3:
+            raise RuntimeError("ffmpeg завершился с ошибкой")
+
+    with pytest.raises(StageError, match="ffmpeg"):
+        with BackgroundWorker(handler, maxsize=1) as worker:
+            for i in range(100):
+                worker.put(i)
@@ -0,0 +1,96 @@
+import numpy as np
+
+from app.services.video_processing import tiling
+
+
+def _frame(width=1920, height=1080, value=0):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+def test_tile_grid_covers_frame():
+    """Тестирует покрытие кадра участками с перекрытием и прижатым к краю последним участком."""
+    grid = tiling.tile_grid(1920, 1080, 640, 0.2)
+
+    assert grid[:, 0].min() == 0 and grid[:, 2].max() == 1920
+    assert grid[:, 1].min() == 0 and grid[:, 3].max() == 1080
+    assert ((grid[:, 2] - grid[:, 0]) == 640).all()
+    # Шаг 512: участки по x с 0, 512, 1024 и 1280, по y с 0 и 440
+    assert len(grid) == 8
+    assert len(tiling.tile_grid(640, 480, 640, 0.2)) == 1
+
+def test_merge_detections_suppresses_duplicates():
+    """Тестирует объединение обрезанной рамки участка с полной рамкой того же объекта."""
+    detections = np.array([
+        [100, 100, 200, 200, 0.6, 1],
+        # Та же рамка, обрезанная границей участка
+        [100, 100, 150, 200, 0.8, 1],
+        # Другой класс в том же месте сохраняется
+        [100, 100, 200, 200, 0.5, 0],
+        [500, 500, 540, 540, 0.4, 1],
+    ], dtype=np.float32)
+
+    merged = tiling.merge_detections(detections, 0.5)
+
+    assert merged[:, 4].tolist() == [np.float32(0.8), np.float32(0.5), np.float32(0.4)]
+
+def test_select_low_confidence_and_motion():
+    """Тестирует выбор участков с неуверенными детекциями и движением с ограничением числа участков."""
+    tiler = tiling.TiledInference(enabled=True, tile_size=640, overlap=0.2, max_tiles=2,
+                                  low_confidence=0.5, motion_threshold=0.02)
+    confident = np.array([[50, 50, 100, 100, 0.9, 1]], dtype=np.float32)
+    uncertain = np.array([[1800, 1000, 1850, 1050, 0.2, 1]], dtype=np.float32)
+
+    # Первый кадр: движения еще нет, уверенная детекция участков не требует
+    assert len(tiler.select(_frame(), confident)) == 0
+
+    moved = _frame()
+    moved[100:300, 100:300] = 255
+    selected = tiler.select(moved, uncertain)
+
+    assert len(selected) == 2
+    # Сначала участок с неуверенной детекцией, затем участок с движением
+    assert selected[0].tolist() == [1280, 440, 1920, 1080]
+    assert selected[1][0] == 0 and selected[1][1] == 0
+    # Кадр не больше участка не делится
+    assert len(tiler.select(_frame(640, 480), uncertain)) == 0
+
+def test_refine_maps_tile_boxes_to_frame():
+    """Тестирует перевод рамок участков в координаты кадра и объединение с детекциями кадра."""
+    tiler = tiling.TiledInference(enabled=True, tile_size=640, overlap=0.2, max_tiles=4,
+                                  low_confidence=0.5, motion_threshold=0)
+    full = np.array([[1800, 1000, 1850, 1050, 0.2, 1]], dtype=np.float32)
+    crops = []
+
+    def predict(tiles):
+        crops.extend(tiles)
+        return [np.array([[520, 560, 570, 610, 0.7, 1]], dtype=np.float32) for _ in tiles]
+
+    detections, tiled_frames, tiles = tiler.refine([_frame()], [full], predict)
+
+    assert (tiled_frames, tiles) == (1, 1)
+    assert crops[0].shape == (640, 640, 3)
+    # Рамка участка (1280, 440) совпала с рамкой кадра и заменила ее
+    np.testing.assert_allclose(detections[0], [[1800, 1000, 1850, 1050, 0.7, 1]])
+
+def test_benchmark_tiling_report():
+    """Тестирует отчет о стоимости детекции без участков, с адаптивным выбором и со всеми участками."""
+    from unittest.mock import MagicMock, patch
+    from app.services.video_processing import tiling_benchmark, video_processing
+
+    def predict_frames(frames, confidence_threshold, summary):
+        # Неуверенная детекция в левом верхнем углу уменьшенного кадра
+        return [np.array([[10, 10, 20, 20, 0.3, 1]], dtype=np.float32) for _ in frames]
+
+    mock_model = MagicMock()
+    mock_model.names = {0: "weapon", 1: "knife"}
+    with patch.object(video_processing, "_predict_frames", side_effect=predict_frames), \
+            patch.object(tiling_benchmark.model, "model", mock_model):
+        report = tiling_benchmark.benchmark_tiling(
+            [_frame(1280, 720)] * 4, batch_size=2, tile_size=640, max_tiles=1, motion_threshold=0
+        )
+
+    # Сетка 1280x720 участками 640 с перекрытием 0.2: 3 x 2 участка
+    assert report["grid_tiles"] == 6
+    assert report["full_frame"]["tiles_per_frame"] == 0
+    assert report["adaptive"]["tiles_per_frame"] == 1
+    assert report["all_tiles"]["tiles_per_frame"] == 6
+    assert report["all_tiles"]["tiled_frames"] == 4
@@ -0,0 +1,85 @@
+import numpy as np
+from app.services.video_processing.detections import DetectionSummary
+from app.services.video_processing.tracking import ObjectTracker, box_iou
+
+
+def _textured_frame(offset=(0, 0)):
+    """Создает кадр BGR 240x320 с текстурированным объектом, смещенным на offset."""
+    rng = np.random.default_rng(0)
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    texture = rng.integers(0, 255, size=(60, 60, 3), dtype=np.uint8)
+    x, y = 100 + offset[0], 80 + offset[1]
+    frame[y:y + 60, x:x + 60] = texture
+    return frame
+
+def _detections(*rows):
+    """Детекции кадра в формате [x1, y1, x2, y2, conf, cls]."""
+    return np.array(rows, dtype=np.float32).reshape(-1, 6)
+
+def test_box_iou():
+    """Тестирует попарное пересечение рамок."""
+    ious = box_iou([[0, 0, 10, 10]], [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+
+    assert np.allclose(ious, [[1.0, 1 / 3, 0.0]])
+
+def test_tracker_keeps_ids_between_keyframes():
+    """Тестирует сохранение номера трека для того же объекта на следующем ключевом кадре."""
+    tracker = ObjectTracker(match_iou=0.3)
+    frame = _textured_frame()
+
+    first = tracker.update(frame, _detections([100, 80, 160, 140, 0.9, 0], [0, 0, 20, 20, 0.8, 1]))
+    second = tracker.update(frame, _detections(
+        [104, 82, 164, 142, 0.85, 0],  # тот же объект, немного сместился
+        [0, 0, 20, 20, 0.8, 0],        # другой класс в рамке ножа - новый объект
+    ))
+
+    assert first.tolist() == [0, 1]
+    assert second.tolist() == [0, 2]
+
+def test_tracker_drops_tracks_after_max_age():
+    """Тестирует удаление трека, не подтвержденного детекцией max_age ключевых кадров."""
+    tracker = ObjectTracker(max_age=1)
+    frame = _textured_frame()
+
+    tracker.update(frame, _detections([100, 80, 160, 140, 0.9, 0]))
+    tracker.update(frame, _detections())
+    tracker.update(frame, _detections())
+
+    assert tracker.update(frame, _detections([100, 80, 160, 140, 0.9, 0])).tolist() == [1]
+
+def test_tracker_propagates_boxes_with_optical_flow():
+    """Тестирует перенос рамки за движущимся объектом между ключевыми кадрами."""
+    tracker = ObjectTracker(decay=0.9, redetect_health=0.5)
+    tracker.update(_textured_frame(), _detections([100, 80, 160, 140, 0.9, 0]))
+
+    detections, track_ids = tracker.propagate(_textured_frame(offset=(6, 3)))
+
+    assert track_ids.tolist() == [0]
+    assert np.allclose(detections[0, :4], [106, 83, 166, 143], atol=1.0)
+    # Уверенность ключевого кадра сохраняется, надежность трека снижается
+    assert detections[0, 4] == np.float32(0.9)
+    assert not tracker.needs_detection
+
+    for step in range(2, 8):
+        tracker.propagate(_textured_frame(offset=(6 * step, 3)))
+    assert tracker.needs_detection
+
+def test_summary_counts_distinct_tracks():
+    """Тестирует подсчет различных объектов по номерам треков."""
+    summary = DetectionSummary({0: "weapon", 1: "knife"}, 0.5)
+    for frame_index in range(3):
+        summary.add(frame_index, _detections([0, 0, 10, 10, 0.9, 0]), np.array([7], dtype=np.int32))
+    summary.add(3, _detections([0, 0, 10, 10, 0.9, 1], [0, 0, 5, 5, 0.2, 0]), np.array([8, 9], dtype=np.int32))
+
+    assert summary.total_weapons == 3
+    assert summary.distinct_weapons == 1
+    assert summary.distinct_knives == 1
+
+    other = DetectionSummary({0: "weapon", 1: "knife"}, 0.5)
+    other.add(4, _detections([0, 0, 10, 10, 0.9, 0]), np.array([0], dtype=np.int32))
+    summary.merge(other)
+
+    # Номера треков участка сдвигаются и не совпадают с номерами первого участка
+    assert summary.distinct_weapons == 2
+    assert summary.track_ids[-1].tolist() == [10]
+    assert DetectionSummary({}).distinct_weapons is None
@@ -2,10 +2,12 @@ import pytest
 import os
 import json
 import tempfile
+import shutil
+import subprocess
 import cv2
 import numpy as np
 from unittest.mock import patch, MagicMock, mock_open
-from app.services.video_processing import video_processing
+from app.services.video_processing import detections, video_processing
 
 
 @pytest.fixture
@@ -33,6 +35,24 @@ def mock_video_file():
     if os.path.exists(temp_file.name):
         os.remove(temp_file.name)
 
+def _write_gop_video(path, frames, gop, fps=25, timestamps=None):
+    """
+    Видео H.264 с ключевым кадром каждые gop кадров и B-кадрами (кадры пронумерованы testsrc).
+
+    :param timestamps: выражение setpts для видео с переменной частотой кадров
+    """
+    from app.services.video_processing.encoder import get_ffmpeg_binary
+
+    variable = ["-vf", f"setpts={timestamps}", "-fps_mode", "passthrough"] if timestamps else []
+    subprocess.run([
+        get_ffmpeg_binary(), "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc=size=160x120:rate={fps}",
+        "-frames:v", str(frames), *variable,
+        "-c:v", "libx264", "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0", "-bf", "2",
+        "-pix_fmt", "yuv420p", path,
+    ], check=True)
+    return path
+
 @pytest.fixture
 def mock_yolo():
     """Мокирует модель YOLO для тестирования."""
@@ -52,10 +72,7 @@ def mock_yolo():
 @pytest.fixture
 def mock_storage():
     """Мокирует хранилище MinIO для тестирования."""
-    with patch('app.services.video_processing.video_processing.MinioStorage') as mock_minio_class:
-        mock_storage = MagicMock()
-        mock_minio_class.return_value = mock_storage
-        
+    with patch('app.services.video_processing.video_processing.storage') as mock_storage:
         mock_storage.save_video.return_value = True
         mock_storage.save_log.return_value = True
         
@@ -84,4 +101,688 @@ def test_process_video_invalid_file(mock_storage):
     finally:
 
         if os.path.exists(temp_path):
-            os.remove(temp_path) 
\ No newline at end of file
+            os.remove(temp_path) 
+
+def _make_frame_result(class_ids, names=None):
+    """Создает мок результата модели для одного кадра."""
+    frame_result = MagicMock()
+    frame_result.names = names or {0: "weapon", 1: "knife"}
+    frame_result.boxes.cls = np.array(class_ids, dtype=np.float32)
+    frame_result.boxes.conf = np.full(len(class_ids), 0.9, dtype=np.float32)
+    frame_result.boxes.xyxy = np.array(
+        [[10, 10, 50, 50]] * len(class_ids), dtype=np.float32
+    ).reshape(-1, 4)
+    return frame_result
+
+
+def test_summarize_detections_consumes_stream():
+    """Тестирует потоковую обработку результатов модели по одному кадру."""
+    consumed = []
+
+    def results_stream():
+        for class_ids in ([0], [], [0, 1], [1]):
+            consumed.append(len(consumed))
+            yield _make_frame_result(class_ids)
+
+    summary = video_processing.summarize_detections(results_stream())
+
+    assert consumed == [0, 1, 2, 3]
+    assert summary.frame_objects == [
+        (0, True, False),
+        (1, False, False),
+        (2, True, True),
+        (3, False, True),
+    ]
+    assert summary.total_weapons == 2
+    assert summary.total_knives == 2
+    assert summary.has_weapon_or_knife
+
+
+def test_find_processed_video_prefers_mp4():
+    """Тестирует поиск результата модели в директории задачи."""
+    with tempfile.TemporaryDirectory() as output_dir:
+        assert video_processing.find_processed_video(output_dir) is None
+
+        for name in ("frame.jpg", "video.avi", "video.mp4"):
+            open(os.path.join(output_dir, name), "wb").close()
+
+        result = video_processing.find_processed_video(output_dir)
+        assert result == os.path.join(output_dir, "video.mp4")
+
+
+def test_process_video_uses_isolated_work_dir(mock_video_file):
+    """Тестирует, что каждая задача пишет результаты в собственную директорию."""
+    work_dirs = []
+
+    def fake_predict(source, project, name, **kwargs):
+        save_dir = os.path.join(project, name)
+        os.makedirs(save_dir, exist_ok=True)
+        open(os.path.join(save_dir, "video.mp4"), "wb").write(b"video")
+        work_dirs.append(project)
+        return iter([_make_frame_result([0])])
+
+    with patch.object(video_processing.model, 'model', side_effect=fake_predict), \
+         patch('app.services.video_processing.video_processing.storage') as mock_storage:
+        result = video_processing.process_video(
+            mock_video_file, 0.6, "testuser", pipeline="ultralytics"
+        )
+        video_processing.process_video(
+            mock_video_file, 0.6, "testuser", pipeline="ultralytics"
+        )
+
+    assert len(set(work_dirs)) == 2
+    assert all(not os.path.exists(work_dir) for work_dir in work_dirs)
+    assert result[1] == [(0, True, False)]
+    assert mock_storage.save_video.call_count == 2
+
+
+def test_process_video_single_pass(mock_video_file):
+    """Тестирует однопроходный конвейер с кодированием в H.264 MP4."""
+    uploaded = {}
+
+    def fake_save_video(file_path, object_name, metadata=None):
+        cap = cv2.VideoCapture(file_path)
+        uploaded["frames"] = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        with open(file_path, "rb") as video:
+            uploaded["content"] = video.read()
+        return True
+
+    mock_model = MagicMock()
+    mock_model.names = {0: "weapon", 1: "knife"}
+    mock_model.predict.side_effect = lambda frames, **kwargs: [_make_frame_result([1]) for _ in frames]
+
+    with patch.object(video_processing.model, 'model', mock_model), \
+         patch('app.services.video_processing.video_processing.storage') as mock_storage:
+        mock_storage.save_video.side_effect = fake_save_video
+
+        video_filename, frame_objects, fps, has_weapon, log_filename = (
+            video_processing.process_video(
+                mock_video_file, 0.6, "testuser", pipeline="single_pass", batch_size=2
+            )
+        )
+
+    # 5 кадров пакетами по 2: 2 + 2 + 1
+    assert [len(call[0][0]) for call in mock_model.predict.call_args_list] == [2, 2, 1]
+    assert frame_objects == [(i, False, True) for i in range(5)]
+    assert has_weapon is True
+    assert fps == 30
+    assert video_filename.endswith(".mp4")
+    assert log_filename == f"{video_filename}.detections.npz"
+    detection_log = mock_storage.save_detection_log.call_args[0][0]
+    assert detection_log["confidence_threshold"] == 0.6
+    assert detection_log["frame"].tolist() == [0, 1, 2, 3, 4]
+    assert uploaded["frames"] == 5
+    # +faststart переносит moov-атом перед данными кадров
+    assert uploaded["content"].index(b"moov") < uploaded["content"].index(b"mdat")
+
+
+def test_process_video_detection_only(mock_video_file):
+    """Тестирует обработку без отрисовки, кодирования и загрузки видео."""
+    mock_model = MagicMock()
+    mock_model.names = {0: "weapon", 1: "knife"}
+    mock_model.predict.side_effect = lambda frames, **kwargs: [_make_frame_result([0]) for _ in frames]
+
+    with patch.object(video_processing.model, 'model', mock_model), \
+         patch('app.services.video_processing.video_processing.VideoEncoder') as mock_encoder, \
+         patch('app.services.video_processing.video_processing.storage') as mock_storage:
+        video_filename, frame_objects, _, has_weapon, log_filename = video_processing.process_video(
+            mock_video_file, 0.6, "testuser", pipeline="single_pass", render=False
+        )
+
+    mock_encoder.assert_not_called()
+    mock_storage.save_video.assert_not_called()
+    assert frame_objects == [(i, True, False) for i in range(5)]
+    assert has_weapon is True
+    assert log_filename == f"{video_filename}.detections.npz"
+    detection_log, _, metadata = mock_storage.save_detection_log.call_args[0]
+    assert detection_log["boxes"].shape == (5, 4)
+    assert metadata["render"] == "false"
+    assert not video_processing.has_annotated_video(metadata)
+    assert video_processing.has_annotated_video({})
+
+
+def test_iter_batches():
+    """Тестирует группировку кадров в пакеты с неполным последним пакетом."""
+    assert list(video_processing.iter_batches(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(video_processing.iter_batches([], 3)) == []
+
+def test_single_pass_batches_keep_frame_order(mock_video_file):
+    """Тестирует, что результаты пакета сопоставляются кадрам в исходном порядке."""
+    names = {0: "weapon", 1: "knife"}
+    # Оружие только во 2-м и 5-м кадрах
+    frame_classes = iter([[], [0], [], [], [0]])
+    mock_model = MagicMock()
+    mock_model.names = names
+    mock_model.predict.side_effect = lambda frames, **kwargs: [
+        _make_frame_result(next(frame_classes), names) for _ in frames
+    ]
+    progress = []
+
+    with patch.object(video_processing.model, 'model', mock_model), \
+         patch('app.services.video_processing.video_processing.VideoEncoder'):
+        summary = video_processing.run_single_pass(
+            mock_video_file, "out.mp4", 0.6, 30, progress.append, batch_size=4
+        )
+
+    assert mock_model.predict.call_count == 2
+    assert summary.frame_objects == [
+        (0, False, False), (1, True, False), (2, False, False), (3, False, False), (4, True, False)
+    ]
+    assert progress == [4, 5]
+
+def test_single_pass_keeps_low_confidence_detections(mock_video_file):
+    """Тестирует запуск модели с нижним порогом и фильтрацию результата по порогу запроса."""
+    mock_model = MagicMock()
+    mock_model.names = {0: "weapon", 1: "knife"}
+
+    def predict(frames, **kwargs):
+        results = []
+        for _ in frames:
+            result = _make_frame_result([0])
+            result.boxes.conf = np.array([0.3], dtype=np.float32)
+            results.append(result)
+        return results
+
+    mock_model.predict.side_effect = predict
+
+    with patch.object(video_processing.model, 'model', mock_model), \
+         patch('app.services.video_processing.video_processing.VideoEncoder'):
+        summary = video_processing.run_single_pass(mock_video_file, "out.mp4", 0.6, 30, batch_size=8)
+
+    assert mock_model.predict.call_args[1]["conf"] == video_processing.RAW_DETECTION_FLOOR
+    assert not summary.has_weapon_or_knife
+    assert len(summary.raw_detections) == 5
+
+    detection_log = detections.build_detection_log(summary, video_processing.RAW_DETECTION_FLOOR)
+    assert detections.log_frame_objects(detection_log) == summary.frame_objects
+    assert detections.rethreshold(detection_log, 0.25).frame_objects == [(i, True, False) for i in range(5)]
+    assert detections.rethreshold(detection_log, 0.6).frame_objects == summary.frame_objects
+    with pytest.raises(ValueError):
+        detections.rethreshold(detection_log, 0.05)
+
+def test_iter_log_detections():
+    """Тестирует восстановление покадровых детекций из колоночного лога."""
+    summary = detections.DetectionSummary({0: "weapon", 1: "knife"})
+    frame_detections = {
+        1: np.array([[10.2, 10, 50, 50.7, 0.5, 0], [60, 60, 90, 90, 0.8, 1]], dtype=np.float32),
+        3: np.array([[0, 0, 20, 20, 0.9, 1]], dtype=np.float32),
+    }
+    for frame_index in range(5):
+        summary.add(frame_index, frame_detections.get(frame_index, detections.EMPTY_DETECTIONS))
+
+    detection_log = detections.build_detection_log(summary, 0.1)
+    restored = list(detections.iter_log_detections(detection_log))
+
+    assert [frame_index for frame_index, _ in restored] == [0, 1, 2, 3, 4]
+    assert [len(rows) for _, rows in restored] == [0, 2, 0, 1, 0]
+    # Координаты рамок округляются до пикселей
+    np.testing.assert_allclose(restored[1][1][:, :4], np.rint(frame_detections[1][:, :4]))
+    np.testing.assert_allclose(restored[3][1][:, 4:], frame_detections[3][:, 4:])
+
+def test_log_boxes():
+    """Тестирует выдачу рамок детекций не ниже порога."""
+    detection_log = {
+        "confidence_threshold": 0.6,
+        "frame": np.array([0, 0, 3], dtype=np.int32),
+        "class_id": np.array([0, 1, 1], dtype=np.int16),
+        "confidence": np.array([0.9, 0.4, 0.7], dtype=np.float32),
+        "boxes": np.array([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12]], dtype=np.uint16),
+    }
+
+    assert detections.log_boxes(detection_log) == [
+        [0, 0, 0.9, 1, 2, 3, 4],
+        [3, 1, 0.7, 9, 10, 11, 12],
+    ]
+    assert len(detections.log_boxes(detection_log, 0.3)) == 3
+
+def test_benchmark_detection_log_report():
+    """Тестирует сравнение размера колоночного лога и JSON-лога на синтетических детекциях."""
+    from app.services.video_processing.detection_log_benchmark import benchmark_detection_log
+
+    report = benchmark_detection_log(total_frames=2000, detection_rate=0.05, repeats=1)
+
+    assert report["frames"] == 2000
+    assert report["detected_frames"] >= 100
+    assert report["boxes"] >= report["detected_frames"]
+    assert report["npz"]["bytes"] < report["json"]["bytes"]
+
+def test_log_intervals():
+    """Тестирует сведение кадров с детекциями в интервалы с одинаковым набором классов."""
+    def detection(class_id, confidence):
+        return np.array([[0, 0, 10, 10, confidence, class_id]], dtype=np.float32)
+
+    frames = [
+        detections.EMPTY_DETECTIONS,
+        detection(0, 0.6),
+        detection(0, 0.9),
+        detections.EMPTY_DETECTIONS,
+        detection(1, 0.7),
+        np.vstack([detection(0, 0.55), detection(1, 0.8)]),
+        detection(0, 0.3),
+        detection(0, 0.95),
+    ]
+    summary = detections.DetectionSummary({0: "weapon", 1: "knife"}, 0.5)
+    for frame_index, frame_detections in enumerate(frames):
+        summary.add(frame_index, frame_detections)
+
+    detection_log = detections.build_detection_log(summary, 0.1)
+
+    assert detections.log_intervals(detection_log) == [
+        {"start_frame": 1, "end_frame": 2, "classes": ["weapon"], "max_confidence": 0.9},
+        {"start_frame": 4, "end_frame": 4, "classes": ["knife"], "max_confidence": 0.7},
+        {"start_frame": 5, "end_frame": 5, "classes": ["weapon", "knife"], "max_confidence": 0.8},
+        {"start_frame": 7, "end_frame": 7, "classes": ["weapon"], "max_confidence": 0.95},
+    ]
+    # Детекция 0.3 в кадре 6 видна при меньшем пороге и продлевает интервал
+    assert detections.log_intervals(detections.with_intervals(detection_log, 0.2))[-1] == {
+        "start_frame": 6, "end_frame": 7, "classes": ["weapon"], "max_confidence": 0.95
+    }
+    # Для прежнего JSON-лога интервалы те же, но без уверенности
+    legacy = detections.frame_object_intervals(summary.frame_objects)
+    assert [(i["start_frame"], i["end_frame"], i["classes"]) for i in legacy] == [
+        (i["start_frame"], i["end_frame"], i["classes"]) for i in detections.log_intervals(detection_log)
+    ]
+    assert all(interval["max_confidence"] is None for interval in legacy)
+
+def test_detection_floor():
+    """Тестирует, что нижний порог модели не выше порога запроса."""
+    assert video_processing.detection_floor(0.6) == video_processing.RAW_DETECTION_FLOOR
+    assert video_processing.detection_floor(0.05) == 0.05
+
+def test_single_pass_frame_stride(mock_video_file):
+    """Тестирует детекцию на каждом N-м кадре с заполнением промежуточных кадров."""
+    names = {0: "weapon", 1: "knife"}
+    # Обрабатываются кадры 0 и 3; кадр 1 ближе к 0-му, кадры 2 и 4 - к 3-му
+    sampled_classes = iter([[], [0]])
+    mock_model = MagicMock()
+    mock_model.names = names
+    mock_model.predict.side_effect = lambda frames, **kwargs: [
+        _make_frame_result(next(sampled_classes), names) for _ in frames
+    ]
+
+    with patch.object(video_processing.model, 'model', mock_model), \
+         patch('app.services.video_processing.video_processing.VideoEncoder') as mock_encoder:
+        summary = video_processing.run_single_pass(
+            mock_video_file, "out.mp4", 0.6, 30, batch_size=8, stride=3
+        )
+
+    assert len(mock_model.predict.call_args[0][0]) == 2
+    assert summary.frame_objects == [
+        (0, False, False), (1, False, False), (2, True, False), (3, True, False), (4, True, False)
+    ]
+    encoder = mock_encoder.return_value.__enter__.return_value
+    assert encoder.write.call_count == 5
+
+def test_nearest_sample():
+    """Тестирует выбор ближайшего обработанного кадра."""
+    assert video_processing.nearest_sample(1, 4, "prev", "next") == "prev"
+    assert video_processing.nearest_sample(2, 4, "prev", "next") == "prev"
+    assert video_processing.nearest_sample(3, 4, "prev", "next") == "next"
+    assert video_processing.nearest_sample(3, 4, "prev", None) == "prev"
+
+def test_single_pass_motion_gate(mock_video_file):
+    """Тестирует пропуск детекции на кадрах статичной сцены."""
+    from app.services.video_processing.motion import MotionGate
+
+    names = {0: "weapon", 1: "knife"}
+    mock_model = MagicMock()
+    mock_model.names = names
+    mock_model.predict.side_effect = lambda frames, **kwargs: [
+        _make_frame_result([0], names) for _ in frames
+    ]
+
+    with patch.object(video_processing.model, 'model', mock_model), \
+         patch('app.services.video_processing.video_processing.VideoEncoder'):
+        summary = video_processing.run_single_pass(
+            mock_video_file, "out.mp4", 0.6, 30, batch_size=2,
+            motion_gate=MotionGate(threshold=0.01, max_gated=100)
+        )
+
+    # Все кадры тестового видео одинаковые: модель запускается только на первом
+    assert sum(len(call[0][0]) for call in mock_model.predict.call_args_list) == 1
+    assert summary.inferred_frames == 1
+    assert summary.gated_frames == 4
+    assert summary.frame_objects == [(i, True, False) for i in range(5)]
+
+def test_single_pass_tracker_keyframes(mock_video_file):
+    """Тестирует запуск модели только на ключевых кадрах и перенос рамок трекером."""
+    from app.services.video_processing.tracking import ObjectTracker
+
+    names = {0: "weapon", 1: "knife"}
+    mock_model = MagicMock()
+    mock_model.names = names
+    mock_model.predict.side_effect = lambda frames, **kwargs: [
+        _make_frame_result([0], names) for _ in frames
+    ]
+
+    with patch.object(video_processing.model, 'model', mock_model), \
+         patch('app.services.video_processing.video_processing.VideoEncoder') as mock_encoder:
+        summary = video_processing.run_tracked_pass(
+            mock_video_file, "out.mp4", 0.6, 30, keyframe_interval=3,
+            tracker=ObjectTracker(0.6, redetect_health=0)
+        )
+
+    # Модель обрабатывает кадры 0 и 3, остальные кадры получают рамки трекера
+    assert mock_model.predict.call_count == 2
+    assert summary.inferred_frames == 2
+    assert summary.tracked_frames == 3
+    assert summary.frame_objects == [(i, True, False) for i in range(5)]
+    # Один и тот же объект на всех кадрах сохраняет номер трека
+    assert summary.total_weapons == 5
+    assert summary.distinct_weapons == 1
+    assert mock_encoder.return_value.__enter__.return_value.write.call_count == 5
+
+    detection_log = detections.build_detection_log(summary, video_processing.RAW_DETECTION_FLOOR)
+    assert detection_log["track_id"].tolist() == [0] * 5
+
+def test_plan_segments():
+    """Тестирует разбиение видео на непрерывные участки."""
+    from app.services.video_processing.segments import plan_segments
+
+    assert plan_segments(1000, 4, min_frames=100) == [(0, 250), (250, 500), (500, 750), (750, None)]
+    # Короткое видео не делится на участки короче min_frames
+    assert plan_segments(250, 4, min_frames=100) == [(0, 125), (125, None)]
+    assert plan_segments(50, 4, min_frames=100) == [(0, None)]
+    assert plan_segments(0, 4) == [(0, None)]
+
+def test_plan_segments_snaps_to_keyframes():
+    """Тестирует перенос границ участков на ближайшие ключевые кадры."""
+    from app.services.video_processing.segments import plan_segments
+
+    assert plan_segments(200, 3, min_frames=10, keyframes=[0, 50, 100, 150]) == [(0, 50), (50, 150), (150, None)]
+    # Без ключевых кадров внутри видео оно не делится
+    assert plan_segments(200, 3, min_frames=10, keyframes=[0]) == [(0, None)]
+
+def test_keyframe_index_long_gop(tmp_path):
+    """Тестирует поиск ключевых кадров видео с длинной группой кадров и B-кадрами."""
+    from app.services.video_processing import segments
+
+    path = _write_gop_video(str(tmp_path / "gop.mp4"), 120, 50)
+
+    total_frames, keyframes = segments.keyframe_index(path)
+
+    assert total_frames == 120
+    assert [frame for frame, _ in keyframes] == [0, 50, 100]
+    assert segments.seekable_keyframes(keyframes, 25) == [0, 50, 100]
+    # Время ключевого кадра не совпадает с номер / fps (другая частота): переход неточен
+    assert segments.seekable_keyframes(keyframes, 30) == [0]
+    assert segments.keyframe_index(str(tmp_path / "missing.mp4")) is None
+
+def test_segments_long_gop_read_every_frame_once(tmp_path):
+    """Тестирует, что участки, начинающиеся с ключевых кадров, дают те же кадры, что и чтение подряд."""
+    from app.services.video_processing import decoder, segments
+
+    path = _write_gop_video(str(tmp_path / "gop.mp4"), 120, 50)
+    total_frames, keyframes = segments.keyframe_index(path)
+    plan = segments.plan_segments(total_frames, 3, min_frames=10, keyframes=segments.seekable_keyframes(keyframes, 25))
+
+    assert plan == [(0, 50), (50, 100), (100, None)]
+    for read in (
+        lambda start, end: video_processing.read_frames(path, start, end),
+        lambda start, end: decoder.read_scaled_frames(path, (80, 60), 25, start, end),
+    ):
+        sequential = list(read(0, None))
+        segmented = [frame for start, end in plan for frame in read(start, end)]
+        assert len(segmented) == len(sequential) == 120
+        assert all(np.array_equal(a, b) for a, b in zip(segmented, sequential))
+
+def test_segments_variable_frame_rate(tmp_path):
+    """Тестирует, что видео с переменной частотой кадров не делится там, где переход по номер / fps неточен."""
+    from app.services.video_processing import segments
+
+    # После 60-го кадра пауза 0.5 с: время кадров 100+ не равно номер / fps
+    path = _write_gop_video(str(tmp_path / "vfr.mp4"), 120, 50, timestamps="N/25/TB+gte(N\\,60)*0.5/TB")
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    total_frames, keyframes = segments.keyframe_index(path)
+    plan = segments.plan_segments(total_frames, 3, min_frames=10, keyframes=segments.seekable_keyframes(keyframes, fps))
+
+    sequential = list(video_processing.read_frames(path))
+    segmented = [frame for start, end in plan for frame in video_processing.read_frames(path, start, end)]
+    assert len(segmented) == len(sequential)
+    assert all(np.array_equal(a, b) for a, b in zip(segmented, sequential))
+
+def test_run_segmented_merges_segments(tmp_path):
+    """Тестирует склейку участков и глобальную нумерацию кадров."""
+    from contextlib import nullcontext
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services.video_processing import segments
+
+    names = {0: "weapon", 1: "knife"}
+    mock_model = MagicMock()
+    mock_model.names = names
+    mock_model.predict.side_effect = lambda frames, **kwargs: [
+        _make_frame_result([1], names) for _ in frames
+    ]
+    path = _write_gop_video(str(tmp_path / "gop.mp4"), 8, 4)
+    work_dir = tempfile.mkdtemp()
+    output_path = os.path.join(work_dir, "out.mp4")
+
+    with patch.object(video_processing.model, 'model', mock_model), \
+         patch.object(segments, 'SEGMENT_MIN_FRAMES', 2), \
+         patch.object(segments.model, 'backend', 'pytorch', create=True), \
+         patch.object(segments, 'use_pool', return_value=nullcontext(ThreadPoolExecutor(2))) as mock_pool, \
+         patch.object(segments, '_process_segment', wraps=segments._process_segment) as mock_segment:
+        summary = segments.run_segmented(
+            path, output_path, 0.6, 25, 8, work_dir, workers=2
+        )
+
+    # Бэкенд выбран в этом процессе и передан пулу
+    mock_pool.assert_called_once_with(2, 'pytorch')
+    assert sorted(call[0][4:6] for call in mock_segment.call_args_list) == [(0, 4), (4, None)]
+    assert summary.frame_objects == [(i, False, True) for i in range(8)]
+    assert summary.total_knives == 8
+    cap = cv2.VideoCapture(output_path)
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 8
+    cap.release()
+    shutil.rmtree(work_dir)
+
+def test_run_segmented_frame_count_mismatch(tmp_path):
+    """Тестирует повторную обработку одним участком, если кадры на границе потеряны."""
+    from contextlib import nullcontext
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services.video_processing import segments
+
+    names = {0: "weapon", 1: "knife"}
+    mock_model = MagicMock()
+    mock_model.names = names
+    mock_model.predict.side_effect = lambda frames, **kwargs: [
+        _make_frame_result([0], names) for _ in frames
+    ]
+    path = _write_gop_video(str(tmp_path / "gop.mp4"), 8, 4)
+    work_dir = tempfile.mkdtemp()
+    output_path = os.path.join(work_dir, "out.mp4")
+    # Пакетов больше, чем кадров удастся прочитать участками
+    index = (9, [(0, 0.0), (4, 0.16)])
+
+    with patch.object(video_processing.model, 'model', mock_model), \
+         patch.object(segments, 'SEGMENT_MIN_FRAMES', 2), \
+         patch.object(segments, 'keyframe_index', return_value=index), \
+         patch.object(segments.model, 'backend', 'pytorch', create=True), \
+         patch.object(segments, 'use_pool', return_value=nullcontext(ThreadPoolExecutor(2))) as mock_pool, \
+         patch.object(segments, '_process_segment', wraps=segments._process_segment) as mock_segment:
+        summary = segments.run_segmented(
+            path, output_path, 0.6, 25, 8, work_dir, workers=2
+        )
+
+    assert mock_segment.call_count == 3
+    assert mock_segment.call_args[0][4:6] == (0, None)
+    assert summary.frame_objects == [(i, True, False) for i in range(8)]
+    cap = cv2.VideoCapture(output_path)
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 8
+    cap.release()
+    shutil.rmtree(work_dir)
+
+def test_init_worker_uses_parent_backend():
+    """Тестирует, что процесс пула загружает модель бэкендом родительского процесса, а не выбирает его сам."""
+    import torch
+    from app.services.video_processing import segments
+
+    backends = []
+    with patch.object(segments.model, 'model_backend', 'auto'), \
+         patch.object(segments.model, 'warm_up', side_effect=lambda: backends.append(segments.model.model_backend)), \
+         patch.object(segments.inference_process, 'MODEL_PROCESS_ENABLED', True), \
+         patch.object(torch, 'set_num_threads') as set_num_threads:
+        segments._init_worker(2, 'onnx')
+        assert segments.inference_process.MODEL_PROCESS_ENABLED is False
+
+    assert backends == ['onnx']
+    set_num_threads.assert_called_once_with(2)
+
+def test_use_pool_shared_and_replaced_when_unused():
+    """Тестирует, что задачи делят пул, а пул другого размера создается только после освобождения текущего."""
+    import threading
+    from app.services.video_processing import segments
+
+    created = []
+
+    def create_pool(workers, backend):
+        created.append((workers, backend))
+        return MagicMock(name=f"pool-{workers}")
+
+    replaced = threading.Event()
+    pools = {}
+
+    def other_size():
+        with segments.use_pool(3, 'pytorch') as pool:
+            pools['other'] = pool
+            replaced.set()
+
+    with patch.object(segments, '_create_pool', side_effect=create_pool), \
+         patch.object(segments, '_pool', None), \
+         patch.object(segments, '_pool_key', None), \
+         patch.object(segments, '_pool_users', 0):
+        with segments.use_pool(2, 'pytorch') as first:
+            thread = threading.Thread(target=other_size)
+            thread.start()
+            # Пул другого размера ждет, пока первый пул используется
+            assert not replaced.wait(0.2)
+            with segments.use_pool(2, 'pytorch') as second:
+                assert second is first
+            first.shutdown.assert_not_called()
+        thread.join(5)
+
+    assert replaced.is_set()
+    first.shutdown.assert_called_once_with()
+    assert pools['other'] is not first
+    assert created == [(2, 'pytorch'), (3, 'pytorch')]
+
+def test_predict_batch_fits_inference_size():
+    """Тестирует уменьшение больших кадров перед моделью и рамки в координатах исходного кадра."""
+    mock_model = MagicMock()
+    mock_model.predict.side_effect = lambda frames, **kwargs: [_make_frame_result([0]) for _ in frames]
+    frames = [np.zeros((1080, 1920, 3), dtype=np.uint8), np.zeros((480, 640, 3), dtype=np.uint8)]
+
+    with patch.object(video_processing.model, 'model', mock_model):
+        result = video_processing.predict_batch(frames, 0.5)
+
+    passed = mock_model.predict.call_args[0][0]
+    assert [frame.shape for frame in passed] == [(360, 640, 3), (480, 640, 3)]
+    assert mock_model.predict.call_args[1]["imgsz"] == video_processing.model.INFERENCE_IMGSZ
+    np.testing.assert_allclose(result[0][0, :4], [30, 30, 150, 150])
+    np.testing.assert_allclose(result[1][0, :4], [10, 10, 50, 50])
+
+def test_single_pass_detection_only_downscaled_decode(tmp_path):
+    """Тестирует декодирование в размере входа модели без разметки и рамки исходного разрешения."""
+    path = str(tmp_path / "large.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (1280, 720))
+    for _ in range(4):
+        writer.write(np.zeros((720, 1280, 3), dtype=np.uint8))
+    writer.release()
+    shapes = []
+    mock_model = MagicMock()
+    mock_model.names = {0: "weapon", 1: "knife"}
+
+    def predict(frames, **kwargs):
+        shapes.extend(frame.shape for frame in frames)
+        return [_make_frame_result([0]) for _ in frames]
+
+    mock_model.predict.side_effect = predict
+
+    with patch.object(video_processing.model, 'model', mock_model), \
+         patch('app.services.video_processing.video_processing.DOWNSCALE_DECODE', True):
+        summary = video_processing.run_single_pass(path, None, 0.6, 30, batch_size=2)
+
+    assert shapes == [(360, 640, 3)] * 4
+    assert len(summary.raw_detections) == 4
+    np.testing.assert_allclose(summary.raw_detections[0][1][0, :4], [20, 20, 100, 100])
+
+def test_single_pass_tiled_inference(tmp_path):
+    """Тестирует детекцию на участках исходного разрешения без разметки и уменьшенного декодирования."""
+    path = str(tmp_path / "large.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (1280, 720))
+    for _ in range(2):
+        writer.write(np.zeros((720, 1280, 3), dtype=np.uint8))
+    writer.release()
+    shapes = []
+    mock_model = MagicMock()
+    mock_model.names = {0: "weapon", 1: "knife"}
+
+    def predict(frames, **kwargs):
+        shapes.append([frame.shape for frame in frames])
+        results = []
+        for frame in frames:
+            result = _make_frame_result([1])
+            result.boxes.conf = np.array([0.3], dtype=np.float32)
+            if frame.shape[0] == 640:
+                # Мелкий объект, найденный только на участке
+                result.boxes.xyxy = np.array([[300, 300, 340, 340]], dtype=np.float32)
+            results.append(result)
+        return results
+
+    mock_model.predict.side_effect = predict
+    tiler = video_processing.TiledInference(enabled=True, tile_size=640, max_tiles=1, motion_threshold=0)
+
+    with patch.object(video_processing.model, 'model', mock_model), \
+         patch('app.services.video_processing.video_processing.DOWNSCALE_DECODE', True):
+        summary = video_processing.run_single_pass(path, None, 0.6, 30, batch_size=2, tiler=tiler)
+
+    # Полные кадры уменьшаются до входа модели, затем участки - одним пакетом
+    assert shapes == [[(360, 640, 3)] * 2, [(640, 640, 3)] * 2]
+    assert (summary.tiled_frames, summary.tiles) == (2, 2)
+    # Рамка полного кадра (20, 20, 100, 100) и рамка участка не совпадают
+    # и сохраняются обе
+    boxes = summary.raw_detections[0][1][:, :4]
+    assert sorted(boxes.tolist()) == [[20, 20, 100, 100], [300, 300, 340, 340]]
+
+def test_concurrent_jobs_serialize_direct_predict(mock_video_file):
+    """Тестирует, что задачи в соседних потоках не вызывают модель одновременно без сервера инференса."""
+    import threading
+    import time
+
+    active = 0
+    overlaps = []
+    lock = threading.Lock()
+    mock_model = MagicMock()
+    mock_model.names = {0: "weapon", 1: "knife"}
+
+    def predict(frames, **kwargs):
+        nonlocal active
+        with lock:
+            active += 1
+            overlaps.append(active)
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+        return [_make_frame_result([0]) for _ in frames]
+
+    mock_model.predict.side_effect = predict
+    summaries = []
+
+    def job():
+        summaries.append(video_processing.run_single_pass(mock_video_file, None, 0.6, 30, batch_size=1))
+
+    with patch.object(video_processing.model, 'model', mock_model), \
+         patch('app.models.batching.INFERENCE_SERVER_ENABLED', False), \
+         patch('app.models.inference_process.MODEL_PROCESS_ENABLED', False):
+        threads = [threading.Thread(target=job) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(summaries) == 2
+    assert mock_model.predict.call_count == 10
+    assert max(overlaps) == 1
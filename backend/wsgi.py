@@ -1,4 +1,6 @@
 from app import app
 
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5174, debug=True) 
\ No newline at end of file
+    # Сервер для разработки. В production приложение запускается через
+    # gunicorn (gunicorn.conf.py)
+    app.run(host='0.0.0.0', port=5174, debug=True) 
@@ -29,6 +29,12 @@ function start_project() {
     python wsgi.py > ../backend.log 2>&1 &
     BACKEND_PID=$!
     echo $BACKEND_PID > ../backend.pid
+    
+    # Запуск обработчика очереди видео
+    echo "⚙️ Запуск обработчика очереди видео..."
+    python worker.py > ../worker.log 2>&1 &
+    WORKER_PID=$!
+    echo $WORKER_PID > ../worker.pid
     cd ..
     
     # Запуск фронтенда
@@ -44,6 +50,7 @@ function start_project() {
     echo "🔧 Бэкенд доступен по адресу: http://localhost:5174"
     echo "💡 Для авторизации используйте: username=admin, password=zxc"
     echo "📝 Логи бэкенда: backend.log"
+    echo "📝 Логи обработчика очереди: worker.log"
     echo "📝 Логи фронтенда: frontend.log"
     echo "⚠️ Для остановки проекта выполните: ./build.sh stop"
 }
@@ -66,6 +73,21 @@ function stop_project() {
         pkill -f "python wsgi.py" || true
     fi
     
+    # Остановка обработчика очереди
+    if [ -f "worker.pid" ]; then
+        WORKER_PID=$(cat worker.pid)
+        if ps -p $WORKER_PID > /dev/null; then
+            echo "⚙️ Останавливаем обработчик очереди (PID: $WORKER_PID)..."
+            kill $WORKER_PID
+        else
+            echo "⚙️ Процесс обработчика очереди (PID: $WORKER_PID) уже остановлен"
+        fi
+        rm worker.pid
+    else
+        echo "⚙️ Файл с PID для обработчика очереди не найден"
+        pkill -f "python worker.py" || true
+    fi
+    
     # Остановка фронтенда
     if [ -f "frontend.pid" ]; then
         FRONTEND_PID=$(cat frontend.pid)
@@ -0,0 +1,43 @@
+import { useMemo } from 'react';
+import './detectionOverlay.css';
+
+// Рамки детекций поверх исходного видео (для обработки без размеченного видео).
+// detections - строки [кадр, class_id, уверенность, x1, y1, x2, y2] в пикселях видео
+const DetectionOverlay = ({ detections, names, frame, width, height }) => {
+    const framesIndex = useMemo(() => {
+        const index = new Map();
+        detections.forEach((row) => {
+            if (!index.has(row[0])) {
+                index.set(row[0], []);
+            }
+            index.get(row[0]).push(row);
+        });
+        return index;
+    }, [detections]);
+
+    if (!width || !height) {
+        return null;
+    }
+
+    const boxes = framesIndex.get(frame) || [];
+
+    return (
+        <svg
+            className="detection-overlay"
+            viewBox={`0 0 ${width} ${height}`}
+            preserveAspectRatio="xMidYMid meet"
+            data-testid="detection-overlay"
+        >
+            {boxes.map(([, classId, confidence, x1, y1, x2, y2], index) => (
+                <g key={index}>
+                    <rect x={x1} y={y1} width={x2 - x1} height={y2 - y1} className="detection-box" />
+                    <text x={x1} y={Math.max(y1 - 4, 12)} className="detection-label">
+                        {`${names?.[classId] ?? classId} ${Math.round(confidence * 100)}%`}
+                    </text>
+                </g>
+            ))}
+        </svg>
+    );
+};
+
+export default DetectionOverlay;
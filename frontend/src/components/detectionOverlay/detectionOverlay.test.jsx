@@ -0,0 +1,38 @@
+import { describe, it, expect } from 'vitest';
+import { render, screen } from '@testing-library/react';
+import DetectionOverlay from './detectionOverlay';
+
+describe('DetectionOverlay Component', () => {
+    const detections = [
+        [0, 0, 0.91, 10, 20, 110, 220],
+        [3, 1, 0.75, 5, 5, 50, 50],
+        [3, 0, 0.8, 60, 60, 90, 90]
+    ];
+    const names = { 0: 'weapon', 1: 'knife' };
+
+    it('draws only the boxes of the current frame', () => {
+        const { container } = render(
+            <DetectionOverlay detections={detections} names={names} frame={3} width={640} height={480} />
+        );
+
+        expect(container.querySelectorAll('rect')).toHaveLength(2);
+        expect(screen.getByText('knife 75%')).toBeInTheDocument();
+        expect(screen.getByText('weapon 80%')).toBeInTheDocument();
+    });
+
+    it('scales boxes with the video size', () => {
+        render(<DetectionOverlay detections={detections} names={names} frame={0} width={640} height={480} />);
+
+        const overlay = screen.getByTestId('detection-overlay');
+        expect(overlay.getAttribute('viewBox')).toBe('0 0 640 480');
+        const box = overlay.querySelector('rect');
+        expect(box.getAttribute('width')).toBe('100');
+        expect(box.getAttribute('height')).toBe('200');
+    });
+
+    it('renders nothing until the video size is known', () => {
+        render(<DetectionOverlay detections={detections} names={names} frame={0} width={0} height={0} />);
+
+        expect(screen.queryByTestId('detection-overlay')).not.toBeInTheDocument();
+    });
+});
@@ -3,75 +3,58 @@ import { render, screen, fireEvent } from '@testing-library/react';
 import DetectionResults from './detectionResults';
 
 describe('DetectionResults Component', () => {
-    const mockFrameObjects = [
-        [1, 2, 0],
-        [2, 0, 0],
-        [3, 0, 1],
-        [4, 1, 1]
+    const mockIntervals = [
+        { start_frame: 1, end_frame: 1, classes: ['weapon'], max_confidence: 0.91 },
+        { start_frame: 3, end_frame: 3, classes: ['knife'], max_confidence: 0.7 },
+        { start_frame: 4, end_frame: 6, classes: ['weapon', 'knife'], max_confidence: 0.85 }
     ];
 
     it('renders detection results correctly', () => {
         render(<DetectionResults
-            frameObjects={mockFrameObjects}
+            intervals={mockIntervals}
             onFrameClick={() => { }}
             currentFrame={null}
         />);
 
         expect(screen.getByText(/Frame 1\. Detected weapon\./)).toBeInTheDocument();
         expect(screen.getByText(/Frame 3\. Detected knife\./)).toBeInTheDocument();
-        expect(screen.getByText(/Frame 4\. Detected weapon and knife\./)).toBeInTheDocument();
+        expect(screen.getByText(/Frames 4-6\. Detected weapon and knife\./)).toBeInTheDocument();
         expect(screen.queryByText(/Frame 2\./)).not.toBeInTheDocument();
     });
 
     it('handles frame click correctly', () => {
         const mockOnFrameClick = vi.fn();
-        const videoElement = { currentTime: 0 };
-        document.querySelector = vi.fn().mockReturnValue(videoElement);
 
         render(<DetectionResults
-            frameObjects={mockFrameObjects}
+            intervals={mockIntervals}
             onFrameClick={mockOnFrameClick}
             currentFrame={null}
         />);
 
-        const firstLog = screen.getByText(/Frame 1\. Detected weapon\./);
-        fireEvent.click(firstLog);
+        fireEvent.click(screen.getByText(/Frames 4-6\./));
 
-        expect(mockOnFrameClick).toHaveBeenCalledWith(1);
+        expect(mockOnFrameClick).toHaveBeenCalledWith(4);
     });
 
-    it('renders empty message when no weapons or knives are detected', () => {
-        const input = [
-            [5, 0, 0], // не должен отображаться
-            [6, 1, 0], // weapon
-            [7, 0, 0], // не должен отображаться
-            [8, 0, 1], // knife
-            [9, 0, 0], // не должен отображаться
-            [10, 0, 0], // пустой, но отличается от предыдущих по кадру
+    it('renders confidence only when it is known', () => {
+        const intervals = [
+            { start_frame: 6, end_frame: 6, classes: ['weapon'], max_confidence: 0.915 },
+            { start_frame: 8, end_frame: 9, classes: ['knife'], max_confidence: null }
         ];
 
         render(<DetectionResults
-            frameObjects={input}
+            intervals={intervals}
             onFrameClick={() => { }}
             currentFrame={null}
         />);
 
-        expect(screen.queryByText(/Frame 5/)).not.toBeInTheDocument();
-        expect(screen.queryByText(/Frame 7/)).not.toBeInTheDocument();
-        expect(screen.queryByText(/Frame 9/)).not.toBeInTheDocument();
-        expect(screen.queryByText(/Frame 10/)).not.toBeInTheDocument();
+        expect(screen.getByText(/Frame 6\. Detected weapon\. Confidence: 92%\./)).toBeInTheDocument();
+        expect(screen.queryByText(/Frames 8-9\..*Confidence/)).not.toBeInTheDocument();
     });
 
     it('highlights the current frame', () => {
-        const mockFrameObjects = [
-            [1, 2, 0],
-            [2, 0, 0],
-            [3, 0, 1],
-            [4, 1, 1]
-        ];
-
         render(<DetectionResults
-            frameObjects={mockFrameObjects}
+            intervals={mockIntervals}
             onFrameClick={() => { }}
             currentFrame={3}
         />);
@@ -81,4 +64,4 @@ describe('DetectionResults Component', () => {
 
         expect(logItem.classList.contains('active')).toBe(true);
     });
-});
\ No newline at end of file
+});
@@ -1,43 +1,38 @@
 import './detectionResult.css';
 
-const DetectionResults = ({ frameObjects, onFrameClick, currentFrame }) => {
-    const filteredFrameObjects = frameObjects.filter(frameObject =>
-        frameObject[1] > 0 || frameObject[2] > 0
-    );
-
-    const uniqueSequenceFrames = filteredFrameObjects.filter((frameObject, index) => {
-        if (index === 0) return true;
-
-        const prevFrame = filteredFrameObjects[index - 1];
-        const currentFrame = frameObject;
-
-        return (currentFrame[0] - prevFrame[0] > 1) ||
-            (currentFrame[1] !== prevFrame[1]) ||
-            (currentFrame[2] !== prevFrame[2]);
-    });
-
-    const formatDetectionMessage = (weapons, knives) => {
-        if (weapons > 0 && knives > 0) {
+const DetectionResults = ({ intervals, onFrameClick, currentFrame }) => {
+    const formatDetectionMessage = (classes) => {
+        const weapons = classes.includes('weapon');
+        const knives = classes.includes('knife');
+        if (weapons && knives) {
             return "Detected weapon and knife.";
-        } else if (weapons > 0) {
+        } else if (weapons) {
             return "Detected weapon.";
-        } else if (knives > 0) {
+        } else if (knives) {
             return "Detected knife.";
         }
         return "";
     };
 
+    // Интервалы подряд идущих кадров с одинаковыми классами вычисляются на сервере
+    const formatFrames = (interval) => (
+        interval.start_frame === interval.end_frame
+            ? `Frame ${interval.start_frame}`
+            : `Frames ${interval.start_frame}-${interval.end_frame}`
+    );
+
     return (
         <div className="log">
-            {uniqueSequenceFrames.map((frameObject, index) => (
+            {intervals.map((interval, index) => (
                 <div
                     key={index}
-                    className={`log-item ${currentFrame === frameObject[0] ? 'active' : ''}`}
-                    onClick={() => onFrameClick(frameObject[0])}
+                    className={`log-item ${currentFrame === interval.start_frame ? 'active' : ''}`}
+                    onClick={() => onFrameClick(interval.start_frame)}
                     style={{ cursor: 'pointer' }}
                 >
                     <p>
-                        Frame {frameObject[0]}. {formatDetectionMessage(frameObject[1], frameObject[2])}
+                        {formatFrames(interval)}. {formatDetectionMessage(interval.classes)}
+                        {interval.max_confidence != null && ` Confidence: ${Math.round(interval.max_confidence * 100)}%.`}
                     </p>
                 </div>
             ))}
@@ -45,4 +40,4 @@ const DetectionResults = ({ frameObjects, onFrameClick, currentFrame }) => {
     );
 };
 
-export default DetectionResults;
\ No newline at end of file
+export default DetectionResults;
@@ -7,12 +7,16 @@ import cctv from '../../assets/cctv.png';
 import hands from '../../assets/hands.png';
 import loading from '../../assets/loading.svg'
 
+const JOB_POLL_INTERVAL = 2000;
+
 const MainPage = () => {
     const fileInputRef = useRef(null);
     const [isFileUploaded, setIsFileUploaded] = useState(false);
     const [uploadedFile, setUploadedFile] = useState(null);
     const navigate = useNavigate();
     const [isLoading, setIsLoading] = useState(false);
+    const [progress, setProgress] = useState(0);
+    const [renderVideo, setRenderVideo] = useState(true);
 
     const handleFileUpload = () => {
         fileInputRef.current.click();
@@ -25,12 +29,39 @@ const MainPage = () => {
         setUploadedFile(selectedFile);
     };
 
+    const waitForJob = async (jobId, token) => {
+        for (;;) {
+            // Интервалы детекций вычисляются на сервере, покадровый лог не нужен
+            const response = await axios.get(`http://127.0.0.1:5174/jobs/${jobId}?frame_objects=false`, {
+                headers: {
+                    'Authorization': `Bearer ${token}`
+                }
+            });
+            const job = response.data;
+
+            if (job.status === 'completed') {
+                return job;
+            }
+            if (job.status === 'failed') {
+                throw new Error(job.error || 'Video processing failed');
+            }
+
+            setProgress(job.progress || 0);
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+        }
+    };
+
     const sendVideoToBackend = async () => {
         const formData = new FormData();
         formData.append('file', uploadedFile);
+        if (!renderVideo) {
+            // Только детекция: размеченное видео не создается
+            formData.append('render', 'false');
+        }
 
         try {
             setIsLoading(true);
+            setProgress(0);
             const token = localStorage.getItem('token');
             const response = await axios.post('http://127.0.0.1:5174/predict',
                 formData,
@@ -41,10 +72,18 @@ const MainPage = () => {
                     }
                 }
             );
+
+            // Видео обрабатывается в очереди: ждем завершения задачи
+            let result = response.data;
+            if (result.job_id) {
+                result = await waitForJob(result.job_id, token);
+            }
+
             navigate('/result', {
                 state: {
-                    video_url: response.data.video_url,
-                    frame_objects: response.data.frame_objects
+                    video_url: result.video_url,
+                    intervals: result.intervals,
+                    fps: result.fps
                 }
             });
         } catch (error) {
@@ -76,7 +115,11 @@ const MainPage = () => {
                     {isLoading ? (
                         <div className="loading">
                             <img src={loading} alt="loading" className='circle' />
-                            <p className='processing-text'>Your video is being processed...</p>
+                            <p className='processing-text'>
+                                {progress > 0
+                                    ? `Your video is being processed... ${progress}%`
+                                    : 'Your video is being processed...'}
+                            </p>
                         </div>
                     ) : isFileUploaded ? (
                         <div>
@@ -87,6 +130,14 @@ const MainPage = () => {
                             <p className='file-name'>
                                 Uploaded file: {uploadedFile.name}
                             </p>
+                            <label className='render-option'>
+                                <input
+                                    type='checkbox'
+                                    checked={renderVideo}
+                                    onChange={(e) => setRenderVideo(e.target.checked)}
+                                />
+                                Annotated video
+                            </label>
                         </div>
                     ) : (
                         <button onClick={handleFileUpload}>Open file</button>
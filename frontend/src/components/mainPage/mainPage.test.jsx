@@ -46,7 +46,8 @@ describe('MainPage Component', () => {
         axios.post.mockResolvedValue({
             data: {
                 video_url: 'processed-video.mp4',
-                frame_objects: [[1, 2, 0]]
+                intervals: [{ start_frame: 1, end_frame: 1, classes: ['weapon'], max_confidence: 0.9 }],
+                fps: 30
             }
         });
 
@@ -75,6 +76,79 @@ describe('MainPage Component', () => {
         expect(navigateMock).toHaveBeenCalledWith('/result', expect.any(Object));
     });
 
+    it('requests detection only when annotated video is unchecked', async () => {
+        axios.post.mockResolvedValue({
+            data: {
+                video_url: 'processed-video.mp4',
+                intervals: [],
+                fps: 30
+            }
+        });
+
+        render(<MainPage />);
+
+        const file = new File(['dummy content'], 'test-video.mp4', { type: 'video/mp4' });
+        fireEvent.click(screen.getByText('Open file'));
+        const input = document.querySelector('input[type="file"]');
+        fireEvent.change(input, { target: { files: [file] } });
+
+        fireEvent.click(screen.getByLabelText('Annotated video'));
+        fireEvent.click(screen.getByText('Detect'));
+
+        await waitFor(() => expect(axios.post).toHaveBeenCalled());
+        const formData = axios.post.mock.calls[0][1];
+        expect(formData.get('render')).toBe('false');
+    });
+
+    it('waits for the queued job before showing results', async () => {
+        axios.post.mockResolvedValue({
+            status: 202,
+            data: {
+                job_id: 'job-1',
+                status: 'pending',
+                video_url: 'processed-video.mp4'
+            }
+        });
+        axios.get.mockResolvedValue({
+            data: {
+                job_id: 'job-1',
+                status: 'completed',
+                progress: 100,
+                video_url: 'processed-video.mp4',
+                intervals: [{ start_frame: 0, end_frame: 0, classes: ['weapon'], max_confidence: 0.9 }],
+                fps: 25
+            }
+        });
+
+        render(<MainPage />);
+
+        const file = new File(['dummy content'], 'test-video.mp4', { type: 'video/mp4' });
+        fireEvent.click(screen.getByText('Open file'));
+        const input = document.querySelector('input[type="file"]');
+        fireEvent.change(input, { target: { files: [file] } });
+
+        fireEvent.click(screen.getByText('Detect'));
+
+        await waitFor(() => {
+            expect(navigateMock).toHaveBeenCalledWith('/result', {
+                state: {
+                    video_url: 'processed-video.mp4',
+                    intervals: [{ start_frame: 0, end_frame: 0, classes: ['weapon'], max_confidence: 0.9 }],
+                    fps: 25
+                }
+            });
+        });
+
+        expect(axios.get).toHaveBeenCalledWith(
+            'http://127.0.0.1:5174/jobs/job-1?frame_objects=false',
+            expect.objectContaining({
+                headers: expect.objectContaining({
+                    'Authorization': 'Bearer fake-token'
+                })
+            })
+        );
+    });
+
     it('navigates to catalog when Catalog button is clicked', () => {
         render(<MainPage />);
         fireEvent.click(screen.getByText('Catalog'));
@@ -2,16 +2,36 @@ import { Link, useLocation } from 'react-router-dom';
 import { useEffect, useState, useRef } from 'react';
 import ReactPlayer from 'react-player';
 import DetectionResults from '../detectionResult/detectionResults';
+import DetectionOverlay from '../detectionOverlay/detectionOverlay';
 import './resultPage.css';
 
 const ResultPage = () => {
     const { state } = useLocation();
     const [videoUrl, setVideoUrl] = useState('');
     const [currentFrame, setCurrentFrame] = useState(null);
+    const [intervals, setIntervals] = useState(state.intervals || []);
+    const [fps, setFps] = useState(state.fps || 30);
+    // Для обработки без размеченного видео рамки рисуются поверх исходного
+    const [overlay, setOverlay] = useState(null);
+    const [playedFrame, setPlayedFrame] = useState(0);
+    const [videoSize, setVideoSize] = useState({ width: 0, height: 0 });
     const playerRef = useRef(null);
     const token = localStorage.getItem('token');
 
     useEffect(() => {
+        const fetchDetections = async () => {
+            const response = await fetch(`http://127.0.0.1:5174/videos/${state.video_url}/detections`, {
+                headers: {
+                    'Authorization': `Bearer ${token}`
+                }
+            });
+
+            if (response.ok) {
+                const data = await response.json();
+                setOverlay({ detections: data.detections || [], names: data.names || {} });
+            }
+        };
+
         const fetchVideo = async () => {
             try {
                 const response = await fetch(`http://127.0.0.1:5174/video/${state.video_url}`, {
@@ -23,6 +43,9 @@ const ResultPage = () => {
                 if (response.ok) {
                     const data = await response.json();
                     setVideoUrl(data.url);
+                    if (data.annotated === false) {
+                        await fetchDetections();
+                    }
                 }
             } catch (error) {
                 console.error('Error fetching video:', error);
@@ -32,6 +55,34 @@ const ResultPage = () => {
         fetchVideo();
     }, [state.video_url, token]);
 
+    useEffect(() => {
+        if (state.intervals) {
+            return;
+        }
+
+        const fetchIntervals = async () => {
+            try {
+                const response = await fetch(`http://127.0.0.1:5174/videos/${state.video_url}/intervals`, {
+                    headers: {
+                        'Authorization': `Bearer ${token}`
+                    }
+                });
+
+                if (response.ok) {
+                    const data = await response.json();
+                    setIntervals(data.intervals || []);
+                    if (data.fps) {
+                        setFps(data.fps);
+                    }
+                }
+            } catch (error) {
+                console.error('Error fetching intervals:', error);
+            }
+        };
+
+        fetchIntervals();
+    }, [state.video_url, state.intervals, token]);
+
     const handleDownload = async () => {
         if (videoUrl) {
             try {
@@ -51,10 +102,18 @@ const ResultPage = () => {
         }
     };
 
+    const handlePlayerReady = (player) => {
+        const video = player.getInternalPlayer();
+        if (video && video.videoWidth) {
+            setVideoSize({ width: video.videoWidth, height: video.videoHeight });
+        }
+    };
+
     const handleFrameSeek = (frameNumber) => {
+        setPlayedFrame(frameNumber);
         setCurrentFrame(frameNumber);
         if (playerRef.current) {
-            const seekTo = frameNumber / 30;
+            const seekTo = frameNumber / fps;
             playerRef.current.seekTo(seekTo, 'seconds');
         }
     };
@@ -72,6 +131,9 @@ const ResultPage = () => {
                                 url={videoUrl}
                                 controls
                                 playing={false}
+                                progressInterval={overlay ? 1000 / fps : 1000}
+                                onReady={handlePlayerReady}
+                                onProgress={overlay ? ({ playedSeconds }) => setPlayedFrame(Math.round(playedSeconds * fps)) : undefined}
                                 config={{
                                     file: {
                                         attributes: {
@@ -82,6 +144,15 @@ const ResultPage = () => {
                                 }}
                             />
                         )}
+                        {videoUrl && overlay && (
+                            <DetectionOverlay
+                                detections={overlay.detections}
+                                names={overlay.names}
+                                frame={playedFrame}
+                                width={videoSize.width}
+                                height={videoSize.height}
+                            />
+                        )}
                     </div>
                     <div className="buttons">
                         <Link to="/">
@@ -95,7 +166,7 @@ const ResultPage = () => {
                     <h2>Detection Log</h2>
                     <div className="detection-results">
                         <DetectionResults
-                            frameObjects={state.frame_objects}
+                            intervals={intervals}
                             onFrameClick={handleFrameSeek}
                             currentFrame={currentFrame}
                         />
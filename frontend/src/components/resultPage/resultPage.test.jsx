@@ -28,11 +28,11 @@ vi.mock('react-player', () => ({
 }));
 
 vi.mock('../detectionResult/detectionResults', () => ({
-    default: ({ frameObjects, onFrameClick, currentFrame }) => (
+    default: ({ intervals, onFrameClick, currentFrame }) => (
         <div data-testid="detection-results">
-            {frameObjects.map((frame, index) => (
-                <div key={index} onClick={() => onFrameClick(index + 1)}>
-                    Frame {index + 1}
+            {intervals.map((interval, index) => (
+                <div key={index} onClick={() => onFrameClick(interval.start_frame)}>
+                    Frame {interval.start_frame}
                 </div>
             ))}
         </div>
@@ -42,11 +42,11 @@ vi.mock('../detectionResult/detectionResults', () => ({
 describe('ResultPage Component', () => {
     const mockState = {
         video_url: 'test-video.mp4',
-        frame_objects: [
-            [1, 1, 0],  // weapon
-            [2, 0, 0],  // nothing
-            [3, 0, 1],  // knife
-            [4, 1, 1]   // weapon and knife
+        fps: 25,
+        intervals: [
+            { start_frame: 1, end_frame: 1, classes: ['weapon'], max_confidence: 0.9 },
+            { start_frame: 3, end_frame: 3, classes: ['knife'], max_confidence: 0.8 },
+            { start_frame: 4, end_frame: 4, classes: ['weapon', 'knife'], max_confidence: 0.7 }
         ],
     };
 
@@ -103,6 +103,77 @@ describe('ResultPage Component', () => {
         });
     });
 
+    it('fetches detection intervals when they are not passed in state', async () => {
+        useLocation.mockReturnValue({ state: { video_url: mockState.video_url } });
+        global.fetch.mockResolvedValue({
+            ok: true,
+            json: vi.fn().mockResolvedValue({
+                url: 'mock-video-url',
+                fps: 25,
+                intervals: [{ start_frame: 7, end_frame: 9, classes: ['weapon'], max_confidence: 0.9 }]
+            }),
+        });
+
+        render(
+            <MemoryRouter>
+                <ResultPage />
+            </MemoryRouter>
+        );
+
+        expect(await screen.findByText('Frame 7')).toBeInTheDocument();
+        expect(global.fetch).toHaveBeenCalledWith(
+            `http://127.0.0.1:5174/videos/${mockState.video_url}/intervals`,
+            {
+                headers: {
+                    'Authorization': 'Bearer mock-token'
+                }
+            }
+        );
+    });
+
+    it('does not fetch intervals passed in state', async () => {
+        render(
+            <MemoryRouter>
+                <ResultPage />
+            </MemoryRouter>
+        );
+
+        await screen.findByText('Frame 3');
+        expect(global.fetch).not.toHaveBeenCalledWith(
+            expect.stringContaining('/intervals'),
+            expect.anything()
+        );
+    });
+
+    it('fetches detection boxes for a video processed without rendering', async () => {
+        global.fetch.mockResolvedValue({
+            ok: true,
+            json: vi.fn().mockResolvedValue({
+                url: 'mock-original-url',
+                annotated: false,
+                names: { 0: 'weapon' },
+                detections: [[1, 0, 0.9, 10, 10, 50, 50]]
+            }),
+        });
+
+        render(
+            <MemoryRouter>
+                <ResultPage />
+            </MemoryRouter>
+        );
+
+        await waitFor(() => {
+            expect(global.fetch).toHaveBeenCalledWith(
+                `http://127.0.0.1:5174/videos/${mockState.video_url}/detections`,
+                {
+                    headers: {
+                        'Authorization': 'Bearer mock-token'
+                    }
+                }
+            );
+        });
+    });
+
     it('handles fetch video error', async () => {
         global.fetch.mockRejectedValueOnce(new Error('Fetch error'));
         console.error = vi.fn();
@@ -2,12 +2,14 @@ import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import ReactPlayer from 'react-player';
 import axios from 'axios';
+import DetectionResults from '../detectionResult/detectionResults';
 import './videoCatalog.css';
 
 const VideoCatalog = () => {
     const [videos, setVideos] = useState([]);
     const [selectedVideo, setSelectedVideo] = useState(null);
-    const [logs, setLogs] = useState([]);
+    const [intervals, setIntervals] = useState([]);
+    const [fps, setFps] = useState(30);
     const [editingVideo, setEditingVideo] = useState(null);
     const [newName, setNewName] = useState('');
     const [videoUrl, setVideoUrl] = useState('');
@@ -35,8 +37,8 @@ const VideoCatalog = () => {
         setCurrentFrame(null);
 
         try {
-            const logsResponse = await axios.get(
-                `http://127.0.0.1:5174/videos/${video.filename}/logs`,
+            const intervalsResponse = await axios.get(
+                `http://127.0.0.1:5174/videos/${video.filename}/intervals`,
                 { headers: { Authorization: `Bearer ${token}` } }
             );
 
@@ -51,7 +53,8 @@ const VideoCatalog = () => {
             }
 
             setSelectedVideo(video);
-            setLogs(logsResponse.data);
+            setIntervals(intervalsResponse.data.intervals || []);
+            setFps(intervalsResponse.data.fps || 30);
         } catch (error) {
             console.error('Error loading video and logs:', error);
         }
@@ -89,7 +92,7 @@ const VideoCatalog = () => {
             setVideos(videos.filter(v => v.filename !== video.filename));
             if (selectedVideo?.filename === video.filename) {
                 setSelectedVideo(null);
-                setLogs([]);
+                setIntervals([]);
                 setVideoUrl('');
             }
         } catch (error) {
@@ -141,24 +144,11 @@ const VideoCatalog = () => {
         }
     };
 
-    const filterLogsSequence = (logs) => {
-        return logs.filter((log, index) => {
-            if (index === 0) return true;
-
-            const prevLog = logs[index - 1];
-            const currentLog = log;
-
-            return (currentLog[0] - prevLog[0] > 1) ||
-                (currentLog[1] !== prevLog[1]) ||
-                (currentLog[2] !== prevLog[2]);
-        });
-    };
-
     const handleLogClick = (frameNumber) => {
         setCurrentFrame(frameNumber);
         const video = document.querySelector('.react-player video');
         if (video) {
-            const timeInSeconds = frameNumber / 30;
+            const timeInSeconds = frameNumber / fps;
             video.currentTime = timeInSeconds;
             video.play();
             setTimeout(() => {
@@ -167,17 +157,6 @@ const VideoCatalog = () => {
         }
     };
 
-    const formatDetectionMessage = (weapons, knives) => {
-        if (weapons > 0 && knives > 0) {
-            return "Detected weapon and knife.";
-        } else if (weapons > 0) {
-            return "Detected weapon.";
-        } else if (knives > 0) {
-            return "Detected knife.";
-        }
-        return "";
-    };
-
     return (
         <div className="catalog-container">
             <div className="video-list">
@@ -259,18 +238,11 @@ const VideoCatalog = () => {
                         <div className="logs-container">
                             <h3>Detection Logs</h3>
                             <div className="logs-list">
-                                {logs.length > 0 && filterLogsSequence(logs.filter(log => log[1] > 0 || log[2] > 0))
-                                    .map((log, index) => (
-                                        <div
-                                            key={index}
-                                            className={`log-item ${currentFrame === log[0] ? 'active' : ''}`}
-                                            onClick={() => handleLogClick(log[0])}
-                                            style={{ cursor: 'pointer' }}
-                                        >
-                                            <p>Frame {log[0]}. {formatDetectionMessage(log[1], log[2])}</p>
-                                        </div>
-                                    ))
-                                }
+                                <DetectionResults
+                                    intervals={intervals}
+                                    onFrameClick={handleLogClick}
+                                    currentFrame={currentFrame}
+                                />
                             </div>
                         </div>
                     </div>
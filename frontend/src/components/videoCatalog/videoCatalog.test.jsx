@@ -41,10 +41,11 @@ describe('VideoCatalog Component', () => {
         filename: 'video1_20240407.mp4',
         original_name: 'test1.mp4',
         log_count: 3,
-        logs: [
-            [1, 1, 0],
-            [3, 0, 1],
-            [4, 1, 1],
+        fps: 25,
+        intervals: [
+            { start_frame: 1, end_frame: 1, classes: ['weapon'], max_confidence: 0.9 },
+            { start_frame: 3, end_frame: 3, classes: ['knife'], max_confidence: 0.8 },
+            { start_frame: 4, end_frame: 4, classes: ['weapon', 'knife'], max_confidence: 0.7 },
         ],
     };
 
@@ -55,8 +56,10 @@ describe('VideoCatalog Component', () => {
             if (url === 'http://127.0.0.1:5174/videos') {
                 return Promise.resolve({ data: mockVideos });
             }
-            if (url === `http://127.0.0.1:5174/videos/${mockVideo.filename}/logs`) {
-                return Promise.resolve({ data: mockVideo.logs });
+            if (url === `http://127.0.0.1:5174/videos/${mockVideo.filename}/intervals`) {
+                return Promise.resolve({
+                    data: { video_url: mockVideo.filename, fps: mockVideo.fps, intervals: mockVideo.intervals }
+                });
             }
             return Promise.reject(new Error('Unknown endpoint'));
         });
@@ -234,7 +237,7 @@ describe('VideoCatalog Component', () => {
         fireEvent.click(videoItem);
         const frameElement = await screen.findByText(/Frame 1/);
         fireEvent.click(frameElement);
-        expect(fakeVideo.currentTime).toBeCloseTo(1 / 30);
+        expect(fakeVideo.currentTime).toBeCloseTo(1 / 25);
         await waitFor(() => expect(fakeVideo.play).toHaveBeenCalled());
         await waitFor(() => expect(fakeVideo.pause).toHaveBeenCalled());
         document.body.removeChild(playerWrapper);
@@ -61,6 +61,7 @@ CREATE INDEX idx_logs_user_id ON logs (user_id);
 CREATE INDEX idx_logs_video_id ON logs (video_id);
 CREATE INDEX idx_videos_s3_key ON videos (s3_key);
 CREATE INDEX idx_videos_bucket_name ON videos (bucket_name);
+CREATE INDEX idx_videos_status ON videos (status, upload_time);
 
 -- Добавляем тестового пользователя (admin/admin123)
 INSERT INTO users (username, password_hash, role)
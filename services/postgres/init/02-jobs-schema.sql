@@ -0,0 +1,25 @@
+-- Очередь задач обработки видео.
+-- Обработчики на разных узлах забирают задачи через SELECT ... FOR UPDATE SKIP LOCKED,
+-- продлевают аренду (lease) периодическими heartbeat и возвращают в очередь задачи
+-- упавших обработчиков, у которых аренда истекла.
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    video_id UUID NOT NULL UNIQUE,
+    status VARCHAR(50) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'processing', 'completed', 'failed')),
+    payload JSONB,
+    progress INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker_id VARCHAR(255),
+    error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    lease_expires_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    FOREIGN KEY (video_id) REFERENCES videos (video_id) ON DELETE CASCADE
+);
+
+-- Выбор следующей задачи и поиск задач с истекшей арендой
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created_at ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_lease_expires_at ON jobs (lease_expires_at) WHERE status = 'processing';
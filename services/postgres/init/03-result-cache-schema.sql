@@ -0,0 +1,23 @@
+-- Кэш результатов обработки видео.
+-- Ключ - SHA-256 от хэша содержимого исходного видео, версии модели, порога
+-- уверенности и параметров обработки. Запись ссылается на размеченное видео
+-- и лог детекций в MinIO; при повторной загрузке того же видео они копируются
+-- на стороне сервера MinIO вместо повторной обработки.
+CREATE TABLE IF NOT EXISTS result_cache (
+    cache_key CHAR(64) PRIMARY KEY,
+    content_hash CHAR(64) NOT NULL,
+    model_version VARCHAR(255) NOT NULL,
+    confidence_threshold REAL NOT NULL,
+    options JSONB,
+    video_s3_key VARCHAR(255) NOT NULL,
+    video_bucket VARCHAR(100) NOT NULL,
+    log_s3_key VARCHAR(255) NOT NULL,
+    log_bucket VARCHAR(100) NOT NULL,
+    weapon_detected BOOLEAN NOT NULL DEFAULT FALSE,
+    metadata JSONB,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_result_cache_content_hash ON result_cache (content_hash);